@@ -0,0 +1,3 @@
+"""基准测试
+在 src 目录下运行 `python3 -m benchmarks <名称> [参数]` ，`python3 -m benchmarks` 列出所有基准测试
+"""
@@ -0,0 +1,31 @@
+import importlib
+import sys
+
+
+# 基准测试名称 -> 模块名，每个模块提供 main(argv) 函数
+BENCHMARKS = {
+    'retransmit': 'benchmarks.retransmit',
+    'startup': 'benchmarks.startup',
+    'shard': 'benchmarks.shard',
+    'worklist': 'benchmarks.worklist',
+    'sketch': 'benchmarks.sketch',
+    'traffic': 'benchmarks.traffic',
+    'pool': 'benchmarks.pool',
+    'live': 'benchmarks.live',
+    'player': 'benchmarks.player',
+    'dedup': 'benchmarks.dedup',
+    'gossip': 'benchmarks.gossip',
+    'leach': 'benchmarks.leach',
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f'用法: python3 -m benchmarks <{"|".join(BENCHMARKS)}> [参数]')
+        sys.exit(1)
+    module = importlib.import_module(BENCHMARKS[sys.argv[1]])
+    module.main(sys.argv[2:])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import argparse
+from typing import List, Optional
+
+import numpy
+
+from wsn import Wsn, WsnWorklist, get_protocol
+from wsn.utils import generate_rand_nodes
+
+from .sketch import deep_sizeof
+
+
+def run(
+        protocol: str, node_num: int, cycles: int, num_of_sources: int, seed: int,
+        dedup_capacity: Optional[int], dedup_horizon: Optional[int], hop_limit: Optional[int], error_rate: float
+) -> Wsn:
+    """每隔若干个循环让一个随机节点作为新的消息源发出一条消息，逐节点调度
+    """
+    network = generate_rand_nodes(
+        wsn=Wsn(), wsn_width_x=100, wsn_width_y=100, node_num=node_num,
+        node_r_mu=10, node_r_sigma=5, node_power=100000000000, node_pc_per_send=1, rand_seed=seed
+    )
+    network.medium.slotted = True
+    network.set_protocol(get_protocol(
+        protocol, dedup_capacity=dedup_capacity, dedup_error_rate=error_rate, dedup_horizon=dedup_horizon,
+        hop_limit=hop_limit
+    ))
+    nodes = network.node_manager.nodes
+    for node in nodes:
+        node.multithreading = False
+    worklist = WsnWorklist(network)
+
+    rand = numpy.random.RandomState(seed)
+    interval = max(1, cycles // num_of_sources)
+    injected = 0
+    for cycle in range(cycles):
+        if cycle % interval == 0 and injected < num_of_sources:
+            i = int(rand.randint(node_num))
+            nodes[i].teammate_num = node_num // 2
+            nodes[i].send_queue.append(f'message-{injected}')
+            network.medium.wake(numpy.array([i]))
+            injected += 1
+        worklist.step()
+        network.medium.end_slot()
+        network.energy_ledger.tick()
+    worklist.close()
+    return network
+
+
+def main(argv: List[str]) -> None:
+    """比较 action1 、action2 、action3 使用原有的精确去重、只转发一次的重复消息过滤器（RotatingBloomFilter）、
+    隔一段时间遗忘的过滤器以及再加上跳数限制时的发送次数、收到消息的节点比例和每节点去重状态占用的内存
+    精确去重的内存只统计跨活动保存的集合（action3 的 replied_nodes ），action1 的 recv_set 每次活动重建、
+    action2 直接扫描 handlers ，都不计入
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks dedup', description=main.__doc__)
+    parser.add_argument('-p', '--protocols', nargs='+', default=['action1', 'action2', 'action3'], help='比较的协议')
+    parser.add_argument('-n', '--node-num', type=int, default=150, help='节点数')
+    parser.add_argument('-c', '--cycles', type=int, default=120, help='循环次数')
+    parser.add_argument('-m', '--sources', type=int, default=20, help='消息源（消息）的个数')
+    parser.add_argument('-k', '--capacity', type=int, default=64, help='重复消息过滤器每一代记住的消息数')
+    parser.add_argument('-e', '--error-rate', type=float, default=0.01, help='重复消息过滤器的误报率上限')
+    parser.add_argument('--horizon', type=int, default=2, help='重复消息过滤器每一代存活的活动次数')
+    parser.add_argument('--hop-limit', type=int, default=12, help='跳数限制')
+    parser.add_argument('-s', '--seed', type=int, default=1, help='随机数种子')
+    args = parser.parse_args(argv)
+
+    variants = [
+        ('exact', None, None, None),
+        ('bloom', args.capacity, None, None),
+        ('decay', args.capacity, args.horizon, None),
+        ('decay+ttl', args.capacity, args.horizon, args.hop_limit),
+    ]
+    print(f'{"protocol":<10}{"variant":<11}{"sends":>10}{"saved":>8}{"received":>10}{"sends/recv":>12}{"dedup B/node":>14}')
+    for protocol in args.protocols:
+        baseline = None
+        for name, capacity, horizon, hop_limit in variants:
+            network = run(
+                protocol, args.node_num, args.cycles, args.sources, args.seed, capacity, horizon, hop_limit,
+                args.error_rate
+            )
+            nodes = network.node_manager.nodes
+            sends = network.medium.spread_count
+            baseline = sends if baseline is None else baseline
+            num_of_received = sum(1 for node in nodes if node.recv_count)
+            received = num_of_received / len(nodes)
+            if capacity is None:
+                dedup_bytes = sum(deep_sizeof(node.replied_nodes) for node in nodes) / len(nodes) \
+                    if protocol == 'action3' else 0
+            else:
+                dedup_bytes = sum(node.duplicates.nbytes for node in nodes) / len(nodes)
+            saved = 1 - sends / baseline if baseline else 0.
+            print(f'{protocol:<10}{name:<11}{sends:>10}{saved:>8.1%}{received:>10.3f}'
+                  f'{sends / max(num_of_received, 1):>12.1f}{dedup_bytes:>14.0f}')
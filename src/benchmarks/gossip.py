@@ -0,0 +1,78 @@
+import argparse
+import json
+import time
+from typing import List
+
+import numpy
+
+from wsn import Wsn, WsnConnectivity, WsnWorklist, get_protocol
+from wsn.utils import generate_rand_nodes
+
+
+# 变体名 -> 协议配置
+VARIANTS = {
+    'action3': {'name': 'action3'},
+    'flood': {'name': 'gossip', 'p': 1.},
+    'gossip': {'name': 'gossip', 'p': 0.65, 'flood_hops': 1},
+    'counter': {'name': 'gossip_counter', 'threshold': 3, 'max_delay': 3},
+    'distance': {'name': 'gossip_distance', 'min_distance': 0.5, 'max_delay': 3},
+}
+
+
+def run(protocol: dict, node_num: int, cycles: int, seed: int) -> Wsn:
+    """在固定大小的区域中部署 node_num 个节点，由一号节点发出一条消息，逐节点调度 cycles 个循环
+    """
+    network = generate_rand_nodes(
+        wsn=Wsn(), wsn_width_x=100, wsn_width_y=100, node_num=node_num,
+        node_r_mu=10, node_r_sigma=5, node_power=100000000000, node_pc_per_send=1, rand_seed=seed
+    )
+    network.medium.slotted = True
+    kwargs = dict(protocol)
+    network.set_protocol(get_protocol(kwargs.pop('name'), **kwargs))
+    nodes = network.node_manager.nodes
+    for node in nodes:
+        node.multithreading = False
+    nodes[0].send_queue.append('Hello World!')
+
+    worklist = WsnWorklist(network)
+    for _ in range(cycles):
+        worklist.step()
+        network.medium.end_slot()
+        network.energy_ledger.tick()
+    worklist.close()
+    return network
+
+
+def main(argv: List[str]) -> None:
+    """比较 action3（收到后连续广播 100 次）、每个节点只转发一次的泛洪，以及固定概率、基于计数和基于距离的三种 gossip
+    在不同部署密度下的覆盖率、发送（WsnMedium.spread）次数和耗时；覆盖率是收到消息的节点占能与一号节点连通的
+    其它节点的比例，各项都是若干个随机拓扑的平均值
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks gossip', description=main.__doc__)
+    parser.add_argument('-n', '--node-nums', type=int, nargs='+', default=[300, 600, 1200], help='节点数')
+    parser.add_argument('-c', '--cycles', type=int, default=60, help='循环次数')
+    parser.add_argument('-v', '--variants', nargs='+', default=list(VARIANTS), choices=list(VARIANTS), help='比较的协议')
+    parser.add_argument('-p', '--protocol', type=json.loads, default=None,
+                        help='额外比较的协议配置（json），例如 \'{"name": "gossip", "p": 0.5}\'')
+    parser.add_argument('-s', '--seed', type=int, default=1, help='第一个随机拓扑的种子')
+    parser.add_argument('-r', '--repeats', type=int, default=3, help='随机拓扑的个数')
+    args = parser.parse_args(argv)
+
+    variants = [(name, VARIANTS[name]) for name in args.variants]
+    if args.protocol is not None:
+        variants.append(('custom', args.protocol))
+
+    print(f'{"nodes":>6}  {"variant":<10}{"coverage":>10}{"spread":>10}{"spread/node":>13}{"seconds":>9}')
+    for node_num in args.node_nums:
+        for name, protocol in variants:
+            coverage = spread = seconds = 0.
+            for seed in range(args.seed, args.seed + args.repeats):
+                start_time = time.time()
+                network = run(protocol, node_num, args.cycles, seed)
+                seconds += (time.time() - start_time) / args.repeats
+                nodes = network.node_manager.nodes
+                # 消息源自己不算
+                num_of_reachable = WsnConnectivity.from_wsn(network, numpy.array([0])).reachable_num - 1
+                coverage += sum(1 for node in nodes[1:] if node.recv_count) / max(num_of_reachable, 1) / args.repeats
+                spread += network.medium.spread_count / args.repeats
+            print(f'{node_num:>6}  {name:<10}{coverage:>10.3f}{spread:>10.0f}{spread / node_num:>13.2f}{seconds:>9.2f}')
@@ -0,0 +1,132 @@
+import argparse
+import json
+import math
+import time
+from typing import Dict, List, Optional
+
+import numpy
+
+from wsn import Wsn, WsnConnectivity, WsnWorklist, get_protocol
+from wsn.utils import generate_rand_nodes
+
+
+# 变体名 -> 协议配置
+VARIANTS = {
+    'action2': {'name': 'action2'},
+    'leach': {'name': 'leach'},
+}
+
+
+def run(protocol: dict, node_num: int, node_power: float, cycles: int, queries: int, fraction: float,
+        seed: int) -> Dict[str, Optional[float]]:
+    """一号节点的发送队列中预先放入 queries 个收集任务，每个任务要收齐 fraction 比例的能与它连通的其它节点的数据，
+    运行到 cycles 个循环或者所有任务完成为止，记录完成的任务数、耗电以及第一个和一半的节点耗尽电量的循环
+    """
+    network = generate_rand_nodes(
+        wsn=Wsn(), wsn_width_x=100, wsn_width_y=100, node_num=node_num,
+        node_r_mu=10, node_r_sigma=5, node_power=node_power, node_pc_per_send=1, rand_seed=seed
+    )
+    network.medium.slotted = True
+    kwargs = dict(protocol)
+    network.set_protocol(get_protocol(kwargs.pop('name'), **kwargs))
+    nodes = network.node_manager.nodes
+    for node in nodes:
+        node.multithreading = False
+    sink = nodes[0]
+    sink.teammate_num = math.ceil(fraction * WsnConnectivity.from_wsn(network, numpy.array([0])).max_replies(0))
+    sink.send_queue.extend(f'query-{i}' for i in range(queries))
+
+    # 与单线程模式的调度器相同
+    batch = network.protocol.supports_batch
+    worklist = None if batch else WsnWorklist(network)
+    pc_per_send = numpy.fromiter((node.pc_per_send for node in nodes), dtype=numpy.float64, count=node_num)
+    first_death = half_death = None
+    completed_before_death = None
+    # 最后一个任务完成时的总耗电，之后的耗电没有换来完整的任务
+    completed, energy = 0, 0.
+    num_of_cycles = 0
+    start = time.perf_counter()
+    while num_of_cycles < cycles:
+        if batch:
+            network.protocol.step_all(network)
+        else:
+            worklist.step()
+        network.medium.end_slot()
+        network.energy_ledger.tick()
+        num_of_cycles += 1
+
+        num_of_completed = queries - len(sink.send_queue) - (sink.sending is not None)
+        if num_of_completed > completed:
+            completed = num_of_completed
+            energy = float(network.energy_ledger.consumption().sum())
+        power = numpy.fromiter((node.power for node in nodes), dtype=numpy.float64, count=node_num)
+        dead = int((power < pc_per_send).sum())
+        if dead and first_death is None:
+            first_death = num_of_cycles
+            completed_before_death = completed
+        if dead * 2 >= node_num and half_death is None:
+            half_death = num_of_cycles
+        if completed == queries or half_death is not None:
+            break
+    if worklist is not None:
+        worklist.close()
+
+    return {
+        'completed': completed,
+        'completed_before_death': completed if completed_before_death is None else completed_before_death,
+        'cycles': num_of_cycles,
+        'first_death': first_death,
+        'half_death': half_death,
+        'energy': energy,
+        'energy_per_reading': energy / (completed * sink.teammate_num) if completed else None,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def main(argv: List[str]) -> None:
+    """比较 action2（泛洪查询、逐个回应）和 leach（分簇、簇头汇总后沿期望发送次数最小的路径发往一号节点）
+    连续完成收集任务时的每条数据耗电和网络寿命：每个任务要收齐一定比例的其它节点的数据，
+    每条数据耗电是最后一个任务完成时的总耗电除以完成的任务要收齐的数据数，
+    寿命以第一个节点和一半的节点耗尽电量的循环计，并给出第一个节点耗尽电量之前完成的任务数；
+    各项都是若干个随机拓扑的平均值，“-” 表示没有发生
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks leach', description=main.__doc__)
+    parser.add_argument('-n', '--node-num', type=int, default=300, help='节点数')
+    parser.add_argument('-e', '--node-power', type=float, default=2000, help='每个节点的初始电量（发送次数）')
+    parser.add_argument('-c', '--cycles', type=int, default=5000, help='最多运行的循环次数')
+    parser.add_argument('-q', '--queries', type=int, default=100, help='收集任务的个数')
+    parser.add_argument('-f', '--fraction', type=float, default=0.95, help='每个任务要收齐数据的节点比例')
+    parser.add_argument('-v', '--variants', nargs='+', default=list(VARIANTS), choices=list(VARIANTS), help='比较的协议')
+    parser.add_argument('-p', '--protocol', type=json.loads, default=None,
+                        help='额外比较的协议配置（json），例如 \'{"name": "leach", "p": 0.1}\'')
+    parser.add_argument('-s', '--seed', type=int, default=1, help='第一个随机拓扑的种子')
+    parser.add_argument('-r', '--repeats', type=int, default=2, help='随机拓扑的个数')
+    args = parser.parse_args(argv)
+
+    variants = [(name, VARIANTS[name]) for name in args.variants]
+    if args.protocol is not None:
+        variants.append((args.protocol['name'] + '*', args.protocol))
+
+    def mean(values: List[Optional[float]]) -> Optional[float]:
+        values = [value for value in values if value is not None]
+        return sum(values) / len(values) if values else None
+
+    def fmt(value: Optional[float], width: int, precision: int = 1) -> str:
+        return f'{"-":>{width}}' if value is None else f'{value:>{width}.{precision}f}'
+
+    print(f'{"protocol":<10}{"queries":>9}{"before":>8}{"energy":>10}{"per reading":>13}'
+          f'{"first death":>13}{"half death":>12}{"time(s)":>9}')
+    for name, protocol in variants:
+        results = [
+            run(protocol, args.node_num, args.node_power, args.cycles, args.queries, args.fraction, seed)
+            for seed in range(args.seed, args.seed + args.repeats)
+        ]
+        print(
+            f'{name:<10}{fmt(mean([r["completed"] for r in results]), 9)}'
+            f'{fmt(mean([r["completed_before_death"] for r in results]), 8)}'
+            f'{fmt(mean([r["energy"] for r in results]), 10, 0)}'
+            f'{fmt(mean([r["energy_per_reading"] for r in results]), 13, 2)}'
+            f'{fmt(mean([r["first_death"] for r in results]), 13)}'
+            f'{fmt(mean([r["half_death"] for r in results]), 12)}'
+            f'{fmt(mean([r["seconds"] for r in results]), 9, 2)}'
+        )
@@ -0,0 +1,69 @@
+import argparse
+import os
+import time
+from typing import List
+
+from bystander import Bystander
+from bystander.live import LiveBystander
+from wsn import Wsn, WsnWorklist, get_protocol
+from wsn.utils import generate_rand_nodes
+
+
+def build_wsn(node_num: int, seed: int) -> Wsn:
+    wsn = generate_rand_nodes(
+        wsn=Wsn(), wsn_width_x=100, wsn_width_y=100, node_num=node_num,
+        node_r_mu=10, node_r_sigma=5, node_power=100000000000, node_pc_per_send=1, rand_seed=seed
+    )
+    wsn.set_protocol(get_protocol('action2'))
+    for node in wsn.node_manager.nodes:
+        node.multithreading = False
+    source = wsn.node_manager.nodes[0]
+    source.teammate_num = node_num // 2
+    source.send_queue.append('Hello World!')
+    return wsn
+
+
+def main(argv: List[str]) -> None:
+    """比较单线程模式下不画图、在模拟进程中画图（Bystander）和在渲染进程中画图（LiveBystander）三种方式
+    每个循环的耗时；启动和关闭旁观者的耗时单独统计。没有设置 MPLBACKEND 时使用 Agg 后端，不弹出窗口
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks live', description=main.__doc__)
+    parser.add_argument('-n', '--node-num', type=int, default=300, help='节点数')
+    parser.add_argument('-c', '--cycles', type=int, default=100, help='循环次数')
+    parser.add_argument('--fps', type=float, default=10, help='渲染进程的帧率')
+    parser.add_argument('-s', '--seed', type=int, default=1, help='随机数种子')
+    args = parser.parse_args(argv)
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+
+    print(f'{"variant":<10}{"ms/cycle":>10}{"init ms":>10}{"close ms":>10}{"received":>10}')
+    for variant in ('headless', 'in-process', 'live'):
+        wsn = build_wsn(args.node_num, args.seed)
+        nodes = wsn.node_manager.nodes
+        if variant == 'live':
+            bystander = LiveBystander(wsn, fps=args.fps)
+        else:
+            bystander = Bystander(wsn, headless=variant == 'headless')
+            # 只比较画图本身，不生成动画
+            bystander.generate_anim = lambda: None
+
+        start_time = time.time()
+        bystander.init()
+        init_seconds = time.time() - start_time
+
+        worklist = WsnWorklist(wsn)
+        start_time = time.time()
+        for _ in range(args.cycles):
+            worklist.step()
+            wsn.medium.end_slot()
+            bystander.action()
+            wsn.energy_ledger.tick()
+        cycle_seconds = (time.time() - start_time) / args.cycles
+        worklist.close()
+
+        start_time = time.time()
+        bystander.close()
+        close_seconds = time.time() - start_time
+
+        received = sum(1 for node in nodes if node.recv_count) / len(nodes)
+        print(f'{variant:<10}{cycle_seconds * 1000:>10.2f}{init_seconds * 1000:>10.1f}{close_seconds * 1000:>10.1f}'
+              f'{received:>10.3f}')
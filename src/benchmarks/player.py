@@ -0,0 +1,77 @@
+import argparse
+import os
+import tempfile
+import time
+from typing import List
+
+from bystander import Bystander
+from utils import get_log_file_dir_path
+from wsn import Wsn, WsnWorklist, get_protocol
+from wsn.utils import generate_rand_nodes
+
+
+def build_wsn(node_num: int, seed: int) -> Wsn:
+    wsn = generate_rand_nodes(
+        wsn=Wsn(), wsn_width_x=100, wsn_width_y=100, node_num=node_num,
+        node_r_mu=10, node_r_sigma=5, node_power=100000000000, node_pc_per_send=1, rand_seed=seed
+    )
+    wsn.set_protocol(get_protocol('action2'))
+    for node in wsn.node_manager.nodes:
+        node.multithreading = False
+    source = wsn.node_manager.nodes[0]
+    source.teammate_num = node_num // 2
+    source.send_queue.append('Hello World!')
+    return wsn
+
+
+def dir_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main(argv: List[str]) -> None:
+    """比较 Bystander 结束时导出各种动画格式的耗时和文件大小：
+    player（内嵌二进制数据和画布播放器的单个 html ）、html（逐帧 png ）和 gif（需要 imagemagick ）
+    帧和 Bystander 一样只在网络状态发生变化时记录；输出写到临时目录，不保留
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks player', description=main.__doc__)
+    parser.add_argument('-n', '--node-num', type=int, default=300, help='节点数')
+    parser.add_argument('-c', '--cycles', type=int, default=60, help='循环次数')
+    parser.add_argument('-f', '--formats', nargs='+', default=['player', 'html', 'gif'], help='比较的动画格式')
+    parser.add_argument('-s', '--seed', type=int, default=1, help='随机数种子')
+    args = parser.parse_args(argv)
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+
+    wsn = build_wsn(args.node_num, args.seed)
+    recorder = Bystander(wsn, headless=True)
+    frames = []
+    worklist = WsnWorklist(wsn)
+    for _ in range(args.cycles):
+        worklist.step()
+        wsn.medium.end_slot()
+        status = [recorder.extract_node_info(node) for node in wsn.node_manager.nodes]
+        if not frames or status != frames[-1]:
+            frames.append(status)
+        wsn.energy_ledger.tick()
+    worklist.close()
+    print(f'{len(frames)} 帧，{args.node_num} 个节点')
+
+    outputs = {'player': 'result.html', 'html': 'result', 'gif': 'result.gif'}
+    print(f'{"format":<10}{"seconds":>10}{"bytes":>14}')
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 动画导出到工作路径下的日志目录，切换到临时目录以免留下文件
+        os.chdir(work_dir)
+        try:
+            for anim_format in args.formats:
+                bystander = Bystander(wsn, anim_formats=(anim_format, ))
+                bystander.frames_log = frames
+                start_time = time.time()
+                bystander.generate_anim()
+                seconds = time.time() - start_time
+                path = os.path.join(get_log_file_dir_path(), outputs[anim_format])
+                size = dir_size(path) if os.path.exists(path) else 0
+                print(f'{anim_format:<10}{seconds:>10.2f}{size:>14}')
+        finally:
+            os.chdir(cwd)
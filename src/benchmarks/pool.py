@@ -0,0 +1,65 @@
+import argparse
+import math
+import threading
+import time
+from typing import List
+
+from wsn import Wsn, WsnThreadPool, get_protocol
+from wsn.utils import generate_rand_nodes
+
+
+def build_wsn(node_num: int, seed: int, tick_interval: float) -> Wsn:
+    width = 100 * math.sqrt(node_num / 300)
+    wsn = generate_rand_nodes(
+        wsn=Wsn(), wsn_width_x=width, wsn_width_y=width, node_num=node_num,
+        node_r_mu=10, node_r_sigma=5, node_power=100000000000, node_pc_per_send=1, rand_seed=seed
+    )
+    wsn.set_protocol(get_protocol('action2'))
+    for node in wsn.node_manager.nodes:
+        node.tick_interval = tick_interval
+    source = wsn.node_manager.nodes[0]
+    source.teammate_num = node_num
+    source.send_queue.append('Hello World!')
+    return wsn
+
+
+def main(argv: List[str]) -> None:
+    """比较多线程模式下一个节点一个线程与固定数量的工作线程池两种方式启动和停止全网的耗时，
+    以及运行相同时间后收到消息的节点比例
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks pool', description=main.__doc__)
+    parser.add_argument('-n', '--node-num', type=int, default=10000, help='节点数')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='工作线程数，默认取 CPU 核数')
+    parser.add_argument('-t', '--seconds', type=float, default=2, help='运行时间（秒）')
+    parser.add_argument('--tick-interval', type=float, default=5, help='有消息需要发送的节点的活动间隔（秒）')
+    parser.add_argument('-s', '--seed', type=int, default=1, help='随机数种子')
+    args = parser.parse_args(argv)
+
+    print(f'{"variant":<10}{"threads":>9}{"start ms":>10}{"stop ms":>10}{"received":>10}')
+    for variant in ('threads', 'pool'):
+        wsn = build_wsn(args.node_num, args.seed, args.tick_interval)
+        nodes = wsn.node_manager.nodes
+        pool = WsnThreadPool(wsn, args.workers) if variant == 'pool' else None
+
+        start_time = time.time()
+        if pool is None:
+            wsn.start_all()
+        else:
+            pool.start()
+        start_seconds = time.time() - start_time
+        num_of_threads = threading.active_count() - 1
+
+        time.sleep(args.seconds)
+
+        start_time = time.time()
+        if pool is None:
+            wsn.stop_all()
+            for node in nodes:
+                node.thread.join()
+        else:
+            pool.stop()
+        stop_seconds = time.time() - start_time
+
+        received = sum(1 for node in nodes if node.recv_count) / len(nodes)
+        print(f'{variant:<10}{num_of_threads:>9}{start_seconds * 1000:>10.1f}{stop_seconds * 1000:>10.1f}'
+              f'{received:>10.3f}')
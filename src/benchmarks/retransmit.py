@@ -0,0 +1,38 @@
+import argparse
+from typing import List
+
+from experiment import run_experiment
+
+
+def main(argv: List[str]) -> None:
+    """比较 action2 每次活动都重发与按指数退避重传两种方式的发送次数
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks retransmit', description=main.__doc__)
+    parser.add_argument('-n', '--node-num', type=int, default=300, help='节点数')
+    parser.add_argument('-c', '--cycles', type=int, default=300, help='最大循环次数')
+    parser.add_argument('-s', '--seeds', type=int, nargs='+', default=[1, 2, 3], help='随机数种子')
+    parser.add_argument('--max-retries', type=int, default=8, help='最大重传次数')
+    args = parser.parse_args(argv)
+
+    variants = {
+        'every-tick': None,
+        'backoff': {'max_retries': args.max_retries},
+    }
+
+    print(f'{"variant":<12}{"seed":>6}{"cycles":>8}{"received":>10}{"spreads":>10}{"spreads/delivered":>19}')
+    for name, retransmission in variants.items():
+        for seed in args.seeds:
+            summary = run_experiment({
+                'topology': {'node_num': args.node_num},
+                'protocol': 'action2',
+                'termination': {'node_driven': True, 'num_of_cycles': args.cycles, 'survival_rate': None},
+                'retransmission': retransmission,
+                'seed': seed,
+            })
+            if summary['skipped']:
+                print(f'{name:<12}{seed:>6}  skipped: node_driven 的目标无法达成')
+                continue
+            delivered = summary['received_rate'] * args.node_num
+            per_delivered = summary['spread_count'] / delivered if delivered else float('inf')
+            print(f'{name:<12}{seed:>6}{summary["num_of_cycles"]:>8}{summary["received_rate"]:>10.3f}'
+                  f'{summary["spread_count"]:>10}{per_delivered:>19.2f}')
@@ -0,0 +1,38 @@
+import argparse
+import math
+import time
+from typing import List
+
+from experiment import run_experiment
+
+
+def main(argv: List[str]) -> None:
+    """比较单线程模式和不同分片数的多进程模式的模拟吞吐量（每秒循环数）
+    节点密度与 main.py 相同，网络边长随节点数增大
+    工作进程总是逐个节点调用 action ，默认选用没有批量推进的协议，两种模式的语义完全一致
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks shard', description=main.__doc__)
+    parser.add_argument('-n', '--node-num', type=int, default=20000, help='节点数')
+    parser.add_argument('-c', '--cycles', type=int, default=30, help='循环次数')
+    parser.add_argument('-p', '--protocol', default='action2', help='路由协议')
+    parser.add_argument('-t', '--tiles', nargs='+', default=['1x1', '2x1', '2x2', '4x2'], help='分片数，形如 2x2')
+    args = parser.parse_args(argv)
+
+    width = 100 * math.sqrt(args.node_num / 300)
+    base = {
+        'topology': {'wsn_width_x': width, 'wsn_width_y': width, 'node_num': args.node_num},
+        'protocol': args.protocol,
+        'medium': {'slotted': True},
+        'termination': {'node_driven': False, 'num_of_cycles': args.cycles, 'survival_rate': None},
+    }
+
+    variants = [('single_thread', '-', [1, 1])]
+    variants += [('multi_process', tiles, [int(n) for n in tiles.split('x')]) for tiles in args.tiles]
+
+    print(f'{"mode":<15}{"tiles":>7}{"cycles":>8}{"received":>10}{"seconds":>10}{"cycles/s":>10}')
+    for mode, name, tiles in variants:
+        start_time = time.time()
+        summary = run_experiment({**base, 'mode': mode, 'tiles': tiles})
+        seconds = time.time() - start_time
+        print(f'{mode:<15}{name:>7}{summary["num_of_cycles"]:>8}{summary["received_rate"]:>10.3f}'
+              f'{seconds:>10.2f}{summary["num_of_cycles"] / seconds:>10.2f}')
@@ -0,0 +1,121 @@
+import argparse
+import sys
+from typing import Any, List, Optional, Tuple
+
+import numpy
+
+from wsn import Wsn, WsnWorklist, get_protocol
+from wsn.sketch import ExactRouteTable, SketchRouteTable
+from wsn.utils import generate_rand_nodes
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """对象及其引用的容器、字符串和消息占用的内存字节数，共享的对象只计一次
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+class ShadowRouteTable(SketchRouteTable):
+    """在 SketchRouteTable 旁边维护一份精确统计，记录每次“是否来自最常见路径”的判断与精确统计是否一致
+    """
+    decisions: int = 0
+    agreements: int = 0
+
+    def __init__(self, capacity: int):
+        super(ShadowRouteTable, self).__init__(capacity)
+        self.exact = ExactRouteTable()
+
+    def add(self, source: str, last_hop: str) -> None:
+        self.exact.add(source, last_hop)
+        super(ShadowRouteTable, self).add(source, last_hop)
+
+    def is_most_common(self, source: str, last_hop: str) -> bool:
+        decision = super(ShadowRouteTable, self).is_most_common(source, last_hop)
+        ShadowRouteTable.decisions += 1
+        if decision == self.exact.is_most_common(source, last_hop):
+            ShadowRouteTable.agreements += 1
+        return decision
+
+
+def run(
+        node_num: int, cycles: int, num_of_sources: int, seed: int,
+        route_capacity: Optional[int], message_horizon: Optional[int], shadow: bool = False
+) -> Tuple[Wsn, int]:
+    """每隔若干个循环让一个随机节点作为新的消息源发出一条消息
+    :return: (运行结束后的网络, 注入的消息数)
+    """
+    network = generate_rand_nodes(
+        wsn=Wsn(), wsn_width_x=100, wsn_width_y=100, node_num=node_num,
+        node_r_mu=10, node_r_sigma=5, node_power=100000000000, node_pc_per_send=1, rand_seed=seed
+    )
+    network.medium.slotted = True
+    network.set_protocol(get_protocol('action2', route_capacity=route_capacity, message_horizon=message_horizon))
+    nodes = network.node_manager.nodes
+    for node in nodes:
+        node.multithreading = False
+        if shadow:
+            node.route_len = ShadowRouteTable(route_capacity)
+    worklist = WsnWorklist(network)
+
+    interval = max(1, cycles // num_of_sources)
+    injected = 0
+    for cycle in range(cycles):
+        if cycle % interval == 0 and injected < num_of_sources:
+            i = int(numpy.random.randint(node_num))
+            nodes[i].teammate_num = node_num // 2
+            nodes[i].send_queue.append(f'message-{injected}')
+            network.medium.wake(numpy.array([i]))
+            injected += 1
+        worklist.step()
+        network.medium.end_slot()
+        network.energy_ledger.tick()
+    worklist.close()
+    return network, injected
+
+
+def main(argv: List[str]) -> None:
+    """比较 action2 精确记录上一跳和消息状态，与使用 Space-Saving 计数器、消息状态过期两种方式的每节点内存，
+    以及“是否来自最常见路径”的判断与精确计数一致的比例
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks sketch', description=main.__doc__)
+    parser.add_argument('-n', '--node-num', type=int, default=200, help='节点数')
+    parser.add_argument('-c', '--cycles', type=int, default=200, help='循环次数')
+    parser.add_argument('-m', '--sources', type=int, default=20, help='消息源（消息）的个数')
+    parser.add_argument('-k', '--capacities', type=int, nargs='+', default=[16, 32, 64], help='上一跳统计的容量')
+    parser.add_argument('--horizon', type=int, default=100, help='消息状态保留的活动次数')
+    parser.add_argument('-s', '--seed', type=int, default=1, help='随机数种子')
+    args = parser.parse_args(argv)
+
+    variants = [('exact', None, None)]
+    variants += [(f'k={k}', k, args.horizon) for k in args.capacities]
+
+    print(f'{"variant":<10}{"received":>10}{"route B/node":>14}{"message B/node":>16}{"agreement":>11}')
+    for name, capacity, horizon in variants:
+        network, injected = run(args.node_num, args.cycles, args.sources, args.seed, capacity, horizon)
+        nodes = network.node_manager.nodes
+        received = sum(1 for node in nodes if node.recv_count) / len(nodes)
+        route_bytes = sum(deep_sizeof(node.route_len) for node in nodes) / len(nodes)
+        message_bytes = sum(
+            deep_sizeof(node.replied_messages) + deep_sizeof(node.reply_queue) + deep_sizeof(node.reply_attempts)
+            for node in nodes
+        ) / len(nodes)
+
+        agreement = 1.
+        if capacity is not None:
+            # 同样的运行再来一遍，记录每次判断是否与精确计数一致
+            ShadowRouteTable.decisions = ShadowRouteTable.agreements = 0
+            run(args.node_num, args.cycles, args.sources, args.seed, capacity, horizon, shadow=True)
+            agreement = ShadowRouteTable.agreements / ShadowRouteTable.decisions if ShadowRouteTable.decisions else 1.
+
+        print(f'{name:<10}{received:>10.3f}{route_bytes:>14.0f}{message_bytes:>16.0f}{agreement:>11.3f}')
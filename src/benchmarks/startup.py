@@ -0,0 +1,70 @@
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+
+# 需要测量导入耗时的模块
+MODULES = ('wsn', 'utils', 'bystander', 'experiment')
+# 不应在导入时被加载的图形界面相关模块
+GUI_MODULES = ('matplotlib', 'PyQt5', 'tkinter')
+
+
+def measure_import(module: str) -> Tuple[float, List[str]]:
+    """在新的解释器中以 -X importtime 导入一个模块
+    :return: (导入总耗时（毫秒）, 被顺带加载的图形界面模块)
+    """
+    src_dir_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = f'import sys, {module}; print(",".join(m for m in {GUI_MODULES!r} if m in sys.modules))'
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=src_dir_path, capture_output=True, text=True, check=True
+    )
+    # -X importtime 的每一行形如 `import time: self [us] | cumulative | imported package`
+    cumulative = 0
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative = int(fields[1])
+    loaded = [name for name in result.stdout.strip().split(',') if name]
+    return cumulative / 1000, loaded
+
+
+def _ready(start_time: float) -> float:
+    return time.time() - start_time
+
+
+def measure_pool(method: str, workers: int) -> Dict[str, float]:
+    """测量进程池从创建到每个工作进程都执行完第一个任务的耗时
+    :return: 总耗时和单个工作进程的最长启动耗时（毫秒）
+    """
+    from experiment.core import get_pool_context
+    context = get_pool_context(method)
+    start_time = time.time()
+    with context.Pool(workers) as pool:
+        latencies = pool.map(_ready, [start_time] * workers, chunksize=1)
+    return {'total': (time.time() - start_time) * 1000, 'worst': max(latencies) * 1000}
+
+
+def main(argv: List[str]) -> None:
+    """测量各模块的导入耗时和进程池工作进程的启动耗时
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks startup', description=main.__doc__)
+    parser.add_argument('-w', '--workers', type=int, default=4, help='进程池大小')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='重复次数，取最小值')
+    args = parser.parse_args(argv)
+
+    print(f'{"module":<12}{"import ms":>12}  gui modules loaded')
+    for module in MODULES:
+        times, loaded = zip(*(measure_import(module) for _ in range(args.repeat)))
+        print(f'{module:<12}{min(times):>12.1f}  {", ".join(loaded[0]) or "-"}')
+
+    print()
+    print(f'{"start method":<14}{"pool ms":>10}{"worst worker ms":>18}')
+    for method in [None] + multiprocessing.get_all_start_methods():
+        results = [measure_pool(method, args.workers) for _ in range(args.repeat)]
+        name = 'auto' if method is None else method
+        print(f'{name:<14}{min(r["total"] for r in results):>10.1f}{min(r["worst"] for r in results):>18.1f}')
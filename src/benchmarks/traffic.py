@@ -0,0 +1,61 @@
+import argparse
+from typing import Any, Dict, List
+
+from experiment import run_experiment
+
+
+def build_arrival(name: str, rate: float) -> Dict[str, Any]:
+    """每个消息源平均到达率为 rate 的到达过程配置
+    """
+    if name == 'periodic':
+        return {'name': 'periodic', 'period': max(1, round(1 / rate))}
+    if name == 'bursty':
+        return {'name': 'bursty', 'rate': rate, 'on_cycles': 10, 'off_cycles': 30}
+    return {'name': 'poisson', 'rate': rate}
+
+
+def main(argv: List[str]) -> None:
+    """逐步提高合成流量的提供负载，测量 action2 的吞吐量、时延、积压和介质的发送次数，找出饱和点
+    提供负载和吞吐量都是全部消息源合计每个循环的消息数，稳态指标只统计后一半循环
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks traffic', description=main.__doc__)
+    parser.add_argument('-n', '--node-num', type=int, default=300, help='节点数')
+    parser.add_argument('-c', '--cycles', type=int, default=300, help='循环次数')
+    parser.add_argument('-m', '--sources', type=int, default=5, help='消息源的个数')
+    parser.add_argument('-l', '--loads', type=float, nargs='+', default=[0.01, 0.02, 0.05, 0.1], help='提供负载')
+    parser.add_argument('-a', '--arrival', choices=['poisson', 'periodic', 'bursty'], default='poisson', help='到达过程')
+    parser.add_argument('-t', '--teammate-rate', type=float, default=0.1, help='每条消息需要收到回应的节点比例')
+    parser.add_argument('--max-retries', type=int, default=3, help='最大重传次数')
+    parser.add_argument('-s', '--seed', type=int, default=1, help='随机数种子')
+    args = parser.parse_args(argv)
+
+    print(f'{"load":>8}{"offered":>9}{"throughput":>12}{"delivered":>11}{"abandoned":>11}{"latency":>9}{"p95":>7}{"backlog":>9}'
+          f'{"growth":>9}{"queue":>7}{"spreads/cycle":>15}{"ms/cycle":>10}')
+    saturation = None
+    for load in args.loads:
+        summary = run_experiment({
+            'topology': {'node_num': args.node_num},
+            'protocol': 'action2',
+            'termination': {'node_driven': False, 'num_of_cycles': args.cycles, 'survival_rate': None},
+            'retransmission': {'max_retries': args.max_retries},
+            'traffic': {
+                'sources': args.sources,
+                'arrival': build_arrival(args.arrival, load / args.sources),
+                'teammate_rate': args.teammate_rate,
+            },
+            'seed': args.seed,
+        })
+        if summary['traffic_saturated'] and saturation is None:
+            saturation = load
+        cycles = summary['num_of_cycles']
+        print(f'{load:>8.3f}{summary["traffic_offered_load"]:>9.3f}{summary["traffic_throughput"]:>12.3f}'
+              f'{summary["traffic_delivery_ratio"]:>11.3f}{summary["traffic_abandoned"]:>11}'
+              f'{summary["traffic_latency_mean"]:>9.1f}'
+              f'{summary["traffic_latency_p95"]:>7.0f}{summary["traffic_backlog_max"]:>9}'
+              f'{summary["traffic_backlog_growth"]:>9.3f}{summary["traffic_queue_depth_max"]:>7}'
+              f'{summary["spread_count"] / cycles:>15.1f}{summary["running_time"] / cycles * 1000:>10.2f}')
+
+    if saturation is None:
+        print('在测试的负载范围内没有饱和')
+    else:
+        print(f'饱和点：提供负载 {saturation} 条/循环')
@@ -0,0 +1,70 @@
+import argparse
+import math
+import time
+from typing import List
+
+import numpy
+
+from wsn import Wsn, WsnWorklist, get_protocol
+from wsn.retransmit import RetransmissionPolicy, WsnRetransmitter
+from wsn.utils import generate_rand_nodes
+
+
+def build_wsn(node_num: int, seed: int) -> Wsn:
+    width = 100 * math.sqrt(node_num / 300)
+    wsn = generate_rand_nodes(
+        wsn=Wsn(), wsn_width_x=width, wsn_width_y=width, node_num=node_num,
+        node_r_mu=10, node_r_sigma=5, node_power=100000000000, node_pc_per_send=1, rand_seed=seed
+    )
+    wsn.medium.slotted = True
+    wsn.set_protocol(get_protocol('action2'))
+    for node in wsn.node_manager.nodes:
+        node.multithreading = False
+        node.retransmitter = WsnRetransmitter(RetransmissionPolicy(max_retries=3))
+    source = wsn.node_manager.nodes[0]
+    source.teammate_num = node_num
+    source.send_queue.append('Hello World!')
+    return wsn
+
+
+def main(argv: List[str]) -> None:
+    """比较单线程模式下逐个调度全部节点与只调度活跃节点集合两种方式每个循环的耗时
+    消息从一号节点泛洪出去、回应陆续返回之后，重传次数用尽，网络中几乎所有节点都已空闲，
+    按时间窗口分别统计，可以看到繁忙阶段两者耗时接近，空闲阶段的耗时只与活跃节点数有关
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks worklist', description=main.__doc__)
+    parser.add_argument('-n', '--node-num', type=int, default=5000, help='节点数')
+    parser.add_argument('-c', '--cycles', type=int, default=300, help='循环次数')
+    parser.add_argument('-w', '--window', type=int, default=50, help='统计窗口的循环数')
+    parser.add_argument('-s', '--seed', type=int, default=1, help='随机数种子')
+    args = parser.parse_args(argv)
+
+    print(f'{"variant":<10}{"cycles":>10}{"received":>10}{"active/cycle":>14}{"ms/cycle":>10}')
+    for variant in ('all', 'worklist'):
+        wsn = build_wsn(args.node_num, args.seed)
+        nodes = wsn.node_manager.nodes
+        worklist = WsnWorklist(wsn) if variant == 'worklist' else None
+        numpy.random.seed(args.seed)
+
+        for first in range(0, args.cycles, args.window):
+            cycles = min(args.window, args.cycles - first)
+            stepped = 0
+            start_time = time.time()
+            for _ in range(cycles):
+                if worklist is None:
+                    for node in numpy.random.permutation(nodes):
+                        node.action()
+                    stepped += len(nodes)
+                else:
+                    stepped += worklist.num_of_active
+                    worklist.step()
+                wsn.medium.end_slot()
+                wsn.energy_ledger.tick()
+            seconds = time.time() - start_time
+
+            received = sum(1 for node in nodes if node.recv_count) / len(nodes)
+            print(f'{variant:<10}{f"{first}-{first + cycles}":>10}{received:>10.3f}{stepped / cycles:>14.1f}'
+                  f'{seconds / cycles * 1000:>10.2f}')
+
+        if worklist is not None:
+            worklist.close()
@@ -1,4 +1,6 @@
 from .core import Bystander
+from .live import LiveBystander
+from .replay import ReplayState, TraceReplay
 
 
-__all__ = ['Bystander', ]
+__all__ = ['Bystander', 'LiveBystander', 'ReplayState', 'TraceReplay', ]
@@ -0,0 +1,33 @@
+import logging
+import os
+from types import ModuleType
+from typing import Optional, Tuple
+
+
+# 日志配置
+logger: logging.Logger = logging.getLogger('bystander.backend')
+
+_pyplot: Optional[ModuleType] = None
+_animation: Optional[ModuleType] = None
+
+
+def load_matplotlib() -> Tuple[ModuleType, ModuleType]:
+    """导入 matplotlib 的 pyplot 和 animation 模块
+    第一次调用时才导入 matplotlib 并选择图形后端（优先 Qt5Agg ，不可用时使用 TkAgg ），之后直接返回已导入的模块，
+    因此不画图的无界面运行和只用到网络模型的脚本都不需要加载图形界面库
+    设置了环境变量 MPLBACKEND 时使用其指定的后端，例如在没有显示器的机器上用 MPLBACKEND=Agg 回放并保存图像
+    :return: (pyplot, animation)
+    """
+    global _pyplot, _animation
+    if _pyplot is None:
+        import matplotlib
+        from matplotlib import pyplot, animation
+        if not os.environ.get('MPLBACKEND'):
+            # 新版本的 matplotlib 在第一次画图时才真正加载后端，这里立即切换以便检查后端是否可用
+            try:
+                pyplot.switch_backend('Qt5Agg')
+            except ImportError:
+                pyplot.switch_backend('TkAgg')
+        logger.info(f'使用图形后端 {matplotlib.get_backend()}')
+        _pyplot, _animation = pyplot, animation
+    return _pyplot, _animation
@@ -3,20 +3,21 @@ import os
 import shutil
 import threading
 import time
-from typing import Any, Dict, List, Optional
-
-import matplotlib
-
-try:
-    matplotlib.use('Qt5Agg')
-    from matplotlib import pyplot, animation
-except ImportError:
-    matplotlib.use('TkAgg')
-    from matplotlib import pyplot, animation
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
 
 from wsn import Wsn, WsnNode
 from utils import get_log_file_dir_path
 
+from .backend import load_matplotlib
+from .player import export_player
+
+if TYPE_CHECKING:
+    from matplotlib import pyplot
+
+
+# Bystander 支持的动画格式
+ANIM_FORMATS = ('player', 'gif', 'html')
+
 
 class Bystander(object):
     """旁观者
@@ -31,11 +32,25 @@ class Bystander(object):
     frames_log: List[List[Dict[str, Any]]]
 
     last_status: Optional[List[Dict[str, Any]]]
-    fig: pyplot.Figure
-    ax: pyplot.Axes
+    headless: bool
+    # 结束时导出的动画格式
+    anim_formats: Tuple[str, ...]
+    fig: 'pyplot.Figure'
+    ax: 'pyplot.Axes'
 
-    def __init__(self, wsn: Wsn):
+    def __init__(self, wsn: Wsn, headless: bool = False, anim_formats: Sequence[str] = ('player', )):
+        """
+        :param wsn: 需要旁观的无线传感网络
+        :param headless: 无界面模式，不画图也不生成动画，用于批量实验
+        :param anim_formats: 结束时导出的动画格式，可选 'player'（内嵌数据和播放器的单个 result.html ）、
+                             'gif'（ result.gif ）和 'html'（ result/index.html ，每帧一张 png ）
+        """
+        unknown = set(anim_formats) - set(ANIM_FORMATS)
+        if unknown:
+            raise ValueError(f'不支持的动画格式 {sorted(unknown)} ，可选 {list(ANIM_FORMATS)}')
         self.wsn = wsn
+        self.headless = headless
+        self.anim_formats = tuple(anim_formats)
         self.thread = None
         self.thread_cnt = 'stop'
         self.frames_log = []
@@ -103,6 +118,9 @@ class Bystander(object):
 
     def init(self):
         self.last_status = None
+        if self.headless:
+            return
+        pyplot, _ = load_matplotlib()
         self.fig, self.ax = pyplot.subplots()
         self.ax.set_aspect('equal')
 
@@ -110,6 +128,9 @@ class Bystander(object):
         pyplot.ion()
 
     def close(self):
+        if self.headless:
+            return
+        pyplot, _ = load_matplotlib()
         pyplot.close(self.fig)
         # 关闭交互模式
         pyplot.ioff()
@@ -117,6 +138,9 @@ class Bystander(object):
         self.generate_anim()
 
     def action(self):
+        if self.headless:
+            return
+
         status = []
         for node in self.wsn.node_manager.nodes:
             status.append(self.extract_node_info(node))
@@ -128,20 +152,29 @@ class Bystander(object):
             self.draw_nodes(self.fig, self.ax, status)
 
             self.last_status = status
+            pyplot, _ = load_matplotlib()
             pyplot.pause(0.001)
 
     def generate_anim(self):
         """生成动画
-        生成动画并且保存成 gif 和 html
+        按 anim_formats 保存成播放器页面、gif 和逐帧 png 的 html
         """
         self.logger.info('正在生成动画...')
+        if 'player' in self.anim_formats:
+            self.logger.info('正在将动画导出到 result.html')
+            export_player(self.frames_log, f'{get_log_file_dir_path()}/result.html')
+        if 'gif' not in self.anim_formats and 'html' not in self.anim_formats:
+            self.logger.info('动画导出完成...')
+            return
+
+        pyplot, animation = load_matplotlib()
         fig, ax = pyplot.subplots()
 
         def init():
             ax.set_aspect(1)
             return []
 
-        def update(frame: int) -> List[pyplot.Artist]:
+        def update(frame: int) -> List['pyplot.Artist']:
             self.reset_figure(fig, ax)
 
             artists = []
@@ -160,23 +193,25 @@ class Bystander(object):
         )
 
         # 保存动画
-        if 'imagemagick' in animation.writers.avail:
+        if 'gif' not in self.anim_formats:
+            pass
+        elif 'imagemagick' in animation.writers.avail:
             self.logger.info('正在将动画导出到 result.gif')
             anim.save(f'{get_log_file_dir_path()}/result.gif', writer='imagemagick')
         else:
             self.logger.warning('不支持保存成 gif')
 
-        os.makedirs(f'{get_log_file_dir_path()}/result/')
-        self.logger.info('正在将动画导出到 result/index.html')
-        anim.save(f'index.html', writer='html')
-        shutil.move('index_frames', f'{get_log_file_dir_path()}/result/')
-        shutil.move('index.html', f'{get_log_file_dir_path()}/result/')
-        anim.to_jshtml()
+        if 'html' in self.anim_formats:
+            os.makedirs(f'{get_log_file_dir_path()}/result/')
+            self.logger.info('正在将动画导出到 result/index.html')
+            anim.save(f'index.html', writer='html')
+            shutil.move('index_frames', f'{get_log_file_dir_path()}/result/')
+            shutil.move('index.html', f'{get_log_file_dir_path()}/result/')
 
         pyplot.close(fig)
         self.logger.info('动画导出完成...')
 
-    def draw_nodes(self, fig: pyplot.Figure, ax: pyplot.Axes, nodes_info: List[Dict[str, Any]]) -> None:
+    def draw_nodes(self, fig: 'pyplot.Figure', ax: 'pyplot.Axes', nodes_info: List[Dict[str, Any]]) -> None:
         self.reset_figure(fig, ax)
 
         for node_info in nodes_info:
@@ -185,44 +220,53 @@ class Bystander(object):
     def extract_node_info(self, node: WsnNode) -> Dict[str, Any]:
         """从一个节点提取出与画出节点有关的信息
         """
+        # 上一跳统计由 action2 建立在节点上，其它协议的节点没有
+        route = node.route_len.get('1') if hasattr(node, 'route_len') else None
         node_info = {
             'node_id': node.node_id,
             'xy': node.xy,
             'r': node.r,
             'power': node.power,
             'total_power': node.total_power,
-            'label': '',
-            'color': '',
             'last_node':
-                self.wsn.node_manager.nodes[int(max(node.route_len['1'].items(), key=lambda x: x[1])[0])-1].xy
-                if node.route_len.get('1') else None
+                self.wsn.node_manager.nodes[int(max(route.items(), key=lambda x: x[1])[0])-1].xy
+                if route else None
         }
-
-        if node.node_id == 1:
-            node_info['label'] = 'source'
-            node_info['color'] = 'red'
-        elif not node.is_alive:
-            node_info['label'] = 'dead'
-            node_info['color'] = 'black'
-        elif node.sending or node.send_queue or node.reply_queue:
-            node_info['label'] = 'sending'
-            node_info['color'] = 'blue'
-        elif node.node_id in self.wsn.node_manager.nodes[0].replied_nodes:
-            node_info['label'] = 'replied'
-            node_info['color'] = 'yellow'
-        elif node.recv_count > 0:
-            node_info['label'] = 'received'
-            node_info['color'] = 'orange'
-        else:
-            node_info['label'] = 'alive'
-            node_info['color'] = 'green'
+        node_info['label'], node_info['color'] = self.classify_node(
+            is_source=node.node_id == 1,
+            is_dead=not node.is_alive,
+            is_sending=bool(node.sending or node.send_queue or node.reply_queue),
+            is_replied=node.node_id in self.wsn.node_manager.nodes[0].replied_nodes,
+            is_received=node.recv_count > 0
+        )
 
         return node_info
 
     @staticmethod
-    def reset_figure(fig: pyplot.Figure, ax: pyplot.Axes) -> None:
+    def classify_node(
+            is_source: bool, is_dead: bool, is_sending: bool, is_replied: bool, is_received: bool
+    ) -> Tuple[str, str]:
+        """根据节点的状态决定画图时节点的标签和颜色
+        :return: (标签, 颜色)
+        """
+        if is_source:
+            return 'source', 'red'
+        elif is_dead:
+            return 'dead', 'black'
+        elif is_sending:
+            return 'sending', 'blue'
+        elif is_replied:
+            return 'replied', 'yellow'
+        elif is_received:
+            return 'received', 'orange'
+        else:
+            return 'alive', 'green'
+
+    @staticmethod
+    def reset_figure(fig: 'pyplot.Figure', ax: 'pyplot.Axes') -> None:
         """清空并重置一个画布
         """
+        pyplot, _ = load_matplotlib()
         fig.gca().cla()
         fig.gca().set_title('Wireless Sensor Networks')
         fig.gca().set_xlabel('x')
@@ -246,9 +290,10 @@ class Bystander(object):
         ax.legend(handles=legend_elements, loc='upper left', bbox_to_anchor=(1.02, 1), borderaxespad=0)
 
     @staticmethod
-    def draw_node(ax: pyplot.Axes, node_info: Dict[str, Any]) -> List[pyplot.Artist]:
+    def draw_node(ax: 'pyplot.Axes', node_info: Dict[str, Any]) -> List['pyplot.Artist']:
         """根据一个节点的信息画出一个节点
         """
+        pyplot, _ = load_matplotlib()
         artists = []
 
         artists.extend(ax.plot(node_info['xy'][0], node_info['xy'][1], '.', color=node_info['color']))
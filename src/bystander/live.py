@@ -0,0 +1,277 @@
+import logging
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy
+
+from wsn import Wsn
+
+from .backend import load_matplotlib
+from .core import Bystander
+
+
+# 日志配置
+logger: logging.Logger = logging.getLogger('bystander.live')
+
+
+# 快照中每个节点的动态状态，静态的坐标和半径在渲染进程启动时一次性传过去
+SNAPSHOT_DTYPE = numpy.dtype([
+    ('power', '<f8'),
+    ('recv_count', '<i8'),
+    # 最常用路由的上一跳在节点列表中的下标，没有则为 -1
+    ('parent', '<i8'),
+    ('sending', '?'),
+    ('replied', '?'),
+    ('dead', '?'),
+])
+
+# 共享内存头部的字段下标（int64）
+HEADER_CLOSED = 0
+HEADER_FRONT = 1
+# 两个缓冲区各自的快照对应的循环次数，与缓冲区一起受序号保护
+HEADER_CYCLE = 2
+# 两个缓冲区各自的序号，写入期间为奇数
+HEADER_SEQ = 4
+HEADER_SIZE = 6
+
+# 与 Bystander.classify_node 一致的颜色
+COLORS = numpy.array(['red', 'black', 'blue', 'yellow', 'orange', 'green'])
+
+
+class SnapshotBuffer(object):
+    """共享内存中的双缓冲快照
+    头部之后是两个大小相同的缓冲区，写入方总是写不在前台的那一个，写完后把它切换到前台；
+    每个缓冲区带一个序号和循环次数，写入期间序号为奇数，读取方读取前后序号不变且为偶数才说明读到了完整的快照，
+    否则放弃这一帧，因此写入方永远不需要等待读取方
+    """
+
+    node_num: int
+    shm: shared_memory.SharedMemory
+    header: numpy.ndarray
+    # 两个缓冲区，形状为 (2, node_num)
+    slots: numpy.ndarray
+
+    def __init__(self, node_num: int, name: Optional[str] = None):
+        """
+        :param node_num: 节点数
+        :param name: 共享内存的名字，为 None 时新建一块共享内存，否则连接到已有的共享内存
+        """
+        self.node_num = node_num
+        size = HEADER_SIZE * 8 + 2 * max(node_num, 1) * SNAPSHOT_DTYPE.itemsize
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.header = numpy.ndarray((HEADER_SIZE, ), dtype=numpy.int64, buffer=self.shm.buf)
+        self.slots = numpy.ndarray((2, node_num), dtype=SNAPSHOT_DTYPE, buffer=self.shm.buf, offset=HEADER_SIZE * 8)
+        if name is None:
+            self.header[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.header[HEADER_CLOSED])
+
+    def publish(self, snapshot: numpy.ndarray, cycle: int) -> None:
+        """写入一个快照并切换到前台
+        :param snapshot: 形状为 (node_num, ) 、类型为 SNAPSHOT_DTYPE 的数组
+        :param cycle: 快照对应的循环次数
+        """
+        back = 1 - int(self.header[HEADER_FRONT])
+        self.header[HEADER_SEQ + back] += 1
+        self.slots[back] = snapshot
+        self.header[HEADER_CYCLE + back] = cycle
+        self.header[HEADER_SEQ + back] += 1
+        self.header[HEADER_FRONT] = back
+
+    def read(self) -> Optional[Tuple[numpy.ndarray, int, int]]:
+        """读取前台的快照
+        :return: (快照的副本, 循环次数, 序号) ，写入方恰好在改写这个缓冲区时返回 None
+        """
+        front = int(self.header[HEADER_FRONT])
+        seq = int(self.header[HEADER_SEQ + front])
+        cycle = int(self.header[HEADER_CYCLE + front])
+        snapshot = self.slots[front].copy()
+        if seq % 2 or int(self.header[HEADER_SEQ + front]) != seq:
+            return None
+        return snapshot, cycle, seq * 2 + front
+
+    def close(self, unlink: bool = False) -> None:
+        # 释放指向共享内存的数组之后才能关闭
+        del self.header, self.slots
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def classify_nodes(snapshot: numpy.ndarray, is_source: numpy.ndarray) -> numpy.ndarray:
+    """向量化的 Bystander.classify_node
+    :return: 每个节点的颜色
+    """
+    choice = numpy.select(
+        [is_source, snapshot['dead'], snapshot['sending'], snapshot['replied'], snapshot['recv_count'] > 0],
+        [0, 1, 2, 3, 4], default=5
+    )
+    return COLORS[choice]
+
+
+def renderer_main(
+        name: str, xy: numpy.ndarray, r: numpy.ndarray, total_power: numpy.ndarray, node_ids: numpy.ndarray,
+        fps: float, save_path: Optional[str]
+) -> None:
+    """渲染进程的主函数
+    按自己的帧率读取最新的快照，有变化时更新散点的颜色、信号范围的透明度和路由连线，
+    模拟进程关闭快照或者窗口被关闭时退出
+    :param name: 共享内存的名字
+    :param xy: 节点坐标，形状为 (N, 2)
+    :param r: 节点通信半径
+    :param total_power: 节点的总电量
+    :param node_ids: 节点的 node_id
+    :param fps: 帧率
+    :param save_path: 退出前把最后一帧保存到这个路径，为 None 时不保存
+    """
+    pyplot, _ = load_matplotlib()
+    from matplotlib.collections import LineCollection, PatchCollection
+    from matplotlib.colors import to_rgba_array
+
+    buffer = SnapshotBuffer(len(xy), name)
+    total_power = numpy.maximum(total_power, 1e-12)
+    fig, ax = pyplot.subplots()
+    Bystander.reset_figure(fig, ax)
+    ax.set_aspect('equal')
+    points = ax.scatter(xy[:, 0], xy[:, 1], s=4, c='green')
+    circles = PatchCollection([pyplot.Circle(xy=center, radius=radius) for center, radius in zip(xy, r)])
+    ax.add_collection(circles)
+    links = LineCollection([], linewidths=1, colors='red', alpha=0.2)
+    ax.add_collection(links)
+    ax.autoscale_view()
+    is_source = node_ids == 1
+
+    def update(snapshot: numpy.ndarray, cycle: int) -> None:
+        colors = classify_nodes(snapshot, is_source)
+        points.set_color(colors)
+        alive = ~snapshot['dead']
+        rgba = to_rgba_array(colors)
+        rgba[:, 3] = numpy.where(alive, snapshot['power'] / total_power * 0.1, 0)
+        circles.set_facecolors(rgba)
+        has_parent = alive & (snapshot['parent'] >= 0)
+        links.set_segments(numpy.stack([xy[has_parent], xy[snapshot['parent'][has_parent]]], axis=1))
+        ax.set_title(f'Wireless Sensor Networks (cycle {cycle})')
+
+    last_seq = None
+    interval = 1 / fps
+    try:
+        while not buffer.closed and pyplot.fignum_exists(fig.number):
+            frame = buffer.read()
+            if frame is not None and frame[2] != last_seq:
+                snapshot, cycle, last_seq = frame
+                update(snapshot, cycle)
+            pyplot.pause(interval)
+        if save_path is not None:
+            # 模拟进程关闭前发布的最后一个快照，此后不会再被改写
+            snapshot, cycle, _ = buffer.read()
+            update(snapshot, cycle)
+            fig.savefig(save_path)
+    finally:
+        pyplot.close(fig)
+        buffer.close()
+
+
+class LiveBystander(Bystander):
+    """在另一个进程中实时画图的旁观者
+    模拟所在的进程只负责把节点状态写入共享内存中的双缓冲快照（见 SnapshotBuffer ），不画图也不等待，
+    渲染进程按自己的帧率读取最新的快照并画出来，所以画图不会拖慢模拟；
+    两次发布之间至少间隔一帧的时间，多余的循环直接跳过，不会保存帧，也不会在结束时生成动画
+    """
+    # 配置日志
+    logger: logging.Logger = logger
+
+    fps: float
+    save_path: Optional[str]
+    buffer: Optional[SnapshotBuffer]
+    process: Optional[multiprocessing.Process]
+    # 已经完成的循环次数，即 action 被调用的次数
+    num_of_cycles: int
+    last_publish_time: float
+
+    def __init__(self, wsn: Wsn, fps: float = 10, save_path: Optional[str] = None):
+        """
+        :param wsn: 需要旁观的无线传感网络
+        :param fps: 渲染进程的帧率，也是模拟进程发布快照的最高频率
+        :param save_path: 结束时把最后一帧保存到这个路径，为 None 时不保存
+        """
+        super(LiveBystander, self).__init__(wsn)
+        if fps <= 0:
+            raise ValueError('帧率必须大于 0')
+        self.fps = fps
+        self.save_path = save_path
+        self.buffer = None
+        self.process = None
+        self.num_of_cycles = 0
+        self.last_publish_time = 0.
+
+    def init(self):
+        self.last_status = None
+        nodes = self.wsn.node_manager.nodes
+        self.buffer = SnapshotBuffer(len(nodes))
+        self.num_of_cycles = 0
+        self.publish()
+
+        # 渲染进程不继承父进程的线程和图形界面状态
+        context = multiprocessing.get_context(
+            'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        )
+        self.process = context.Process(
+            target=renderer_main, name='renderer',
+            args=(
+                self.buffer.name,
+                numpy.array([node.xy for node in nodes], dtype=numpy.float64).reshape(-1, 2),
+                numpy.array([node.r for node in nodes], dtype=numpy.float64),
+                numpy.array([node.total_power for node in nodes], dtype=numpy.float64),
+                numpy.array([node.node_id for node in nodes], dtype=numpy.int64),
+                self.fps, self.save_path
+            )
+        )
+        self.process.start()
+        self.logger.info(f'渲染进程已启动，帧率 {self.fps}')
+
+    def close(self):
+        if self.buffer is None:
+            return
+        self.publish()
+        self.buffer.header[HEADER_CLOSED] = 1
+        if self.process is not None:
+            self.process.join()
+            self.process = None
+        self.buffer.close(unlink=True)
+        self.buffer = None
+        self.logger.info('渲染进程已退出')
+
+    def action(self):
+        self.num_of_cycles += 1
+        if time.time() - self.last_publish_time >= 1 / self.fps:
+            self.publish()
+
+    def publish(self) -> None:
+        """把所有节点的当前状态写入快照
+        """
+        nodes = self.wsn.node_manager.nodes
+        replied_nodes = nodes[0].replied_nodes if nodes else set()
+        snapshot = numpy.zeros(len(nodes), dtype=SNAPSHOT_DTYPE)
+        for i, node in enumerate(nodes):
+            # 上一跳统计由 action2 建立在节点上，其它协议的节点没有
+            route = node.route_len.get('1') if hasattr(node, 'route_len') else None
+            snapshot[i] = (
+                node.power, node.recv_count,
+                int(max(route.items(), key=lambda x: x[1])[0]) - 1 if route else -1,
+                bool(node.sending or node.send_queue or node.reply_queue),
+                node.node_id in replied_nodes,
+                not node.is_alive
+            )
+        self.buffer.publish(snapshot, self.num_of_cycles)
+        self.last_publish_time = time.time()
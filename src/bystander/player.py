@@ -0,0 +1,268 @@
+import argparse
+import base64
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy
+
+
+# 日志配置
+logger: logging.Logger = logging.getLogger('bystander.player')
+
+
+PLAYER_MAGIC = b'WSNP'
+PLAYER_VERSION = 1
+
+# 节点标签，下标即数据中的类别编号，顺序与 Bystander.classify_node 的判断顺序一致
+LABELS = ('source', 'dead', 'sending', 'replied', 'received', 'alive')
+COLORS = ('red', 'black', 'blue', 'yellow', 'orange', 'green')
+
+
+def encode_frames(frames: List[List[Dict[str, Any]]]) -> bytes:
+    """把 Bystander 记录的帧编码成紧凑的二进制数据
+    布局（小端）：
+      头部       'WSNP' 、版本 u4 、节点数 N u4 、帧数 F u4
+      静态节点表  node_id u4[N] 、x f4[N] 、y f4[N] 、r f4[N]
+      每一帧     与上一帧相比发生变化的节点数 k u4 ，以及这些节点的下标 u4[k] 、类别 u1[k] 、
+                剩余电量比例 u1[k]（0 ~ 255）、最常用路由上一跳的下标 i4[k]（没有为 -1）
+    第一帧与全部节点都是“alive 、电量为 0 、没有上一跳”的空白帧比较
+    :param frames: 每一帧是各个节点的画图信息，格式同 Bystander.extract_node_info()
+    """
+    first = frames[0] if frames else []
+    node_num = len(first)
+    index_of = {tuple(node_info['xy']): i for i, node_info in enumerate(first)}
+    chunks = [
+        PLAYER_MAGIC,
+        numpy.array([PLAYER_VERSION, node_num, len(frames)], dtype='<u4').tobytes(),
+        numpy.array([node_info['node_id'] for node_info in first], dtype='<u4').tobytes(),
+        numpy.array([node_info['xy'][0] for node_info in first], dtype='<f4').tobytes(),
+        numpy.array([node_info['xy'][1] for node_info in first], dtype='<f4').tobytes(),
+        numpy.array([node_info['r'] for node_info in first], dtype='<f4').tobytes(),
+    ]
+
+    label_of = {label: i for i, label in enumerate(LABELS)}
+    last_category = numpy.full(node_num, LABELS.index('alive'), dtype='<u1')
+    last_power = numpy.zeros(node_num, dtype='<u1')
+    last_parent = numpy.full(node_num, -1, dtype='<i4')
+    for frame in frames:
+        category = numpy.array([label_of[node_info['label']] for node_info in frame], dtype='<u1')
+        power = numpy.array([
+            round(255 * min(max(node_info['power'] / node_info['total_power'], 0), 1)) if node_info['total_power'] else 0
+            for node_info in frame
+        ], dtype='<u1')
+        parent = numpy.array([
+            index_of.get(tuple(node_info['last_node']), -1) if node_info['last_node'] is not None else -1
+            for node_info in frame
+        ], dtype='<i4')
+
+        changed = numpy.flatnonzero((category != last_category) | (power != last_power) | (parent != last_parent))
+        chunks += [
+            numpy.array([len(changed)], dtype='<u4').tobytes(),
+            changed.astype('<u4').tobytes(),
+            category[changed].tobytes(),
+            power[changed].tobytes(),
+            parent[changed].tobytes(),
+        ]
+        last_category, last_power, last_parent = category, power, parent
+    return b''.join(chunks)
+
+
+def render_player(blob: bytes, title: str = 'Wireless Sensor Networks', fps: float = 2) -> str:
+    """生成内嵌数据和播放器的单个 html 页面
+    :param blob: encode_frames() 编码的数据
+    :param title: 页面标题
+    :param fps: 默认的播放帧率
+    """
+    return (
+        PLAYER_TEMPLATE
+        .replace('__TITLE__', title)
+        .replace('__FPS__', repr(float(fps)))
+        .replace('__COLORS__', repr(list(COLORS)))
+        .replace('__LABELS__', repr(list(LABELS)))
+        .replace('__DATA__', base64.b64encode(blob).decode('ascii'))
+    )
+
+
+def export_player(
+        frames: List[List[Dict[str, Any]]], path: str, title: str = 'Wireless Sensor Networks', fps: float = 2
+) -> int:
+    """把 Bystander 记录的帧导出成单个 html 文件，用浏览器打开即可播放、暂停和拖动进度
+    :param frames: 每一帧是各个节点的画图信息，格式同 Bystander.extract_node_info()
+    :param path: 输出路径
+    :param title: 页面标题
+    :param fps: 默认的播放帧率
+    :return: 文件大小（字节）
+    """
+    blob = encode_frames(frames)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(render_player(blob, title, fps))
+    size = os.path.getsize(path)
+    logger.info(f'{len(frames)} 帧动画（数据 {len(blob)} 字节）已导出到 {path} ，共 {size} 字节')
+    return size
+
+
+PLAYER_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+body { font-family: sans-serif; margin: 16px; }
+#controls { margin: 8px 0; display: flex; align-items: center; gap: 8px; }
+#seek { width: 480px; }
+#legend span { margin-right: 12px; }
+#legend i { display: inline-block; width: 10px; height: 10px; border-radius: 5px; margin-right: 4px; }
+</style>
+</head>
+<body>
+<h3>__TITLE__</h3>
+<canvas id="canvas" width="640" height="640"></canvas>
+<div id="controls">
+  <button id="play">play</button>
+  <input id="seek" type="range" min="0" max="0" value="0">
+  <span id="label"></span>
+  <label>fps <input id="fps" type="number" min="0.5" max="60" step="0.5" style="width: 4em"></label>
+</div>
+<div id="legend"></div>
+<script>
+(function () {
+  var COLORS = __COLORS__, LABELS = __LABELS__, KEYFRAME_INTERVAL = 64;
+  var RGB = {red: [255, 0, 0], black: [0, 0, 0], blue: [0, 0, 255], yellow: [255, 255, 0],
+             orange: [255, 165, 0], green: [0, 128, 0]};
+  var raw = atob('__DATA__'), bytes = new Uint8Array(raw.length);
+  for (var i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+  var view = new DataView(bytes.buffer), pos = 4;
+  function u4() { var v = view.getUint32(pos, true); pos += 4; return v; }
+  var version = u4(), n = u4(), frameNum = u4();
+  var nodeId = new Uint32Array(n), x = new Float32Array(n), y = new Float32Array(n), r = new Float32Array(n);
+  for (i = 0; i < n; i++) nodeId[i] = u4();
+  for (i = 0; i < n; i++) { x[i] = view.getFloat32(pos, true); pos += 4; }
+  for (i = 0; i < n; i++) { y[i] = view.getFloat32(pos, true); pos += 4; }
+  for (i = 0; i < n; i++) { r[i] = view.getFloat32(pos, true); pos += 4; }
+
+  // 每一帧的增量在数据中的位置
+  var offsets = [];
+  for (var f = 0; f < frameNum; f++) { offsets.push(pos); var k = u4(); pos += k * 10; }
+
+  var category = new Uint8Array(n).fill(LABELS.indexOf('alive')), power = new Uint8Array(n),
+      parent = new Int32Array(n).fill(-1);
+  function applyFrame(f) {
+    pos = offsets[f];
+    var k = u4(), idx = pos, cat = idx + 4 * k, pw = cat + k, par = pw + k;
+    for (var j = 0; j < k; j++) {
+      var node = view.getUint32(idx + 4 * j, true);
+      category[node] = bytes[cat + j];
+      power[node] = bytes[pw + j];
+      parent[node] = view.getInt32(par + 4 * j, true);
+    }
+  }
+  // 每隔 KEYFRAME_INTERVAL 帧保存一次全部状态，跳转时从最近的关键帧开始应用增量
+  var keyframes = [];
+  for (f = 0; f < frameNum; f++) {
+    if (f % KEYFRAME_INTERVAL === 0) keyframes.push([category.slice(), power.slice(), parent.slice()]);
+    applyFrame(f);
+  }
+  var current = -1;
+  function seek(f) {
+    if (f !== current + 1) {
+      var key = keyframes[Math.floor(f / KEYFRAME_INTERVAL)];
+      category.set(key[0]); power.set(key[1]); parent.set(key[2]);
+      for (var g = Math.floor(f / KEYFRAME_INTERVAL) * KEYFRAME_INTERVAL; g < f; g++) applyFrame(g);
+    }
+    applyFrame(f);
+    current = f;
+  }
+
+  var canvas = document.getElementById('canvas'), ctx = canvas.getContext('2d');
+  var xMin = Infinity, xMax = -Infinity, yMin = Infinity, yMax = -Infinity;
+  for (i = 0; i < n; i++) {
+    xMin = Math.min(xMin, x[i] - r[i]); xMax = Math.max(xMax, x[i] + r[i]);
+    yMin = Math.min(yMin, y[i] - r[i]); yMax = Math.max(yMax, y[i] + r[i]);
+  }
+  var scale = Math.min(canvas.width / (xMax - xMin || 1), canvas.height / (yMax - yMin || 1));
+  function px(v) { return (v - xMin) * scale; }
+  function py(v) { return canvas.height - (v - yMin) * scale; }
+
+  function draw() {
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    for (var i = 0; i < n; i++) {
+      if (LABELS[category[i]] === 'dead') continue;
+      var c = RGB[COLORS[category[i]]];
+      ctx.fillStyle = 'rgba(' + c[0] + ',' + c[1] + ',' + c[2] + ',' + (power[i] / 255 * 0.1) + ')';
+      ctx.beginPath(); ctx.arc(px(x[i]), py(y[i]), r[i] * scale, 0, 2 * Math.PI); ctx.fill();
+    }
+    ctx.strokeStyle = 'rgba(255,0,0,0.2)';
+    ctx.beginPath();
+    for (i = 0; i < n; i++) {
+      if (parent[i] < 0 || LABELS[category[i]] === 'dead') continue;
+      ctx.moveTo(px(x[i]), py(y[i])); ctx.lineTo(px(x[parent[i]]), py(y[parent[i]]));
+    }
+    ctx.stroke();
+    for (i = 0; i < n; i++) {
+      ctx.fillStyle = COLORS[category[i]];
+      ctx.fillRect(px(x[i]) - 1.5, py(y[i]) - 1.5, 3, 3);
+    }
+  }
+
+  var seekInput = document.getElementById('seek'), label = document.getElementById('label'),
+      playButton = document.getElementById('play'), fpsInput = document.getElementById('fps');
+  seekInput.max = Math.max(frameNum - 1, 0);
+  fpsInput.value = __FPS__;
+  function show(f) {
+    if (!frameNum) return;
+    seek(f); draw();
+    seekInput.value = f;
+    label.textContent = 'frame ' + (f + 1) + ' / ' + frameNum;
+  }
+  var timer = null;
+  function pause() { clearTimeout(timer); timer = null; playButton.textContent = 'play'; }
+  function tick() {
+    if (current + 1 >= frameNum) { pause(); return; }
+    show(current + 1);
+    timer = setTimeout(tick, 1000 / (parseFloat(fpsInput.value) || 1));
+  }
+  playButton.onclick = function () {
+    if (timer !== null) { pause(); return; }
+    if (current + 1 >= frameNum) show(0);
+    playButton.textContent = 'pause';
+    tick();
+  };
+  seekInput.oninput = function () { pause(); show(parseInt(seekInput.value, 10)); };
+
+  var legend = document.getElementById('legend');
+  for (i = 0; i < LABELS.length; i++) {
+    legend.innerHTML += '<span><i style="background:' + COLORS[i] + '"></i>' + LABELS[i] + '</span>';
+  }
+  show(0);
+})();
+</script>
+</body>
+</html>
+'''
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python3 -m bystander.player', description='把事件轨迹导出成可以在浏览器中播放的 html 动画')
+    parser.add_argument('trace', help='轨迹文件路径')
+    parser.add_argument('-o', '--output', help='输出路径，默认为轨迹文件旁的 `<轨迹文件路径>.html`')
+    parser.add_argument('--step', type=int, default=1, help='每隔多少个循环取一帧')
+    parser.add_argument('--fps', type=float, default=2, help='默认的播放帧率')
+    args = parser.parse_args()
+    if args.step < 1:
+        raise ValueError('取帧间隔不能小于 1')
+
+    # 在这里才导入回放，只导出 Bystander 记录的帧时不需要读取轨迹
+    from .replay import TraceReplay
+
+    replay = TraceReplay(args.trace)
+    frames: List[List[Dict[str, Any]]] = []
+    for cycle in range(0, replay.num_of_cycles + 1, args.step):
+        frames.append(replay.nodes_info(cycle))
+    output: Optional[str] = args.output if args.output else f'{args.trace}.html'
+    size = export_player(frames, output, fps=args.fps)
+    print(f'{len(frames)} 帧，{size} 字节，已导出到 {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+import argparse
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy
+
+from utils.trace import EnumTraceEvent, FLAG_REPLY, load_topology, open_trace
+
+from .backend import load_matplotlib
+from .core import Bystander
+
+if TYPE_CHECKING:
+    from matplotlib import pyplot
+
+
+class ReplayState(object):
+    """回放中某一时刻的网络状态，每个数组的下标与拓扑文件中节点的顺序一致
+    """
+
+    # 节点剩余电量
+    power: numpy.ndarray
+    # 节点收到的（非回应）消息数
+    recv_count: numpy.ndarray
+    # 节点第一次收到消息时的发送者 node_id ，没有则为 0
+    parent: numpy.ndarray
+    # 节点是否已经发出过自己的回应
+    replied: numpy.ndarray
+    # 节点是否已经电量耗尽
+    dead: numpy.ndarray
+
+    FIELDS = ('power', 'recv_count', 'parent', 'replied', 'dead')
+
+    def __init__(self, power: numpy.ndarray):
+        node_num = len(power)
+        self.power = numpy.array(power, dtype=numpy.float64)
+        self.recv_count = numpy.zeros(node_num, dtype=numpy.int64)
+        self.parent = numpy.zeros(node_num, dtype=numpy.int64)
+        self.replied = numpy.zeros(node_num, dtype=bool)
+        self.dead = numpy.zeros(node_num, dtype=bool)
+
+    def copy(self) -> 'ReplayState':
+        state = ReplayState.__new__(ReplayState)
+        for name in self.FIELDS:
+            setattr(state, name, getattr(self, name).copy())
+        return state
+
+
+class TraceReplay(object):
+    """事件轨迹回放
+    以内存映射的方式打开 EventTrace 记录的事件轨迹，不需要重新模拟就能重建任意循环结束时的网络状态并画出来
+
+    第一次打开一个轨迹时会顺序扫描一遍，每隔大约 keyframe_events 个事件在循环边界处保存一个关键帧（全网状态的快照），
+    保存在轨迹文件旁的 `<轨迹文件路径>.keyframes.npz` 中，之后再打开时直接读取；
+    跳转到某个循环时从它之前最近的关键帧出发，向量化地应用其后的事件，
+    因此跳转的耗时只与关键帧间隔有关，与轨迹的总长度无关
+
+    回放的状态由事件推断，与运行时 Bystander 看到的略有不同：
+      - 发送中（sending）指该节点在这个循环中发送过消息
+      - 已回应（replied）指该节点已经发出过自己的回应，而不是源节点已经收到
+      - 连线指向节点第一次收到消息时的发送者，而不是最常用的路由
+    """
+    # 日志配置
+    logger: logging.Logger = logging.getLogger('bystander.replay')
+
+    path: str
+    trace: numpy.ndarray
+    topology: numpy.ndarray
+    keyframe_events: int
+    # node_id -> 节点在拓扑中的下标
+    index_of: numpy.ndarray
+    # 第 c 个元素是第一个循环次数不小于 c 的事件的位置，避免每次跳转都在整个轨迹上二分查找
+    cycle_offsets: numpy.ndarray
+    # 关键帧所在的循环，关键帧是该循环开始前（上一循环结束时）的状态
+    keyframe_cycles: numpy.ndarray
+    # 关键帧对应的第一个未应用事件的位置
+    keyframe_offsets: numpy.ndarray
+    keyframe_states: Dict[str, numpy.ndarray]
+
+    def __init__(self, path: str, keyframe_events: int = 1 << 19):
+        """
+        :param path: 轨迹文件路径
+        :param keyframe_events: 相邻关键帧之间的事件数（近似值）
+        """
+        if keyframe_events < 1:
+            raise ValueError('关键帧间隔不能小于 1')
+        self.path = path
+        self.keyframe_events = keyframe_events
+        self.trace = open_trace(path)
+        self.topology = load_topology(path)
+
+        node_ids = self.topology['node_id'].astype(numpy.int64)
+        self.index_of = numpy.full(int(node_ids.max(initial=0)) + 1, -1, dtype=numpy.int64)
+        self.index_of[node_ids] = numpy.arange(len(node_ids))
+
+        if not self.load_keyframes():
+            self.build_keyframes()
+            self.save_keyframes()
+
+    @property
+    def keyframes_path(self) -> str:
+        return f'{self.path}.keyframes.npz'
+
+    @property
+    def num_of_cycles(self) -> int:
+        """轨迹中最后一个事件所在的循环
+        """
+        return int(self.trace['cycle'][-1]) if len(self.trace) else 0
+
+    def load_keyframes(self) -> bool:
+        """读取关键帧文件，文件不存在或与轨迹不匹配时返回 False
+        """
+        try:
+            with numpy.load(self.keyframes_path) as keyframes:
+                if int(keyframes['num_of_events']) != len(self.trace) or \
+                        int(keyframes['keyframe_events']) != self.keyframe_events:
+                    return False
+                self.cycle_offsets = keyframes['cycle_offsets']
+                self.keyframe_cycles = keyframes['cycles']
+                self.keyframe_offsets = keyframes['offsets']
+                self.keyframe_states = {name: keyframes[name] for name in ReplayState.FIELDS}
+        except (OSError, KeyError, ValueError):
+            return False
+        return True
+
+    def save_keyframes(self) -> None:
+        tmp_path = f'{self.keyframes_path}.{os.getpid()}.tmp.npz'
+        numpy.savez(
+            tmp_path, num_of_events=len(self.trace), keyframe_events=self.keyframe_events,
+            cycle_offsets=self.cycle_offsets, cycles=self.keyframe_cycles, offsets=self.keyframe_offsets,
+            **self.keyframe_states
+        )
+        os.replace(tmp_path, self.keyframes_path)
+
+    def build_keyframes(self) -> None:
+        """顺序扫描一遍轨迹，在循环边界处生成关键帧
+        """
+        cycles = self.trace['cycle']
+        self.cycle_offsets = numpy.searchsorted(cycles, numpy.arange(self.num_of_cycles + 2), side='left')
+        state = ReplayState(self.topology['power'])
+        keyframe_cycles, keyframe_offsets, snapshots = [0], [0], [state.copy()]
+
+        offset = 0
+        while True:
+            target = offset + self.keyframe_events
+            if target >= len(self.trace):
+                break
+            # 关键帧必须落在循环边界上，一个循环的事件太多时顺延到下一个循环
+            cycle = int(cycles[target])
+            next_offset = int(self.cycle_offsets[cycle])
+            if next_offset <= offset:
+                cycle += 1
+                next_offset = int(self.cycle_offsets[cycle])
+                if next_offset >= len(self.trace):
+                    break
+            self.apply(state, self.trace[offset:next_offset])
+            offset = next_offset
+            keyframe_cycles.append(cycle)
+            keyframe_offsets.append(offset)
+            snapshots.append(state.copy())
+
+        self.keyframe_cycles = numpy.array(keyframe_cycles, dtype=numpy.int64)
+        self.keyframe_offsets = numpy.array(keyframe_offsets, dtype=numpy.int64)
+        self.keyframe_states = {
+            name: numpy.stack([getattr(snapshot, name) for snapshot in snapshots]) for name in ReplayState.FIELDS
+        }
+        self.logger.info(f'为 {len(self.trace)} 个事件生成了 {len(keyframe_cycles)} 个关键帧')
+
+    def apply(self, state: ReplayState, events: numpy.ndarray) -> None:
+        """按顺序把一段事件应用到网络状态上
+        """
+        if len(events) == 0:
+            return
+        kind = events['kind']
+        node_ids = events['node'].astype(numpy.int64)
+        valid = node_ids < len(self.index_of)
+        nodes = numpy.where(valid, self.index_of[numpy.where(valid, node_ids, 0)], -1)
+
+        # 发送类事件记录了发送后的剩余电量，取每个节点的最后一次
+        sent = ((kind == EnumTraceEvent.SEND) | (kind == EnumTraceEvent.FORWARD) | (kind == EnumTraceEvent.REPLY) |
+                (kind == EnumTraceEvent.DEATH)) & (nodes >= 0)
+        if sent.any():
+            reversed_nodes = nodes[sent][::-1]
+            unique_nodes, last = numpy.unique(reversed_nodes, return_index=True)
+            state.power[unique_nodes] = events['value'][sent][::-1][last]
+
+        received = (kind == EnumTraceEvent.RECEIVE) & (events['flags'] & FLAG_REPLY == 0) & (nodes >= 0)
+        if received.any():
+            state.recv_count += numpy.bincount(nodes[received], minlength=len(state.recv_count))
+            unique_nodes, first = numpy.unique(nodes[received], return_index=True)
+            orphan = state.parent[unique_nodes] == 0
+            state.parent[unique_nodes[orphan]] = events['peer'][received][first[orphan]]
+
+        # 节点发出自己的回应时，回应消息的源就是它自己
+        replied = (kind == EnumTraceEvent.REPLY) & (node_ids == events['peer']) & (nodes >= 0)
+        state.replied[nodes[replied]] = True
+
+        dead = (kind == EnumTraceEvent.DEATH) & (nodes >= 0)
+        state.dead[nodes[dead]] = True
+
+    def cycle_range(self, cycle: int) -> Tuple[int, int]:
+        """第 cycle 个循环的事件在轨迹中的范围 [start, end)
+        """
+        cycle = min(max(cycle, 0), len(self.cycle_offsets) - 2)
+        return int(self.cycle_offsets[cycle]), int(self.cycle_offsets[cycle + 1])
+
+    def seek(self, cycle: int) -> ReplayState:
+        """重建第 cycle 个循环结束时的网络状态
+        """
+        _, end = self.cycle_range(cycle)
+        k = int(numpy.searchsorted(self.keyframe_offsets, end, side='right')) - 1
+
+        state = ReplayState.__new__(ReplayState)
+        for name in ReplayState.FIELDS:
+            setattr(state, name, self.keyframe_states[name][k].copy())
+        self.apply(state, self.trace[self.keyframe_offsets[k]:end])
+        return state
+
+    def sending(self, cycle: int) -> numpy.ndarray:
+        """第 cycle 个循环中发送过消息的节点
+        """
+        start, end = self.cycle_range(cycle)
+        events = self.trace[start:end]
+        kind = events['kind']
+        sent = (kind == EnumTraceEvent.SEND) | (kind == EnumTraceEvent.FORWARD) | (kind == EnumTraceEvent.REPLY)
+        node_ids = events['node'][sent].astype(numpy.int64)
+        node_ids = node_ids[node_ids < len(self.index_of)]
+        is_sending = numpy.zeros(len(self.topology), dtype=bool)
+        indices = self.index_of[node_ids]
+        is_sending[indices[indices >= 0]] = True
+        return is_sending
+
+    def nodes_info(self, cycle: int) -> List[Dict[str, Any]]:
+        """第 cycle 个循环结束时每个节点的画图信息，格式同 Bystander.extract_node_info()
+        """
+        state = self.seek(cycle)
+        is_sending = self.sending(cycle)
+        topology = self.topology
+        xy = {int(node_id): (x, y) for node_id, x, y in zip(topology['node_id'], topology['x'], topology['y'])}
+
+        nodes_info = []
+        for i, node in enumerate(topology.tolist()):
+            node_id, x, y, r, _, total_power = node
+            label, color = Bystander.classify_node(
+                is_source=node_id == 1,
+                is_dead=bool(state.dead[i]),
+                is_sending=bool(is_sending[i]),
+                is_replied=bool(state.replied[i]),
+                is_received=state.recv_count[i] > 0
+            )
+            nodes_info.append({
+                'node_id': node_id,
+                'xy': (x, y),
+                'r': r,
+                'power': float(state.power[i]),
+                'total_power': total_power,
+                'label': label,
+                'color': color,
+                'last_node': xy.get(int(state.parent[i])),
+            })
+        return nodes_info
+
+    def draw(
+            self, cycle: int, fig: Optional['pyplot.Figure'] = None, ax: Optional['pyplot.Axes'] = None,
+            region: Optional[Tuple[float, float, float, float]] = None
+    ) -> Tuple['pyplot.Figure', 'pyplot.Axes']:
+        """用 Bystander 的画图方法画出第 cycle 个循环结束时的网络
+        :param cycle: 循环次数
+        :param fig: 画布，为 None 时新建
+        :param ax: 坐标系，为 None 时新建
+        :param region: 只显示这个区域 (x_min, x_max, y_min, y_max) ，为 None 时显示全部
+        :return: (fig, ax)
+        """
+        if fig is None or ax is None:
+            pyplot, _ = load_matplotlib()
+            fig, ax = pyplot.subplots()
+        Bystander.reset_figure(fig, ax)
+        ax.set_aspect('equal')
+        for node_info in self.nodes_info(cycle):
+            Bystander.draw_node(ax, node_info)
+        ax.set_title(f'Wireless Sensor Networks (cycle {cycle})')
+        if region is not None:
+            ax.set_xlim(region[0], region[1])
+            ax.set_ylim(region[2], region[3])
+        return fig, ax
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python3 -m bystander.replay', description='回放事件轨迹中某个循环的网络状态')
+    parser.add_argument('trace', help='轨迹文件路径')
+    parser.add_argument('-c', '--cycle', type=int, help='循环次数，默认为最后一个循环')
+    parser.add_argument('-o', '--output', help='保存图像的路径，不指定则显示窗口')
+    parser.add_argument('--region', type=float, nargs=4, metavar=('X_MIN', 'X_MAX', 'Y_MIN', 'Y_MAX'), help='显示区域')
+    args = parser.parse_args()
+
+    replay = TraceReplay(args.trace)
+    cycle = replay.num_of_cycles if args.cycle is None else args.cycle
+    fig, _ = replay.draw(cycle, region=args.region)
+
+    pyplot, _ = load_matplotlib()
+    if args.output:
+        fig.savefig(args.output)
+    else:
+        pyplot.show()
+    pyplot.close(fig)
+
+
+if __name__ == '__main__':
+    main()
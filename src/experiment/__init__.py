@@ -0,0 +1,8 @@
+from .core import DEFAULT_CONFIG, expand_grid, get_code_version, get_config_key, run_experiment, run_sweep
+from .store import ResultStore
+
+
+__all__ = [
+    'DEFAULT_CONFIG', 'expand_grid', 'get_code_version', 'get_config_key', 'run_experiment', 'run_sweep',
+    'ResultStore',
+]
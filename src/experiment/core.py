@@ -0,0 +1,304 @@
+import copy
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import numpy
+
+from utils import DeliveryTracer, EnumScheduleMode, Scheduler, TerminationCondition
+from bystander import Bystander
+from wsn import Wsn, get_protocol
+from wsn.retransmit import RetransmissionPolicy, WsnRetransmitter
+from wsn.traffic import WsnTrafficGenerator, get_arrival
+from wsn.utils import generate_rand_nodes
+
+from .store import ResultStore
+
+
+# 日志配置
+logger: logging.Logger = logging.getLogger('experiment')
+
+
+# 默认实验配置，与 main.py 中的实验参数一致
+DEFAULT_CONFIG: Dict[str, Any] = {
+    # 网络拓扑，即 generate_rand_nodes 的参数
+    'topology': {
+        'wsn_width_x': 100,
+        'wsn_width_y': 100,
+        'node_num': 300,
+        'node_r_mu': 10,
+        'node_r_sigma': 5,
+        'node_power': 100000000000,
+        'node_pc_per_send': 1,
+    },
+    # 节点使用的路由协议，可以是协议的注册名（见 wsn.protocol.PROTOCOLS ），
+    # 也可以是 {"name": 注册名, 其它键为协议的参数}
+    'protocol': 'action2',
+    # 调度模式，即 EnumScheduleMode 的值
+    'mode': 'single_thread',
+    # 多进程（分片）模式下 x 和 y 方向上的分片数
+    'tiles': [2, 2],
+    # 通信介质的设置
+    'medium': {
+        # 是否使用时隙模式，见 WsnMedium
+        'slotted': False,
+    },
+    # 终止条件，键是 TerminationCondition 中条件类名的蛇形命名，值是条件的参数（无参数的条件为 true）
+    'termination': {
+        'node_driven': True,
+        'num_of_cycles': 300,
+        'survival_rate': 0.6,
+    },
+    # 重传策略，即 RetransmissionPolicy 的参数，为 null 时 action2 每次活动都重发所有未确认的消息
+    'retransmission': None,
+    # 消息源（一号节点）的设置
+    'source': {
+        # 需要收到回应的节点占总节点数的比例
+        'teammate_rate': 0.95,
+        'message': 'Hello World!',
+    },
+    # 合成流量，为 null 时只有消息源（一号节点）发送一条消息，否则不再使用 source 中的设置，
+    # 每发送完一条消息都会触发 node_driven ，使用时应在 termination 中关闭
+    # 例如 {"sources": 5, "arrival": {"name": "poisson", "rate": 0.01}, "teammate_rate": 0.5}
+    'traffic': None,
+    # 是否追踪每条消息的送达时延和跳数（见 DeliveryTracer ），开启后结果摘要中多出 latency_* 和 hops_* 等项
+    'delivery_tracing': False,
+    # 随机数种子，同时用于生成拓扑和调度
+    'seed': 0,
+}
+
+TERMINATION_CONDITIONS = {
+    'user_driven': TerminationCondition.UserDriven,
+    'num_of_cycles': TerminationCondition.NumOfCycles,
+    'running_time': TerminationCondition.RunningTime,
+    'node_driven': TerminationCondition.NodeDriven,
+    'received_rate': TerminationCondition.ReceivedRate,
+    'survival_rate': TerminationCondition.SurvivalRate,
+    'projected_lifetime': TerminationCondition.ProjectedLifetime,
+    'quiescent': TerminationCondition.Quiescent,
+}
+
+
+def merge_config(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """把 override 递归地合并到 base 的副本上
+    """
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def expand_grid(base: Dict[str, Any], grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """根据参数网格展开出所有实验配置
+    :param base: 基础配置
+    :param grid: 参数网格，键是用点号分隔的配置路径（如 `topology.node_num`），值是该参数的取值列表
+    :return: 网格中每个点对应的完整配置
+    """
+    configs = []
+    keys = list(grid.keys())
+    for values in itertools.product(*(grid[key] for key in keys)):
+        config = copy.deepcopy(base)
+        for key, value in zip(keys, values):
+            *parents, leaf = key.split('.')
+            target = config
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[leaf] = value
+        configs.append(config)
+    return configs
+
+
+@lru_cache(maxsize=1)
+def get_code_version() -> str:
+    """计算源代码的版本号，即 src 目录下所有 .py 文件内容的哈希值
+    """
+    src_dir_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha1()
+    for dir_path, dir_names, file_names in os.walk(src_dir_path):
+        dir_names[:] = sorted(name for name in dir_names if name != '__pycache__' and not name.startswith('.'))
+        for file_name in sorted(file_names):
+            if file_name.endswith('.py'):
+                path = os.path.join(dir_path, file_name)
+                digest.update(os.path.relpath(path, src_dir_path).replace(os.sep, '/').encode())
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+def get_config_key(config: Dict[str, Any], code_version: Optional[str] = None) -> str:
+    """计算实验结果的键，即实验配置和代码版本的哈希值
+    """
+    code_version = get_code_version() if code_version is None else code_version
+    text = json.dumps({'config': config, 'code_version': code_version}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def build_termination_conditions(termination: Dict[str, Any]) -> List[TerminationCondition.Ordinary]:
+    conditions = []
+    for name, value in termination.items():
+        if name not in TERMINATION_CONDITIONS:
+            raise ValueError(f'不支持的终止条件 `{name}`')
+        if value is None or value is False:
+            continue
+        condition_type = TERMINATION_CONDITIONS[name]
+        conditions.append(condition_type() if value is True else condition_type(value))
+    return conditions
+
+
+def build_protocol(protocol: Any):
+    if isinstance(protocol, str):
+        return get_protocol(protocol)
+    if isinstance(protocol, dict) and 'name' in protocol:
+        kwargs = dict(protocol)
+        return get_protocol(kwargs.pop('name'), **kwargs)
+    raise ValueError(f'无法识别的协议配置 `{protocol}`')
+
+
+def build_traffic(traffic: Dict[str, Any], node_num: int, seed: int) -> WsnTrafficGenerator:
+    """根据合成流量的配置创建流量发生器
+    :param traffic: sources 是消息源的节点下标列表，或者随机选取的消息源个数；
+                    arrival 是到达过程的配置 {"name": 注册名, 其它键为到达过程的参数}；
+                    teammate_rate 是每条消息需要收到回应的节点占总节点数的比例
+    """
+    sources = traffic['sources']
+    if isinstance(sources, int):
+        sources = numpy.random.RandomState(seed).choice(node_num, sources, replace=False).tolist()
+    arrival = dict(traffic['arrival'])
+    return WsnTrafficGenerator(
+        sources, get_arrival(arrival.pop('name'), **arrival),
+        teammate_num=int(node_num * traffic.get('teammate_rate', DEFAULT_CONFIG['source']['teammate_rate']))
+    )
+
+
+def run_experiment(config: Dict[str, Any]) -> Dict[str, Any]:
+    """按配置运行一次实验（无界面）
+    :param config: 实验配置，缺省的项取 DEFAULT_CONFIG 中的值
+    :return: 实验结果摘要
+    """
+    config = merge_config(DEFAULT_CONFIG, config)
+    protocol = build_protocol(config['protocol'])
+    mode = EnumScheduleMode(config['mode'])
+    conditions = build_termination_conditions(config['termination'])
+
+    wsn = generate_rand_nodes(wsn=Wsn(), **config['topology'], rand_seed=config['seed'])
+    wsn.medium.slotted = config['medium']['slotted']
+    wsn.set_protocol(protocol)
+    nodes = wsn.node_manager.nodes
+    if config['retransmission'] is not None:
+        for node in nodes:
+            node.retransmitter = WsnRetransmitter(RetransmissionPolicy(**config['retransmission']))
+
+    source = nodes[0]
+    traffic = None
+    if config['traffic'] is not None:
+        traffic = build_traffic(config['traffic'], len(nodes), config['seed'])
+    else:
+        source.teammate_num = len(nodes) * config['source']['teammate_rate']
+        source.send_queue.append(config['source']['message'])
+
+    delivery_tracer = DeliveryTracer(save=False) if config['delivery_tracing'] else None
+
+    start_time = time.time()
+    ran = Scheduler.schedule(
+        Bystander(wsn, headless=True), mode, conditions, rand_seed=config['seed'], tiles=tuple(config['tiles']),
+        traffic=traffic, delivery_tracer=delivery_tracer
+    )
+    running_time = time.time() - start_time
+
+    energy_ledger = wsn.energy_ledger
+    summary = {
+        # 终止条件中的目标都无法达成，没有运行，其余各项都是初始状态
+        'skipped': not ran,
+        'num_of_cycles': energy_ledger.cycle,
+        'running_time': running_time,
+        'received_rate': sum(1 for node in nodes if node.recv_count) / len(nodes),
+        'survival_rate': sum(1 for node in nodes if node.is_alive) / len(nodes),
+        'replied_num': len(source.replied_nodes),
+        'power_usage': float(energy_ledger.consumption().sum()),
+        'spread_count': wsn.medium.spread_count,
+        'energy_gini': energy_ledger.gini(),
+    }
+    if traffic is not None:
+        summary.update({f'traffic_{key}': value for key, value in traffic.report().items()})
+    if delivery_tracer is not None:
+        for name, histogram in (('latency', delivery_tracer.latency), ('hops', delivery_tracer.hops)):
+            summary.update({
+                f'{name}_mean': histogram.mean, f'{name}_p50': histogram.quantile(.5),
+                f'{name}_p95': histogram.quantile(.95), f'{name}_p99': histogram.quantile(.99), f'{name}_max': histogram.max,
+            })
+        for level, histogram in delivery_tracer.coverage_latency.items():
+            summary[f'coverage_{level * 100:g}_p50'] = histogram.quantile(.5)
+    return summary
+
+
+def get_pool_context(method: Optional[str] = None) -> multiprocessing.context.BaseContext:
+    """获取运行实验的进程池所用的上下文
+    默认在支持 forkserver 的平台上使用 forkserver ，并让服务进程预先导入本模块，
+    之后的工作进程都从服务进程 fork 出来，不需要重新导入 numpy 等依赖，启动只需几毫秒，
+    也不会继承父进程中的线程和锁；其它平台使用默认的启动方式
+    :param method: 指定进程的启动方式，为 None 时自动选择
+    """
+    if method is None:
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else None
+    context = multiprocessing.get_context(method)
+    if method == 'forkserver':
+        context.set_forkserver_preload([__name__])
+    return context
+
+
+def _run_point(config: Dict[str, Any]) -> Dict[str, Any]:
+    return run_experiment(config)
+
+
+def run_sweep(
+        configs: List[Dict[str, Any]], store: Optional[ResultStore] = None, workers: int = 1
+) -> List[Dict[str, Any]]:
+    """运行一组实验，已经有结果的配置直接从结果仓库读取，只计算缺失的点
+    每个点算完后立即保存，中途崩溃或扩大参数网格后重新运行不会重复计算；
+    目标无法达成而没有运行的点（summary 中 skipped 为 True ）不保存，下次仍会重新判断
+    :param configs: 实验配置列表
+    :param store: 结果仓库
+    :param workers: 并行运行实验的进程数
+    :return: 与 configs 一一对应的结果记录，包含 config 、 code_version 和 summary
+    """
+    store = ResultStore() if store is None else store
+    code_version = get_code_version()
+    configs = [merge_config(DEFAULT_CONFIG, config) for config in configs]
+    keys = [get_config_key(config, code_version) for config in configs]
+
+    records: Dict[str, Dict[str, Any]] = {}
+    missing: Dict[str, Dict[str, Any]] = {}
+    for key, config in zip(keys, configs):
+        record = store.get(key)
+        if record is not None:
+            records[key] = record
+        else:
+            missing[key] = config
+    logger.info(f'共 {len(configs)} 个实验点，{len(configs) - len(missing)} 个已有结果，{len(missing)} 个需要计算')
+
+    def save(key: str, summary: Dict[str, Any]) -> None:
+        records[key] = {'config': missing[key], 'code_version': code_version, 'summary': summary}
+        if summary.get('skipped'):
+            logger.warning(f'实验点 {key} 的目标无法达成，没有运行，不保存结果，已完成 {len(records)}/{len(configs)}')
+            return
+        store.put(key, records[key])
+        logger.info(f'实验点 {key} 计算完成，已完成 {len(records)}/{len(configs)}')
+
+    if workers > 1 and len(missing) > 1:
+        with get_pool_context().Pool(min(workers, len(missing))) as pool:
+            for key, summary in zip(missing.keys(), pool.imap(_run_point, missing.values())):
+                save(key, summary)
+    else:
+        for key, config in missing.items():
+            save(key, run_experiment(config))
+
+    return [records[key] for key in keys]
@@ -0,0 +1,48 @@
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+
+class ResultStore(object):
+    """实验结果仓库
+    以内容寻址的方式保存每次实验的结果，键是实验配置和代码版本的哈希值，每个结果保存为一个 json 文件
+    """
+    # 日志配置
+    logger: logging.Logger = logging.getLogger('experiment.store')
+
+    dir_path: str
+
+    def __init__(self, dir_path: Optional[str] = None):
+        """
+        :param dir_path: 保存结果的目录，默认为工作路径下的 ./results/ 目录
+        """
+        self.dir_path = os.path.abspath('./results') if dir_path is None else dir_path
+        if not os.path.exists(self.dir_path):
+            os.makedirs(self.dir_path)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.dir_path, f'{key}.json')
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取一个结果，不存在或已损坏则返回 None
+        """
+        try:
+            with open(self.path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            self.logger.warning(f'实验结果 {self.path(key)} 已损坏，将重新计算')
+            return None
+
+    def put(self, key: str, record: Dict[str, Any]) -> None:
+        """保存一个结果，先写临时文件再替换，中途崩溃不会留下写了一半的结果
+        """
+        tmp_path = f'{self.path(key)}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path(key))
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
@@ -1,7 +1,8 @@
+import argparse
 import logging
 import threading
 
-from utils import init_root_logger, Scheduler, EnumScheduleMode, TerminationCondition
+from utils import init_root_logger, DeliveryTracer, EventTrace, MetricsRecorder, Scheduler, EnumScheduleMode, TerminationCondition
 from bystander import Bystander
 from wsn import Wsn
 from wsn.utils import generate_rand_nodes
@@ -12,7 +13,11 @@ init_root_logger()
 logger: logging.Logger = logging.getLogger('main')
 
 
-def main(multithreading: bool = True):
+def main(multithreading: bool = True, diagnostics: bool = False):
+    """
+    :param multithreading: 是否以多线程模式运行
+    :param diagnostics: 是否记录网络指标、事件轨迹和送达时延，它们的开销与运行时长和事件数成正比，默认关闭
+    """
     node_num = 300
 
     logger.info('正在生成无线传感网络...')
@@ -29,6 +34,12 @@ def main(multithreading: bool = True):
     wsn.node_manager.nodes[0].teammate_num = node_num * 0.95
     wsn.node_manager.nodes[0].send_queue.append('Hello World!')
 
+    recorders = dict(
+        metrics_recorder=MetricsRecorder(interval=10),
+        event_trace=EventTrace(max_records=1 << 22),
+        delivery_tracer=DeliveryTracer()
+    ) if diagnostics else {}
+
     if multithreading:
         Scheduler.schedule(
             bystander, EnumScheduleMode.MULTI_THREAD,
@@ -37,7 +48,8 @@ def main(multithreading: bool = True):
                 TerminationCondition.NodeDriven(),
                 TerminationCondition.RunningTime(300),
                 TerminationCondition.SurvivalRate(0.6),
-            ]
+            ],
+            **recorders
         )
     else:
         Scheduler.schedule(
@@ -47,17 +59,19 @@ def main(multithreading: bool = True):
                 TerminationCondition.NodeDriven(),
                 TerminationCondition.NumOfCycles(300),
                 TerminationCondition.SurvivalRate(0.6),
-            ]
+            ],
+            **recorders
         )
 
     logger.info('正在进行电量统计..')
-    power_usage = 0
-    for node in wsn.node_manager.nodes:
-        power_usage += (node.total_power - node.power)
-    logger.warning(f'本次传输总耗电量 {power_usage} 点')
+    logger.warning(f'本次传输总耗电量 {wsn.energy_ledger.consumption().sum()} 点')
+    logger.info(wsn.energy_ledger.summary(survival_rate=0.6))
     logger.info('主线程结束...')
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 main.py')
+    parser.add_argument('-d', '--diagnostics', action='store_true', help='记录网络指标、事件轨迹和送达时延')
+    args = parser.parse_args()
     threading.main_thread().setName('main')
-    main(False)
+    main(False, args.diagnostics)
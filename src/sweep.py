@@ -0,0 +1,42 @@
+import argparse
+import json
+import logging
+import threading
+
+from utils import init_root_logger
+from experiment import ResultStore, expand_grid, run_sweep
+
+
+# 初始化日志配置
+init_root_logger()
+logger: logging.Logger = logging.getLogger('sweep')
+
+
+def main():
+    """参数扫描
+    读取一个 json 格式的扫描配置，形如
+    {
+        "base": {"protocol": "action2", "topology": {"node_num": 300}},
+        "grid": {"topology.node_num": [100, 200, 300], "seed": [1, 2, 3]}
+    }
+    对网格中的每个点运行一次实验，已经算过的点直接从结果仓库读取
+    """
+    parser = argparse.ArgumentParser(description='无线传感网络参数扫描')
+    parser.add_argument('config', help='扫描配置文件路径')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='并行运行实验的进程数')
+    parser.add_argument('-r', '--results', default=None, help='结果仓库目录，默认为 ./results/')
+    args = parser.parse_args()
+
+    with open(args.config, encoding='utf-8') as f:
+        sweep_config = json.load(f)
+
+    configs = expand_grid(sweep_config.get('base', {}), sweep_config.get('grid', {}))
+    records = run_sweep(configs, ResultStore(args.results), workers=args.workers)
+
+    for record in records:
+        logger.warning(f'{json.dumps(record["config"], sort_keys=True)} => {json.dumps(record["summary"])}')
+
+
+if __name__ == '__main__':
+    threading.main_thread().setName('main')
+    main()
@@ -1,10 +1,18 @@
 from .log import init_root_logger, get_log_file_dir_path, launch_time
 from .event import node_want_to_terminate
+from .metrics import MetricsRecorder, load_metrics
+from .latency import DeliveryTracer, StreamingHistogram
+from .trace import EnumTraceEvent, EventTrace, iter_trace, iter_trace_records, load_topology, open_trace
+from .shard import ShardCoordinator, WsnTiling
 from .scheduler import EnumScheduleMode, Scheduler, TerminationCondition
 
 
 __all__ = [
     'init_root_logger', 'get_log_file_dir_path', 'launch_time',
     'node_want_to_terminate',
+    'MetricsRecorder', 'load_metrics',
+    'DeliveryTracer', 'StreamingHistogram',
+    'EnumTraceEvent', 'EventTrace', 'iter_trace', 'iter_trace_records', 'load_topology', 'open_trace',
+    'ShardCoordinator', 'WsnTiling',
     'EnumScheduleMode', 'Scheduler', 'TerminationCondition'
 ]
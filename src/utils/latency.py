@@ -0,0 +1,309 @@
+import json
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
+
+import numpy
+
+from .log import get_log_file_dir_path
+
+
+# 日志配置
+logger: logging.Logger = logging.getLogger('latency')
+
+
+class StreamingHistogram(object):
+    """固定内存的非负整数直方图，对数线性分桶（与 HdrHistogram 相同的思路）
+    小于 2 ** precision 的值各占一个桶；更大的值按二进制位数分段，每段均分成 2 ** (precision - 1) 个桶，
+    所以任何分位数的相对误差都不超过 2 ** -(precision - 1) ；大于 2 ** max_bits 的值计入最后一个桶
+    加入一个值只需要算出桶的下标再加一，桶数只与 precision 和 max_bits 有关
+    """
+
+    precision: int
+    max_bits: int
+    counts: numpy.ndarray
+    count: int
+    total: float
+    min: Optional[int]
+    max: Optional[int]
+
+    def __init__(self, precision: int = 5, max_bits: int = 32):
+        """
+        :param precision: 精确计数的位数
+        :param max_bits: 能够区分的最大值的位数
+        """
+        if precision < 1:
+            raise ValueError('精度不能小于 1')
+        if max_bits < precision:
+            raise ValueError('最大值的位数不能小于精度')
+        self.precision = precision
+        self.max_bits = max_bits
+        self.counts = numpy.zeros((1 << precision) + (max_bits - precision) * (1 << (precision - 1)), dtype=numpy.int64)
+        self.count = 0
+        self.total = 0.
+        self.min = None
+        self.max = None
+
+    def bucket(self, value: int) -> int:
+        """值所在的桶的下标
+        """
+        precision = self.precision
+        if value < (1 << precision):
+            return value
+        shift = min(value.bit_length(), self.max_bits) - precision
+        top = min(value >> shift, (1 << precision) - 1)
+        return (1 << precision) + (shift - 1) * (1 << (precision - 1)) + top - (1 << (precision - 1))
+
+    def bucket_range(self, index: int) -> (int, int):
+        """桶能够表示的值的范围
+        :return: (下界, 上界) ，都包含在内
+        """
+        precision = self.precision
+        if index < (1 << precision):
+            return index, index
+        shift, offset = divmod(index - (1 << precision), 1 << (precision - 1))
+        shift += 1
+        top = offset + (1 << (precision - 1))
+        return top << shift, ((top + 1) << shift) - 1
+
+    def add(self, value: int, count: int = 1) -> None:
+        """加入 count 个相同的值
+        """
+        if value < 0:
+            raise ValueError('直方图只接受非负整数')
+        self.counts[self.bucket(value)] += count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: 'StreamingHistogram') -> None:
+        """把另一个分桶方式相同的直方图合并进来
+        """
+        if (other.precision, other.max_bits) != (self.precision, self.max_bits):
+            raise ValueError('只能合并分桶方式相同的直方图')
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """第 q 分位数，取所在桶的中点，并限制在实际的最小值和最大值之间
+        :param q: 0 ~ 1 之间的比例
+        :return: 没有数据时返回 None
+        """
+        if not 0 <= q <= 1:
+            raise ValueError('分位数必须在 0 和 1 之间')
+        if self.count == 0:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        index = int(numpy.searchsorted(numpy.cumsum(self.counts), rank))
+        lower, upper = self.bucket_range(index)
+        return min(max((lower + upper) / 2, self.min), self.max)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def summary(self, quantiles: Sequence[float] = (0.5, 0.9, 0.95, 0.99)) -> Dict[str, Any]:
+        """统计摘要和非空的桶
+        :return: count 、mean 、min 、max 、p50 等分位数，以及 buckets: [[下界, 上界, 计数], ...]
+        """
+        summary: Dict[str, Any] = {'count': self.count, 'mean': self.mean, 'min': self.min, 'max': self.max}
+        for q in quantiles:
+            summary[f'p{q * 100:g}'] = self.quantile(q)
+        summary['buckets'] = [
+            [*self.bucket_range(index), int(self.counts[index])] for index in numpy.flatnonzero(self.counts).tolist()
+        ]
+        return summary
+
+
+class DeliveryTracer(object):
+    """逐条消息的送达时延和跳数追踪
+    由调度器挂到 Wsn.delivery_tracer 上：介质第一次发送一条消息时记下它的起始循环（NormalMessage.origin_tick），
+    之后每次投递时只记录每个节点第一次收到这条消息的时刻，把时延（循环数）和跳数（经手人数）计入直方图，
+    同时记录每条消息送达 coverage_levels 比例的节点所用的循环数；回应消息不追踪
+    时隙模式下本循环发出的消息下一个循环才会被处理，时延按下一个循环计；多线程模式下循环数是调度器的检查次数
+    每条消息的送达情况占 N 字节，送达情况和每条消息的记录都只保留最近 max_messages 条消息，
+    更早的消息之后再送达的副本被忽略：不在追踪中的消息，起始循环不晚于被挤出去的消息时视为已被挤出去
+    （起始循环更早、却在被挤出去的消息之后才第一次送达的消息因此不会被追踪）
+    不逐条处理消息的批量实现通过 arrive_batch() 直接给出接收者和各自的跳数
+    """
+    # 日志配置
+    logger: logging.Logger = logger
+
+    path: Optional[str]
+    coverage_levels: Sequence[float]
+    max_messages: int
+    # 当前的循环次数，由调度器更新
+    cycle: int
+    # 除消息源以外的节点数，即送达比例的分母
+    node_num: int
+    # node_id -> 节点在 node_manager.nodes 中的下标
+    node_index: Dict[int, int]
+    # 时延（循环数）直方图
+    latency: StreamingHistogram
+    # 跳数直方图
+    hops: StreamingHistogram
+    # 送达比例 -> 每条消息达到这个比例所用的循环数的直方图
+    coverage_latency: Dict[float, StreamingHistogram]
+    # uuid -> 每个节点（按下标）是否已经收到
+    arrived: 'OrderedDict[str, numpy.ndarray]'
+    # uuid -> 这条消息的记录，与 arrived 一起挤出
+    records: 'OrderedDict[str, Dict[str, Any]]'
+    # 追踪过的消息数，包括已经被挤出去的
+    num_of_messages: int
+    # 被挤出去的消息中最晚的起始循环，还没有消息被挤出去时为 None
+    evicted_origin: Optional[int]
+
+    def __init__(
+            self, path: Optional[str] = None, coverage_levels: Sequence[float] = (0.5, 0.9, 0.95),
+            max_messages: int = 1024, save: bool = True
+    ):
+        """
+        :param path: 结果文件路径，默认为本次运行日志目录下的 latency.json
+        :param coverage_levels: 需要记录送达时间的送达比例
+        :param max_messages: 最多同时追踪的消息数
+        :param save: 结束时是否把结果写入文件
+        """
+        if max_messages < 1:
+            raise ValueError('追踪的消息数不能小于 1')
+        if any(not 0 < level <= 1 for level in coverage_levels):
+            raise ValueError('送达比例必须在 (0, 1] 之间')
+        self.path = (os.path.join(get_log_file_dir_path(), 'latency.json') if path is None else path) if save else None
+        self.coverage_levels = tuple(sorted(coverage_levels))
+        self.max_messages = max_messages
+        self.cycle = 0
+        self.node_num = 0
+        self.node_index = {}
+        self.latency = StreamingHistogram()
+        self.hops = StreamingHistogram()
+        self.coverage_latency = {level: StreamingHistogram() for level in self.coverage_levels}
+        self.arrived = OrderedDict()
+        self.records = OrderedDict()
+        self.num_of_messages = 0
+        self.evicted_origin = None
+        self.lock = threading.Lock()
+
+    def bind(self, wsn) -> None:
+        """开始追踪一个网络，由调度器在开始运行时调用
+        """
+        self.node_num = max(len(wsn.node_manager.nodes) - 1, 1)
+        self.node_index = wsn.node_manager.node_index
+
+    def stamp(self, message) -> None:
+        """介质发送消息时调用，第一次发送时记下起始循环
+        """
+        if getattr(message, 'origin_tick', 0) is None and not getattr(message, 'is_reply', False):
+            message.origin_tick = self.cycle
+
+    def arrive(self, receivers: numpy.ndarray, message, cycle: Optional[int] = None) -> None:
+        """介质把一条消息投递给一组节点时调用
+        :param receivers: 接收者在 node_manager.nodes 中的下标，不重复
+        :param message: 投递的消息
+        :param cycle: 送达的循环，为 None 时取当前循环
+        """
+        origin = getattr(message, 'origin_tick', None)
+        if origin is None or getattr(message, 'is_reply', False):
+            return
+        self.arrive_batch(message.uuid, message.source, origin, receivers, len(message.handlers), cycle)
+
+    def arrive_batch(
+            self, uuid: str, source: int, origin: int, receivers: numpy.ndarray, hops, cycle: Optional[int] = None
+    ) -> None:
+        """一条消息送达一组节点
+        :param uuid: 消息的 uuid
+        :param source: 消息源的 node_id
+        :param origin: 消息的起始循环
+        :param receivers: 接收者在 node_manager.nodes 中的下标，不重复
+        :param hops: 跳数，可以是所有接收者共同的跳数，也可以是与 receivers 一一对应的数组
+        :param cycle: 送达的循环，为 None 时取当前循环
+        """
+        cycle = self.cycle if cycle is None else cycle
+        with self.lock:
+            arrived = self.arrived.get(uuid)
+            if arrived is None:
+                if self.evicted_origin is not None and origin <= self.evicted_origin:
+                    # 已经被挤出去的消息
+                    return
+                arrived = self.arrived[uuid] = numpy.zeros(self.node_num + 1, dtype=bool)
+                # 消息源收到自己的消息不算送达
+                index = self.node_index.get(source)
+                if index is not None and index < len(arrived):
+                    arrived[index] = True
+                self.records[uuid] = {'source': source, 'origin': origin, 'received': 0, 'coverage': {}}
+                self.num_of_messages += 1
+                if len(self.arrived) > self.max_messages:
+                    self.arrived.popitem(last=False)
+                    _, record = self.records.popitem(last=False)
+                    self.evicted_origin = max(record['origin'], self.evicted_origin or 0)
+            receivers = numpy.asarray(receivers, dtype=numpy.int64)
+            in_range = receivers < len(arrived)
+            is_first = numpy.zeros(len(receivers), dtype=bool)
+            is_first[in_range] = ~arrived[receivers[in_range]]
+            first = receivers[is_first]
+            if len(first) == 0:
+                return
+            arrived[first] = True
+            record = self.records[uuid]
+            num_of_new = len(first)
+            self.latency.add(cycle - origin, num_of_new)
+            if numpy.ndim(hops):
+                for value, count in zip(*numpy.unique(numpy.asarray(hops)[is_first], return_counts=True)):
+                    self.hops.add(int(value), int(count))
+            else:
+                self.hops.add(hops, num_of_new)
+            record['received'] += num_of_new
+            for level in self.coverage_levels:
+                if str(level) not in record['coverage'] and record['received'] >= level * self.node_num:
+                    record['coverage'][str(level)] = cycle - origin
+                    self.coverage_latency[level].add(cycle - origin)
+
+    def summary(self) -> Dict[str, Any]:
+        """追踪结果
+        :return: messages 消息数，latency 和 hops 两个直方图的摘要，coverage 为每个送达比例的摘要，
+                 unreached 为每个送达比例下没有达到的消息数，records 为最近 max_messages 条消息的记录
+        """
+        return {
+            'messages': self.num_of_messages,
+            'node_num': self.node_num,
+            'latency': self.latency.summary(),
+            'hops': self.hops.summary(),
+            'coverage': {str(level): histogram.summary() for level, histogram in self.coverage_latency.items()},
+            'unreached': {
+                str(level): self.num_of_messages - histogram.count for level, histogram in self.coverage_latency.items()
+            },
+            'records': self.records,
+        }
+
+    def describe(self) -> str:
+        def fmt(value: Optional[float]) -> str:
+            return '-' if value is None else f'{value:g}'
+
+        lines = [
+            f'追踪了 {self.num_of_messages} 条消息的 {self.latency.count} 次首次送达',
+            f'时延（循环） p50={fmt(self.latency.quantile(.5))} p95={fmt(self.latency.quantile(.95))} '
+            f'p99={fmt(self.latency.quantile(.99))} max={fmt(self.latency.max)}',
+            f'跳数 p50={fmt(self.hops.quantile(.5))} p95={fmt(self.hops.quantile(.95))} '
+            f'p99={fmt(self.hops.quantile(.99))} max={fmt(self.hops.max)}',
+        ]
+        for level, histogram in self.coverage_latency.items():
+            lines.append(
+                f'送达 {level:.0%} 的节点 p50={fmt(histogram.quantile(.5))} 个循环，'
+                f'{self.num_of_messages - histogram.count} 条消息没有达到'
+            )
+        return '\n'.join(lines)
+
+    def close(self) -> None:
+        self.logger.info(self.describe())
+        if self.path is None:
+            return
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+        self.logger.info(f'送达时延和跳数已保存到 {self.path}')
@@ -1,7 +1,11 @@
+import gzip
 import logging
+import logging.handlers
 import os
 import sys
+import threading
 import time
+from typing import Optional
 
 
 # 记录第一次引入该模块时的系统时间，用于作为日志文件和路径名
@@ -18,8 +22,113 @@ def get_log_file_dir_path() -> str:
     return log_file_dir_path
 
 
-def init_root_logger() -> None:
+class GzipRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """边写边压缩、按大小滚动的日志文件处理器
+    日志以 gzip 流的形式写入，未压缩的内容超过 max_bytes 后滚动，
+    旧文件依次改名为 `<文件名>.1.gz` 、 `<文件名>.2.gz` …… ，最多保留 backup_count 个，更早的被删除
+    压缩流每隔 flush_interval 秒（或遇到 ERROR 及以上级别的日志时）同步刷新一次，间隔内没有新的日志时，
+    由一个一次性的定时器在间隔到期时补上刷新，程序崩溃时最多丢失最后一个间隔内的日志，
+    已写入的部分仍然可以用 zcat 等工具正常解压
+    """
+
+    compresslevel: int
+    flush_interval: float
+    # 当前文件已写入的未压缩字节数
+    written: int
+    last_flush_time: float
+    # 最近一条日志的级别
+    last_levelno: int
+    # 补上刷新的定时器，没有未刷新的日志时为 None
+    flush_timer: Optional[threading.Timer]
+
+    def __init__(
+            self, filename: str, max_bytes: int = 64 * 1024 * 1024, backup_count: int = 8,
+            compresslevel: int = 6, flush_interval: float = 1., encoding: str = 'utf-8'
+    ):
+        """
+        :param filename: 日志文件路径，应以 .gz 结尾
+        :param max_bytes: 每个文件的未压缩内容上限（字节），为 0 时不滚动
+        :param backup_count: 保留的旧文件个数
+        :param compresslevel: gzip 压缩级别，1 最快，9 最小
+        :param flush_interval: 同步刷新压缩流的间隔（秒）
+        :param encoding: 日志的编码
+        """
+        self.compresslevel = compresslevel
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.last_flush_time = time.time()
+        self.last_levelno = logging.NOTSET
+        self.flush_timer = None
+        super(GzipRotatingFileHandler, self).__init__(
+            filename, mode='a', maxBytes=max_bytes, backupCount=backup_count, encoding=encoding
+        )
+
+    def _open(self):
+        return gzip.open(self.baseFilename, 'at', compresslevel=self.compresslevel, encoding=self.encoding)
+
+    def rotation_filename(self, default_name: str) -> str:
+        # xxx.log.gz.1 -> xxx.log.1.gz
+        base, _, index = default_name.rpartition('.')
+        return f'{base[:-len(".gz")]}.{index}.gz' if base.endswith('.gz') else default_name
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        return 0 < self.maxBytes <= self.written
+
+    def doRollover(self) -> None:
+        super(GzipRotatingFileHandler, self).doRollover()
+        self.written = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.last_levelno = record.levelno
+        super(GzipRotatingFileHandler, self).emit(record)
+
+    def format(self, record: logging.LogRecord) -> str:
+        # 顺便统计未压缩的字节数
+        msg = super(GzipRotatingFileHandler, self).format(record)
+        self.written += len(msg.encode(self.encoding, errors='replace')) + len(self.terminator)
+        return msg
+
+    def flush(self) -> None:
+        # StreamHandler 每写一条日志都会调用 flush ，压缩流的同步刷新代价较高，这里按间隔进行
+        now = time.time()
+        if self.last_levelno < logging.ERROR and now - self.last_flush_time < self.flush_interval:
+            if self.flush_timer is None:
+                self.flush_timer = threading.Timer(self.last_flush_time + self.flush_interval - now, self.flush_due)
+                self.flush_timer.name = 'log-flush'
+                self.flush_timer.daemon = True
+                self.flush_timer.start()
+            return
+        self.last_flush_time = now
+        super(GzipRotatingFileHandler, self).flush()
+
+    def flush_due(self) -> None:
+        """定时器到期，刷新间隔内还没有刷新的日志
+        """
+        self.acquire()
+        try:
+            self.flush_timer = None
+            self.last_flush_time = time.time()
+            super(GzipRotatingFileHandler, self).flush()
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        # 关闭压缩流时会写出所有内容，之后不再需要定时器
+        super(GzipRotatingFileHandler, self).close()
+        self.acquire()
+        try:
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+        finally:
+            self.release()
+
+
+def init_root_logger(max_bytes: int = 64 * 1024 * 1024, backup_count: int = 8) -> None:
     """初始化根日志配置
+    日志文件以 gzip 压缩写入本次运行日志目录下的 `<启动时间>.log.gz` ，按大小滚动，见 GzipRotatingFileHandler
+    :param max_bytes: 每个日志文件的未压缩内容上限（字节）
+    :param backup_count: 保留的旧日志文件个数
     """
     # 日志根目录
     log_file_dir_path = get_log_file_dir_path()
@@ -28,7 +137,9 @@ def init_root_logger() -> None:
     datefmt = '%H:%M:%S'
     formatter = logging.Formatter(fmt, datefmt=datefmt)
 
-    file_handler = logging.FileHandler(f'{log_file_dir_path}/{launch_time}.log', encoding='utf-8')
+    file_handler = GzipRotatingFileHandler(
+        f'{log_file_dir_path}/{launch_time}.log.gz', max_bytes=max_bytes, backup_count=backup_count
+    )
     file_handler.setFormatter(formatter)
 
     console_handler = logging.StreamHandler(sys.stdout)
@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import time
+from itertools import compress, repeat
+from operator import attrgetter, is_not
+from typing import Dict, Optional
+
+import numpy
+
+from .log import get_log_file_dir_path
+
+
+# 日志配置
+logger: logging.Logger = logging.getLogger('metrics')
+
+
+def collect_node_stats(wsn, num_of_nodes: Optional[int] = None) -> Dict[str, float]:
+    """统计网络中节点的指标
+    积压在收件箱中的消息数取自传播介质的计数，累计耗电量取自能耗账本的数组，
+    其余逐个节点的属性由 map 和 operator.attrgetter 在 C 层面批量取出，不在 Python 中逐个节点循环
+    :param wsn: 需要统计的无线传感网络
+    :param num_of_nodes: 只统计 node_manager.nodes 中的前多少个节点（例如分片模式下本分片拥有的节点），默认统计全部节点，
+                         此时 in_flight 仍是全部节点的（分片模式下光晕节点的收件箱在每个循环结束时都会被清空）
+    :return: 收到过消息的节点数 received 、存活节点数 alive 、等待发送的消息数 queue_depth 、
+             已送达但还未被处理的消息数 in_flight 、各消息源收到的回应数之和 replied 和累计耗电量 energy
+    """
+    nodes = wsn.node_manager.nodes
+    if num_of_nodes is not None:
+        nodes = nodes[:num_of_nodes]
+    node_num = len(nodes)
+
+    recv_count = numpy.fromiter(map(attrgetter('recv_count'), nodes), dtype=numpy.int64, count=node_num)
+    sending = list(map(attrgetter('sending'), nodes))
+    # 消息源是正在发送自己产生的消息的节点，它们的 replied_nodes 是这条消息收到的回应
+    sources = compress(zip(nodes, sending), map(is_not, sending, repeat(None)))
+    # 单线程模式下的节点总是存活的，只有多线程模式下的节点需要查看线程或控制位
+    threaded = list(compress(nodes, map(attrgetter('multithreading'), nodes)))
+    return {
+        'received': int(numpy.count_nonzero(recv_count)),
+        'alive': node_num - len(threaded) + sum(map(attrgetter('is_alive'), threaded)),
+        'queue_depth': sum(map(len, map(attrgetter('send_queue'), nodes))) +
+        sum(map(len, map(attrgetter('reply_queue'), nodes))) + node_num - sending.count(None),
+        'in_flight': wsn.medium.in_flight,
+        'replied': sum(
+            len(node.replied_nodes) for node, message in sources
+            if not getattr(message, 'is_reply', True) and message.source == node.node_id
+        ),
+        'energy': float(wsn.energy_ledger.consumption()[:node_num].sum()),
+    }
+
+
+class MetricsRecorder(object):
+    """网络指标记录器
+    每 interval 个循环（多线程模式下是调度器的检查次数）采样一次全网指标，先缓存在预分配的数组中，
+    每攒满 chunk_size 行就按列追加写入文件，因此无论运行多久内存占用都是固定的
+
+    输出目录下每一列是一个 `<列名>.bin` 文件，内容是该列数据按 schema.json 中的 dtype 紧密排列的原始字节，
+    可以用 load_metrics() 以内存映射的方式读取
+    """
+
+    # 列名及其数据类型
+    COLUMNS: Dict[str, str] = {
+        # 循环次数（多线程模式下为检查次数）
+        'cycle': '<i8',
+        # 距开始记录的秒数
+        'time': '<f8',
+        # 收到过消息的节点比例
+        'coverage': '<f8',
+        # 各消息源正在发送的消息已经收到的回应数之和
+        'replied': '<i8',
+        # 存活节点数
+        'alive': '<i8',
+        # 等待发送的消息数（正在发送的、发送队列和回应队列中的）
+        'queue_depth': '<i8',
+        # 已送达但还未被节点处理的消息数
+        'in_flight': '<i8',
+        # 全网累计耗电量
+        'energy': '<f8',
+    }
+
+    dir_path: str
+    chunk_size: int
+    # 采样间隔（循环数），统计的开销与节点数成正比（见 collect_node_stats ），大网络上应适当调大
+    interval: int
+    buffers: Dict[str, numpy.ndarray]
+    # 缓冲区中尚未写入文件的行数
+    buffered: int
+    # 已经写入文件的行数
+    flushed: int
+    start_time: float
+
+    def __init__(self, dir_path: Optional[str] = None, chunk_size: int = 1024, interval: int = 1):
+        """
+        :param dir_path: 输出目录，默认为本次运行日志目录下的 metrics/ 目录
+        :param chunk_size: 每次写入文件的行数
+        :param interval: 采样间隔（循环数）
+        """
+        if chunk_size < 1:
+            raise ValueError('块大小不能小于 1')
+        if interval < 1:
+            raise ValueError('采样间隔不能小于 1')
+        self.dir_path = os.path.join(get_log_file_dir_path(), 'metrics') if dir_path is None else dir_path
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.buffers = {name: numpy.zeros(chunk_size, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        self.buffered = 0
+        self.flushed = 0
+        self.start_time = time.time()
+
+        if not os.path.exists(self.dir_path):
+            os.makedirs(self.dir_path)
+        # 清空旧文件
+        for name in self.COLUMNS:
+            open(self.column_path(name), 'wb').close()
+        self.write_schema()
+
+    def column_path(self, name: str) -> str:
+        return os.path.join(self.dir_path, f'{name}.bin')
+
+    def write_schema(self) -> None:
+        with open(os.path.join(self.dir_path, 'schema.json'), 'w', encoding='utf-8') as f:
+            json.dump(
+                {'columns': self.COLUMNS, 'rows': self.flushed, 'chunk_size': self.chunk_size, 'interval': self.interval},
+                f, indent=2
+            )
+
+    def due(self, cycle: int) -> bool:
+        """这个循环是否需要采样
+        """
+        return cycle % self.interval == 0
+
+    def sample(self, wsn, cycle: int) -> None:
+        """采样一次全网指标
+        :param wsn: 需要采样的无线传感网络
+        :param cycle: 当前循环次数，不是 interval 的整数倍时不采样
+        """
+        if not self.due(cycle):
+            return
+        node_num = wsn.node_manager.node_num
+        stats = collect_node_stats(wsn)
+        self.append(
+            cycle=cycle,
+            coverage=stats['received'] / node_num if node_num else 0.,
+            replied=stats['replied'],
+            alive=stats['alive'],
+            queue_depth=stats['queue_depth'],
+            in_flight=stats['in_flight'],
+            energy=stats['energy']
+        )
+
+    def append(self, **values: float) -> None:
+        """追加一行已经统计好的指标，例如分片模式下由协调者汇总的全网指标
+        :param values: 列名到值的映射，time 列缺省时取当前时间，其它缺省的列记为 0
+        """
+        row = self.buffered
+        values.setdefault('time', time.time() - self.start_time)
+        for name, buffer in self.buffers.items():
+            buffer[row] = values.get(name, 0)
+        self.buffered += 1
+
+        if self.buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """把缓冲区中的数据按列追加写入文件
+        """
+        if self.buffered == 0:
+            return
+        for name, buffer in self.buffers.items():
+            with open(self.column_path(name), 'ab') as f:
+                f.write(buffer[:self.buffered].tobytes())
+        self.flushed += self.buffered
+        self.buffered = 0
+        self.write_schema()
+
+    def close(self) -> None:
+        self.flush()
+        logger.info(f'共记录 {self.flushed} 行网络指标，已保存到 {self.dir_path}')
+
+
+def load_metrics(dir_path: str) -> Dict[str, numpy.ndarray]:
+    """以内存映射的方式读取 MetricsRecorder 输出的网络指标
+    :param dir_path: MetricsRecorder 的输出目录
+    :return: 列名到只读数组的映射
+    """
+    with open(os.path.join(dir_path, 'schema.json'), encoding='utf-8') as f:
+        schema = json.load(f)
+
+    metrics = {}
+    for name, dtype in schema['columns'].items():
+        if schema['rows'] == 0:
+            metrics[name] = numpy.zeros(0, dtype=dtype)
+        else:
+            metrics[name] = numpy.memmap(
+                os.path.join(dir_path, f'{name}.bin'), dtype=dtype, mode='r', shape=(schema['rows'], )
+            )
+    return metrics
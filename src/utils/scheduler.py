@@ -1,14 +1,21 @@
 import logging
+import math
 import threading
 import time
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
 
 import numpy
 
-from bystander import Bystander
-
 from .event import node_want_to_terminate
+from .latency import DeliveryTracer
+from .metrics import MetricsRecorder
+from .shard import ShardCoordinator
+from .trace import EnumTraceEvent, EventTrace
+
+if TYPE_CHECKING:
+    from bystander import Bystander
 
 
 # 日志配置
@@ -20,9 +27,16 @@ class EnumScheduleMode(Enum):
     SINGLE_THREAD: 单线程，只有一个主线程，调度器依次调度所有节点和旁观者执行。
                    使用严格轮换法，节点间的调度顺序在每一轮中都会重新随机决定。
     MULTI_THREAD:  多线程，一个节点一个子线程、旁观者一个线程，调度器在主线程做一些管理和控制
+    THREAD_POOL:   线程池，与多线程模式相同，但节点由固定数量的工作线程分片调度（见 wsn.pool ），
+                   线程数、启动和停止的耗时不再随节点数增长。终止条件与多线程模式相同
+    MULTI_PROCESS: 多进程（分片），按空间把网络划分成若干分片，每个分片由一个工作进程按单线程模式模拟，
+                   跨分片的消息在循环边界上交换，见 utils.shard 。终止条件与单线程模式相同，
+                   旁观者只在结束时画一次，不支持事件轨迹
     """
     SINGLE_THREAD = 'single_thread'
     MULTI_THREAD = 'multi_thread'
+    THREAD_POOL = 'thread_pool'
+    MULTI_PROCESS = 'multi_process'
 
 
 class TerminationCondition(object):
@@ -46,7 +60,7 @@ class TerminationCondition(object):
     class NumOfCycles(Ordinary):
         """循环次数
         循环调度指定的次数后，该条件满足
-        仅对 EnumScheduleMode.SINGLE_THREAD 模式有效
+        仅对 EnumScheduleMode.SINGLE_THREAD 和 EnumScheduleMode.MULTI_PROCESS 模式有效
         """
 
         num_of_cycles: int
@@ -102,6 +116,49 @@ class TerminationCondition(object):
                 raise ValueError('存活率只能在 [0, 1] 范围内取值')
             self.survival_rate = survival_rate
 
+    class Quiescent(Ordinary):
+        """静止
+        连续 num_of_cycles 个循环（多线程模式下是调度器的检查次数）全网没有节点发送或接收消息，该条件满足
+        节点只在处理收到的消息时改变路由状态，所以此时网络已经收敛，继续运行不会再有变化；
+        判断只比较通信介质的累计收发次数，不需要比较节点状态的快照
+        还有节点的重传计时器没有取消（指数退避的两次重传之间）、或者合成流量之后还会有消息到达时，网络只是暂时安静，不会触发
+        对 EnumScheduleMode.SINGLE_THREAD 、EnumScheduleMode.MULTI_THREAD 和 EnumScheduleMode.MULTI_PROCESS 模式有效
+        """
+
+        num_of_cycles: int
+
+        def __init__(self, num_of_cycles: int):
+            if num_of_cycles < 1:
+                raise ValueError('网络循环次数不能小于 1')
+            self.num_of_cycles = num_of_cycles
+
+    class ProjectedLifetime(Ordinary):
+        """寿命推算
+        能耗账本记录满 num_of_cycles 个循环后，每个循环按最近的耗电速率推算网络寿命：设置了 SurvivalRate 时推算存活率
+        低至其阈值的循环，否则推算第一个节点没电的循环；推算结果超出了剩余的预算，即在预算用完之前不会发生，
+        继续运行也不会改变寿命方面的结论，该条件满足，同时打印推算结果
+        剩余的预算是 horizon 减去已运行的循环数，horizon 为 None 时取 NumOfCycles 的阈值；两者都没有时，
+        只有全网不再耗电（推算的寿命为无穷大）才满足
+        适用于只关心网络寿命的实验，不必空跑到预算用完
+        多线程模式下以调度器的检查次数作为循环次数
+        对 EnumScheduleMode.SINGLE_THREAD 和 EnumScheduleMode.MULTI_THREAD 模式有效
+        """
+
+        num_of_cycles: int
+        horizon: Optional[int]
+
+        def __init__(self, num_of_cycles: int, horizon: Optional[int] = None):
+            """
+            :param num_of_cycles: 开始推算前至少记录的循环数，耗电速率取能耗账本缓冲区内的平均值
+            :param horizon: 预算的总循环数
+            """
+            if num_of_cycles < 1:
+                raise ValueError('网络循环次数不能小于 1')
+            if horizon is not None and horizon < 1:
+                raise ValueError('预算的循环次数不能小于 1')
+            self.num_of_cycles = num_of_cycles
+            self.horizon = horizon
+
     @staticmethod
     def extract(conditions: Optional[List[Ordinary]], mode: EnumScheduleMode) -> Dict[str, Any]:
         conditions_map = {
@@ -111,7 +168,9 @@ class TerminationCondition(object):
             'running_time': None,
             'node_driven': False,
             'received_rate': None,
-            'survival_rate': None
+            'survival_rate': None,
+            'projected_lifetime': None,
+            'quiescent': None
         }
         if conditions is not None:
             for condition in conditions:
@@ -167,27 +226,141 @@ class TerminationCondition(object):
                         )
                     conditions_map['survival_rate'] = condition.survival_rate
 
+                elif isinstance(condition, TerminationCondition.ProjectedLifetime):
+                    if mode == EnumScheduleMode.MULTI_PROCESS:
+                        logger.warning(f'{type(mode)} 模式下不能使用 {type(condition)} 条件，该条件被跳过')
+                        continue
+                    value = (condition.num_of_cycles, condition.horizon)
+                    if conditions_map['projected_lifetime'] is not None and conditions_map['projected_lifetime'] != value:
+                        raise ValueError(
+                            f'设置了两个值不同的 `{type(condition)}` ，值分别是 '
+                            f'{conditions_map["projected_lifetime"]} 和 {value}'
+                        )
+                    conditions_map['projected_lifetime'] = value
+
+                elif isinstance(condition, TerminationCondition.Quiescent):
+                    if conditions_map['quiescent'] is not None and \
+                            conditions_map['quiescent'] != condition.num_of_cycles:
+                        raise ValueError(
+                            f'设置了两个值不同的 `{type(condition)}` ，值分别是 '
+                            f'{conditions_map["quiescent"]} 和 {condition.num_of_cycles}'
+                        )
+                    conditions_map['quiescent'] = condition.num_of_cycles
+
                 else:
                     raise ValueError(f'不支持的终止条件 `{type(condition)}`')
 
         return conditions_map
 
+    @staticmethod
+    def lifetime_settled(energy_ledger, conditions_map: Dict[str, Any]) -> Tuple[bool, float, float]:
+        """按能耗账本推算寿命，判断 ProjectedLifetime 是否满足
+        :return: (是否满足, 推算的循环数, 剩余的预算)
+        """
+        warmup, horizon = conditions_map['projected_lifetime']
+        if energy_ledger.cycle < warmup:
+            return False, math.inf, math.inf
+        if conditions_map['survival_rate'] is not None:
+            projected = energy_ledger.projected_cycles_to_survival_rate(conditions_map['survival_rate'])
+        else:
+            projected = energy_ledger.projected_cycles_to_first_death()
+        horizon = conditions_map['num_of_cycles'] if horizon is None else horizon
+        remaining = math.inf if horizon is None else horizon - energy_ledger.cycle
+        return projected > remaining or math.isinf(projected), projected, remaining
+
+    @staticmethod
+    def check_reachability(wsn, conditions_map: Dict[str, Any]) -> bool:
+        """运行前分析网络的连通性，判断 NodeDriven 和 ReceivedRate 的目标是否还有可能达成
+        目标无法达成时给出警告；设置了的这类目标全都无法达成时，继续运行只会耗尽其它条件的预算，返回 False
+        :param wsn: 需要调度的无线传感网络
+        :param conditions_map: 整理后的终止条件
+        :return: 是否值得运行
+        """
+        if not conditions_map['node_driven'] and conditions_map['received_rate'] is None:
+            return True
+
+        # 在这里才导入 wsn ，避免 utils 和 wsn 之间的循环导入
+        from wsn.analysis import WsnConnectivity
+
+        nodes = wsn.node_manager.nodes
+        connectivity = WsnConnectivity.from_wsn(wsn)
+        logger.info(f'连通性分析：{connectivity.summary()}')
+
+        reachable = []
+        if conditions_map['node_driven']:
+            # 只有设置了 teammate_num 的消息源才会因为收齐回应而要求终止，没有这样的节点时无从判断
+            targets = [i for i in connectivity.sources.tolist() if nodes[i].teammate_num > 0]
+            if targets:
+                unreachable = [i for i in targets if nodes[i].teammate_num > connectivity.max_replies(i)]
+                for i in unreachable:
+                    logger.warning(
+                        f'node-{nodes[i].node_id} 需要 {nodes[i].teammate_num} 个节点回应，但最多只有 '
+                        f'{connectivity.max_replies(i)} 个节点能够回应，`{TerminationCondition.NodeDriven}` 无法达成'
+                    )
+                reachable.append(len(unreachable) < len(targets))
+            else:
+                reachable.append(True)
+
+        if conditions_map['received_rate'] is not None:
+            if connectivity.max_received_rate < conditions_map['received_rate']:
+                logger.warning(
+                    f'节点消息接收率最高只能达到 {connectivity.max_received_rate} ，低于阈值 '
+                    f'{conditions_map["received_rate"]} ，`{TerminationCondition.ReceivedRate}` 无法达成'
+                )
+                reachable.append(False)
+            else:
+                reachable.append(True)
+
+        return any(reachable)
+
+    @staticmethod
+    def has_pending_work(
+            wsn, traffic=None, num_of_cycles: int = 0, num_of_retransmitting: Optional[int] = None
+    ) -> bool:
+        """网络安静下来以后是否还有计划在将来发生的收发
+        节点的重传计时器在确认或者放弃时才会取消，还有计时器说明还会重传或者放弃（并接着发送下一条消息）；
+        合成流量之后还会有消息到达时，消息源也还会发送
+        :param wsn: 无线传感网络
+        :param traffic: 合成流量发生器
+        :param num_of_cycles: 已经完成的循环次数
+        :param num_of_retransmitting: 已经汇总好的还有重传计时器的节点数，为 None 时根据节点统计
+        """
+        if traffic is not None and traffic.has_future_arrivals(num_of_cycles):
+            return True
+        if num_of_retransmitting is not None:
+            return num_of_retransmitting > 0
+        # 没有重传管理器（None）和没有计时器的重传管理器都为假
+        return any(map(attrgetter('retransmitter'), wsn.node_manager.nodes))
+
     @staticmethod
     def check_termination_conditions(
-            bystander: Bystander,
+            bystander: 'Bystander',
             conditions_map: Dict[str, Any],
             mode: EnumScheduleMode,
             num_of_cycles: int = 0,
             running_time: float = 0,
-            node_driven: bool = False
+            node_driven: bool = False,
+            received_rate: Optional[float] = None,
+            survival_rate: Optional[float] = None,
+            num_of_idle_cycles: int = 0,
+            traffic=None,
+            num_of_retransmitting: Optional[int] = None
     ) -> bool:
+        """
+        :param num_of_idle_cycles: 连续没有收发消息的循环数（多线程模式下是检查次数）
+        :param received_rate: 已经汇总好的接收率，为 None 时根据节点统计
+        :param survival_rate: 已经汇总好的存活率，为 None 时根据节点统计
+        :param traffic: 合成流量发生器，之后还会有消息到达时网络不算静止
+        :param num_of_retransmitting: 已经汇总好的还有重传计时器的节点数，为 None 时根据节点统计
+        """
         nodes = bystander.wsn.node_manager.nodes
+        energy_ledger = bystander.wsn.energy_ledger
 
         if conditions_map['ordinary']:
             logger.info(f'凭白无故，触发终止条件 `{TerminationCondition.Ordinary}`')
             return True
 
-        elif mode == EnumScheduleMode.SINGLE_THREAD and conditions_map['num_of_cycles'] and \
+        elif mode != EnumScheduleMode.MULTI_THREAD and conditions_map['num_of_cycles'] and \
                 num_of_cycles >= conditions_map['num_of_cycles']:
             logger.info(f'循环调度了 {num_of_cycles} 次，超过阈值 {conditions_map["num_of_cycles"]} ，'
                         f'触发终止条件 `{TerminationCondition.NumOfCycles}`')
@@ -203,23 +376,40 @@ class TerminationCondition(object):
             logger.info(f'节点要求终止，触发终止条件 `{TerminationCondition.NodeDriven}`')
             return True
 
+        elif conditions_map['quiescent'] is not None and num_of_idle_cycles >= conditions_map['quiescent'] and \
+                not TerminationCondition.has_pending_work(bystander.wsn, traffic, num_of_cycles, num_of_retransmitting):
+            logger.info(f'连续 {num_of_idle_cycles} 个循环没有节点收发消息，'
+                        f'触发终止条件 `{TerminationCondition.Quiescent}`')
+            return True
+
+        elif conditions_map['projected_lifetime'] is not None and \
+                TerminationCondition.lifetime_settled(energy_ledger, conditions_map)[0]:
+            _, projected, remaining = TerminationCondition.lifetime_settled(energy_ledger, conditions_map)
+            logger.info(f'能耗账本已记录 {energy_ledger.cycle} 个循环，'
+                        f'{energy_ledger.summary(conditions_map["survival_rate"])} ，'
+                        f'推算 {projected:.1f} 个循环后才会发生，超出剩余的预算 {remaining} 个循环，'
+                        f'触发终止条件 `{TerminationCondition.ProjectedLifetime}`')
+            return True
+
         elif conditions_map['received_rate'] is not None:
-            received_count = 0
-            for node in nodes:
-                if node.recv_count:
-                    received_count += 1
-            received_rate = received_count / len(nodes)
+            if received_rate is None:
+                received_count = 0
+                for node in nodes:
+                    if node.recv_count:
+                        received_count += 1
+                received_rate = received_count / len(nodes)
             if received_rate >= conditions_map['received_rate']:
                 logger.info(f'节点消息接收率 {received_rate} ，高至阈值 {conditions_map["received_rate"]} ，'
                             f'触发终止条件 `{TerminationCondition.ReceivedRate}`')
                 return True
 
         elif conditions_map['survival_rate'] is not None:
-            alive_count = 0
-            for node in nodes:
-                if node.is_alive:
-                    alive_count += 1
-            survival_rate = alive_count / len(nodes)
+            if survival_rate is None:
+                alive_count = 0
+                for node in nodes:
+                    if node.is_alive:
+                        alive_count += 1
+                survival_rate = alive_count / len(nodes)
             if survival_rate <= conditions_map['survival_rate']:
                 logger.info(f'节点存活率 {survival_rate} ，低至阈值 {conditions_map["survival_rate"]} ，'
                             f'触发终止条件 `{TerminationCondition.SurvivalRate}`')
@@ -235,11 +425,18 @@ class Scheduler(object):
 
     @staticmethod
     def schedule(
-            bystander: Bystander,
+            bystander: 'Bystander',
             mode: EnumScheduleMode = EnumScheduleMode.SINGLE_THREAD,
             termination_conditions: Optional[List[TerminationCondition.Ordinary]] = None,
-            rand_seed: Optional[int] = None
-    ) -> None:
+            rand_seed: Optional[int] = None,
+            metrics_recorder: Optional[MetricsRecorder] = None,
+            event_trace: Optional[EventTrace] = None,
+            tiles: Tuple[int, int] = (2, 2),
+            check_reachability: bool = True,
+            traffic=None,
+            num_of_workers: Optional[int] = None,
+            delivery_tracer: Optional[DeliveryTracer] = None
+    ) -> bool:
         """开始调度
         开始调度网络运行，网络运行结束后返回
 
@@ -247,31 +444,97 @@ class Scheduler(object):
         :param mode: 调度模式
         :param termination_conditions: 终止条件
         :param rand_seed: 随机数种子（仅 EnumScheduleMode.SINGLE_THREAD 模式有效）
-        :return:
+        :param metrics_recorder: 网络指标记录器，每个循环（多线程模式下是每次检查）采样一次
+        :param event_trace: 事件轨迹，运行期间挂在 wsn.event_trace 上，记录节点的收发和死亡事件
+        :param tiles: x 和 y 方向上的分片数（仅 EnumScheduleMode.MULTI_PROCESS 模式有效）
+        :param check_reachability: 运行前是否检查 NodeDriven 和 ReceivedRate 的目标能否达成，都无法达成时不运行
+        :param traffic: 合成流量发生器（wsn.traffic.WsnTrafficGenerator），每个循环开始前注入消息（仅 EnumScheduleMode.SINGLE_THREAD 模式有效）
+        :param num_of_workers: 工作线程数，为 None 时取 CPU 核数（仅 EnumScheduleMode.THREAD_POOL 模式有效）
+        :param delivery_tracer: 送达时延追踪，运行期间挂在 wsn.delivery_tracer 上，记录每条消息的送达时延和跳数
+                                （对 EnumScheduleMode.MULTI_PROCESS 模式无效）
+        :return: 是否运行了网络，终止条件中的目标都无法达成、没有运行时为 False
         """
 
-        # 整理终止条件
-        conditions_map = TerminationCondition.extract(termination_conditions, mode)
+        # 整理终止条件，线程池模式的终止条件与多线程模式相同
+        conditions_map = TerminationCondition.extract(
+            termination_conditions, EnumScheduleMode.MULTI_THREAD if mode == EnumScheduleMode.THREAD_POOL else mode
+        )
+
+        # 目标不可能达成时提前退出；使用合成流量时消息在运行中才注入，运行前无从判断
+        if check_reachability and traffic is None and not TerminationCondition.check_reachability(bystander.wsn, conditions_map):
+            logger.warning('终止条件中的目标都无法达成，不再运行')
+            if metrics_recorder is not None:
+                metrics_recorder.close()
+            if event_trace is not None:
+                event_trace.close()
+            if delivery_tracer is not None:
+                delivery_tracer.close()
+            return False
+
+        if traffic is not None:
+            if mode != EnumScheduleMode.SINGLE_THREAD:
+                logger.warning(f'{mode} 模式下不支持合成流量，不会注入消息')
+            elif conditions_map['node_driven']:
+                logger.warning(f'使用合成流量时，第一条消息发送完毕就会触发终止条件 `{TerminationCondition.NodeDriven}`')
 
         # 单线程模式
         if mode == EnumScheduleMode.SINGLE_THREAD:
             # 设置随机数种子
             numpy.random.seed(int(time.time()) if rand_seed is None else rand_seed)
-            return Scheduler.schedule_in_single_thread_mode(bystander, conditions_map)
+            Scheduler.schedule_in_single_thread_mode(
+                bystander, conditions_map, metrics_recorder, event_trace, traffic, delivery_tracer
+            )
 
         # 多线程模式
         elif mode == EnumScheduleMode.MULTI_THREAD:
-            return Scheduler.schedule_in_multi_thread_mode(bystander, conditions_map)
+            Scheduler.schedule_in_multi_thread_mode(
+                bystander, conditions_map, metrics_recorder, event_trace, delivery_tracer=delivery_tracer
+            )
+
+        # 线程池模式
+        elif mode == EnumScheduleMode.THREAD_POOL:
+            # 在这里才导入 wsn ，避免 utils 和 wsn 之间的循环导入
+            from wsn.pool import WsnThreadPool
+
+            Scheduler.schedule_in_multi_thread_mode(
+                bystander, conditions_map, metrics_recorder, event_trace, WsnThreadPool(bystander.wsn, num_of_workers),
+                delivery_tracer
+            )
+
+        # 多进程（分片）模式
+        elif mode == EnumScheduleMode.MULTI_PROCESS:
+            if event_trace is not None:
+                logger.warning(f'{EnumScheduleMode.MULTI_PROCESS} 模式下不支持事件轨迹，不会记录事件')
+            if delivery_tracer is not None:
+                logger.warning(f'{EnumScheduleMode.MULTI_PROCESS} 模式下不支持送达时延追踪，不会记录时延')
+            Scheduler.schedule_in_multi_process_mode(
+                bystander, conditions_map, tiles, int(time.time()) if rand_seed is None else rand_seed, metrics_recorder
+            )
 
         # 其它诡异的模式
         else:
             raise ValueError(f'未知的调度模式 `{mode}`')
 
+        return True
+
     @staticmethod
-    def schedule_in_single_thread_mode(bystander: Bystander, conditions_map: Dict[str, Any]) -> None:
+    def schedule_in_single_thread_mode(
+            bystander: 'Bystander',
+            conditions_map: Dict[str, Any],
+            metrics_recorder: Optional[MetricsRecorder] = None,
+            event_trace: Optional[EventTrace] = None,
+            traffic=None,
+            delivery_tracer: Optional[DeliveryTracer] = None
+    ) -> None:
 
         wsn = bystander.wsn
         nodes = wsn.node_manager.nodes
+        wsn.event_trace = event_trace
+        if event_trace is not None:
+            event_trace.write_topology(wsn)
+        wsn.delivery_tracer = delivery_tracer
+        if delivery_tracer is not None:
+            delivery_tracer.bind(wsn)
 
         for node in nodes:
             node.multithreading = False
@@ -281,41 +544,121 @@ class Scheduler(object):
 
         # 初始化终止条件
         node_driven = False
+        user_driven = False
         num_of_cycles = 0
+        num_of_idle_cycles = 0
+        activity_count = wsn.medium.activity_count
+
+        # 协议支持批量调度时，每个循环一次推进全网
+        protocol = wsn.protocol
+        batch = protocol.supports_batch
+        if batch:
+            logger.info(f'路由协议 {protocol.name} 支持批量调度，每个循环一次推进全网')
+            if delivery_tracer is not None:
+                logger.warning('批量调度不经过通信介质逐条发送消息，不会记录送达时延')
+        else:
+            # 在这里才导入 wsn ，避免 utils 和 wsn 之间的循环导入
+            from wsn.worklist import WsnWorklist
+
+            # 每个循环只调度有事可做的节点
+            worklist = WsnWorklist(wsn)
 
         try:
             while True:
 
+                # 注入这个循环到达的消息
+                if traffic is not None:
+                    traffic.inject(wsn, num_of_cycles)
+
                 # 调度每个节点运行一次
-                for node in numpy.random.permutation(nodes):
-                    if node.action():
+                if batch:
+                    if protocol.step_all(wsn):
                         node_driven = True
+                else:
+                    if worklist.step():
+                        node_driven = True
+                # 时隙模式下，在循环结束时统一投递本循环发送的消息
+                wsn.medium.end_slot()
                 # 调度旁观者运行一次
                 bystander.action()
+                # 结算本轮能耗
+                wsn.energy_ledger.tick()
 
                 num_of_cycles += 1
+                if event_trace is not None:
+                    event_trace.cycle = num_of_cycles
+                if delivery_tracer is not None:
+                    delivery_tracer.cycle = num_of_cycles
+                if traffic is not None:
+                    traffic.update(wsn, num_of_cycles)
+                num_of_idle_cycles = num_of_idle_cycles + 1 if wsn.medium.activity_count == activity_count else 0
+                activity_count = wsn.medium.activity_count
+
+                if metrics_recorder is not None:
+                    metrics_recorder.sample(wsn, num_of_cycles)
 
                 if TerminationCondition.check_termination_conditions(
                     bystander=bystander,
                     conditions_map=conditions_map,
                     mode=EnumScheduleMode.SINGLE_THREAD,
                     num_of_cycles=num_of_cycles,
-                    node_driven=node_driven
+                    node_driven=node_driven,
+                    num_of_idle_cycles=num_of_idle_cycles,
+                    traffic=traffic
                 ):
                     break
 
         except KeyboardInterrupt as e:
             if conditions_map['user_driven']:
                 logger.info(f'用户通过按键引发中断，触发终止条件 `{TerminationCondition.UserDriven}`')
+                user_driven = True
             else:
                 raise e
 
+        if not batch:
+            worklist.close()
+
+        if traffic is not None:
+            logger.info(traffic.summary())
+
+        if metrics_recorder is not None:
+            metrics_recorder.close()
+
+        if event_trace is not None:
+            event_trace.record(EnumTraceEvent.TERMINATION, value=num_of_cycles, flags=int(user_driven))
+            event_trace.close()
+            wsn.event_trace = None
+
+        if delivery_tracer is not None:
+            delivery_tracer.close()
+            wsn.delivery_tracer = None
+
         # 关闭旁观者
         bystander.close()
 
     @staticmethod
-    def schedule_in_multi_thread_mode(bystander: Bystander, conditions_map: Dict[str, Any]) -> None:
+    def schedule_in_multi_thread_mode(
+            bystander: 'Bystander',
+            conditions_map: Dict[str, Any],
+            metrics_recorder: Optional[MetricsRecorder] = None,
+            event_trace: Optional[EventTrace] = None,
+            pool=None,
+            delivery_tracer: Optional[DeliveryTracer] = None
+    ) -> None:
+        """
+        :param pool: 调度节点的工作线程池（wsn.pool.WsnThreadPool），为 None 时一个节点一个线程
+        """
         wsn = bystander.wsn
+        wsn.event_trace = event_trace
+        if event_trace is not None:
+            event_trace.write_topology(wsn)
+        wsn.delivery_tracer = delivery_tracer
+        if delivery_tracer is not None:
+            delivery_tracer.bind(wsn)
+
+        if wsn.medium.slotted:
+            logger.warning(f'{EnumScheduleMode.MULTI_THREAD} 模式下没有统一的时隙，通信介质的时隙模式被关闭')
+            wsn.medium.slotted = False
 
         logger.info('正在启动旁观者..')
         if bystander.start():
@@ -326,7 +669,7 @@ class Scheduler(object):
             raise err
 
         logger.info('正在启动无线传感网..')
-        if wsn.start_all():
+        if wsn.start_all() if pool is None else pool.start():
             logger.info('无线传感网启动成功')
         else:
             err = RuntimeError('无线传感网启动，部分节点失败')
@@ -336,26 +679,47 @@ class Scheduler(object):
         # 初始化终止条件
         node_want_to_terminate.clear()
         start_time = time.time()
+        num_of_checks = 0
+        num_of_idle_checks = 0
+        activity_count = wsn.medium.activity_count
+        user_driven = False
 
         try:
             while True:
                 time.sleep(5)
+                wsn.energy_ledger.tick()
+
+                num_of_checks += 1
+                if event_trace is not None:
+                    event_trace.cycle = num_of_checks
+                if delivery_tracer is not None:
+                    delivery_tracer.cycle = num_of_checks
+                # 计数器由节点线程并发累加，可能少算，但只要有收发就一定会变化
+                num_of_idle_checks = num_of_idle_checks + 1 if wsn.medium.activity_count == activity_count else 0
+                activity_count = wsn.medium.activity_count
+                if metrics_recorder is not None:
+                    metrics_recorder.sample(wsn, num_of_checks)
 
                 if TerminationCondition.check_termination_conditions(
                     bystander=bystander,
                     conditions_map=conditions_map,
                     mode=EnumScheduleMode.MULTI_THREAD,
                     running_time=time.time() - start_time,
-                    node_driven=node_want_to_terminate.is_set()
+                    node_driven=node_want_to_terminate.is_set(),
+                    num_of_idle_cycles=num_of_idle_checks
                 ):
                     break
 
         except KeyboardInterrupt as e:
             if conditions_map['user_driven']:
                 logger.info(f'用户通过按键引发中断，触发终止条件 `{TerminationCondition.UserDriven}`')
+                user_driven = True
             else:
                 raise e
 
+        if metrics_recorder is not None:
+            metrics_recorder.close()
+
         logger.info('正在停止旁观者..')
         if bystander.stop():
             logger.info('旁观者停止成功')
@@ -363,7 +727,7 @@ class Scheduler(object):
             logger.error('旁观者停止失败')
 
         logger.info('正在停止无线传感网..')
-        if wsn.stop_all():
+        if wsn.stop_all() if pool is None else pool.stop():
             logger.info('无线传感网停止成功')
         else:
             logger.error('无线传感网停止，部分节点失败')
@@ -372,4 +736,97 @@ class Scheduler(object):
         for thread in threading.enumerate():
             if thread != threading.currentThread():
                 thread.join()
+
+        # 所有节点线程结束后才关闭事件轨迹
+        if event_trace is not None:
+            event_trace.record(EnumTraceEvent.TERMINATION, value=num_of_checks, flags=int(user_driven))
+            event_trace.close()
+            wsn.event_trace = None
+        if delivery_tracer is not None:
+            delivery_tracer.close()
+            wsn.delivery_tracer = None
+
         logger.info('调度器退出')
+
+    @staticmethod
+    def schedule_in_multi_process_mode(
+            bystander: 'Bystander',
+            conditions_map: Dict[str, Any],
+            tiles: Tuple[int, int],
+            rand_seed: int,
+            metrics_recorder: Optional[MetricsRecorder] = None
+    ) -> None:
+        wsn = bystander.wsn
+        node_num = wsn.node_manager.node_num
+
+        for node in wsn.node_manager.nodes:
+            node.multithreading = False
+
+        # 初始化旁观者
+        bystander.init()
+
+        coordinator = ShardCoordinator(wsn, tiles, rand_seed)
+        logger.info('正在启动分片..')
+        coordinator.start()
+
+        # 初始化终止条件
+        num_of_cycles = 0
+        num_of_idle_cycles = 0
+        spread_count = 0
+        delivery_count = 0
+
+        try:
+            while True:
+
+                # 所有分片并行推进一个循环
+                stats, node_driven = coordinator.step()
+                if int(stats['spread_count']) == spread_count and int(stats['delivery_count']) == delivery_count:
+                    num_of_idle_cycles += 1
+                else:
+                    num_of_idle_cycles = 0
+                spread_count = int(stats['spread_count'])
+                delivery_count = int(stats['delivery_count'])
+
+                num_of_cycles += 1
+
+                if metrics_recorder is not None and metrics_recorder.due(num_of_cycles):
+                    metrics_recorder.append(
+                        cycle=num_of_cycles,
+                        coverage=stats['received'] / node_num if node_num else 0.,
+                        replied=stats['replied'],
+                        alive=stats['alive'],
+                        queue_depth=stats['queue_depth'],
+                        in_flight=stats['in_flight'] + stats['cross_tile'],
+                        energy=stats['energy']
+                    )
+
+                if TerminationCondition.check_termination_conditions(
+                    bystander=bystander,
+                    conditions_map=conditions_map,
+                    mode=EnumScheduleMode.MULTI_PROCESS,
+                    num_of_cycles=num_of_cycles,
+                    node_driven=node_driven,
+                    received_rate=stats['received'] / node_num if node_num else 0.,
+                    survival_rate=stats['alive'] / node_num if node_num else 0.,
+                    num_of_idle_cycles=num_of_idle_cycles,
+                    num_of_retransmitting=int(stats['retransmitting'])
+                ):
+                    break
+
+        except KeyboardInterrupt as e:
+            if conditions_map['user_driven']:
+                logger.info(f'用户通过按键引发中断，触发终止条件 `{TerminationCondition.UserDriven}`')
+            else:
+                raise e
+
+        # 收回节点状态，之后旁观者和能耗账本看到的是运行结束时的网络
+        coordinator.close()
+        wsn.medium.spread_count = spread_count
+        wsn.medium.delivery_count = delivery_count
+
+        if metrics_recorder is not None:
+            metrics_recorder.close()
+
+        # 调度旁观者运行一次，画出最终的网络
+        bystander.action()
+        bystander.close()
@@ -0,0 +1,267 @@
+import logging
+import multiprocessing
+import pickle
+import signal
+from multiprocessing.connection import Connection
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy
+
+from .metrics import collect_node_stats
+
+
+# 日志配置
+logger: logging.Logger = logging.getLogger('shard')
+
+
+# 节点在协调进程和工作进程之间交接的状态，协议没有在节点上建立的属性跳过
+NODE_STATE_ATTRS = (
+    'power', 'total_power', 'send_queue', 'reply_queue', 'recv_count', 'replied_nodes', 'sending',
+    'sending_attempts', 'reply_attempts', 'teammate_num', 'route_len', 'replied_messages', 'tick', 'retransmitter',
+)
+
+
+def get_node_state(node) -> Dict[str, Any]:
+    return {name: getattr(node, name) for name in NODE_STATE_ATTRS if hasattr(node, name)}
+
+
+def set_node_state(node, state: Dict[str, Any]) -> None:
+    for name, value in state.items():
+        setattr(node, name, value)
+
+
+class WsnTiling(object):
+    """把部署区域划分成 tiles_x × tiles_y 个大小相同的矩形分片
+    每个节点属于其坐标所在的分片；一个分片的光晕（halo）是其它分片中与本分片矩形的距离小于最大通信半径的节点，
+    链路概率 p = 1 - d² / (r1 r2) 只有在 d < max(r) 时才可能大于 0 ，
+    所以分片内节点发出的消息只可能送达本分片或光晕中的节点
+    """
+
+    tiles: Tuple[int, int]
+    # 每个节点所属分片的编号
+    owner: numpy.ndarray
+    # 每个分片的矩形 (x_min, x_max, y_min, y_max)
+    bounds: List[Tuple[float, float, float, float]]
+    r_max: float
+
+    def __init__(self, xy: numpy.ndarray, r: numpy.ndarray, tiles: Tuple[int, int]):
+        """
+        :param xy: 节点坐标，形状为 (N, 2)
+        :param r: 节点通信半径
+        :param tiles: x 和 y 方向上的分片数
+        """
+        tiles_x, tiles_y = tiles
+        if tiles_x < 1 or tiles_y < 1:
+            raise ValueError('每个方向上的分片数都不能小于 1')
+        self.tiles = (tiles_x, tiles_y)
+        self.xy = numpy.asarray(xy, dtype=numpy.float64).reshape(-1, 2)
+        self.r_max = float(numpy.max(r, initial=0.))
+
+        x_min, y_min = self.xy.min(axis=0) if len(self.xy) else (0., 0.)
+        x_max, y_max = self.xy.max(axis=0) if len(self.xy) else (0., 0.)
+        # 坐标最大的节点归入最后一个分片
+        width_x = (x_max - x_min) / tiles_x or 1.
+        width_y = (y_max - y_min) / tiles_y or 1.
+        ix = numpy.minimum(((self.xy[:, 0] - x_min) / width_x).astype(numpy.int64), tiles_x - 1)
+        iy = numpy.minimum(((self.xy[:, 1] - y_min) / width_y).astype(numpy.int64), tiles_y - 1)
+        self.owner = iy * tiles_x + ix
+        self.bounds = [
+            (x_min + i * width_x, x_min + (i + 1) * width_x, y_min + j * width_y, y_min + (j + 1) * width_y)
+            for j in range(tiles_y) for i in range(tiles_x)
+        ]
+
+    @property
+    def num_of_tiles(self) -> int:
+        return self.tiles[0] * self.tiles[1]
+
+    def owned(self, tile: int) -> numpy.ndarray:
+        """分片拥有的节点下标
+        """
+        return numpy.flatnonzero(self.owner == tile)
+
+    def halo(self, tile: int) -> numpy.ndarray:
+        """分片光晕中的节点下标
+        """
+        x_min, x_max, y_min, y_max = self.bounds[tile]
+        dx = numpy.maximum(numpy.maximum(x_min - self.xy[:, 0], self.xy[:, 0] - x_max), 0)
+        dy = numpy.maximum(numpy.maximum(y_min - self.xy[:, 1], self.xy[:, 1] - y_max), 0)
+        return numpy.flatnonzero((self.owner != tile) & (dx ** 2 + dy ** 2 < self.r_max ** 2))
+
+
+def shard_worker_main(
+        conn: Connection, tile: int, specs: List[Tuple[int, float, float, float, float, Dict[str, Any]]],
+        num_of_owned: int, ghost_owner: Dict[int, int], protocol: Optional[bytes], rand_seed: int
+) -> None:
+    """工作进程的主函数
+    在进程内建立只包含本分片节点和光晕节点的网络，光晕节点只接收、不活动，
+    每个循环结束时把送达光晕节点的消息取出，交给协调进程转发给其所属的分片
+    :param conn: 与协调进程通信的管道
+    :param tile: 分片编号
+    :param specs: 节点的 (node_id, x, y, r, pc_per_send, 状态) ，前 num_of_owned 个是本分片拥有的节点
+    :param num_of_owned: 本分片拥有的节点数
+    :param ghost_owner: 光晕节点的 node_id -> 其所属的分片
+    :param protocol: pickle 之后的路由协议，为 None 时使用默认的 action2
+    :param rand_seed: 随机数种子
+    """
+    # 在工作进程中才导入 wsn ，避免 utils 和 wsn 之间的循环导入
+    from wsn import Wsn, WsnWorklist
+
+    # 用户按 Ctrl + C 时由协调者决定如何终止，工作进程继续等待协调者的命令
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    numpy.random.seed(rand_seed)
+    wsn = Wsn()
+    # 本分片的消息在循环结束时统一投递，与跨分片的消息在同一时刻生效
+    wsn.medium.slotted = True
+    for node_id, x, y, r, pc_per_send, state in specs:
+        node = wsn.node_manager.add_node(x, y, r, state['total_power'], pc_per_send, node_id=node_id)
+        node.multithreading = False
+        set_node_state(node, state)
+    if protocol is not None:
+        wsn.set_protocol(pickle.loads(protocol))
+
+    nodes = wsn.node_manager.nodes
+    node_index = wsn.node_manager.node_index
+    owned, ghosts = nodes[:num_of_owned], nodes[num_of_owned:]
+    # 光晕节点只接收、不活动
+    worklist = WsnWorklist(wsn, num_of_schedulable=num_of_owned)
+    logger.info(f'分片 {tile} 启动，拥有 {len(owned)} 个节点，光晕中有 {len(ghosts)} 个节点')
+
+    while True:
+        command, payload = conn.recv()
+
+        if command == 'step':
+            # 投递其它分片在上个循环送达本分片节点的消息
+            for node_id, message in payload:
+                nodes[node_index[node_id]].recv_queue.append(message)
+            wsn.medium.wake(numpy.fromiter((node_index[node_id] for node_id, _ in payload), dtype=numpy.int64))
+
+            node_driven = worklist.step()
+            wsn.medium.end_slot()
+            wsn.energy_ledger.tick()
+
+            outbound: Dict[int, List[Tuple[int, Any]]] = {}
+            for ghost in ghosts:
+                if ghost.recv_queue:
+                    messages = outbound.setdefault(ghost_owner[ghost.node_id], [])
+                    while ghost.recv_queue:
+                        messages.append((ghost.node_id, ghost.recv_queue.popleft()))
+
+            stats = collect_node_stats(wsn, num_of_owned)
+            stats['spread_count'] = wsn.medium.spread_count
+            stats['delivery_count'] = wsn.medium.delivery_count
+            stats['retransmitting'] = sum(map(bool, map(attrgetter('retransmitter'), owned)))
+            conn.send((outbound, stats, node_driven))
+
+        elif command == 'collect':
+            consumption = wsn.energy_ledger.total[:num_of_owned].copy()
+            conn.send(([(node.node_id, get_node_state(node)) for node in owned], consumption))
+
+        elif command == 'close':
+            conn.close()
+            break
+
+
+class ShardCoordinator(object):
+    """分片模式的协调者
+    把网络按空间划分成多个分片，每个分片由一个工作进程模拟，协调者在每个循环的边界上
+    收集各分片送达光晕节点的消息并转发给其所属的分片，同时汇总全网的指标
+    """
+    # 日志配置
+    logger: logging.Logger = logger
+
+    tiling: WsnTiling
+    conns: List[Connection]
+    processes: List[multiprocessing.Process]
+    # 下个循环开始时要投递给各分片的消息
+    inbound: List[List[Tuple[int, Any]]]
+    num_of_cycles: int
+
+    def __init__(self, wsn, tiles: Tuple[int, int], rand_seed: int = 0):
+        """
+        :param wsn: 需要模拟的无线传感网络，节点的初始状态从这里读取，运行结束后写回
+        :param tiles: x 和 y 方向上的分片数
+        :param rand_seed: 随机数种子，第 i 个分片使用 rand_seed + i
+        """
+        self.wsn = wsn
+        self.rand_seed = rand_seed
+        nodes = wsn.node_manager.nodes
+        self.tiling = WsnTiling(
+            numpy.array([node.xy for node in nodes], dtype=numpy.float64),
+            numpy.array([node.r for node in nodes], dtype=numpy.float64),
+            tiles
+        )
+        self.conns = []
+        self.processes = []
+        self.inbound = [[] for _ in range(self.tiling.num_of_tiles)]
+        self.num_of_cycles = 0
+
+    def start(self) -> None:
+        """启动所有工作进程
+        """
+        nodes = self.wsn.node_manager.nodes
+        protocol = pickle.dumps(self.wsn.protocol) if self.wsn.protocol is not None else None
+        # 工作进程不继承父进程的日志处理器和线程
+        context = multiprocessing.get_context(
+            'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        )
+        for tile in range(self.tiling.num_of_tiles):
+            owned, halo = self.tiling.owned(tile), self.tiling.halo(tile)
+            specs = [
+                (node.node_id, node.x, node.y, node.r, node.pc_per_send, get_node_state(node))
+                for node in (nodes[i] for i in numpy.concatenate([owned, halo]).tolist())
+            ]
+            ghost_owner = {nodes[i].node_id: int(self.tiling.owner[i]) for i in halo.tolist()}
+            conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=shard_worker_main, name=f'shard-{tile}',
+                args=(child_conn, tile, specs, len(owned), ghost_owner, protocol, self.rand_seed + tile)
+            )
+            process.start()
+            child_conn.close()
+            self.conns.append(conn)
+            self.processes.append(process)
+        self.logger.info(
+            f'启动了 {self.tiling.num_of_tiles} 个分片，光晕宽度 {self.tiling.r_max:.2f} ，'
+            f'每个分片的节点数 {numpy.bincount(self.tiling.owner, minlength=self.tiling.num_of_tiles).tolist()}'
+        )
+
+    def step(self) -> Tuple[Dict[str, float], bool]:
+        """所有分片并行推进一个循环
+        :return: (全网汇总的指标, 是否有节点要求终止)
+        """
+        for conn, inbound in zip(self.conns, self.inbound):
+            conn.send(('step', inbound))
+        self.inbound = [[] for _ in range(self.tiling.num_of_tiles)]
+
+        total: Dict[str, float] = {}
+        node_driven = False
+        for conn in self.conns:
+            outbound, stats, driven = conn.recv()
+            for tile, messages in outbound.items():
+                self.inbound[tile].extend(messages)
+            for name, value in stats.items():
+                total[name] = total.get(name, 0) + value
+            node_driven = node_driven or driven
+        total['cross_tile'] = sum(len(messages) for messages in self.inbound)
+        self.num_of_cycles += 1
+        return total, node_driven
+
+    def close(self) -> None:
+        """收回所有节点的状态和能耗写回到网络中，然后关闭工作进程
+        """
+        nodes = self.wsn.node_manager.nodes
+        node_index = self.wsn.node_manager.node_index
+        consumption = numpy.zeros((len(nodes), self.wsn.energy_ledger.total.shape[-1]), dtype=numpy.float64)
+        for conn in self.conns:
+            conn.send(('collect', None))
+            states, owned_consumption = conn.recv()
+            for (node_id, state), row in zip(states, owned_consumption):
+                set_node_state(nodes[node_index[node_id]], state)
+                consumption[node_index[node_id]] = row
+            conn.send(('close', None))
+        for process in self.processes:
+            process.join()
+        self.wsn.energy_ledger.restore(consumption, self.num_of_cycles)
+        self.logger.info('所有分片已关闭')
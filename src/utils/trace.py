@@ -0,0 +1,336 @@
+import gzip
+import logging
+import os
+import shutil
+import threading
+from collections import namedtuple
+from enum import IntEnum
+from typing import Iterator, List, Optional, Set, Union
+
+import numpy
+
+from .log import get_log_file_dir_path
+
+
+# 日志配置
+logger: logging.Logger = logging.getLogger('trace')
+
+
+class EnumTraceEvent(IntEnum):
+    """事件轨迹中的事件类型
+    """
+    # 节点发送一条自己产生的消息，peer 为消息源，value 为发送后的剩余电量，flags 的低位为耗电原因（EnumEnergyCause 的值）
+    SEND = 1
+    # 介质把一条消息送达节点，peer 为发送者
+    RECEIVE = 2
+    # 节点转发别人的消息，各字段同 SEND
+    FORWARD = 3
+    # 节点发送或转发回应，各字段同 SEND
+    REPLY = 4
+    # 节点电量耗尽，value 为剩余电量
+    DEATH = 5
+    # 网络终止，value 为循环次数，flags 为 1 时表示由用户中断
+    TERMINATION = 6
+
+
+# 事件轨迹文件的格式
+#   文件头 16 字节: 魔数 b'WSNTRACE' ，版本号（<u4），每条记录的字节数（<u4）
+#   之后是紧密排列的定长记录，每条 32 字节，字段如下（小端序）:
+#     cycle    <u4  事件发生的循环次数（多线程模式下为调度器的检查次数）
+#     kind     u1   事件类型，EnumTraceEvent 的值
+#     flags    u1   事件标志，含义见 EnumTraceEvent ，消息相关的事件中第 7 位表示是否为回应消息
+#     reserved <u2  保留，为 0
+#     node     <u4  事件所在节点的 node_id ，TERMINATION 为 0
+#     peer     <u4  对端节点的 node_id ，没有则为 0
+#     value    <f8  事件的数值，含义见 EnumTraceEvent
+#     message  <u8  消息 uuid 的前 64 位，没有则为 0
+TRACE_MAGIC = b'WSNTRACE'
+TRACE_VERSION = 1
+TRACE_HEADER_SIZE = 16
+TRACE_DTYPE = numpy.dtype([
+    ('cycle', '<u4'),
+    ('kind', 'u1'),
+    ('flags', 'u1'),
+    ('reserved', '<u2'),
+    ('node', '<u4'),
+    ('peer', '<u4'),
+    ('value', '<f8'),
+    ('message', '<u8'),
+])
+# 消息相关事件的 flags 中表示回应消息的位
+FLAG_REPLY = 0x80
+
+TraceRecord = namedtuple('TraceRecord', TRACE_DTYPE.names)
+
+# 拓扑文件 `<轨迹文件路径>.nodes.npy` 中每个节点的字段，事件轨迹只记录 node_id ，回放时需要节点的位置等信息
+TOPOLOGY_DTYPE = numpy.dtype([
+    ('node_id', '<u4'),
+    ('x', '<f8'),
+    ('y', '<f8'),
+    ('r', '<f8'),
+    ('power', '<f8'),
+    ('total_power', '<f8'),
+])
+
+
+def message_hash(message) -> int:
+    """消息在事件轨迹中的标识，即 uuid 的前 64 位，没有 uuid 的消息为 0
+    """
+    uuid = getattr(message, 'uuid', None)
+    return int(uuid[:8] + uuid[9:13] + uuid[14:18], 16) if uuid else 0
+
+
+def message_flags(message) -> int:
+    return FLAG_REPLY if getattr(message, 'is_reply', False) else 0
+
+
+class EventTrace(object):
+    """二进制事件轨迹
+    以定长记录的形式逐条记录网络中发生的事件，格式见 TRACE_DTYPE ，
+    记录先缓存在预分配的数组中，每攒满 chunk_size 条追加写入文件，写入开销与事件数成正比
+    由调度器挂到 Wsn.event_trace 上，节点和介质在发生事件时调用 record() / record_array()
+
+    max_records 不为 0 时按记录数滚动：当前文件写满 max_records 条后压缩为 `<文件名>.1.gz` ，
+    更早的依次改名为 `<文件名>.2.gz` …… ，最多保留 backup_count 个，更早的被删除，磁盘占用有上界；
+    当前文件始终是未压缩的，可以直接用 open_trace() 内存映射，iter_trace() 等读取函数会按时间先后读取所有分段
+    """
+    # 日志配置
+    logger: logging.Logger = logger
+
+    path: str
+    chunk_size: int
+    buffer: numpy.ndarray
+    # 缓冲区中尚未写入文件的记录数
+    buffered: int
+    # 已经写入文件的记录数（含滚动出去的分段）
+    flushed: int
+    # 当前文件中的记录数
+    segment_records: int
+    # 每个文件的记录数上限，为 0 时不滚动
+    max_records: int
+    # 保留的压缩分段个数
+    backup_count: int
+    compresslevel: int
+    # 当前的循环次数，由调度器更新
+    cycle: int
+    # 已经记录过 DEATH 的节点
+    dead: Set[int]
+
+    def __init__(
+            self, path: Optional[str] = None, chunk_size: int = 65536, max_records: int = 0, backup_count: int = 8,
+            compresslevel: int = 6
+    ):
+        """
+        :param path: 轨迹文件路径，默认为本次运行日志目录下的 trace.bin
+        :param chunk_size: 每次写入文件的记录数
+        :param max_records: 每个文件的记录数上限，为 0 时不滚动
+        :param backup_count: 保留的压缩分段个数
+        :param compresslevel: gzip 压缩级别，1 最快，9 最小
+        """
+        if chunk_size < 1:
+            raise ValueError('块大小不能小于 1')
+        if max_records < 0 or backup_count < 0:
+            raise ValueError('每个文件的记录数上限和保留的分段个数不能小于 0')
+        self.path = os.path.join(get_log_file_dir_path(), 'trace.bin') if path is None else path
+        self.chunk_size = chunk_size
+        self.max_records = max_records
+        self.backup_count = backup_count
+        self.compresslevel = compresslevel
+        self.buffer = numpy.zeros(chunk_size, dtype=TRACE_DTYPE)
+        self.buffered = 0
+        self.flushed = 0
+        self.segment_records = 0
+        self.cycle = 0
+        self.dead = set()
+        self.lock = threading.Lock()
+
+        # 清理同一路径下之前运行留下的分段
+        for segment in trace_segments(self.path)[:-1]:
+            os.remove(segment)
+        self.write_header()
+
+    def write_header(self) -> None:
+        with open(self.path, 'wb') as f:
+            f.write(TRACE_MAGIC + numpy.array([TRACE_VERSION, TRACE_DTYPE.itemsize], dtype='<u4').tobytes())
+
+    def write_topology(self, wsn) -> None:
+        """把网络中所有节点的位置、通信半径和电量保存到拓扑文件，由调度器在开始运行时调用
+        """
+        nodes = wsn.node_manager.nodes
+        topology = numpy.zeros(len(nodes), dtype=TOPOLOGY_DTYPE)
+        for i, node in enumerate(nodes):
+            topology[i] = (node.node_id, node.xy[0], node.xy[1], node.r, node.power, node.total_power)
+        numpy.save(get_topology_path(self.path), topology)
+
+    def record(
+            self, kind: EnumTraceEvent, node: int = 0, peer: int = 0, value: float = 0.,
+            message: int = 0, flags: int = 0
+    ) -> None:
+        """记录一个事件
+        :param kind: 事件类型
+        :param node: 事件所在节点的 node_id
+        :param peer: 对端节点的 node_id
+        :param value: 事件的数值
+        :param message: 消息标识，见 message_hash()
+        :param flags: 事件标志
+        """
+        with self.lock:
+            if kind == EnumTraceEvent.DEATH:
+                if node in self.dead:
+                    return
+                self.dead.add(node)
+            self.buffer[self.buffered] = (self.cycle, kind, flags, 0, node, peer, value, message)
+            self.buffered += 1
+            if self.buffered >= self.chunk_size:
+                self.flush_locked()
+
+    def record_array(
+            self, kind: EnumTraceEvent, nodes: numpy.ndarray, peers: Union[int, numpy.ndarray] = 0,
+            messages: Union[int, numpy.ndarray] = 0, flags: Union[int, numpy.ndarray] = 0,
+            values: Union[float, numpy.ndarray] = 0.
+    ) -> None:
+        """批量记录同一类型的事件，参数含义同 record() ，标量参数对所有事件相同
+        """
+        count = len(nodes)
+        with self.lock:
+            done = 0
+            while done < count:
+                size = min(count - done, self.chunk_size - self.buffered)
+                part = self.buffer[self.buffered:self.buffered + size]
+                part['cycle'] = self.cycle
+                part['kind'] = kind
+                for name, column in (
+                        ('flags', flags), ('node', nodes), ('peer', peers), ('value', values), ('message', messages)
+                ):
+                    part[name] = column[done:done + size] if isinstance(column, numpy.ndarray) else column
+                part['reserved'] = 0
+                self.buffered += size
+                done += size
+                if self.buffered >= self.chunk_size:
+                    self.flush_locked()
+
+    def flush(self) -> None:
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self) -> None:
+        done = 0
+        while done < self.buffered:
+            # 滚动时当前文件恰好写满 max_records 条
+            size = self.buffered - done
+            if self.max_records:
+                size = min(size, self.max_records - self.segment_records)
+            with open(self.path, 'ab') as f:
+                f.write(self.buffer[done:done + size].tobytes())
+            done += size
+            self.segment_records += size
+            if self.max_records and self.segment_records >= self.max_records:
+                self.rollover()
+        self.flushed += self.buffered
+        self.buffered = 0
+
+    def rollover(self) -> None:
+        """把写满的当前文件压缩为 `<文件名>.1.gz` ，更早的分段依次后移，超出 backup_count 的被删除
+        """
+        for index in range(self.backup_count, 0, -1):
+            segment = get_segment_path(self.path, index)
+            if not os.path.exists(segment):
+                continue
+            if index == self.backup_count:
+                os.remove(segment)
+            else:
+                os.replace(segment, get_segment_path(self.path, index + 1))
+        if self.backup_count:
+            with open(self.path, 'rb') as src, \
+                    gzip.open(get_segment_path(self.path, 1), 'wb', compresslevel=self.compresslevel) as dst:
+                shutil.copyfileobj(src, dst)
+        self.write_header()
+        self.segment_records = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.logger.info(f'共记录 {self.flushed} 个事件，已保存到 {self.path}')
+
+
+def get_topology_path(path: str) -> str:
+    return f'{path}.nodes.npy'
+
+
+def get_segment_path(path: str, index: int) -> str:
+    return f'{path}.{index}.gz'
+
+
+def trace_segments(path: str) -> List[str]:
+    """事件轨迹的所有分段，按时间先后排列，最后一个是当前文件
+    :param path: 轨迹文件路径
+    """
+    segments = []
+    index = 1
+    while os.path.exists(get_segment_path(path, index)):
+        segments.append(get_segment_path(path, index))
+        index += 1
+    return segments[::-1] + [path]
+
+
+def load_topology(path: str) -> numpy.ndarray:
+    """读取事件轨迹对应的拓扑文件
+    :param path: 轨迹文件路径
+    :return: dtype 为 TOPOLOGY_DTYPE 的数组
+    """
+    return numpy.load(get_topology_path(path))
+
+
+def read_trace_header(f) -> None:
+    header = f.read(TRACE_HEADER_SIZE)
+    if len(header) < TRACE_HEADER_SIZE or header[:8] != TRACE_MAGIC:
+        raise ValueError(f'{f.name} 不是事件轨迹文件')
+    version, record_size = numpy.frombuffer(header[8:], dtype='<u4')
+    if version != TRACE_VERSION or record_size != TRACE_DTYPE.itemsize:
+        raise ValueError(f'不支持的事件轨迹版本 {version} （记录大小 {record_size} 字节）')
+
+
+def iter_trace(path: str, chunk_size: int = 65536) -> Iterator[numpy.ndarray]:
+    """分块流式读取事件轨迹，依次读取滚动出去的压缩分段和当前文件，内存占用只与 chunk_size 有关
+    :param path: 轨迹文件路径
+    :param chunk_size: 每块的记录数
+    :return: 依次产生 dtype 为 TRACE_DTYPE 的结构化数组
+    """
+    for segment in trace_segments(path):
+        with (gzip.open(segment, 'rb') if segment != path else open(path, 'rb')) as f:
+            read_trace_header(f)
+            while True:
+                data = f.read(chunk_size * TRACE_DTYPE.itemsize)
+                if len(data) < TRACE_DTYPE.itemsize:
+                    break
+                count = len(data) // TRACE_DTYPE.itemsize
+                yield numpy.frombuffer(data, dtype=TRACE_DTYPE, count=count)
+
+
+def iter_trace_records(path: str, kinds: Optional[Set[EnumTraceEvent]] = None) -> Iterator[TraceRecord]:
+    """逐条流式读取事件轨迹
+    :param path: 轨迹文件路径
+    :param kinds: 只读取这些类型的事件，为 None 时读取全部
+    """
+    for chunk in iter_trace(path):
+        if kinds is not None:
+            chunk = chunk[numpy.isin(chunk['kind'], [int(kind) for kind in kinds])]
+        for row in chunk.tolist():
+            yield TraceRecord(*row)
+
+
+def open_trace(path: str) -> numpy.ndarray:
+    """以内存映射的方式打开事件轨迹，可以随机访问任意一段记录
+    有滚动出去的压缩分段时，所有分段解压后拼接在内存中
+    :param path: 轨迹文件路径
+    :return: dtype 为 TRACE_DTYPE 的只读数组
+    """
+    if len(trace_segments(path)) > 1:
+        trace = numpy.concatenate([numpy.zeros(0, dtype=TRACE_DTYPE)] + list(iter_trace(path)))
+        trace.flags.writeable = False
+        return trace
+    with open(path, 'rb') as f:
+        read_trace_header(f)
+    count = (os.path.getsize(path) - TRACE_HEADER_SIZE) // TRACE_DTYPE.itemsize
+    if count == 0:
+        return numpy.zeros(0, dtype=TRACE_DTYPE)
+    return numpy.memmap(path, dtype=TRACE_DTYPE, mode='r', offset=TRACE_HEADER_SIZE, shape=(count, ))
@@ -1,6 +1,17 @@
 from .core import Wsn
 from .node import WsnNode, WsnNodeManager
 from .medium import WsnMedium
+from .link import WsnLinkMatrix
+from .kernel import WsnFloodingKernel
+from .analysis import WsnConnectivity
+from .worklist import WsnWorklist
+from .pool import WsnThreadPool
+from .energy import EnumEnergyCause, WsnEnergyLedger
+from .protocol import WsnProtocol, get_protocol, register_protocol
 
 
-__all__ = ['Wsn', 'WsnNode', 'WsnNodeManager', 'WsnMedium']
+__all__ = [
+    'Wsn', 'WsnNode', 'WsnNodeManager', 'WsnMedium', 'WsnLinkMatrix', 'WsnFloodingKernel', 'WsnConnectivity', 'WsnWorklist',
+    'WsnThreadPool',
+    'EnumEnergyCause', 'WsnEnergyLedger', 'WsnProtocol', 'get_protocol', 'register_protocol'
+]
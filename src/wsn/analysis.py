@@ -0,0 +1,193 @@
+import logging
+from typing import Optional, Tuple
+
+import numpy
+
+from .link import WsnLinkMatrix
+
+
+def connected_components(link_matrix: WsnLinkMatrix, relays: Optional[numpy.ndarray] = None) -> numpy.ndarray:
+    """求链路图的连通分量
+    链路概率 p = 1 - d² / (r1 r2) 关于两个节点对称，所以链路图可以看作无向图；
+    用“挂接 + 指针跳跃”的方法迭代，每一轮把每条边两端所在的树挂到编号较小的根上，再把所有节点直接指向根，
+    轮数约为 O(log N) ，每轮都是对全部链路的向量化运算
+    :param link_matrix: 链路概率矩阵
+    :param relays: 能够发送消息的节点，形状为 (N, ) 的布尔数组，其余节点不连接任何节点，为 None 时全部节点都能发送
+    :return: 每个节点所在连通分量的编号（分量中最小的节点下标）
+    """
+    node_num = link_matrix.node_num
+    labels = numpy.arange(node_num, dtype=numpy.int64)
+    rows = numpy.repeat(labels, numpy.diff(link_matrix.indptr))
+    cols = link_matrix.indices
+    if relays is not None:
+        mask = relays[rows] & relays[cols]
+        rows, cols = rows[mask], cols[mask]
+
+    while True:
+        row_labels, col_labels = labels[rows], labels[cols]
+        differ = row_labels != col_labels
+        if not differ.any():
+            return labels
+        # labels 已经完全压缩，每个值都是根，把较大的根挂到较小的根上不会成环
+        numpy.minimum.at(
+            labels, numpy.maximum(row_labels[differ], col_labels[differ]),
+            numpy.minimum(row_labels[differ], col_labels[differ])
+        )
+        while True:
+            jumped = labels[labels]
+            if numpy.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+def hop_distances(
+        link_matrix: WsnLinkMatrix, sources: numpy.ndarray, relays: Optional[numpy.ndarray] = None
+) -> numpy.ndarray:
+    """按层广度优先搜索，求每个节点到最近的消息源的最少跳数
+    每一层只展开一次当前层节点的链路，总开销与链路数成正比
+    :param link_matrix: 链路概率矩阵
+    :param sources: 消息源的节点下标
+    :param relays: 能够发送消息的节点，形状为 (N, ) 的布尔数组，其余节点只接收不转发，为 None 时全部节点都能发送
+    :return: 每个节点的跳数，消息不可能送达的节点为 -1
+    """
+    hops = numpy.full(link_matrix.node_num, -1, dtype=numpy.int64)
+    frontier = numpy.unique(numpy.asarray(sources, dtype=numpy.int64))
+    hops[frontier] = 0
+    level = 0
+    while len(frontier):
+        if relays is not None:
+            frontier = frontier[relays[frontier]]
+        level += 1
+        _, receivers, _ = link_matrix.rows(frontier)
+        frontier = numpy.unique(receivers[hops[receivers] < 0])
+        hops[frontier] = level
+    return hops
+
+
+def etx_routes(
+        link_matrix: WsnLinkMatrix, sinks: numpy.ndarray, relays: Optional[numpy.ndarray] = None
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """求每个节点到最近的汇聚节点的期望发送次数（ETX）最小的路径
+    一条链路的期望发送次数是 1 / (pf * pr) ，pf 是数据送达下一跳的概率，pr 是确认送回的概率，链路对称，两者都是 p ；
+    路径的期望发送次数是各跳之和，与最少跳数的路径相比，它宁可多走几跳也不走很弱的链路
+    用向量化的 Bellman-Ford 迭代，每一轮对全部链路同时松弛一次，轮数不超过最优路径的最大跳数
+    :param link_matrix: 链路概率矩阵
+    :param sinks: 汇聚节点的下标
+    :param relays: 能够发送消息的节点，形状为 (N, ) 的布尔数组，其余节点既不转发也不发出消息，为 None 时全部节点都能发送
+    :return: (每个节点的期望发送次数，无法送达为 inf ；每个节点的下一跳下标，汇聚节点和无法送达的节点为 -1)
+    """
+    node_num = link_matrix.node_num
+    sinks = numpy.asarray(sinks, dtype=numpy.int64)
+    rows = numpy.repeat(numpy.arange(node_num, dtype=numpy.int64), numpy.diff(link_matrix.indptr))
+    cols = link_matrix.indices
+    costs = 1 / link_matrix.probs ** 2
+    if relays is not None:
+        mask = relays[rows] & relays[cols]
+        rows, cols, costs = rows[mask], cols[mask], costs[mask]
+
+    etx = numpy.full(node_num, numpy.inf)
+    etx[sinks] = 0
+    while True:
+        relaxed = etx.copy()
+        numpy.minimum.at(relaxed, rows, costs + etx[cols])
+        relaxed[sinks] = 0
+        if numpy.array_equal(relaxed, etx):
+            break
+        etx = relaxed
+
+    # 每个节点取使本跳与下一跳的 ETX 之和最小的邻居
+    next_hop = numpy.full(node_num, -1, dtype=numpy.int64)
+    totals = costs + etx[cols]
+    order = numpy.lexsort((totals, rows))
+    rows, cols, totals = rows[order], cols[order], totals[order]
+    first = numpy.flatnonzero(numpy.r_[True, rows[1:] != rows[:-1]]) if len(rows) else rows
+    routed = numpy.isfinite(totals[first])
+    next_hop[rows[first][routed]] = cols[first][routed]
+    next_hop[sinks] = -1
+    return etx, next_hop
+
+
+class WsnConnectivity(object):
+    """无线传感网络在运行前的连通性分析
+    只看链路概率是否大于 0 和节点是否还有电发送，不模拟丢包，得到的可达节点数是运行中能收到消息的节点数的上界
+    """
+    # 日志配置
+    logger: logging.Logger = logging.getLogger('wsn.analysis')
+
+    # 还有电发送至少一次的节点
+    relays: numpy.ndarray
+    # 消息源的节点下标
+    sources: numpy.ndarray
+    # 每个节点所在连通分量的编号
+    labels: numpy.ndarray
+    # 每个连通分量的节点数，下标为分量编号
+    component_sizes: numpy.ndarray
+    # 每个节点到最近的消息源的跳数，不可达为 -1
+    hops: numpy.ndarray
+
+    def __init__(self, link_matrix: WsnLinkMatrix, relays: numpy.ndarray, sources: numpy.ndarray):
+        """
+        :param link_matrix: 链路概率矩阵
+        :param relays: 能够发送消息的节点，形状为 (N, ) 的布尔数组
+        :param sources: 消息源的节点下标
+        """
+        self.relays = numpy.asarray(relays, dtype=bool)
+        self.sources = numpy.asarray(sources, dtype=numpy.int64)
+        self.labels = connected_components(link_matrix, self.relays)
+        self.component_sizes = numpy.bincount(self.labels, minlength=link_matrix.node_num)
+        self.hops = hop_distances(link_matrix, self.sources, self.relays)
+
+    @classmethod
+    def from_wsn(cls, wsn, sources: Optional[numpy.ndarray] = None) -> 'WsnConnectivity':
+        """根据一个无线传感网络的当前状态进行分析，节点下标与 wsn.node_manager.nodes 一致
+        :param wsn: 无线传感网络
+        :param sources: 消息源的节点下标，为 None 时取所有还有消息要发送的节点
+        """
+        nodes = wsn.node_manager.nodes
+        relays = numpy.array([node.power >= node.pc_per_send for node in nodes], dtype=bool)
+        if sources is None:
+            sources = numpy.array([i for i, node in enumerate(nodes) if node.has_pending_output], dtype=numpy.int64)
+        return cls(wsn.medium.get_link_matrix(), relays, sources)
+
+    @property
+    def node_num(self) -> int:
+        return len(self.labels)
+
+    @property
+    def num_of_components(self) -> int:
+        return int(numpy.count_nonzero(self.component_sizes))
+
+    @property
+    def reachable_num(self) -> int:
+        """可能收到消息源消息的节点数（含消息源自己）
+        """
+        return int(numpy.count_nonzero(self.hops >= 0))
+
+    @property
+    def max_received_rate(self) -> float:
+        """接收率的上界
+        """
+        return self.reachable_num / self.node_num if self.node_num else 0.
+
+    @property
+    def eccentricity(self) -> int:
+        """消息从消息源传到最远的可达节点至少需要的跳数
+        """
+        return int(self.hops.max(initial=0))
+
+    def max_replies(self, source: int) -> int:
+        """一个消息源最多能收到多少个节点的回应
+        回应要原路返回，只有和消息源在同一个连通分量里、还有电发送的节点才可能回应
+        :param source: 消息源的节点下标
+        """
+        if not self.relays[source]:
+            return 0
+        return int(self.component_sizes[self.labels[source]]) - 1
+
+    def summary(self) -> str:
+        largest = int(self.component_sizes.max(initial=0))
+        return (
+            f'{self.node_num} 个节点构成 {self.num_of_components} 个连通分量，最大的有 {largest} 个节点，'
+            f'{len(self.sources)} 个消息源可达 {self.reachable_num} 个节点（接收率上界 {self.max_received_rate:.3f}），'
+            f'最远 {self.eccentricity} 跳'
+        )
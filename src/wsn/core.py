@@ -1,10 +1,14 @@
 import logging
-from functools import reduce
+from functools import partial, reduce
 from operator import and_
-from typing import List
+from typing import List, Optional
+
+from utils import DeliveryTracer, EventTrace
 
 from .node import WsnNodeManager
 from .medium import WsnMedium
+from .energy import WsnEnergyLedger
+from .protocol import WsnProtocol, get_protocol
 
 
 class Wsn(object):
@@ -15,12 +19,34 @@ class Wsn(object):
 
     node_manager: WsnNodeManager
     medium: WsnMedium
+    energy_ledger: WsnEnergyLedger
+    # 节点使用的路由协议，默认为 action2
+    protocol: WsnProtocol
+    # 事件轨迹，由调度器在运行期间设置
+    event_trace: Optional[EventTrace]
+    # 送达时延追踪，由调度器在运行期间设置
+    delivery_tracer: Optional[DeliveryTracer]
 
     def __init__(self):
         self.medium = WsnMedium(self)
         self.logger.info('初始化通信介质完成')
         self.node_manager = WsnNodeManager(self)
         self.logger.info('初始化节点管理器完成')
+        self.energy_ledger = WsnEnergyLedger(self)
+        self.logger.info('初始化能耗账本完成')
+        self.event_trace = None
+        self.delivery_tracer = None
+        self.set_protocol(get_protocol('action2'))
+
+    def set_protocol(self, protocol: WsnProtocol) -> None:
+        """为网络中的所有节点（包括之后新增的节点）选用路由协议
+        :param protocol: 路由协议
+        """
+        self.protocol = protocol
+        for node in self.node_manager.nodes:
+            node.action = partial(protocol.step, node)
+        protocol.init(self)
+        self.logger.info(f'选用路由协议 {protocol.name}')
 
     def start_all(self) -> bool:
         """启动所有节点
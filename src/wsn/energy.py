@@ -0,0 +1,255 @@
+import logging
+import math
+import threading
+from enum import Enum
+from typing import List, Optional, Tuple
+
+import numpy
+
+
+class EnumEnergyCause(Enum):
+    """耗电原因的枚举
+    ORIGINAL:   节点第一次发送自己产生的消息
+    FORWARD:    节点第一次转发别的节点的消息
+    REPLY:      节点第一次发送或转发回应
+    RETRANSMIT: 对同一条消息的重复发送
+    """
+    ORIGINAL = 0
+    FORWARD = 1
+    REPLY = 2
+    RETRANSMIT = 3
+
+
+class WsnEnergyLedger(object):
+    """无线传感网络的能耗账本
+    按节点、按耗电原因累计耗电量，并按耗电原因记录全网每一个循环（多线程模式下是调度器的每一次检查）的耗电量
+    全网的历史记录保存在固定大小的环形缓冲区中，只保留最近 capacity 个循环；
+    每个节点的耗电速率由每 capacity 个循环保存一次的累计耗电量快照推算，结束一个循环的开销与节点数无关
+    逐节点、逐循环的历史记录占用的内存与节点数成正比，需要时用 node_history 开启
+    """
+    # 日志配置
+    logger: logging.Logger = logging.getLogger('wsn.energy')
+
+    # wsn: Wsn
+    capacity: int
+    # 逐节点历史记录保留的循环数，为 0 时不记录
+    node_history: int
+    # 当前循环全网各耗电原因的耗电量，形如 (原因数, )
+    current: numpy.ndarray
+    # 全网历史耗电量的环形缓冲区，形如 (capacity, 原因数)
+    history: numpy.ndarray
+    # 开启逐节点历史记录时，当前循环每个节点的耗电量，形如 (N, 原因数)
+    node_current: Optional[numpy.ndarray]
+    # 开启逐节点历史记录时，逐节点历史耗电量的环形缓冲区，形如 (node_history, N, 原因数)
+    node_window: Optional[numpy.ndarray]
+    # 自网络运行以来的累计耗电量，形如 (N, 原因数)
+    total: numpy.ndarray
+    # 最近两次的 (循环数, 每个节点的累计耗电量) 快照，按时间先后排列，用于推算耗电速率
+    snapshots: List[Tuple[int, numpy.ndarray]]
+    # 已经结束的循环数
+    cycle: int
+
+    def __init__(self, wsn, capacity: int = 256, node_history: int = 0):
+        """
+        :param wsn: 账本所属的无线传感网络
+        :param capacity: 全网历史记录保留的循环数，也是推算耗电速率的快照间隔
+        :param node_history: 逐节点历史记录保留的循环数，为 0 时不记录
+        """
+        if capacity < 1:
+            raise ValueError('能耗账本容量不能小于 1')
+        if node_history < 0:
+            raise ValueError('逐节点历史记录的容量不能小于 0')
+        self.wsn = wsn
+        self.capacity = capacity
+        self.node_history = node_history
+        self.lock = threading.Lock()
+        self.cycle = 0
+        self.current = numpy.zeros(len(EnumEnergyCause), dtype=numpy.float64)
+        self.history = numpy.zeros((capacity, len(EnumEnergyCause)), dtype=numpy.float64)
+        self.total = numpy.zeros((0, len(EnumEnergyCause)), dtype=numpy.float64)
+        self.snapshots = [(0, numpy.zeros(0, dtype=numpy.float64))]
+        if node_history:
+            self.node_current = numpy.zeros((0, len(EnumEnergyCause)), dtype=numpy.float32)
+            self.node_window = numpy.zeros((node_history, 0, len(EnumEnergyCause)), dtype=numpy.float32)
+        else:
+            self.node_current = None
+            self.node_window = None
+
+    def resize(self, node_num: int) -> None:
+        """扩充账本以容纳 node_num 个节点，新节点的历史耗电量记为 0
+        """
+        old_num = self.total.shape[0]
+        if node_num <= old_num:
+            return
+        pad = ((0, node_num - old_num), (0, 0))
+        self.total = numpy.pad(self.total, pad)
+        if self.node_history:
+            self.node_current = numpy.pad(self.node_current, pad)
+            self.node_window = numpy.pad(self.node_window, ((0, 0), ) + pad)
+
+    def record(self, node, cause: EnumEnergyCause, energy: float) -> None:
+        """记录一个节点的一次耗电
+        :param node: 耗电的节点
+        :param cause: 耗电原因
+        :param energy: 耗电量
+        """
+        index = self.wsn.node_manager.node_index[node.node_id]
+        with self.lock:
+            if index >= self.total.shape[0]:
+                self.resize(self.wsn.node_manager.node_num)
+            self.total[index, cause.value] += energy
+            self.current[cause.value] += energy
+            if self.node_history:
+                self.node_current[index, cause.value] += energy
+
+    def record_array(self, cause: EnumEnergyCause, energy: numpy.ndarray) -> None:
+        """批量记录全网节点的耗电
+        :param cause: 耗电原因
+        :param energy: 每个节点的耗电量，下标与 wsn.node_manager.nodes 一致
+        """
+        with self.lock:
+            if len(energy) > self.total.shape[0]:
+                self.resize(len(energy))
+            self.total[:len(energy), cause.value] += energy
+            self.current[cause.value] += energy.sum()
+            if self.node_history:
+                self.node_current[:len(energy), cause.value] += energy
+
+    def restore(self, total: numpy.ndarray, cycle: int) -> None:
+        """用在别处统计的累计耗电量覆盖账本，例如分片模式下由各工作进程汇总的结果
+        历史窗口被清空，依赖耗电速率的推算在之后的 tick() 积累足够的历史前不可用
+        :param total: 每个节点按原因分类的累计耗电量，形状为 (节点数, 原因数)
+        :param cycle: 已经结算的循环数
+        """
+        with self.lock:
+            self.resize(len(total))
+            self.total[:len(total)] = total
+            self.current[:] = 0
+            self.history[:] = 0
+            if self.node_history:
+                self.node_current[:] = 0
+                self.node_window[:] = 0
+            self.cycle = cycle
+            self.snapshots = [(cycle, self.consumption())]
+
+    def tick(self) -> None:
+        """结束当前循环，把当前循环全网的耗电量写入环形缓冲区
+        每 capacity 个循环保存一次每个节点的累计耗电量快照，开启了逐节点历史记录时还要写入逐节点的环形缓冲区
+        """
+        with self.lock:
+            self.resize(self.wsn.node_manager.node_num)
+            self.history[self.cycle % self.capacity] = self.current
+            self.current[:] = 0
+            if self.node_history:
+                self.node_window[self.cycle % self.node_history] = self.node_current
+                self.node_current[:] = 0
+            self.cycle += 1
+            if self.cycle - self.snapshots[-1][0] >= self.capacity:
+                self.snapshots = self.snapshots[-1:] + [(self.cycle, self.consumption())]
+
+    def window(self) -> numpy.ndarray:
+        """获取缓冲区中按时间先后排列的全网各耗电原因的历史耗电量，形如 (min(cycle, capacity), 原因数)
+        """
+        if self.cycle <= self.capacity:
+            return self.history[:self.cycle]
+        head = self.cycle % self.capacity
+        return numpy.concatenate((self.history[head:], self.history[:head]))
+
+    def series(self, downsample: int = 1) -> numpy.ndarray:
+        """获取逐节点历史记录中每个节点每个循环的总耗电量，形如 (T, N) ，需要开启 node_history
+        :param downsample: 每 downsample 个循环合并为一个点
+        """
+        if not self.node_history:
+            raise ValueError('没有开启逐节点历史记录，创建能耗账本时需要指定 node_history')
+        if self.cycle <= self.node_history:
+            window = self.node_window[:self.cycle]
+        else:
+            head = self.cycle % self.node_history
+            window = numpy.concatenate((self.node_window[head:], self.node_window[:head]))
+        per_cycle = window.sum(axis=2)
+        if downsample > 1:
+            length = len(per_cycle) // downsample * downsample
+            per_cycle = per_cycle[len(per_cycle) - length:].reshape(-1, downsample, per_cycle.shape[1]).sum(axis=1)
+        return per_cycle
+
+    def consumption(self) -> numpy.ndarray:
+        """每个节点自网络运行以来的累计耗电量
+        """
+        return self.total.sum(axis=1)
+
+    def consumption_by_cause(self) -> numpy.ndarray:
+        """各耗电原因的全网累计耗电量，下标为 EnumEnergyCause 的值
+        """
+        return self.total.sum(axis=0)
+
+    def rate(self) -> numpy.ndarray:
+        """每个节点自较早的一次快照以来（最近 capacity 到 2 * capacity 个循环，不足时为全部循环）的平均每循环耗电量
+        """
+        consumption = self.consumption()
+        cycle, snapshot = self.snapshots[0]
+        if self.cycle <= cycle:
+            return numpy.zeros(len(consumption))
+        consumption[:len(snapshot)] -= snapshot
+        return consumption / (self.cycle - cycle)
+
+    def gini(self) -> float:
+        """节点累计耗电量的基尼系数，0 表示完全均衡，越接近 1 表示耗电越集中于少数热点节点
+        """
+        consumption = numpy.sort(self.consumption())
+        node_num = len(consumption)
+        if node_num == 0 or consumption.sum() <= 0:
+            return 0.
+        rank = numpy.arange(1, node_num + 1)
+        return float(2 * (rank * consumption).sum() / (node_num * consumption.sum()) - (node_num + 1) / node_num)
+
+    def hot_spots(self, k: int = 10) -> List[int]:
+        """耗电速率最高的 k 个节点的 node_id
+        """
+        nodes = self.wsn.node_manager.nodes
+        rate = self.rate()
+        return [nodes[i].node_id for i in numpy.argsort(-rate, kind='stable')[:k] if rate[i] > 0]
+
+    def projected_lifetime(self) -> numpy.ndarray:
+        """按缓冲区时间窗口内的耗电速率推算每个节点还能坚持的循环数
+        电量已不足以发送一次的节点记为 0 ，不耗电的节点记为无穷大
+        """
+        nodes = self.wsn.node_manager.nodes
+        power = numpy.array([node.power for node in nodes], dtype=numpy.float64)
+        pc_per_send = numpy.array([node.pc_per_send for node in nodes], dtype=numpy.float64)
+        rate = self.rate()[:len(nodes)]
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            lifetime = numpy.where(rate > 0, (power - pc_per_send) / rate, numpy.inf)
+        lifetime[power < pc_per_send] = 0
+        return numpy.maximum(lifetime, 0)
+
+    def projected_cycles_to_first_death(self) -> float:
+        """推算距离第一个节点没电还有多少个循环，已有节点没电则为 0
+        """
+        lifetime = self.projected_lifetime()
+        return float(lifetime.min()) if len(lifetime) else math.inf
+
+    def projected_cycles_to_survival_rate(self, survival_rate: float) -> float:
+        """推算距离网络存活率低至 survival_rate 还有多少个循环（与 TerminationCondition.SurvivalRate 的判定一致）
+        """
+        lifetime = numpy.sort(self.projected_lifetime())
+        node_num = len(lifetime)
+        if node_num == 0:
+            return math.inf
+        # 存活率 <= survival_rate 时，至多还能剩下 floor(survival_rate * N) 个节点
+        deaths_needed = node_num - int(math.floor(survival_rate * node_num))
+        if deaths_needed <= 0:
+            return 0.
+        return float(lifetime[deaths_needed - 1])
+
+    def summary(self, survival_rate: Optional[float] = None) -> str:
+        first_death = self.projected_cycles_to_first_death()
+        text = (
+            f'累计耗电 {self.consumption().sum()} 点（'
+            + '，'.join(f'{cause.name} {energy}' for cause, energy in zip(EnumEnergyCause, self.consumption_by_cause()))
+            + f'），基尼系数 {self.gini():.3f} ，热点节点 {self.hot_spots(5)} ，'
+            f'预计 {first_death:.1f} 个循环后出现第一个没电的节点'
+        )
+        if survival_rate is not None:
+            text += f'，{self.projected_cycles_to_survival_rate(survival_rate):.1f} 个循环后存活率低至 {survival_rate}'
+        return text
@@ -0,0 +1,178 @@
+import logging
+from typing import Dict, List, Optional
+
+import numpy
+
+from .link import WsnLinkMatrix
+
+
+class WsnFloodingKernel(object):
+    """泛洪协议的全网向量化轮次内核
+    用数组表示整个网络的状态，每次 step() 推进全网一轮，等价于单线程模式下所有节点各执行一次 action
+    适用于 action0 和 action3 这类不需要回应的泛洪协议：
+      - action0（无限复读广播）：persistent=True, sends_per_round=1 ，收到过消息的节点每轮都会再广播一次
+      - action3（方案二）：persistent=False, sends_per_round=100 ，节点第一次收到消息后只广播一轮，之后不再发送
+    时序与逐节点调度相同：节点的 action 先发送再处理收到的消息，第 t 轮收到的消息第 t + 1 轮才被处理，
+    第 t + 2 轮才转发出去（时隙模式下完全如此，单线程调度器的活跃节点集合也只在下一个循环调度被唤醒的节点）；
+    已经耗尽电量的节点仍然能收到消息并计入接收次数，只是不再发送
+    """
+    # 日志配置
+    logger: logging.Logger = logging.getLogger('wsn.kernel')
+
+    link_matrix: WsnLinkMatrix
+    power: numpy.ndarray
+    total_power: numpy.ndarray
+    pc_per_send: numpy.ndarray
+    sends_per_round: int
+    persistent: bool
+
+    # 已知消息（不会重复转发）的节点
+    seen: numpy.ndarray
+    # 本轮需要广播的节点
+    frontier: numpy.ndarray
+    # 每个节点上一轮收到、本轮才处理的消息份数，第一次收到的节点下一轮开始广播
+    arriving: numpy.ndarray
+    # 节点收到消息的次数
+    recv_count: numpy.ndarray
+    # 是否追踪 hops 和 reached ，每轮要多处理一遍所有送达，追踪送达时延时才需要打开
+    track_hops: bool
+    # 节点第一次收到消息时经过的跳数，消息源为 0 ，还没有收到过为 -1
+    hops: numpy.ndarray
+    # 最近一轮第一次收到消息的节点下标，它们在下一轮处理这条消息
+    reached: numpy.ndarray
+    # 电量不足以再发送一次、已经关机的节点
+    dead: numpy.ndarray
+    num_of_rounds: int
+
+    def __init__(
+            self, link_matrix: WsnLinkMatrix, power: numpy.ndarray, pc_per_send: numpy.ndarray,
+            sends_per_round: int = 1, persistent: bool = True
+    ):
+        """
+        :param link_matrix: 链路概率矩阵
+        :param power: 节点初始电量
+        :param pc_per_send: 节点单次发射耗电量
+        :param sends_per_round: 节点在一轮中发送同一条消息的次数
+        :param persistent: 节点收到消息后是否每轮都广播（否则只广播一轮）
+        """
+        node_num = link_matrix.node_num
+        self.link_matrix = link_matrix
+        self.power = numpy.array(numpy.broadcast_to(power, node_num), dtype=numpy.float64)
+        self.total_power = self.power.copy()
+        self.pc_per_send = numpy.array(numpy.broadcast_to(pc_per_send, node_num), dtype=numpy.float64)
+        if sends_per_round < 1:
+            raise ValueError('每轮发送次数不能小于 1')
+        self.sends_per_round = sends_per_round
+        self.persistent = persistent
+
+        self.seen = numpy.zeros(node_num, dtype=bool)
+        self.frontier = numpy.zeros(node_num, dtype=bool)
+        self.arriving = numpy.zeros(node_num, dtype=numpy.int64)
+        self.recv_count = numpy.zeros(node_num, dtype=numpy.int64)
+        self.track_hops = False
+        self.hops = numpy.full(node_num, -1, dtype=numpy.int64)
+        self.reached = numpy.zeros(0, dtype=numpy.int64)
+        self.dead = self.power < self.pc_per_send
+        self.num_of_rounds = 0
+
+    @classmethod
+    def from_wsn(cls, wsn, sends_per_round: int = 1, persistent: bool = True) -> 'WsnFloodingKernel':
+        """根据一个无线传感网络的当前状态生成内核，节点下标与 wsn.node_manager.nodes 一致
+        """
+        nodes = wsn.node_manager.nodes
+        return cls(
+            wsn.medium.get_link_matrix(),
+            numpy.array([node.power for node in nodes], dtype=numpy.float64),
+            numpy.array([node.pc_per_send for node in nodes], dtype=numpy.float64),
+            sends_per_round=sends_per_round, persistent=persistent
+        )
+
+    def inject(self, index: int) -> None:
+        """让第 index 个节点作为消息源，从下一轮开始广播
+        """
+        self.frontier[index] = True
+        if self.hops[index] < 0:
+            self.hops[index] = 0
+
+    def step(self) -> Dict[str, float]:
+        """推进全网一轮
+        :return: 本轮的统计信息
+        """
+        # 本轮实际发送的次数受剩余电量限制
+        senders = numpy.flatnonzero(self.frontier & ~self.dead)
+        pc = self.pc_per_send[senders]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            affordable = numpy.where(pc > 0, numpy.floor(self.power[senders] / pc), self.sends_per_round)
+        sends = numpy.minimum(affordable, self.sends_per_round).astype(numpy.int64)
+        energy = sends * pc
+        self.power[senders] -= energy
+
+        # 把所有发送者的行展开成 (接收者, 概率) 列表，k 次发送中至少成功一次的概率为 1 - (1 - p)^k
+        owners, receivers, probs = self.link_matrix.rows(senders)
+        p = 1 - (1 - probs) ** sends[owners]
+        hit = numpy.random.random(len(p)) < p
+        receivers = receivers[hit]
+
+        if self.track_hops:
+            # 第一次收到消息的节点的跳数是这一轮送达它的发送者中最小的跳数加一，只需要看还没有收到过的接收者
+            fresh = self.hops[receivers] < 0
+            fresh_receivers = receivers[fresh]
+            hops = self.hops[senders[owners[hit][fresh]]] + 1
+            order = numpy.lexsort((hops, fresh_receivers))
+            fresh_receivers, hops = fresh_receivers[order], hops[order]
+            first = numpy.ones(len(fresh_receivers), dtype=bool)
+            first[1:] = fresh_receivers[1:] != fresh_receivers[:-1]
+            self.reached = fresh_receivers[first]
+            self.hops[self.reached] = hops[first]
+
+        # 更新节点状态，上一轮收到新消息的节点在本轮处理，下一轮开始广播
+        newly_dead = ~self.dead & (self.power < self.pc_per_send)
+        self.dead |= newly_dead
+        hits = numpy.bincount(receivers, minlength=len(self.power))
+        newly_seen = (self.arriving > 0) & ~self.seen
+        if self.persistent:
+            self.recv_count += self.arriving
+            self.frontier |= newly_seen
+        else:
+            self.recv_count += newly_seen
+            self.frontier = newly_seen
+        self.seen |= newly_seen
+        self.arriving = hits
+        self.num_of_rounds += 1
+
+        return {
+            'round': self.num_of_rounds,
+            'coverage': float(numpy.count_nonzero(self.recv_count)) / len(self.power),
+            'sends': int(sends.sum()),
+            'energy_used': float(energy.sum()),
+            'deaths': int(newly_dead.sum()),
+        }
+
+    def run(self, num_of_rounds: int, received_rate: Optional[float] = None) -> Dict[str, numpy.ndarray]:
+        """连续推进若干轮，网络中没有节点需要广播、或接收率不低于 received_rate 时提前结束
+        :param num_of_rounds: 最大轮数
+        :param received_rate: 接收率阈值
+        :return: 每轮统计信息组成的数组，键与 step() 的返回值相同
+        """
+        history: List[Dict[str, float]] = []
+        for _ in range(num_of_rounds):
+            if not (self.frontier & ~self.dead).any() and not self.arriving.any():
+                break
+            history.append(self.step())
+            if received_rate is not None and history[-1]['coverage'] >= received_rate:
+                break
+
+        self.logger.info(f'泛洪内核运行了 {len(history)} 轮，接收率 {history[-1]["coverage"] if history else 0.}')
+        keys = ('round', 'coverage', 'sends', 'energy_used', 'deaths')
+        return {key: numpy.array([stats[key] for stats in history]) for key in keys}
+
+    def write_back(self, wsn) -> None:
+        """把内核中的电量和接收次数写回网络中的节点对象，供旁观者等基于节点对象的代码使用
+        """
+        for node, power, recv_count in zip(wsn.node_manager.nodes, self.power, self.recv_count):
+            node.power = float(power)
+            node.recv_count = int(recv_count)
+
+    @property
+    def energy_used(self) -> float:
+        return float((self.total_power - self.power).sum())
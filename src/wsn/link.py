@@ -0,0 +1,207 @@
+import hashlib
+import logging
+import os
+from typing import Optional, Tuple
+
+import numpy
+
+
+# 日志配置
+logger: logging.Logger = logging.getLogger('wsn.link')
+
+# 链路概率矩阵的缓存格式版本，计算方式变化时需要修改，使旧缓存失效
+LINK_MATRIX_VERSION = 1
+
+
+def get_link_cache_dir_path() -> str:
+    """获取存放链路概率矩阵缓存的目录
+    该目录为启动脚本时工作路径下的 ./cache/link/ 目录，不同次运行之间共享
+    """
+    cache_dir_path = os.path.abspath('./cache/link')
+    if not os.path.exists(cache_dir_path):
+        os.makedirs(cache_dir_path)
+    return cache_dir_path
+
+
+class WsnLinkMatrix(object):
+    """节点间通信成功概率的稀疏矩阵（CSR 格式）
+    第 i 行保存第 i 个节点发出的信号能以非零概率送达的节点下标及对应的概率
+    两节点通信成功概率为 p = 1 - d^2 / (r1 * r2) ，只保存 p > 0 的项
+    """
+
+    indptr: numpy.ndarray
+    indices: numpy.ndarray
+    probs: numpy.ndarray
+
+    def __init__(self, indptr: numpy.ndarray, indices: numpy.ndarray, probs: numpy.ndarray):
+        """
+        :param indptr: 第 i 行的数据位于 indices[indptr[i]:indptr[i + 1]]
+        :param indices: 每一项的列下标（接收节点下标）
+        :param probs: 每一项的通信成功概率
+        """
+        self.indptr = indptr
+        self.indices = indices
+        self.probs = probs
+
+    def row(self, i: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """获取第 i 个节点能够送达的节点下标及概率
+        """
+        start, stop = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:stop], self.probs[start:stop]
+
+    def rows(self, rows: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """把多行的数据展开拼接在一起
+        :param rows: 行下标，可以重复
+        :return: (每一项来自 rows 中的第几个, 列下标, 概率)
+        """
+        rows = numpy.asarray(rows, dtype=numpy.int64)
+        starts = self.indptr[rows]
+        counts = self.indptr[rows + 1] - starts
+        offsets = numpy.repeat(starts - numpy.cumsum(counts) + counts, counts) + numpy.arange(counts.sum())
+        owners = numpy.repeat(numpy.arange(len(rows)), counts)
+        return owners, self.indices[offsets], self.probs[offsets]
+
+    @property
+    def node_num(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    @staticmethod
+    def topology_hash(xy: numpy.ndarray, r: numpy.ndarray) -> str:
+        """根据节点坐标和通信半径计算拓扑的哈希值，作为缓存的键
+        """
+        digest = hashlib.sha1()
+        digest.update(f'v{LINK_MATRIX_VERSION}'.encode())
+        digest.update(numpy.ascontiguousarray(xy, dtype=numpy.float64).tobytes())
+        digest.update(numpy.ascontiguousarray(r, dtype=numpy.float64).tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def build(cls, xy: numpy.ndarray, r: numpy.ndarray, block_size: int = 256,
+              max_block_elements: int = 1 << 22) -> 'WsnLinkMatrix':
+        """根据节点坐标和通信半径构建链路概率矩阵
+        按空间位置分块计算，每块只与可能够得着的节点求距离，避免 O(N^2) 的时间和内存开销
+
+        :param xy: 形如 (N, 2) 的节点坐标
+        :param r: 形如 (N, ) 的节点通信半径
+        :param block_size: 每次计算的行数
+        :param max_block_elements: 每次计算的距离矩阵元素个数上限
+        :return: 链路概率矩阵
+        """
+        xy = numpy.asarray(xy, dtype=numpy.float64).reshape(-1, 2)
+        r = numpy.asarray(r, dtype=numpy.float64)
+        node_num = len(r)
+
+        if node_num == 0:
+            return cls(numpy.zeros(1, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64),
+                       numpy.zeros(0, dtype=numpy.float64))
+
+        # 按宽度为 r_max 的竖条分区，条内按 y 排序，一个节点只可能与相邻竖条中 y 相近的节点通信
+        r_max = float(r.max())
+        strip_width = r_max if r_max > 0 else 1.
+        strip = ((xy[:, 0] - xy[:, 0].min()) // strip_width).astype(numpy.int64)
+        order = numpy.lexsort((xy[:, 1], strip))
+        sorted_y = xy[order, 1]
+        sorted_strip = strip[order]
+
+        def strip_range(t: int) -> Tuple[int, int]:
+            return (int(numpy.searchsorted(sorted_strip, t, side='left')),
+                    int(numpy.searchsorted(sorted_strip, t, side='right')))
+
+        rows_list, cols_list, probs_list = [], [], []
+        for s in numpy.unique(strip):
+            s_lo, s_hi = strip_range(s)
+            for start in range(s_lo, s_hi, block_size):
+                rows = order[start:min(start + block_size, s_hi)]
+                rows = rows[r[rows] > 0]
+                if len(rows) == 0:
+                    continue
+
+                # p > 0 要求 d^2 < r1 * r2 <= r1 * r_max ，距离超过 sqrt(r1 * r_max) 的节点不可能送达
+                reach = numpy.sqrt(r[rows].max() * r_max)
+                y_lo, y_hi = xy[rows, 1].min() - reach, xy[rows, 1].max() + reach
+                candidates = []
+                for t in (s - 1, s, s + 1):
+                    lo, hi = strip_range(t)
+                    candidates.append(order[
+                        lo + numpy.searchsorted(sorted_y[lo:hi], y_lo, side='left'):
+                        lo + numpy.searchsorted(sorted_y[lo:hi], y_hi, side='right')
+                    ])
+                candidates = numpy.concatenate(candidates)
+
+                col_step = max(1, max_block_elements // len(rows))
+                for col_start in range(0, len(candidates), col_step):
+                    cols = candidates[col_start:col_start + col_step]
+
+                    dx = xy[rows, 0][:, None] - xy[cols, 0][None, :]
+                    dy = xy[rows, 1][:, None] - xy[cols, 1][None, :]
+                    d2 = dx * dx + dy * dy
+                    rr = r[rows][:, None] * r[cols][None, :]
+                    with numpy.errstate(divide='ignore', invalid='ignore'):
+                        p = numpy.where(rr > 0, 1 - d2 / rr, 0.)
+
+                    row_idx, col_idx = numpy.nonzero(p > 0)
+                    rows_list.append(rows[row_idx])
+                    cols_list.append(cols[col_idx])
+                    probs_list.append(p[row_idx, col_idx])
+
+        if rows_list:
+            all_rows = numpy.concatenate(rows_list)
+            all_cols = numpy.concatenate(cols_list)
+            all_probs = numpy.concatenate(probs_list)
+        else:
+            all_rows = numpy.zeros(0, dtype=numpy.int64)
+            all_cols = numpy.zeros(0, dtype=numpy.int64)
+            all_probs = numpy.zeros(0, dtype=numpy.float64)
+
+        # 按 (行, 列) 排序，整理成 CSR 格式
+        sort = numpy.lexsort((all_cols, all_rows))
+        indptr = numpy.zeros(node_num + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(all_rows, minlength=node_num), out=indptr[1:])
+
+        return cls(indptr, all_cols[sort].astype(numpy.int64), all_probs[sort])
+
+    def save(self, path: str) -> None:
+        """保存到文件，先写临时文件再替换，避免并发运行时读到写了一半的缓存
+        """
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        numpy.savez(tmp_path, indptr=self.indptr, indices=self.indices, probs=self.probs)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'WsnLinkMatrix':
+        with numpy.load(path) as data:
+            return cls(data['indptr'], data['indices'], data['probs'])
+
+    @classmethod
+    def load_or_build(cls, xy: numpy.ndarray, r: numpy.ndarray, cache_dir_path: Optional[str] = None) -> 'WsnLinkMatrix':
+        """从磁盘缓存加载链路概率矩阵，如果没有缓存则构建并保存
+        :param xy: 形如 (N, 2) 的节点坐标
+        :param r: 形如 (N, ) 的节点通信半径
+        :param cache_dir_path: 缓存目录，默认为 get_link_cache_dir_path()
+        :return: 链路概率矩阵
+        """
+        cache_dir_path = get_link_cache_dir_path() if cache_dir_path is None else cache_dir_path
+        path = os.path.join(cache_dir_path, f'{cls.topology_hash(xy, r)}.npz')
+
+        if os.path.exists(path):
+            try:
+                matrix = cls.load(path)
+                if matrix.node_num == len(r):
+                    logger.info(f'从缓存 {path} 加载链路概率矩阵')
+                    return matrix
+            except (OSError, ValueError, KeyError):
+                logger.warning(f'链路概率矩阵缓存 {path} 已损坏，重新构建')
+
+        matrix = cls.build(xy, r)
+        logger.info(f'构建链路概率矩阵完成，共 {matrix.node_num} 个节点、{matrix.nnz} 条链路')
+        try:
+            if not os.path.exists(cache_dir_path):
+                os.makedirs(cache_dir_path)
+            matrix.save(path)
+        except OSError as e:
+            logger.warning(f'链路概率矩阵缓存 {path} 保存失败：{e}')
+        return matrix
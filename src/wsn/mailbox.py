@@ -0,0 +1,112 @@
+import collections
+import threading
+import time
+from typing import Deque, Iterable, Optional
+
+from .message import BaseMessage
+
+
+class WsnMailbox(object):
+    """节点的收件箱（接收队列）
+    投递和取出都直接操作 collections.deque （在 CPython 中是线程安全的），只有在节点线程正阻塞等待消息时，
+    投递方才会去获取锁唤醒它，因此多线程投递几乎没有锁竞争
+    节点线程可以阻塞等待，直到收到消息、计时器到期或者被要求停止
+    投递和取出消息时同时更新所属介质的 in_flight 计数，统计全网积压的消息数不必逐个节点查看收件箱
+    """
+
+    queue: Deque[BaseMessage]
+    # 节点线程是否正在等待消息
+    waiting: bool
+    # 是否被要求停止等待
+    interrupted: bool
+    # 线程池模式下所属工作线程的门铃，投递消息时按响，唤醒等待中的工作线程
+    doorbell: Optional[threading.Event] = None
+    # 所属节点的传播介质（WsnMedium），为 None 时不计数
+    medium = None
+
+    def __init__(self, medium=None):
+        """
+        :param medium: 所属节点的传播介质，投递和取出消息时更新它的 in_flight 计数
+        """
+        self.medium = medium
+        self.queue = collections.deque()
+        self.condition = threading.Condition(threading.Lock())
+        self.waiting = False
+        self.interrupted = False
+
+    def append(self, message: BaseMessage) -> None:
+        """投递一条消息
+        """
+        self.queue.append(message)
+        if self.medium is not None:
+            self.medium.in_flight += 1
+        if self.waiting:
+            with self.condition:
+                self.condition.notify()
+        doorbell = self.doorbell
+        if doorbell is not None and not doorbell.is_set():
+            doorbell.set()
+
+    def extend(self, messages: Iterable[BaseMessage]) -> None:
+        """投递一批消息
+        """
+        count = len(self.queue)
+        self.queue.extend(messages)
+        if self.medium is not None:
+            self.medium.in_flight += len(self.queue) - count
+        if self.waiting:
+            with self.condition:
+                self.condition.notify()
+        doorbell = self.doorbell
+        if doorbell is not None and not doorbell.is_set():
+            doorbell.set()
+
+    def popleft(self) -> BaseMessage:
+        """取出最早投递的一条消息
+        """
+        message = self.queue.popleft()
+        if self.medium is not None:
+            self.medium.in_flight -= 1
+        return message
+
+    def clear(self) -> None:
+        if self.medium is not None:
+            self.medium.in_flight -= len(self.queue)
+        self.queue.clear()
+
+    def wait(self, timeout: Optional[float] = None, wake_on_message: bool = True) -> None:
+        """阻塞等待，直到收到消息（wake_on_message 为 True 时）、超时或者被 interrupt() 打断
+        :param timeout: 超时时间（秒），None 表示不超时
+        :param wake_on_message: 收到消息时是否醒来，否则只等待超时或打断
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            self.waiting = wake_on_message
+            try:
+                while not self.interrupted and not (wake_on_message and self.queue):
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+            finally:
+                self.waiting = False
+
+    def interrupt(self) -> None:
+        """打断等待，之后的 wait() 都会立即返回，直到调用 reset()
+        """
+        with self.condition:
+            self.interrupted = True
+            self.condition.notify_all()
+
+    def reset(self) -> None:
+        """清空收件箱并取消打断状态
+        """
+        with self.condition:
+            self.clear()
+            self.interrupted = False
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def __bool__(self) -> bool:
+        return bool(self.queue)
@@ -1,7 +1,12 @@
 import logging
+import threading
+from typing import List, Optional, Tuple
+
 import numpy
-import time
 
+from utils.trace import EnumTraceEvent, message_flags, message_hash
+
+from .link import WsnLinkMatrix
 from .message import BaseMessage
 
 
@@ -9,41 +14,180 @@ class WsnMedium(object):
     """无线传感网络的无线信号传播介质
     节点往介质中发送信息，介质给节点传递信息
     介质的“物理特性”决定了一个信息将会送达到哪些节点
+
+    时隙模式（slotted = True）下，spread 只登记 (发送者, 消息) ，由调度器在每个循环结束时调用 end_slot() ，
+    一次性向量化地抽样所有发送的接收者并批量投递，本循环发出的消息在下一个循环才会被处理
     """
     # 配置日志
     logger: logging.Logger = logging.getLogger('wsn.medium')
 
     # wsn: Wsn
+    link_matrix: Optional[WsnLinkMatrix]
+    # 与链路概率矩阵的行对应的 node_id
+    node_ids: Optional[numpy.ndarray]
+    slotted: bool
+    # 累计的发送（spread 调用）次数
+    spread_count: int
+    # 累计的成功投递次数，一次发送被 k 个节点收到记为 k 次
+    delivery_count: int
+    # 已经放入节点收件箱、还未被取出处理的消息数，由各节点的收件箱（WsnMailbox）维护，
+    # 与上面两个计数一样不加锁，多线程模式下是近似值
+    in_flight: int
+    # 时隙模式下本时隙内登记的发送，(发送者下标, 消息副本)
+    pending: List[Tuple[int, BaseMessage]]
+    # 收到了消息、需要唤醒的节点下标，为 None 时不记录，由 WsnWorklist 开启和取走
+    woken: Optional[List[numpy.ndarray]]
+    cache_dir_path: Optional[str]
 
-    def __init__(self, wsn):
+    def __init__(self, wsn, cache_dir_path: Optional[str] = None, slotted: bool = False):
+        """
+        :param wsn: 介质所属的无线传感网络
+        :param cache_dir_path: 链路概率矩阵的缓存目录，默认为 get_link_cache_dir_path()
+        :param slotted: 是否使用时隙模式
+        """
         self.wsn = wsn
+        self.cache_dir_path = cache_dir_path
+        self.slotted = slotted
+        self.pending = []
+        self.woken = None
+        self.spread_count = 0
+        self.delivery_count = 0
+        self.in_flight = 0
+        self.link_matrix = None
+        self.node_ids = None
+        self.lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """网络拓扑发生变化（增删节点）后调用，使链路概率矩阵在下次使用时重新加载
+        """
+        with self.lock:
+            self.link_matrix = None
+            self.node_ids = None
+
+    def get_link_matrix(self) -> WsnLinkMatrix:
+        """获取当前拓扑的链路概率矩阵，第 i 行对应 node_manager.nodes[i]
+        """
+        link_matrix = self.link_matrix
+        if link_matrix is not None:
+            return link_matrix
+
+        with self.lock:
+            if self.link_matrix is None:
+                nodes = self.wsn.node_manager.nodes
+                xy = numpy.array([node.xy for node in nodes], dtype=numpy.float64).reshape(-1, 2)
+                r = numpy.array([node.r for node in nodes], dtype=numpy.float64)
+                self.node_ids = numpy.array([node.node_id for node in nodes], dtype=numpy.int64)
+                self.link_matrix = WsnLinkMatrix.load_or_build(xy, r, self.cache_dir_path)
+            return self.link_matrix
+
+    @property
+    def activity_count(self) -> int:
+        """全网累计的收发次数，不变说明这段时间内没有节点收发消息
+        节点只在处理收到的消息时改变路由状态，所以它也不会变化
+        """
+        return self.spread_count + self.delivery_count
+
+    def wake(self, indices: numpy.ndarray) -> None:
+        """通知调度器这些节点有新的事情要做（收到了消息，或者被注入了要发送的消息）
+        :param indices: 节点在 node_manager.nodes 中的下标
+        """
+        woken = self.woken
+        if woken is not None:
+            woken.append(numpy.asarray(indices, dtype=numpy.int64))
 
     def spread(self, source_node, message: BaseMessage) -> None:
-        # 设置随机数种子
-        numpy.random.seed(int(time.time()))
-
-        for target_node in self.wsn.node_manager.nodes:
-            # 两节点间距
-            d = numpy.linalg.norm(numpy.array(source_node.xy) - numpy.array(target_node.xy))
-
-            # 两节点通信半径
-            r1 = source_node.r
-            r2 = target_node.r
-
-            # 两节点通信成功概率
-            if r1 * r2 <= 0:
-                p = 0
-            else:
-                p = 1 - d * d / r1 / r2
-
-            # 不可能成功的事情就不试了
-            if p <= 0:
-                continue
-
-            # 上帝掷骰子
-            if numpy.random.choice((True, False), p=(p, 1 - p)):
-                # 信息传输成功
-                target_node.recv_queue.append(message.copy())
-            else:
-                # 信息传输失败
-                continue
+        self.spread_count += 1
+        delivery_tracer = self.wsn.delivery_tracer
+        if delivery_tracer is not None:
+            # 在登记副本之前记下起始循环，之后的副本都会带上
+            delivery_tracer.stamp(message)
+
+        if self.slotted:
+            # 节点发送后可能还会修改消息，所以登记的是副本
+            self.pending.append((self.wsn.node_manager.node_index[source_node.node_id], message.copy()))
+            return
+
+        link_matrix = self.get_link_matrix()
+        nodes = self.wsn.node_manager.nodes
+
+        # 发送节点能以非零概率送达的节点及概率，不可能成功的事情就不试了
+        indices, probs = link_matrix.row(self.wsn.node_manager.node_index[source_node.node_id])
+
+        # 上帝掷骰子
+        hits = indices[numpy.random.random(len(probs)) < probs]
+        self.delivery_count += len(hits)
+        self.wake(hits)
+        for i in hits:
+            # 信息传输成功
+            nodes[i].recv_queue.append(message.copy())
+
+        event_trace = self.wsn.event_trace
+        if event_trace is not None:
+            event_trace.record_array(
+                EnumTraceEvent.RECEIVE, self.node_ids[hits], source_node.node_id,
+                message_hash(message), message_flags(message)
+            )
+        if delivery_tracer is not None:
+            delivery_tracer.arrive(hits, message)
+
+    def end_slot(self) -> None:
+        """结束当前时隙，一次性决定本时隙内所有发送的接收者并投递
+        """
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+
+        link_matrix = self.get_link_matrix()
+        nodes = self.wsn.node_manager.nodes
+
+        # 把所有发送者的行展开，批量掷骰子
+        owners, receivers, probs = link_matrix.rows(numpy.fromiter((i for i, _ in pending), dtype=numpy.int64))
+        hit = numpy.random.random(len(probs)) < probs
+        owners, receivers = owners[hit], receivers[hit]
+
+        if len(receivers) == 0:
+            return
+        self.delivery_count += len(receivers)
+        self.wake(receivers)
+
+        event_trace = self.wsn.event_trace
+        if event_trace is not None:
+            senders = numpy.fromiter((i for i, _ in pending), dtype=numpy.int64)
+            hashes = numpy.array([message_hash(message) for _, message in pending], dtype=numpy.uint64)
+            flags = numpy.array([message_flags(message) for _, message in pending], dtype=numpy.uint8)
+            event_trace.record_array(
+                EnumTraceEvent.RECEIVE, self.node_ids[receivers], self.node_ids[senders[owners]],
+                hashes[owners], flags[owners]
+            )
+
+        delivery_tracer = self.wsn.delivery_tracer
+        if delivery_tracer is not None:
+            # 本循环发出的消息在下一个循环才会被处理
+            cycle = delivery_tracer.cycle + 1
+            order = numpy.argsort(owners, kind='stable')
+            sorted_owners = owners[order]
+            bounds = numpy.searchsorted(sorted_owners, numpy.arange(len(pending) + 1))
+            for owner, (_, message) in enumerate(pending):
+                # 回应消息和没有记下起始循环的消息不追踪，也就不必取出它们的接收者
+                if getattr(message, 'is_reply', False) or getattr(message, 'origin_tick', None) is None:
+                    continue
+                if bounds[owner] < bounds[owner + 1]:
+                    delivery_tracer.arrive(receivers[order[bounds[owner]:bounds[owner + 1]]], message, cycle)
+
+        # 按接收者分组，同一接收者收到的消息保持发送的先后顺序，每组一次性放入接收队列
+        order = numpy.argsort(receivers, kind='stable')
+        owners, receivers = owners[order].tolist(), receivers[order]
+        bounds = (numpy.flatnonzero(numpy.diff(receivers)) + 1).tolist()
+        starts, stops = [0] + bounds, bounds + [len(owners)]
+        messages = [message for _, message in pending]
+        delivered = [False] * len(pending)
+        for start, stop, receiver in zip(starts, stops, receivers[starts].tolist()):
+            batch = []
+            for owner in owners[start:stop]:
+                # 每条消息的第一个接收者直接拿走登记的副本，其余接收者各拿一份新的副本
+                if delivered[owner]:
+                    batch.append(messages[owner].copy())
+                else:
+                    batch.append(messages[owner])
+                    delivered[owner] = True
+            nodes[receiver].recv_queue.extend(batch)
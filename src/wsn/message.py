@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from uuid import uuid4, UUID
 
 
@@ -50,23 +50,98 @@ class RegisteredMessage(BaseMessage):
 
 class NormalMessage(RegisteredMessage):
     """普通消息
-    比 RegisteredMessage 多了 uuid 和 is_reply 两个属性
+    比 RegisteredMessage 多了 uuid 、is_reply 、ttl 和 origin_tick 四个属性
     """
     uuid: str
     is_reply: bool
+    # 还能经手的跳数，每经手（register）一次减一，为 None 时不限制
+    ttl: Optional[int]
+    # 消息第一次被发送时的循环次数，由送达时延追踪（utils.DeliveryTracer）记下，为 None 时不追踪
+    origin_tick: Optional[int]
 
-    def __init__(self, uuid: str = '', is_reply: bool = False, data: str = '', source: int = 0):
+    def __init__(
+            self, uuid: str = '', is_reply: bool = False, data: str = '', source: int = 0, ttl: Optional[int] = None,
+            origin_tick: Optional[int] = None
+    ):
         """
         :param uuid: 消息组的唯一标识
         :param is_reply: 该消息是否是对一个先前消息的回应
         :param data: 消息内容
         :param source: 源头发送者
+        :param ttl: 跳数限制，源头发送者之外最多经手的节点数，为 None 时不限制
+        :param origin_tick: 消息第一次被发送时的循环次数
         """
         super(NormalMessage, self).__init__(data, source)
         self.uuid = str(UUID(uuid)) if uuid else str(uuid4())
         self.is_reply = is_reply
+        self.ttl = ttl
+        self.origin_tick = origin_tick
+
+    def register(self, node_id: int = 0) -> None:
+        """记录一个经手人，并消耗一跳
+        :param node_id: 经手人的 node_id
+        """
+        super(NormalMessage, self).register(node_id)
+        if self.ttl is not None:
+            self.ttl -= 1
+
+    @property
+    def expired(self) -> bool:
+        """跳数是否已经用完，用完的消息不应再转发
+        """
+        return self.ttl is not None and self.ttl <= 0
+
+    def copy(self):
+        # 介质每投递一次都要复制一次消息，这里跳过 __init__ 中对 uuid 的解析
+        new_message = NormalMessage.__new__(NormalMessage)
+        new_message.data = self.data
+        new_message.handlers = self.handlers.copy()
+        new_message.uuid = self.uuid
+        new_message.is_reply = self.is_reply
+        new_message.ttl = self.ttl
+        new_message.origin_tick = self.origin_tick
+        return new_message
+
+
+class AggregateMessage(NormalMessage):
+    """分簇协议中发往指定节点的汇总消息
+    比 NormalMessage 多了 destination 、readings 和 round_index 三个属性，
+    uuid 是汇聚节点正在收集的消息的 uuid ，handlers[0] 是发出这份汇总的节点（成员或者簇头）
+    """
+    # 这一跳的接收者的 node_id ，其它节点收到后丢弃
+    destination: int
+    # 汇总了哪些节点的数据
+    readings: List[int]
+    # 发出时所在的轮次
+    round_index: int
+
+    def __init__(
+            self, uuid: str = '', data: str = '', source: int = 0, destination: int = 0,
+            readings: Optional[List[int]] = None, round_index: int = 0
+    ):
+        """
+        :param uuid: 汇聚节点正在收集的消息的 uuid
+        :param data: 消息内容
+        :param source: 发出这份汇总的节点
+        :param destination: 这一跳的接收者
+        :param readings: 汇总了哪些节点的数据，默认只有 source 自己
+        :param round_index: 发出时所在的轮次
+        """
+        super(AggregateMessage, self).__init__(uuid=uuid, is_reply=True, data=data, source=source)
+        self.destination = destination
+        self.readings = [source] if readings is None else readings
+        self.round_index = round_index
 
     def copy(self):
-        new_message = NormalMessage(self.uuid, self.is_reply, self.data)
+        new_message = AggregateMessage.__new__(AggregateMessage)
+        new_message.data = self.data
         new_message.handlers = self.handlers.copy()
+        new_message.uuid = self.uuid
+        new_message.is_reply = self.is_reply
+        new_message.ttl = self.ttl
+        new_message.origin_tick = self.origin_tick
+        new_message.destination = self.destination
+        # 汇总的数据发出后不再修改，副本之间可以共享
+        new_message.readings = self.readings
+        new_message.round_index = self.round_index
         return new_message
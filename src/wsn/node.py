@@ -1,16 +1,21 @@
 import logging
 import threading
-import time
 from enum import Enum
+from functools import partial
 from typing import Any, Callable, Dict, List, Tuple, Optional, Set
 
-from utils import node_want_to_terminate
+from utils.trace import EnumTraceEvent, message_flags, message_hash
 
+from .energy import EnumEnergyCause
+from .mailbox import WsnMailbox
 from .message import NormalMessage
+from .retransmit import WsnRetransmitter
 
 
 class WsnNode(object):
     """无线传感网络中的一个节点
+    节点只保存各个协议共用的收发状态，每次活动做什么由网络选用的路由协议（WsnProtocol.step）决定，
+    协议自己需要的状态由协议的 init_node() 建立在节点上
     """
     # 日志配置
     logger: logging.Logger = logging.getLogger('wsn.node')
@@ -37,20 +42,30 @@ class WsnNode(object):
     thread_cnt: str
 
     # 收发消息相关
-    recv_queue: List[NormalMessage]
+    recv_queue: WsnMailbox
     send_queue: List[str or NormalMessage]
     reply_queue: Dict[str, NormalMessage]
     recv_count: int
     replied_nodes: Set[int or str]
     sending: Optional[NormalMessage]
+    sending_attempts: int
     teammate_num: int
-    route_len: Dict[str, Dict[str, int]]
     partners: List[str]
-    action: Callable[..., Any]
-    replied_messages: Set[str]
+    # 节点的一次活动，由 Wsn.set_protocol 设为所选协议的 step
+    action: Optional[Callable[..., Any]]
+    # 节点自己的时钟（活动次数）
+    tick: int
+    # 重传管理器，为 None 时要求回应的协议每次活动都重发所有未确认的消息
+    retransmitter: Optional[WsnRetransmitter]
+    # 正在发送的消息结束时的回调 (节点, 消息, 是否被全部确认)，被全部确认或放弃发送时调用，例如供合成流量发生器统计
+    on_finish: Optional[Callable[['WsnNode', NormalMessage, bool], None]] = None
 
     # 是否多线程模式
     multithreading: bool = True
+    # 多线程模式下是否由线程池（WsnThreadPool）调度，此时节点没有自己的线程，启停只看 thread_cnt 控制位
+    pooled: bool = False
+    # 多线程模式下，有消息需要发送的节点每隔多少秒活动一次
+    tick_interval: float = 5
 
     def __init__(
             self,
@@ -66,28 +81,34 @@ class WsnNode(object):
         self.pc_per_send = pc_per_send
         self.thread = None
         self.thread_cnt = 'stop'
-        self.recv_queue = []
+        self.recv_queue = WsnMailbox(medium)
         self.send_queue = []
         self.reply_queue = dict()
         self.recv_count = 0
         self.replied_nodes = set()
         self.sending = None
+        self.sending_attempts = 0
         self.medium = medium
-        self.action = self.action2
-        self.route_len = {}
+        self.action = None
         self.teammate_num = 0
-        self.replied_messages = set()
+        self.tick = 0
+        self.retransmitter = None
 
     def start(self) -> bool:
         """启动节点
         :return: 只要方法执行完节点是处于运行状态，就返回 True 否则返回 False
         """
-        if self.thread is not None and self.thread.is_alive():
+        if self.is_running:
             return True
 
-        self.recv_queue = []
+        self.recv_queue.reset()
         self.recv_count = 0
 
+        # 由线程池调度的节点只需要打开控制位，工作线程下次巡视时就会调度它
+        if self.pooled:
+            self.thread_cnt = 'start'
+            return True
+
         self.thread_cnt = 'start'
         self.thread = threading.Thread(target=self.thread_main, name=f'node-{self.node_id}')
         self.thread.start()
@@ -99,12 +120,17 @@ class WsnNode(object):
         :param timeout: 等待线程结束的超时时间（秒），如果 < 0 则不等待（函数一定返回 True ），如果 0 则表示无限长的超时时间
         :return: 只要方法执行完节点是处于停止状态，就返回 True 否则返回 False
         """
-        if self.thread is None or not self.thread.is_alive():
+        if not self.is_running:
             self.logger.warning(f'node-{self.node_id} 节点已处于停止状态，不能再停止')
             return True
 
-        # 设置控制位，通知线程应当停止
+        # 设置控制位，并唤醒正在等待的线程，通知线程应当停止
         self.thread_cnt = 'stop'
+        self.recv_queue.interrupt()
+
+        # 由线程池调度的节点没有自己的线程，工作线程看到控制位后不再调度它
+        if self.pooled:
+            return True
 
         if timeout < 0:
             self.logger.info(f'node-{self.node_id} 已通知节点停止，但不等待其停止')
@@ -129,16 +155,44 @@ class WsnNode(object):
     def echo(self) -> None:
         self.logger.info(f'我还活着！')
 
-    def send(self, message: NormalMessage):
+    def send(self, message: NormalMessage, cause: Optional[EnumEnergyCause] = None):
+        """发送一条消息
+        :param message: 需要发送的消息
+        :param cause: 计入能耗账本的耗电原因，不指定则根据消息判断是原始发送、转发还是回应
+        """
         node_tag = ("node-" + str(self.node_id) + ": ") if not self.multithreading else ""
 
+        if cause is None:
+            if message.is_reply:
+                cause = EnumEnergyCause.REPLY
+            elif message.source == self.node_id:
+                cause = EnumEnergyCause.ORIGINAL
+            else:
+                cause = EnumEnergyCause.FORWARD
+
         if self.power - self.pc_per_send >= 0:
             self.power -= self.pc_per_send
+            self.medium.wsn.energy_ledger.record(self, cause, self.pc_per_send)
             self.medium.spread(self, message)
             self.logger.info(f'{node_tag}发送消息 "{message.data}"')
+            event_trace = self.medium.wsn.event_trace
+            if event_trace is not None:
+                if message.is_reply:
+                    kind = EnumTraceEvent.REPLY
+                elif message.source == self.node_id:
+                    kind = EnumTraceEvent.SEND
+                else:
+                    kind = EnumTraceEvent.FORWARD
+                event_trace.record(
+                    kind, self.node_id, message.source, self.power, message_hash(message),
+                    cause.value | message_flags(message)
+                )
         else:
             self.stop()
             self.logger.warning(f'{node_tag}电量不足，发送失败，已关机')
+            event_trace = self.medium.wsn.event_trace
+            if event_trace is not None:
+                event_trace.record(EnumTraceEvent.DEATH, self.node_id, value=self.power)
 
     def thread_main(self) -> None:
         self.logger.info(f'节点启动')
@@ -147,221 +201,65 @@ class WsnNode(object):
                 self.logger.info(f'节点停止')
                 break
             self.action()
-            time.sleep(5)
+            # 还有消息需要发送的节点按节拍定时活动，期间收到的消息留到下次活动时处理；
+            # 空闲节点则一直阻塞，直到收到消息或被要求停止，不占用 CPU
+            if self.is_ticking:
+                self.recv_queue.wait(self.tick_interval, wake_on_message=False)
+            else:
+                self.recv_queue.wait()
 
-    def action0(self):
-        """无限复读广播
+    def finish_sending(self, acknowledged: bool) -> None:
+        """结束正在发送的消息，清空收到的回应
+        :param acknowledged: 消息是否已被全部确认，为 False 时表示放弃发送
         """
-        node_tag = ("node-" + str(self.node_id) + ": ") if not self.multithreading else ""
-
-        # 如果发送队列里有消息需要发送，且当前没有别的消息需要发送，则从发送队列取出一条消息进行发送
-        if self.send_queue and self.sending is None:
-            message = self.send_queue.pop(0)
-            if isinstance(message, str):
-                self.sending = NormalMessage(data=message, source=self.node_id)
-            elif isinstance(message, NormalMessage):
-                self.sending = message
-
-        # 如果当前有正在发送的消息则发送之
-        if self.sending is not None:
-            self.send(NormalMessage(uuid=self.sending.uuid, data=self.sending.data, source=self.node_id))
-
-        # 处理收到的各种消息
-        while self.recv_queue:
-            message = self.recv_queue.pop(0)
-            if message.uuid == self.sending:
-                continue
-
-            self.recv_count += 1
-            self.logger.info(f'{node_tag}接收到消息 "{message.data}"')
+        if self.on_finish is not None:
+            self.on_finish(self, self.sending, acknowledged)
+        self.sending = None
+        self.replied_nodes = set()
 
-            self.sending = message
+    @property
+    def xy(self) -> Tuple[float, float]:
+        return self.x, self.y
 
-    def action1(self) -> Optional[bool]:
-        """要求回应
+    @property
+    def has_pending_output(self) -> bool:
+        """是否还有消息需要发送（或重发）
         """
-        node_tag = ("node-" + str(self.node_id) + ": ") if not self.multithreading else ""
+        return self.sending is not None or bool(self.send_queue) or bool(self.reply_queue)
 
-        # 如果一条消息已经被全部确认，则该条消息发送完毕
-        if self.sending is not None and len(self.replied_nodes) >= self.teammate_num:
-            self.sending = None
-            self.replied_nodes = set()
-            # 唤醒主线程
-            if self.multithreading:
-                self.logger.info(f'唤起主线程')
-                node_want_to_terminate.set()
-            else:
-                return True
-
-        # 如果发送队列里有消息需要发送，且当前没有别的消息需要发送，则从发送队列取出一条消息进行发送
-        if self.send_queue and self.sending is None:
-            message = self.send_queue.pop(0)
-            if isinstance(message, str):
-                self.sending = NormalMessage(data=message, source=self.node_id)
-            elif isinstance(message, NormalMessage):
-                self.sending = message
-
-        # 如果当前有正在发送的消息则发送之
-        if self.sending is not None:
-            self.send(self.sending)
-
-        # 处理收到的各种消息
-        recv_set = set()
-        while self.recv_queue:
-            message = self.recv_queue.pop(0)
-            # 自己发送的或者处理过的消息丢弃
-            if self.node_id in message.handlers:
-                if self.sending is not None and message.uuid == self.sending.uuid and message.is_reply:
-                    self.replied_nodes.add(message.handlers[0])
-                continue
-
-            if f'{message.uuid}-{message.handlers[0]}-{message.handlers[-1]}' not in recv_set:
-                recv_set.add(f'{message.uuid}-{message.handlers[0]}-{message.handlers[-1]}')
-
-                if not message.is_reply:
-                    self.recv_count += 1
-                    self.logger.info(f'{node_tag}接收到消息 "{message.data}"')
-
-                # 给消息注册上自己名字，转发之
-                message.register(self.node_id)
-                self.send(message)
-
-                # 如果消息不是一个回应，则同时发送一条对该消息的回应
-                if not message.is_reply:
-                    self.send(NormalMessage(uuid=message.uuid, is_reply=True, data=message.data, source=self.node_id))
-
-    def action2(self) -> Optional[bool]:
-        """要求回应，最常用路径，原路回应
+    @property
+    def is_ticking(self) -> bool:
+        """多线程模式下是否按节拍定时活动：还有消息需要发送，或者协议还有不依赖收到消息的定时行为
         """
-        node_tag = ("node-" + str(self.node_id) + ": ") if not self.multithreading else ""
-
-        # 如果一条消息已经被全部确认，则该条消息发送完毕
-        if self.sending is not None and not self.sending.is_reply and len(self.replied_nodes) >= self.teammate_num:
-            self.sending = None
-            self.replied_nodes = set()
-            # 唤醒主线程
-            if self.multithreading:
-                self.logger.info(f'唤起主线程')
-                node_want_to_terminate.set()
-            else:
-                return True
-
-        # 如果发送队列里有消息需要发送，且当前没有别的消息需要发送，则从发送队列取出一条消息进行发送
-        if self.send_queue and self.sending is None:
-            message = self.send_queue.pop(0)
-            if isinstance(message, str):
-                self.sending = NormalMessage(data=message, source=self.node_id)
-            elif isinstance(message, NormalMessage):
-                self.sending = message
-
-        # 如果当前有正在发送的消息则发送之
-        if self.sending is not None:
-            self.send(self.sending)
-        for i, reply in self.reply_queue.items():
-            for _ in range(1):
-                self.send(reply)
-
-        # 处理收到的各种消息
-        while self.recv_queue:
-            message = self.recv_queue.pop(0)
-
-            if message.is_reply:
-
-                self.logger.info(f'{node_tag}接收到消息 "{message.data}" {message.handlers}')
-                if self.reply_queue.get(f'{message.uuid}-{message.handlers[0]}') is not None and \
-                        len(
-                            self.reply_queue.get(f'{message.uuid}-{message.handlers[0]}').handlers
-                        ) > len(message.handlers):
-                    self.reply_queue.pop(f'{message.uuid}-{message.handlers[0]}')
-                    continue
-
-                if len(message.handlers) < 2:
-                    continue
-
-                if self.node_id != message.handlers[1]:
-                    continue
-
-                message.handlers.pop(1)
-                self.send(message)
-
-                if self.sending is not None and not self.sending.is_reply and message.uuid == self.sending.uuid:
-                    self.replied_nodes.add(message.handlers[0])
-                    continue
-
-                if f'{message.uuid}-{message.handlers[0]}' not in self.replied_messages:
-                    self.replied_messages.add(f'{message.uuid}-{message.handlers[0]}')
-                    self.reply_queue[f'{message.uuid}-{message.handlers[0]}'] = message
+        if self.has_pending_output:
+            return True
+        return self.medium.wsn.protocol.has_timer(self)
 
-            else:
-                # 自己发送的或者处理过的消息丢弃
-                if self.node_id in message.handlers:
-                    continue
-
-                self.recv_count += 1
-                self.logger.info(f'{node_tag}接收到消息 "{message.data}" {message.handlers}')
-
-                if str(message.handlers[0]) not in self.route_len.keys():
-                    self.route_len[str(message.handlers[0])] = {}
-                start_point_route = self.route_len[str(message.handlers[0])]
-                if str(message.handlers[-1]) not in start_point_route.keys():
-                    start_point_route[str(message.handlers[-1])] = 0
-                start_point_route[str(message.handlers[-1])] += 1
-
-                # 是从最常见路径传播过来的
-                if start_point_route[str(message.handlers[-1])] == max(*list(start_point_route.values()) + [0]):
-                    # 给消息注册上自己名字，转发之
-                    message.register(self.node_id)
-                    self.send(message)
-
-                    # 没回复过的消息回应以下
-                    if message.uuid not in self.replied_messages:
-                        message.is_reply = True
-                        message.handlers = message.handlers[::-1]
-                        self.replied_messages.add(message.uuid)
-                        self.reply_queue[f'{message.uuid}-{message.handlers[0]}'] = message
-
-    def action3(self):
-        """节点一次活动（方案二）
-        在多线程模式时，该函数每隔一段休眠时间运行一次
-        在单线程模式，由调度器调度运行
+    @property
+    def is_idle(self) -> bool:
+        """节点此刻活动一次是否什么都不会做
+        没有待处理的消息，也没有要发送的消息和在计时的重传；或者还有消息要发送，但电量已经不够发送，
+        且正在发送的消息也还没有被全部确认（否则下次活动时会要求终止）
         """
-        node_tag = ("node-" + str(self.node_id) + ": ") if not self.multithreading else ""
-
-        # 如果发送队列里有消息需要发送，且当前没有别的消息需要发送，则从发送队列取出一条消息进行发送
-        if self.send_queue and self.sending is None:
-            message = self.send_queue.pop(0)
-            if isinstance(message, str):
-                self.sending = NormalMessage(data=message, source=self.node_id)
-                self.replied_nodes.add(self.node_id)
-            elif isinstance(message, NormalMessage):
-                self.sending = message
-
-        # 如果当前有正在发送的消息则发送之
-        if self.sending is not None:
-            for _ in range(100):
-                self.send(self.sending)
-            self.sending = None
-
-        # 处理收到的各种消息
-        while self.recv_queue:
-            message = self.recv_queue.pop(0)
-            # 自己发送的或者处理过的消息丢弃
-            if message.uuid in self.replied_nodes:
-                continue
-
-            self.recv_count += 1
-            self.replied_nodes.add(message.uuid)
-            self.logger.info(f'{node_tag}接收到消息 "{message.data}"')
-
-            self.send_queue.append(message)
+        if self.recv_queue:
+            return False
+        if not self.has_pending_output:
+            return self.retransmitter is None or not self.retransmitter
+        return self.power < self.pc_per_send and not (
+            self.sending is not None and not self.sending.is_reply and len(self.replied_nodes) >= self.teammate_num
+        )
 
     @property
-    def xy(self) -> Tuple[float, float]:
-        return self.x, self.y
+    def is_running(self) -> bool:
+        """节点是否处于运行状态，由线程池调度时看控制位，否则看节点线程是否还活着
+        """
+        if self.pooled:
+            return self.thread_cnt == 'start'
+        return self.thread is not None and self.thread.is_alive()
 
     @property
     def is_alive(self):
-        return not self.multithreading or (self.thread is not None and self.thread.is_alive())
+        return not self.multithreading or self.is_running
 
 
 class WsnNodeManager(object):
@@ -372,18 +270,31 @@ class WsnNodeManager(object):
     logger: logging = logging.getLogger('wsn.nm')
 
     nodes: List[WsnNode]
+    # node_id 到节点在 nodes 中下标的映射
+    node_index: Dict[int, int]
     # wsn: Wsn
 
     def __init__(self, wsn) -> None:
         self.nodes = []
+        self.node_index = {}
         self.wsn = wsn
 
-    def add_node(self, x: float, y: float, r: float, power: float, pc_per_send: float) -> WsnNode:
-
-        new_node_id = self.nodes[-1].node_id + 1 if len(self.nodes) > 0 else 1
+    def add_node(
+            self, x: float, y: float, r: float, power: float, pc_per_send: float, node_id: Optional[int] = None
+    ) -> WsnNode:
+        """
+        :param node_id: 新节点的 node_id ，默认为最后一个节点的 node_id 加 1
+        """
+        if node_id is not None and node_id in self.node_index:
+            raise ValueError(f'node-{node_id} 已经存在')
+        new_node_id = node_id if node_id is not None else self.nodes[-1].node_id + 1 if len(self.nodes) > 0 else 1
 
         new_node = WsnNode(new_node_id, x, y, r, power, pc_per_send, self.wsn.medium)
         self.nodes.append(new_node)
+        self.node_index[new_node_id] = len(self.nodes) - 1
+        self.wsn.medium.invalidate()
+        new_node.action = partial(self.wsn.protocol.step, new_node)
+        self.wsn.protocol.init_node(new_node)
 
         self.logger.info(f'新增节点 node-{new_node_id} ({x}, {y}), r={r}, power={power}, pc_per_send={pc_per_send}')
 
@@ -391,9 +302,13 @@ class WsnNodeManager(object):
 
     def pop_node(self, node_id: int) -> Optional[WsnNode]:
         try:
-            return self.nodes.pop(self.get_nodes_id().index(node_id))
+            node = self.nodes.pop(self.get_nodes_id().index(node_id))
         except ValueError:
             return None
+        self.node_index = {each.node_id: i for i, each in enumerate(self.nodes)}
+        self.wsn.medium.invalidate()
+        self.wsn.protocol.remove_node(node)
+        return node
 
     def get_nodes_id(self) -> List[int]:
         return [node.node_id for node in self.nodes]
@@ -0,0 +1,114 @@
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+
+class WsnThreadPool(object):
+    """多线程模式的工作线程池
+    用固定数量的工作线程代替一个节点一个线程：每个工作线程拥有一个分片的节点，反复巡视分片，
+    调度其中到期的节点活动一次，没有节点到期时等待门铃（分片中有节点收到消息）或最近的节拍
+    节点的活动时机与 WsnNode.thread_main 相同：还有消息需要发送的节点每隔 tick_interval 秒活动一次，
+    期间收到的消息留到下次活动时处理；空闲节点收到消息时活动；启动后立即活动一次
+    节点的启停和存活仍然通过 WsnNode.start 、stop 和 is_alive 判断，只是改由 thread_cnt 控制位表示
+    线程池启动后新增的节点不会被调度
+    """
+    # 日志配置
+    logger: logging.Logger = logging.getLogger('wsn.pool')
+
+    # wsn: Wsn
+    num_of_workers: int
+    # 每个工作线程的节点分片
+    shards: List[list]
+    # 每个工作线程的门铃
+    doorbells: List[threading.Event]
+    threads: List[threading.Thread]
+    # 是否被要求停止
+    stopping: bool
+
+    def __init__(self, wsn, num_of_workers: Optional[int] = None):
+        """
+        :param wsn: 需要调度的无线传感网络
+        :param num_of_workers: 工作线程数，为 None 时取 CPU 核数
+        """
+        num_of_workers = (os.cpu_count() or 1) if num_of_workers is None else num_of_workers
+        if num_of_workers < 1:
+            raise ValueError('工作线程数不能小于 1')
+        self.wsn = wsn
+        self.num_of_workers = num_of_workers
+        self.shards = []
+        self.doorbells = []
+        self.threads = []
+        self.stopping = False
+
+    def start(self) -> bool:
+        """把节点按下标轮流分给各个工作线程，启动所有节点和工作线程
+        :return: 如果全部启动成功，则返回 True ，否则返回 False
+        """
+        nodes = self.wsn.node_manager.nodes
+        num_of_workers = max(1, min(self.num_of_workers, len(nodes)))
+        self.stopping = False
+        self.shards = [nodes[k::num_of_workers] for k in range(num_of_workers)]
+        self.doorbells = [threading.Event() for _ in range(num_of_workers)]
+        for shard, doorbell in zip(self.shards, self.doorbells):
+            for node in shard:
+                node.pooled = True
+                node.recv_queue.doorbell = doorbell
+                node.start()
+
+        self.threads = [
+            threading.Thread(target=self.worker_main, args=(shard, doorbell), name=f'pool-{k}')
+            for k, (shard, doorbell) in enumerate(zip(self.shards, self.doorbells))
+        ]
+        for thread in self.threads:
+            thread.start()
+        self.logger.info(f'启动了 {len(self.threads)} 个工作线程，调度 {len(nodes)} 个节点')
+        return all(thread.is_alive() for thread in self.threads)
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """停止所有节点，然后通知工作线程退出并等待
+        :param timeout: 等待每个工作线程结束的超时时间（秒），为 None 时一直等待
+        :return: 如果全部停止成功，则返回 True ，否则返回 False
+        """
+        for shard in self.shards:
+            for node in shard:
+                if node.is_running:
+                    node.stop()
+                node.recv_queue.doorbell = None
+        self.stopping = True
+        for doorbell in self.doorbells:
+            doorbell.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        stopped = not any(thread.is_alive() for thread in self.threads)
+        if stopped:
+            self.logger.info('所有工作线程已停止')
+        else:
+            self.logger.warning('部分工作线程停止超时')
+        return stopped
+
+    def worker_main(self, shard: list, doorbell: threading.Event) -> None:
+        # 每个节点下次活动的时刻，为 None 时等到收到消息才活动；刚启动的节点立即活动
+        due: List[Optional[float]] = [0.] * len(shard)
+        while not self.stopping:
+            # 先清门铃再巡视，巡视期间送达的消息会让下面的等待立即返回
+            doorbell.clear()
+            now = time.time()
+            next_due = None
+            acted = False
+            for k, node in enumerate(shard):
+                if self.stopping:
+                    break
+                if node.thread_cnt != 'start':
+                    # 停止的节点重新启动后立即活动
+                    due[k] = 0.
+                    continue
+                if due[k] is None and node.recv_queue or due[k] is not None and due[k] <= now:
+                    node.action()
+                    acted = True
+                    due[k] = time.time() + node.tick_interval if node.is_ticking else None
+                if due[k] is not None and (next_due is None or due[k] < next_due):
+                    next_due = due[k]
+            if not acted:
+                doorbell.wait(None if next_due is None else max(0., next_due - time.time()))
@@ -0,0 +1,18 @@
+from .base import PROTOCOLS, WsnProtocol, get_protocol, register_protocol
+from .flooding import (
+    DuplicateFilterMixin, WsnFloodingProtocol, RepeatBroadcastProtocol, OnceFloodingProtocol,
+    ReplyRequiredProtocol, ReverseRouteReplyProtocol
+)
+from .cluster import LeachProtocol
+from .gossip import (
+    GossipState, WsnGossipProtocol, ProbabilisticGossipProtocol, CounterGossipProtocol, DistanceGossipProtocol
+)
+
+
+__all__ = [
+    'PROTOCOLS', 'WsnProtocol', 'get_protocol', 'register_protocol',
+    'DuplicateFilterMixin', 'WsnFloodingProtocol', 'RepeatBroadcastProtocol', 'OnceFloodingProtocol',
+    'ReplyRequiredProtocol', 'ReverseRouteReplyProtocol',
+    'GossipState', 'WsnGossipProtocol', 'ProbabilisticGossipProtocol', 'CounterGossipProtocol', 'DistanceGossipProtocol',
+    'LeachProtocol',
+]
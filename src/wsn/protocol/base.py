@@ -0,0 +1,86 @@
+import logging
+from typing import Dict, Optional, Type
+
+
+class WsnProtocol(object):
+    """路由协议
+    所有路由协议的基类，一个协议对象在一次运行中被网络中的所有节点共享
+    协议可以在 init() 和 init_node() 中建立自己需要的状态（节点上的属性或者全网的数组）
+
+    每个协议都必须实现 step() ，即一个节点的一次活动，供多线程模式和不支持批量调度的情况使用；
+    如果协议还实现了 step_all() ，即一次推进全网所有节点，应把 supports_batch 设为 True ，
+    单线程模式的调度器会优先使用批量实现
+    """
+    # 日志配置
+    logger: logging.Logger = logging.getLogger('wsn.protocol')
+
+    # 协议的注册名
+    name: str = ''
+    # 是否实现了 step_all()
+    supports_batch: bool = False
+
+    def init(self, wsn) -> None:
+        """协议被网络选用时调用一次，此后新增的节点会单独调用 init_node()
+        """
+        for node in wsn.node_manager.nodes:
+            self.init_node(node)
+
+    def init_node(self, node) -> None:
+        """初始化一个节点上本协议需要的状态
+        """
+        pass
+
+    def remove_node(self, node) -> None:
+        """节点被移出网络时调用，清理本协议为其保存的状态
+        """
+        pass
+
+    def step(self, node) -> Optional[bool]:
+        """一个节点的一次活动
+        :return: 为 True 时表示该节点要求终止网络
+        """
+        raise NotImplementedError
+
+    def is_idle(self, node) -> bool:
+        """节点此刻调用 step() 是否什么都不会做，单线程模式的调度器只调度不空闲的节点
+        节点有自己的定时行为（不依赖收到消息）的协议需要重写
+        """
+        return node.is_idle
+
+    def has_timer(self, node) -> bool:
+        """节点没有消息要发送时是否还有定时行为，多线程模式下这样的节点按节拍活动，而不是阻塞到收到消息为止
+        """
+        return False
+
+    def step_all(self, wsn) -> bool:
+        """全网所有节点的一次活动（一个循环）
+        :return: 为 True 时表示有节点要求终止网络
+        """
+        raise NotImplementedError
+
+
+# 注册名 -> 协议类
+PROTOCOLS: Dict[str, Type[WsnProtocol]] = {}
+
+
+def register_protocol(*aliases: str):
+    """注册一个协议类，使之可以通过 get_protocol() 按名字选用
+    :param aliases: 协议除了 name 以外的别名
+    """
+    def decorator(protocol_type: Type[WsnProtocol]) -> Type[WsnProtocol]:
+        for name in (protocol_type.name, ) + aliases:
+            if name in PROTOCOLS:
+                raise ValueError(f'协议名 `{name}` 已被注册')
+            PROTOCOLS[name] = protocol_type
+        return protocol_type
+    return decorator
+
+
+def get_protocol(name: str, **kwargs) -> WsnProtocol:
+    """按注册名创建一个协议
+    :param name: 协议的注册名或别名
+    :param kwargs: 协议的参数
+    """
+    if name not in PROTOCOLS:
+        raise ValueError(f'未知的协议 `{name}` ，可选的协议有 {sorted(PROTOCOLS)}')
+    return PROTOCOLS[name](**kwargs)
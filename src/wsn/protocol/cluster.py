@@ -0,0 +1,394 @@
+import threading
+from typing import Optional
+
+import numpy
+
+from utils import node_want_to_terminate
+
+from ..analysis import etx_routes
+from ..energy import EnumEnergyCause
+from ..message import AggregateMessage, NormalMessage
+from ..sketch import ExpiringSet
+from .base import register_protocol, WsnProtocol
+
+
+@register_protocol()
+class LeachProtocol(WsnProtocol):
+    """LEACH 式的分簇协议
+    汇聚节点（默认是一号节点）发送队列中的每条消息是一次数据收集任务，其它节点不需要收到它，
+    而是每一轮各自把一份数据交给自己的簇头，直到汇聚节点收齐 teammate_num 个节点的数据，与 action2 的结束条件相同
+
+    网络按 round_length 个循环划分成轮，每轮开始时一次性向量化地重新分簇：
+      - 选簇头：沿用 LEACH 的阈值 T = p / (1 - p (r mod 1/p)) ，每 1/p 轮为一个周期，本周期内当过簇头的节点不参选，
+        阈值再乘以节点剩余电量与存活节点平均剩余电量之比，电量多的节点更容易当选，簇头随轮次轮换
+      - 入簇：每个节点加入链路概率最高（最近）的簇头，链路概率低于 min_link_prob 的簇头不考虑；没有簇头可加入的节点中，
+        剩余电量是这些节点的邻居里最多的当簇头，其余的再入簇，重复到每个节点都有簇头为止
+      - 路由：求存活节点到汇聚节点的期望发送次数最小的路径（见 etx_routes ）
+    相当于 LEACH-C 由汇聚节点集中分簇后广播结果，广播中一并告知当前任务已经收到了哪些节点的数据，这些节点本轮不再交出数据；
+    簇头广播通告、成员申请入簇各计一次原始发送的耗电（control_cost）
+    成员把数据单跳发给簇头，簇头等待 aggregate_delay 个循环后把收到的数据汇总成一条消息，沿路径发往汇聚节点；
+    节点通信半径有限，簇头大多无法直接送达汇聚节点，所以与原始的 LEACH 不同，汇总沿多跳路径转发，
+    途经的节点把同一次活动中收到的所有汇总合并成一条再发出
+    每一跳都与 action2 的回应一样以旁听代替确认：听到下一跳发出了包含自己数据的消息就不再重发，
+    否则每隔 retry_interval 个循环重发一次，最多发送 max_attempts 次；汇聚节点不再转发，改为每次收到汇总后广播一条确认
+
+    时钟是能耗账本的循环数，多线程模式下是调度器的检查次数，还有数据要交出或转发的节点按节拍活动（见 has_timer() ）；
+    单线程模式下由 step_all() 只调度当轮有事可做的节点
+    """
+    name = 'leach'
+    supports_batch = True
+
+    # 期望的簇头比例
+    p: float
+    # 每轮的循环数
+    round_length: int
+    # 簇头在轮次开始后等待成员数据的循环数
+    aggregate_delay: int
+    # 每一跳最多发送的次数
+    max_attempts: int
+    # 没有收到确认时重发的间隔（循环数）
+    retry_interval: int
+    # 入簇和竞选簇头时只考虑链路概率不低于它的邻居
+    min_link_prob: float
+    # 是否计入分簇时的控制消息耗电
+    control_cost: bool
+    # 汇聚节点在 node_manager.nodes 中的下标
+    sink: int
+
+    # 当前轮次，尚未分簇时为 -1
+    round_index: int
+    # 以下数组的下标与 node_manager.nodes 一致
+    # 本轮的簇头
+    heads: Optional[numpy.ndarray]
+    # 本轮每个节点的簇头下标，簇头自己和死亡的节点为 -1
+    head_of: Optional[numpy.ndarray]
+    # 本轮每个节点发往汇聚节点的下一跳下标，无法送达时为 -1
+    next_hop: Optional[numpy.ndarray]
+    # 每个节点上次当选簇头的轮次
+    last_head_round: Optional[numpy.ndarray]
+    # 本轮还需要交出数据的节点
+    pending: Optional[numpy.ndarray]
+    # 每个簇头发出汇总的循环，没有在等待成员数据时为 -1
+    aggregate_due: Optional[numpy.ndarray]
+    # 汇聚节点收到的（去重后的）数据数，跨越所有任务累计
+    delivered: int
+
+    def __init__(
+            self, p: float = 0.05, round_length: int = 20, aggregate_delay: int = 1, max_attempts: int = 4,
+            retry_interval: int = 2, min_link_prob: float = 0.5, control_cost: bool = True, sink: int = 0
+    ):
+        """
+        :param p: 期望的簇头比例
+        :param round_length: 每轮的循环数
+        :param aggregate_delay: 簇头在轮次开始后等待成员数据的循环数
+        :param max_attempts: 每一跳最多发送的次数
+        :param retry_interval: 没有收到确认时重发的间隔（循环数），应大于下一跳转发所需的循环数
+        :param min_link_prob: 入簇和竞选簇头时只考虑链路概率不低于它的邻居
+        :param control_cost: 是否计入分簇时的控制消息耗电
+        :param sink: 汇聚节点在 node_manager.nodes 中的下标
+        """
+        if not 0 < p <= 1:
+            raise ValueError('簇头比例必须在 (0, 1] 之间')
+        if round_length < 1:
+            raise ValueError('每轮的循环数不能小于 1')
+        if not 0 <= aggregate_delay < round_length:
+            raise ValueError('簇头的等待时间必须小于每轮的循环数')
+        if max_attempts < 1:
+            raise ValueError('发送次数不能小于 1')
+        if retry_interval < 1:
+            raise ValueError('重发间隔不能小于 1')
+        if not 0 <= min_link_prob < 1:
+            raise ValueError('链路概率阈值必须在 [0, 1) 之间')
+        self.p = p
+        self.round_length = round_length
+        self.aggregate_delay = aggregate_delay
+        self.max_attempts = max_attempts
+        self.retry_interval = retry_interval
+        self.min_link_prob = min_link_prob
+        self.control_cost = control_cost
+        self.sink = sink
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.round_index = -1
+        self.heads = None
+        self.head_of = None
+        self.next_hop = None
+        self.last_head_round = None
+        self.pending = None
+        self.aggregate_due = None
+        self.delivered = 0
+
+    def init(self, wsn) -> None:
+        super(LeachProtocol, self).init(wsn)
+        self.reset()
+
+    def init_node(self, node) -> None:
+        # 等待发出的数据（数据来自哪些节点）
+        node.cluster_readings = set()
+        # 已经汇总过的数据，(数据来自的节点, 轮次)
+        node.cluster_forwarded = ExpiringSet(2)
+        # 等待下一跳确认的汇总，序号 -> [消息, 已发送次数, 下次发送的循环]
+        node.cluster_outbox = {}
+        node.cluster_sequence = 0
+        # 拓扑变化后下一次活动时重新分簇
+        self.round_index = -1
+
+    def remove_node(self, node) -> None:
+        self.round_index = -1
+
+    def update_round(self, wsn) -> int:
+        """进入新的一轮（或者拓扑发生了变化）时重新分簇
+        :return: 当前轮次
+        """
+        round_index = wsn.energy_ledger.cycle // self.round_length
+        if round_index == self.round_index and len(self.heads) == len(wsn.node_manager.nodes):
+            return round_index
+        with self.lock:
+            if round_index != self.round_index or len(self.heads) != len(wsn.node_manager.nodes):
+                self.form_clusters(wsn, round_index)
+        return round_index
+
+    def join(self, link_matrix, nodes: numpy.ndarray, heads: numpy.ndarray, head_of: numpy.ndarray) -> None:
+        """让一组节点加入各自链路概率最高的簇头，没有簇头可加入的节点不变
+        """
+        owners, receivers, probs = link_matrix.rows(nodes)
+        reachable = heads[receivers] & (probs >= self.min_link_prob)
+        owners, receivers, probs = owners[reachable], receivers[reachable], probs[reachable]
+        order = numpy.lexsort((-probs, owners))
+        owners, receivers = owners[order], receivers[order]
+        first = numpy.flatnonzero(numpy.r_[True, owners[1:] != owners[:-1]]) if len(owners) else owners
+        head_of[nodes[owners[first]]] = receivers[first]
+
+    def form_clusters(self, wsn, round_index: int) -> None:
+        """向量化地完成一轮的选簇头、入簇和路由
+        """
+        nodes = wsn.node_manager.nodes
+        node_num = len(nodes)
+        epoch = max(int(round(1 / self.p)), 1)
+        if self.last_head_round is None or len(self.last_head_round) != node_num:
+            self.last_head_round = numpy.full(node_num, -epoch, dtype=numpy.int64)
+            self.aggregate_due = numpy.full(node_num, -1, dtype=numpy.int64)
+
+        link_matrix = wsn.medium.get_link_matrix()
+        power = numpy.fromiter((node.power for node in nodes), dtype=numpy.float64, count=node_num)
+        pc_per_send = numpy.fromiter((node.pc_per_send for node in nodes), dtype=numpy.float64, count=node_num)
+        alive = power >= pc_per_send
+        is_sink = numpy.arange(node_num) == self.sink
+
+        # 按 LEACH 的阈值选簇头，汇聚节点本身总是簇头；周期的最后一轮阈值为 1 ，没当过簇头的节点全部当选，
+        # 下一个周期开始时所有节点重新参选
+        eligible = alive & (self.last_head_round < round_index - round_index % epoch)
+        threshold = self.p / (1 - self.p * (round_index % epoch))
+        mean_power = power[alive].mean() if alive.any() else 0.
+        weight = power / mean_power if mean_power > 0 else numpy.zeros(node_num)
+        heads = eligible & (numpy.random.random(node_num) < numpy.minimum(threshold * weight, 1)) | is_sink
+
+        # 入簇，没有簇头可加入的节点按剩余电量就地选出簇头
+        head_of = numpy.full(node_num, -1, dtype=numpy.int64)
+        self.join(link_matrix, numpy.flatnonzero(alive & ~heads), heads, head_of)
+        # 电量相同时下标小的优先
+        rank = numpy.lexsort((-numpy.arange(node_num), power)).argsort()
+        while True:
+            orphans = alive & ~heads & (head_of < 0)
+            if not orphans.any():
+                break
+            candidates = numpy.flatnonzero(orphans)
+            owners, receivers, probs = link_matrix.rows(candidates)
+            # 链路矩阵包含节点自己
+            rivals = orphans[receivers] & (receivers != candidates[owners]) & (probs >= self.min_link_prob)
+            best = numpy.full(len(candidates), -1, dtype=numpy.int64)
+            numpy.maximum.at(best, owners[rivals], rank[receivers[rivals]])
+            heads[candidates[rank[candidates] > best]] = True
+            self.join(link_matrix, numpy.flatnonzero(orphans & ~heads), heads, head_of)
+        self.last_head_round[heads & ~is_sink] = round_index
+
+        # 路由
+        relays = alive | is_sink
+        _, next_hop = etx_routes(link_matrix, numpy.array([self.sink]), relays)
+
+        # 簇头广播通告、成员申请入簇的耗电
+        if self.control_cost:
+            controls = heads & alive & ~is_sink | (head_of >= 0)
+            wsn.energy_ledger.record_array(EnumEnergyCause.ORIGINAL, numpy.where(controls, pc_per_send, 0.))
+            wsn.medium.spread_count += int(controls.sum())
+            for i in numpy.flatnonzero(controls).tolist():
+                nodes[i].power -= pc_per_send[i]
+
+        replied = nodes[self.sink].replied_nodes if self.sink < node_num else set()
+        delivered = numpy.fromiter((node.node_id in replied for node in nodes), dtype=bool, count=node_num)
+        self.pending = alive & ~is_sink & ~delivered
+        self.heads, self.head_of, self.next_hop = heads, head_of, next_hop
+        self.round_index = round_index
+        self.logger.info(
+            f'第 {round_index} 轮分簇：{int(heads.sum())} 个簇头，{int((head_of >= 0).sum())} 个成员，'
+            f'{int((next_hop >= 0).sum())} 个节点能够送达汇聚节点'
+        )
+
+    def task(self, wsn) -> Optional[NormalMessage]:
+        """汇聚节点正在进行的收集任务
+        """
+        nodes = wsn.node_manager.nodes
+        return nodes[self.sink].sending if self.sink < len(nodes) else None
+
+    def post(self, node, message: AggregateMessage, cycle: int) -> None:
+        """把一条汇总放进节点的待发队列，立即发送第一次
+        """
+        node.cluster_sequence += 1
+        node.cluster_outbox[node.cluster_sequence] = [message, 0, cycle]
+        self.flush(node, cycle)
+
+    def flush(self, node, cycle: int) -> None:
+        """发送待发队列中到了重发时间的汇总，发满 max_attempts 次的不再发送
+        """
+        for key, entry in list(node.cluster_outbox.items()):
+            message, attempts, due = entry
+            if due > cycle:
+                continue
+            node.send(message, EnumEnergyCause.RETRANSMIT if attempts else None)
+            entry[1] = attempts + 1
+            entry[2] = cycle + self.retry_interval
+            if entry[1] >= self.max_attempts:
+                node.cluster_outbox.pop(key)
+
+    @staticmethod
+    def acknowledge(node, message: AggregateMessage) -> None:
+        """旁听到下一跳发出了包含待发汇总的消息，相当于收到了确认
+        """
+        sender = message.handlers[-1]
+        readings = None
+        for key, (pending, _, _) in list(node.cluster_outbox.items()):
+            if pending.destination != sender:
+                continue
+            readings = set(message.readings) if readings is None else readings
+            if pending.readings[0] in readings:
+                node.cluster_outbox.pop(key)
+
+    def step(self, node) -> Optional[bool]:
+        node_tag = ("node-" + str(node.node_id) + ": ") if not node.multithreading else ""
+        wsn = node.medium.wsn
+        node_manager = wsn.node_manager
+        round_index = self.update_round(wsn)
+        cycle = wsn.energy_ledger.cycle
+        index = node_manager.node_index[node.node_id]
+        node.tick += 1
+        node.cluster_forwarded.expire(round_index)
+
+        # 汇聚节点收齐数据后结束当前任务，开始下一个任务
+        if index == self.sink:
+            if node.sending is not None and len(node.replied_nodes) >= node.teammate_num:
+                node.finish_sending(True)
+                if node.multithreading:
+                    node.logger.info(f'唤起主线程')
+                    node_want_to_terminate.set()
+                else:
+                    return True
+            if node.send_queue and node.sending is None:
+                message = node.send_queue.pop(0)
+                node.sending = NormalMessage(data=message, source=node.node_id) if isinstance(message, str) else message
+                node.logger.info(f'{node_tag}开始收集 "{node.sending.data}"')
+                # 新的任务需要所有节点交出数据，不必等到下一轮
+                self.pending[:] = True
+                self.pending[self.sink] = False
+
+        task = self.task(wsn)
+        # 汇聚节点本次收到的数据
+        received = set()
+        while node.recv_queue:
+            message = node.recv_queue.popleft()
+            if not isinstance(message, AggregateMessage):
+                continue
+            if node.cluster_outbox:
+                self.acknowledge(node, message)
+            # 只处理发给自己的汇总，其余的都是旁听到的
+            if message.destination != node.node_id:
+                continue
+            node.recv_count += 1
+            if task is None or message.uuid != task.uuid:
+                continue
+            if index == self.sink:
+                received.update(message.readings)
+                new_readings = set(message.readings) - node.replied_nodes
+                new_readings.discard(node.node_id)
+                node.replied_nodes |= new_readings
+                self.delivered += len(new_readings)
+                continue
+            # 上一跳没听到确认而重发的数据不再汇总
+            for reading in message.readings:
+                if (reading, message.round_index) not in node.cluster_forwarded.times:
+                    node.cluster_forwarded.add((reading, message.round_index))
+                    node.cluster_readings.add(reading)
+
+        # 汇聚节点不再转发，收到数据后广播一次确认，包含本次收到的所有数据
+        if received:
+            node.send(AggregateMessage(
+                uuid=task.uuid, data=task.data, source=node.node_id, destination=node.node_id,
+                readings=sorted(received), round_index=round_index
+            ))
+
+        # 每轮交出一次自己的数据，汇聚节点已经收到的不再交出
+        if task is not None and self.pending[index] and node.power >= node.pc_per_send:
+            self.pending[index] = False
+            if self.heads[index]:
+                node.cluster_forwarded.add((node.node_id, round_index))
+                node.cluster_readings.add(node.node_id)
+                self.aggregate_due[index] = round_index * self.round_length + self.aggregate_delay
+            elif self.head_of[index] >= 0:
+                self.post(node, AggregateMessage(
+                    uuid=task.uuid, data=task.data, source=node.node_id,
+                    destination=node_manager.nodes[self.head_of[index]].node_id, round_index=round_index
+                ), cycle)
+
+        # 不在等待成员数据时，把收到的数据合并成一条汇总发给下一跳
+        if node.cluster_readings and self.aggregate_due[index] <= cycle:
+            readings, node.cluster_readings = node.cluster_readings, set()
+            self.aggregate_due[index] = -1
+            next_hop = self.next_hop[index]
+            if task is not None and next_hop >= 0:
+                self.post(node, AggregateMessage(
+                    uuid=task.uuid, data=task.data, source=node.node_id,
+                    destination=node_manager.nodes[next_hop].node_id, readings=sorted(readings),
+                    round_index=round_index
+                ), cycle)
+
+        self.flush(node, cycle)
+
+    def is_idle(self, node) -> bool:
+        if node.recv_queue or node.cluster_outbox or node.cluster_readings or self.heads is None:
+            return False
+        wsn = node.medium.wsn
+        index = wsn.node_manager.node_index[node.node_id]
+        if index == self.sink:
+            return not node.send_queue and node.sending is None
+        return self.task(wsn) is None or node.power < node.pc_per_send or not self.pending[index]
+
+    def has_timer(self, node) -> bool:
+        if node.cluster_outbox or node.cluster_readings or self.heads is None:
+            return True
+        wsn = node.medium.wsn
+        return self.task(wsn) is not None and bool(self.pending[wsn.node_manager.node_index[node.node_id]])
+
+    def step_all(self, wsn) -> bool:
+        nodes = wsn.node_manager.nodes
+        if not nodes:
+            return False
+        self.update_round(wsn)
+        cycle = wsn.energy_ledger.cycle
+
+        # 只调度有消息要处理或者要重发、还需要交出数据或者汇总到期的节点
+        busy = numpy.fromiter(
+            (bool(node.recv_queue or node.cluster_outbox) for node in nodes), dtype=bool, count=len(nodes)
+        )
+        busy[self.sink] = True
+        if self.task(wsn) is not None:
+            power = numpy.fromiter((node.power for node in nodes), dtype=numpy.float64, count=len(nodes))
+            pc_per_send = numpy.fromiter((node.pc_per_send for node in nodes), dtype=numpy.float64, count=len(nodes))
+            busy |= self.pending & (power >= pc_per_send)
+        busy |= (self.aggregate_due >= 0) & (self.aggregate_due <= cycle)
+
+        node_driven = False
+        for i in numpy.random.permutation(numpy.flatnonzero(busy)).tolist():
+            if self.step(nodes[i]):
+                node_driven = True
+        return node_driven
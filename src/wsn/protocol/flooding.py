@@ -0,0 +1,544 @@
+import uuid
+from typing import Optional, Tuple
+
+import numpy
+
+from utils import node_want_to_terminate
+from utils.trace import EnumTraceEvent
+
+from ..energy import EnumEnergyCause
+from ..kernel import WsnFloodingKernel
+from ..message import NormalMessage
+from ..sketch import ExactRouteTable, ExpiringDict, ExpiringSet, RotatingBloomFilter, SketchRouteTable
+from .base import WsnProtocol, register_protocol
+
+
+class WsnFloodingProtocol(WsnProtocol):
+    """不需要回应的泛洪协议
+    逐节点调度时由子类的 step() 推进一个节点；
+    批量调度时全网状态保存在 WsnFloodingKernel 的数组中，每个循环向量化地推进一轮，
+    再把电量和接收次数有变化的节点写回节点对象，供旁观者、终止条件等使用
+    批量实现不区分消息，所有注入的消息都视为同一次泛洪，追踪送达时延时按第一条注入的消息记录
+    """
+    supports_batch = True
+
+    # 节点在一轮中发送同一条消息的次数
+    sends_per_round: int = 1
+    # 节点收到消息后是否每轮都广播
+    persistent: bool = True
+
+    kernel: Optional[WsnFloodingKernel]
+    # 节点是否已经发送过（之后的发送都计为重传）
+    sent_before: Optional[numpy.ndarray]
+    # 追踪送达时延时代表这次泛洪的消息：(uuid, 消息源的 node_id, 起始循环)
+    traced: Optional[Tuple[str, int, int]]
+
+    def __init__(self):
+        self.kernel = None
+        self.sent_before = None
+        self.traced = None
+
+    def init(self, wsn) -> None:
+        super(WsnFloodingProtocol, self).init(wsn)
+        self.traced = None
+        self.kernel = None
+
+    def init_node(self, node) -> None:
+        # 拓扑变化后需要重建全网状态
+        self.kernel = None
+
+    def remove_node(self, node) -> None:
+        self.kernel = None
+
+    def build_kernel(self, wsn) -> None:
+        nodes = wsn.node_manager.nodes
+        kernel = WsnFloodingKernel.from_wsn(wsn, self.sends_per_round, self.persistent)
+        kernel.recv_count[:] = [node.recv_count for node in nodes]
+        kernel.seen[:] = kernel.recv_count > 0
+        if self.persistent:
+            kernel.frontier[:] = kernel.seen | numpy.array([node.sending is not None for node in nodes], dtype=bool)
+        self.kernel = kernel
+        self.sent_before = numpy.array([node.power < node.total_power for node in nodes], dtype=bool)
+
+    def step_all(self, wsn) -> bool:
+        nodes = wsn.node_manager.nodes
+        if self.kernel is None or len(self.kernel.power) != len(nodes):
+            self.build_kernel(wsn)
+        kernel = self.kernel
+
+        # 发送队列中新注入的消息，由所在节点开始广播
+        delivery_tracer = wsn.delivery_tracer
+        kernel.track_hops = delivery_tracer is not None
+        injected = numpy.zeros(len(nodes), dtype=bool)
+        for i, node in enumerate(nodes):
+            if node.send_queue:
+                if delivery_tracer is not None and self.traced is None:
+                    message = node.send_queue[0]
+                    origin = getattr(message, 'origin_tick', None)
+                    self.traced = (
+                        getattr(message, 'uuid', None) or str(uuid.uuid4()), node.node_id,
+                        delivery_tracer.cycle if origin is None else origin
+                    )
+                node.send_queue.clear()
+                kernel.inject(i)
+                injected[i] = True
+
+        power_before = kernel.power.copy()
+        recv_count_before = kernel.recv_count.copy()
+        stats = kernel.step()
+
+        # 记账，每个节点第一次发送计为原始发送或转发，之后都计为重传
+        spent = power_before - kernel.power
+        first = numpy.where(~self.sent_before & (spent > 0), numpy.minimum(kernel.pc_per_send, spent), 0.)
+        wsn.energy_ledger.record_array(EnumEnergyCause.ORIGINAL, numpy.where(injected, first, 0.))
+        wsn.energy_ledger.record_array(EnumEnergyCause.FORWARD, numpy.where(injected, 0., first))
+        wsn.energy_ledger.record_array(EnumEnergyCause.RETRANSMIT, spent - first)
+        self.sent_before |= spent > 0
+        wsn.medium.spread_count += stats['sends']
+        wsn.medium.delivery_count += int((kernel.recv_count - recv_count_before).sum())
+
+        event_trace = wsn.event_trace
+        if event_trace is not None:
+            # 批量实现没有逐条的消息，只记录节点层面的事件
+            node_ids = wsn.medium.node_ids
+            sent = spent > 0
+            event_trace.record_array(
+                EnumTraceEvent.SEND, node_ids[sent & injected], values=kernel.power[sent & injected]
+            )
+            event_trace.record_array(
+                EnumTraceEvent.FORWARD, node_ids[sent & ~injected], values=kernel.power[sent & ~injected]
+            )
+            event_trace.record_array(EnumTraceEvent.RECEIVE, node_ids[kernel.recv_count > recv_count_before])
+            died = kernel.dead & (power_before >= kernel.pc_per_send)
+            for node_id, power in zip(node_ids[died].tolist(), kernel.power[died].tolist()):
+                event_trace.record(EnumTraceEvent.DEATH, node_id, value=power)
+
+        if delivery_tracer is not None and self.traced is not None and len(kernel.reached):
+            # 本轮第一次收到的节点下一个循环才处理这条消息，与时隙模式下的逐节点调度相同
+            delivery_tracer.arrive_batch(
+                *self.traced, kernel.reached, kernel.hops[kernel.reached], delivery_tracer.cycle + 1
+            )
+
+        # 只写回有变化的节点
+        changed = numpy.flatnonzero((spent != 0) | (kernel.recv_count != recv_count_before))
+        for i in changed.tolist():
+            nodes[i].power = float(kernel.power[i])
+            nodes[i].recv_count = int(kernel.recv_count[i])
+
+        return False
+
+
+class DuplicateFilterMixin(object):
+    """重复消息过滤和跳数限制的协议选项，放在协议基类之前混入
+    dedup_capacity 不为 None 时，每个节点用一个固定大小的 RotatingBloomFilter （节点的 duplicates ）代替协议原有的精确去重，
+    处理过的消息在被过滤器遗忘之前不再转发，内存不随消息数增长；dedup_horizon 让过滤器在节点活动若干次后遗忘，
+    链路有丢包时，隔一段时间再转发一次可以弥补只转发一次造成的覆盖率损失
+    hop_limit 不为 None 时，节点发出的消息最多经过这么多跳
+    """
+
+    dedup_capacity: Optional[int]
+    dedup_error_rate: float
+    dedup_horizon: Optional[int]
+    hop_limit: Optional[int]
+
+    def __init__(
+            self, dedup_capacity: Optional[int] = None, dedup_error_rate: float = 0.01,
+            dedup_horizon: Optional[int] = None, hop_limit: Optional[int] = None
+    ):
+        """
+        :param dedup_capacity: 重复消息过滤器每一代记住的消息数，为 None 时精确去重
+        :param dedup_error_rate: 重复消息过滤器的误报率上限，误报的消息不会被转发
+        :param dedup_horizon: 重复消息过滤器每一代存活的活动次数，为 None 时只在加满时轮换
+        :param hop_limit: 节点发出的消息的跳数限制，为 None 时不限制
+        """
+        super(DuplicateFilterMixin, self).__init__()
+        if dedup_capacity is not None and dedup_capacity < 1:
+            raise ValueError('重复消息过滤器的容量不能小于 1')
+        if not 0 < dedup_error_rate < 1:
+            raise ValueError('重复消息过滤器的误报率必须在 0 和 1 之间')
+        if dedup_horizon is not None and dedup_horizon < 1:
+            raise ValueError('重复消息过滤器的存活时间不能小于 1')
+        if hop_limit is not None and hop_limit < 1:
+            raise ValueError('跳数限制不能小于 1')
+        self.dedup_capacity = dedup_capacity
+        self.dedup_error_rate = dedup_error_rate
+        self.dedup_horizon = dedup_horizon
+        self.hop_limit = hop_limit
+
+    def init_node(self, node) -> None:
+        super(DuplicateFilterMixin, self).init_node(node)
+        # 重复消息过滤器，为 None 时使用协议原有的精确去重
+        if self.dedup_capacity is None:
+            node.duplicates = None
+        elif getattr(node, 'duplicates', None) is None:
+            node.duplicates = RotatingBloomFilter(self.dedup_capacity, self.dedup_error_rate, self.dedup_horizon)
+            node.duplicates.expire(node.tick)
+
+
+@register_protocol('action0')
+class RepeatBroadcastProtocol(WsnFloodingProtocol):
+    """无限复读广播（action0）
+    收到过消息的节点每次活动都广播一次
+    """
+    name = 'repeat_broadcast'
+    sends_per_round = 1
+    persistent = True
+
+    def step(self, node) -> Optional[bool]:
+        node_tag = ("node-" + str(node.node_id) + ": ") if not node.multithreading else ""
+
+        # 如果发送队列里有消息需要发送，且当前没有别的消息需要发送，则从发送队列取出一条消息进行发送
+        if node.send_queue and node.sending is None:
+            message = node.send_queue.pop(0)
+            if isinstance(message, str):
+                node.sending = NormalMessage(data=message, source=node.node_id)
+            elif isinstance(message, NormalMessage):
+                node.sending = message
+            node.sending_attempts = 0
+
+        # 如果当前有正在发送的消息则发送之
+        if node.sending is not None:
+            if node.sending_attempts:
+                cause = EnumEnergyCause.RETRANSMIT
+            else:
+                cause = EnumEnergyCause.ORIGINAL if node.sending.source == node.node_id else EnumEnergyCause.FORWARD
+            message = NormalMessage(
+                uuid=node.sending.uuid, data=node.sending.data, source=node.node_id, origin_tick=node.sending.origin_tick
+            )
+            node.send(message, cause)
+            # 每次重发的都是新消息，把第一次发送时记下的起始循环留在正在发送的消息上
+            node.sending.origin_tick = message.origin_tick
+            node.sending_attempts += 1
+
+        # 处理收到的各种消息
+        while node.recv_queue:
+            message = node.recv_queue.popleft()
+            if message.uuid == node.sending:
+                continue
+
+            node.recv_count += 1
+            node.logger.info(f'{node_tag}接收到消息 "{message.data}"')
+
+            node.sending = message
+            node.sending_attempts = 0
+
+
+@register_protocol('action3')
+class OnceFloodingProtocol(DuplicateFilterMixin, WsnFloodingProtocol):
+    """一次性泛洪（action3）
+    节点第一次收到消息后的下一次活动中把消息连续广播 100 次，之后不再发送
+    批量实现不区分消息，设置了重复消息过滤器或跳数限制时改为逐节点调度
+    """
+    name = 'once_flooding'
+    sends_per_round = 100
+    persistent = False
+
+    def __init__(
+            self, dedup_capacity: Optional[int] = None, dedup_error_rate: float = 0.01,
+            dedup_horizon: Optional[int] = None, hop_limit: Optional[int] = None
+    ):
+        super(OnceFloodingProtocol, self).__init__(dedup_capacity, dedup_error_rate, dedup_horizon, hop_limit)
+        self.supports_batch = dedup_capacity is None and hop_limit is None
+
+    def step(self, node) -> Optional[bool]:
+        node_tag = ("node-" + str(node.node_id) + ": ") if not node.multithreading else ""
+        node.tick += 1
+        if node.duplicates is not None:
+            node.duplicates.expire(node.tick)
+
+        # 如果发送队列里有消息需要发送，且当前没有别的消息需要发送，则从发送队列取出一条消息进行发送
+        if node.send_queue and node.sending is None:
+            message = node.send_queue.pop(0)
+            if isinstance(message, str):
+                node.sending = NormalMessage(data=message, source=node.node_id, ttl=self.hop_limit)
+                node.replied_nodes.add(node.node_id)
+            elif isinstance(message, NormalMessage):
+                node.sending = message
+
+        # 如果当前有正在发送的消息则发送之
+        if node.sending is not None:
+            for i in range(100):
+                node.send(node.sending, EnumEnergyCause.RETRANSMIT if i else None)
+            node.sending = None
+
+        # 处理收到的各种消息
+        while node.recv_queue:
+            message = node.recv_queue.popleft()
+            # 自己发送的或者处理过的消息丢弃
+            if node.duplicates is not None:
+                if node.duplicates.add(message.uuid):
+                    continue
+            else:
+                if message.uuid in node.replied_nodes:
+                    continue
+                node.replied_nodes.add(message.uuid)
+
+            node.recv_count += 1
+            node.logger.info(f'{node_tag}接收到消息 "{message.data}"')
+
+            # 有跳数限制或者在追踪送达跳数时给消息注册上自己名字，跳数没有用完则留待下次活动时泛洪；
+            # 其它情况下不需要经手记录，不再让经手列表随跳数增长
+            if message.ttl is not None or node.medium.wsn.delivery_tracer is not None:
+                message.register(node.node_id)
+                if message.expired:
+                    continue
+            node.send_queue.append(message)
+
+
+@register_protocol('action1')
+class ReplyRequiredProtocol(DuplicateFilterMixin, WsnProtocol):
+    """要求回应（action1）
+    """
+    name = 'reply_required'
+
+    def step(self, node) -> Optional[bool]:
+        node_tag = ("node-" + str(node.node_id) + ": ") if not node.multithreading else ""
+        node.tick += 1
+        if node.duplicates is not None:
+            node.duplicates.expire(node.tick)
+
+        # 如果一条消息已经被全部确认，则该条消息发送完毕
+        if node.sending is not None and len(node.replied_nodes) >= node.teammate_num:
+            node.finish_sending(True)
+            # 唤醒主线程
+            if node.multithreading:
+                node.logger.info(f'唤起主线程')
+                node_want_to_terminate.set()
+            else:
+                return True
+
+        # 如果发送队列里有消息需要发送，且当前没有别的消息需要发送，则从发送队列取出一条消息进行发送
+        if node.send_queue and node.sending is None:
+            message = node.send_queue.pop(0)
+            if isinstance(message, str):
+                node.sending = NormalMessage(data=message, source=node.node_id, ttl=self.hop_limit)
+            elif isinstance(message, NormalMessage):
+                node.sending = message
+            node.sending_attempts = 0
+
+        # 如果当前有正在发送的消息则发送之
+        if node.sending is not None:
+            node.send(node.sending, EnumEnergyCause.RETRANSMIT if node.sending_attempts else None)
+            node.sending_attempts += 1
+
+        # 处理收到的各种消息
+        recv_set = set()
+        while node.recv_queue:
+            message = node.recv_queue.popleft()
+            # 自己发送的或者处理过的消息丢弃
+            if node.node_id in message.handlers:
+                if node.sending is not None and message.uuid == node.sending.uuid and message.is_reply:
+                    node.replied_nodes.add(message.handlers[0])
+                continue
+
+            if node.duplicates is not None:
+                # 有重复消息过滤器时，同一源头的同一条消息（或回应）只处理一次，不再按上一跳区分
+                is_new = not node.duplicates.add(f'{message.uuid}-{message.is_reply:d}-{message.handlers[0]}')
+            else:
+                is_new = f'{message.uuid}-{message.handlers[0]}-{message.handlers[-1]}' not in recv_set
+                recv_set.add(f'{message.uuid}-{message.handlers[0]}-{message.handlers[-1]}')
+
+            if is_new:
+                if not message.is_reply:
+                    node.recv_count += 1
+                    node.logger.info(f'{node_tag}接收到消息 "{message.data}"')
+
+                # 给消息注册上自己名字，跳数没有用完则转发之
+                message.register(node.node_id)
+                if not message.expired:
+                    node.send(message)
+
+                # 如果消息不是一个回应，则同时发送一条对该消息的回应
+                if not message.is_reply:
+                    node.send(NormalMessage(
+                        uuid=message.uuid, is_reply=True, data=message.data, source=node.node_id, ttl=self.hop_limit
+                    ))
+
+
+@register_protocol('action2')
+class ReverseRouteReplyProtocol(DuplicateFilterMixin, WsnProtocol):
+    """要求回应，沿最常用路径原路回应（action2）
+    默认精确记录每个消息源的所有上一跳，并永久保留处理过的消息；消息源多、运行时间长时，
+    可以用 route_capacity 把上一跳统计换成固定大小的 SketchRouteTable ，
+    用 message_horizon 让与具体消息有关的状态在节点活动若干次后过期；
+    用 dedup_capacity 和 hop_limit 限制重复转发（见 DuplicateFilterMixin ），上一跳统计仍然记录收到的每一份
+    """
+    name = 'reverse_route_reply'
+
+    route_capacity: Optional[int]
+    message_horizon: Optional[int]
+
+    def __init__(
+            self, route_capacity: Optional[int] = None, message_horizon: Optional[int] = None,
+            dedup_capacity: Optional[int] = None, dedup_error_rate: float = 0.01,
+            dedup_horizon: Optional[int] = None, hop_limit: Optional[int] = None
+    ):
+        """
+        :param route_capacity: 每个节点保留的 (消息源, 上一跳) 对数，为 None 时精确记录
+        :param message_horizon: 消息状态保留的活动次数，为 None 时永久保留
+        其余参数见 DuplicateFilterMixin
+        """
+        super(ReverseRouteReplyProtocol, self).__init__(dedup_capacity, dedup_error_rate, dedup_horizon, hop_limit)
+        if route_capacity is not None and route_capacity < 1:
+            raise ValueError('上一跳统计的容量不能小于 1')
+        if message_horizon is not None and message_horizon < 1:
+            raise ValueError('消息状态保留的活动次数不能小于 1')
+        self.route_capacity = route_capacity
+        self.message_horizon = message_horizon
+
+    def init_node(self, node) -> None:
+        super(ReverseRouteReplyProtocol, self).init_node(node)
+        # 上一跳统计，消息源 -> 上一跳 -> 收到的次数；节点上已有的统计（例如换用协议之前的）保留下来
+        route_len = getattr(node, 'route_len', None)
+        if route_len is None:
+            node.route_len = ExactRouteTable() if self.route_capacity is None else SketchRouteTable(self.route_capacity)
+        elif self.route_capacity is not None and not isinstance(route_len, SketchRouteTable):
+            node.route_len = SketchRouteTable(self.route_capacity)
+            for source, hops in route_len.items():
+                for last_hop, count in hops.items():
+                    node.route_len.counter.add((source, last_hop), count)
+        # 回应过的消息，以及每条回应已经发送的次数
+        if getattr(node, 'replied_messages', None) is None:
+            node.replied_messages = set()
+        if getattr(node, 'reply_attempts', None) is None:
+            node.reply_attempts = {}
+        if self.message_horizon is not None:
+            replied_messages, reply_queue = node.replied_messages, node.reply_queue
+            node.replied_messages = ExpiringSet(self.message_horizon)
+            node.reply_queue = ExpiringDict(self.message_horizon)
+            # 已有的状态从节点当前的时钟开始计时
+            node.replied_messages.expire(node.tick)
+            node.reply_queue.expire(node.tick)
+            for key in replied_messages:
+                node.replied_messages.add(key)
+            for key, reply in reply_queue.items():
+                node.reply_queue[key] = reply
+
+    def expire_messages(self, node) -> None:
+        """丢弃节点上超过 message_horizon 次活动的消息状态，过期的回应不再重发
+        """
+        node.replied_messages.expire(node.tick)
+        for key, _ in node.reply_queue.expire(node.tick):
+            node.reply_attempts.pop(key, None)
+            if node.retransmitter is not None:
+                node.retransmitter.cancel(key)
+
+    def step(self, node) -> Optional[bool]:
+        node_tag = ("node-" + str(node.node_id) + ": ") if not node.multithreading else ""
+        node.tick += 1
+        if node.duplicates is not None:
+            node.duplicates.expire(node.tick)
+        if self.message_horizon is not None:
+            self.expire_messages(node)
+
+        # 如果一条消息已经被全部确认，则该条消息发送完毕
+        if node.sending is not None and not node.sending.is_reply and len(node.replied_nodes) >= node.teammate_num:
+            if node.retransmitter is not None:
+                node.retransmitter.cancel(f'sending-{node.sending.uuid}')
+            node.finish_sending(True)
+            # 唤醒主线程
+            if node.multithreading:
+                node.logger.info(f'唤起主线程')
+                node_want_to_terminate.set()
+            else:
+                return True
+
+        # 重传次数用尽、最后一次重传后也等满了间隔仍未被全部确认，则放弃这条消息，接着发送下一条
+        if node.sending is not None and not node.sending.is_reply and node.retransmitter is not None and \
+                node.retransmitter.abandoned(f'sending-{node.sending.uuid}', node.tick):
+            node.logger.warning(
+                f'{node_tag}消息 "{node.sending.data}" 重传 {node.retransmitter.policy.max_retries} 次后只收到 '
+                f'{len(node.replied_nodes)}/{node.teammate_num} 个回应，放弃发送'
+            )
+            node.retransmitter.cancel(f'sending-{node.sending.uuid}')
+            node.finish_sending(False)
+
+        # 如果发送队列里有消息需要发送，且当前没有别的消息需要发送，则从发送队列取出一条消息进行发送
+        if node.send_queue and node.sending is None:
+            message = node.send_queue.pop(0)
+            if isinstance(message, str):
+                node.sending = NormalMessage(data=message, source=node.node_id, ttl=self.hop_limit)
+            elif isinstance(message, NormalMessage):
+                node.sending = message
+            node.sending_attempts = 0
+
+        # 如果当前有正在发送的消息则发送之，有重传管理器时只在重传计时到期时发送
+        if node.sending is not None and (
+                node.retransmitter is None or node.retransmitter.due(f'sending-{node.sending.uuid}', node.tick)
+        ):
+            node.send(node.sending, EnumEnergyCause.RETRANSMIT if node.sending_attempts else None)
+            node.sending_attempts += 1
+        for i, reply in list(node.reply_queue.items()):
+            if node.retransmitter is not None:
+                # 重传次数用尽仍未被确认的回应不再发送
+                if node.retransmitter.exhausted(i):
+                    node.reply_queue.pop(i)
+                    node.reply_attempts.pop(i, None)
+                    node.retransmitter.cancel(i)
+                    continue
+                if not node.retransmitter.due(i, node.tick):
+                    continue
+            for _ in range(1):
+                node.send(reply, EnumEnergyCause.RETRANSMIT if node.reply_attempts.get(i) else None)
+                node.reply_attempts[i] = node.reply_attempts.get(i, 0) + 1
+
+        # 处理收到的各种消息
+        while node.recv_queue:
+            message = node.recv_queue.popleft()
+
+            if message.is_reply:
+
+                node.logger.info(f'{node_tag}接收到消息 "{message.data}" {message.handlers}')
+                if node.reply_queue.get(f'{message.uuid}-{message.handlers[0]}') is not None and \
+                        len(
+                            node.reply_queue.get(f'{message.uuid}-{message.handlers[0]}').handlers
+                        ) > len(message.handlers):
+                    # 下一跳已经转发了这条回应，相当于收到了确认
+                    node.reply_queue.pop(f'{message.uuid}-{message.handlers[0]}')
+                    node.reply_attempts.pop(f'{message.uuid}-{message.handlers[0]}', None)
+                    if node.retransmitter is not None:
+                        node.retransmitter.cancel(f'{message.uuid}-{message.handlers[0]}')
+                    continue
+
+                if len(message.handlers) < 2:
+                    continue
+
+                if node.node_id != message.handlers[1]:
+                    continue
+
+                message.handlers.pop(1)
+                node.send(message)
+
+                if node.sending is not None and not node.sending.is_reply and message.uuid == node.sending.uuid:
+                    node.replied_nodes.add(message.handlers[0])
+                    continue
+
+                if f'{message.uuid}-{message.handlers[0]}' not in node.replied_messages:
+                    node.replied_messages.add(f'{message.uuid}-{message.handlers[0]}')
+                    node.reply_queue[f'{message.uuid}-{message.handlers[0]}'] = message
+
+            else:
+                # 自己发送的或者处理过的消息丢弃
+                if node.node_id in message.handlers:
+                    continue
+
+                node.recv_count += 1
+                node.logger.info(f'{node_tag}接收到消息 "{message.data}" {message.handlers}')
+
+                node.route_len.add(str(message.handlers[0]), str(message.handlers[-1]))
+
+                # 是从最常见路径传播过来的
+                if node.route_len.is_most_common(str(message.handlers[0]), str(message.handlers[-1])):
+                    # 给消息注册上自己名字，转发之；跳数已经用完或者转发过的消息只回应，不再转发
+                    message.register(node.node_id)
+                    if not message.expired and (
+                            node.duplicates is None or not node.duplicates.add(f'{message.uuid}-{message.handlers[0]}')
+                    ):
+                        node.send(message)
+
+                    # 没回复过的消息回应以下
+                    if message.uuid not in node.replied_messages:
+                        message.is_reply = True
+                        message.handlers = message.handlers[::-1]
+                        node.replied_messages.add(message.uuid)
+                        node.reply_queue[f'{message.uuid}-{message.handlers[0]}'] = message
@@ -0,0 +1,253 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+
+from ..energy import EnumEnergyCause
+from ..message import NormalMessage
+from .base import register_protocol, WsnProtocol
+from .flooding import DuplicateFilterMixin
+
+
+class GossipState(object):
+    """节点对一条等待评估的消息的观察
+    """
+
+    # 评估到期的时钟（节点活动次数）
+    due: int
+    # 第一次收到之后又听到的副本数
+    duplicates: int
+    # 到听到过的所有发送者的最近距离
+    min_distance: float
+
+    def __init__(self, due: int, distance: float):
+        self.due = due
+        self.duplicates = 0
+        self.min_distance = distance
+
+
+class WsnGossipProtocol(DuplicateFilterMixin, WsnProtocol):
+    """概率性泛洪（gossip）协议的基类，不需要回应
+    与 action3 一样每个节点只处理一条消息一次，但收到新消息后不是无条件地转发，而是先等待一段随机的评估时间
+    （1 ~ max_delay 次活动），期间继续统计听到的副本数和到发送者的最近距离，到期时由 should_forward() 决定
+    转发还是放弃；消息源发出的消息总是发送
+    等待评估的消息放在节点的 send_queue 中，所以两种调度模式都会让节点在评估到期前继续活动，
+    每条消息的观察保存在节点的 gossip_states 中
+    批量实现不区分消息，这类协议只支持逐节点调度
+    """
+
+    # 每次转发（或发出）一条消息的发送次数
+    repeats: int
+    # 最长的评估时间（活动次数）
+    max_delay: int
+    # 邻居数少于这个值的节点总是转发，为 None 时由 sparse_percentile 按全网的邻居数分布决定
+    min_neighbors: Optional[int]
+    # 邻居数低于全网这个百分位数的节点总是转发
+    sparse_percentile: float
+    # 按邻居数分布算出的阈值及其对应的链路矩阵，拓扑变化后重新计算
+    degree_threshold: Optional[Tuple[object, float]]
+
+    def __init__(
+            self, repeats: int = 1, max_delay: int = 1, min_neighbors: Optional[int] = None,
+            sparse_percentile: float = 20., dedup_capacity: Optional[int] = None, dedup_error_rate: float = 0.01,
+            dedup_horizon: Optional[int] = None, hop_limit: Optional[int] = None
+    ):
+        """
+        :param repeats: 每次转发（或发出）一条消息的发送次数
+        :param max_delay: 最长的评估时间（活动次数），评估时间在 1 ~ max_delay 之间均匀抽取
+        :param min_neighbors: 邻居数少于这个值的节点处在稀疏区域，放弃转发很可能让消息断在这里，总是转发；
+                              为 None 时取全网邻居数的 sparse_percentile 百分位数，为 0 时所有节点都按各自的规则转发
+        :param sparse_percentile: 不指定 min_neighbors 时，邻居数低于全网这个百分位数的节点总是转发
+        其余参数见 DuplicateFilterMixin
+        """
+        super(WsnGossipProtocol, self).__init__(dedup_capacity, dedup_error_rate, dedup_horizon, hop_limit)
+        if repeats < 1:
+            raise ValueError('发送次数不能小于 1')
+        if max_delay < 1:
+            raise ValueError('评估时间不能小于 1')
+        if min_neighbors is not None and min_neighbors < 0:
+            raise ValueError('邻居数阈值不能小于 0')
+        if not 0 <= sparse_percentile <= 100:
+            raise ValueError('邻居数的百分位数必须在 0 和 100 之间')
+        self.repeats = repeats
+        self.max_delay = max_delay
+        self.min_neighbors = min_neighbors
+        self.sparse_percentile = sparse_percentile
+        self.degree_threshold = None
+
+    def init_node(self, node) -> None:
+        super(WsnGossipProtocol, self).init_node(node)
+        node.gossip_states = {}
+
+    def should_forward(self, node, message: NormalMessage, state: GossipState) -> bool:
+        """评估到期时是否转发
+        :param node: 做决定的节点
+        :param message: 等待评估的消息，已经注册上了节点自己
+        :param state: 节点对这条消息的观察
+        """
+        raise NotImplementedError
+
+    def sparse_threshold(self, link_matrix) -> float:
+        """稀疏区域的邻居数阈值，即 min_neighbors 或者全网邻居数的 sparse_percentile 百分位数
+        """
+        if self.min_neighbors is not None:
+            return self.min_neighbors
+        if self.degree_threshold is None or self.degree_threshold[0] is not link_matrix:
+            # 链路矩阵的每一行都包含节点自己
+            degrees = numpy.diff(link_matrix.indptr) - 1
+            threshold = float(numpy.percentile(degrees, self.sparse_percentile)) if len(degrees) else 0.
+            self.degree_threshold = (link_matrix, threshold)
+        return self.degree_threshold[1]
+
+    def is_sparse(self, node) -> bool:
+        """节点的邻居数（能以非零概率收到它发出的信号的其它节点数）是否低于稀疏区域的阈值
+        """
+        if self.min_neighbors == 0:
+            return False
+        index = node.medium.wsn.node_manager.node_index[node.node_id]
+        link_matrix = node.medium.get_link_matrix()
+        indptr = link_matrix.indptr
+        return indptr[index + 1] - indptr[index] - 1 < self.sparse_threshold(link_matrix)
+
+    def step(self, node) -> Optional[bool]:
+        node_tag = ("node-" + str(node.node_id) + ": ") if not node.multithreading else ""
+        node.tick += 1
+        if node.duplicates is not None:
+            node.duplicates.expire(node.tick)
+        states: Dict[str, GossipState] = node.gossip_states
+        node_manager = node.medium.wsn.node_manager
+
+        # 先处理收到的消息，评估到期的消息也能算上最后这段时间听到的副本
+        while node.recv_queue:
+            message = node.recv_queue.popleft()
+            state = states.get(message.uuid)
+            # 最后一个经手人就是这份副本的发送者
+            index = node_manager.node_index.get(message.handlers[-1])
+            sender = node_manager.nodes[index] if index is not None else node
+            distance = math.hypot(sender.x - node.x, sender.y - node.y)
+            if state is not None:
+                state.duplicates += 1
+                state.min_distance = min(state.min_distance, distance)
+                continue
+
+            # 自己发送的或者处理过的消息丢弃
+            if node.duplicates is not None:
+                if node.duplicates.add(message.uuid):
+                    continue
+            else:
+                if message.uuid in node.replied_nodes:
+                    continue
+                node.replied_nodes.add(message.uuid)
+
+            node.recv_count += 1
+            node.logger.info(f'{node_tag}接收到消息 "{message.data}"')
+
+            # 给消息注册上自己名字，跳数没有用完则等待评估
+            message.register(node.node_id)
+            if not message.expired:
+                delay = int(numpy.random.randint(1, self.max_delay + 1))
+                states[message.uuid] = GossipState(node.tick + delay, distance)
+                node.send_queue.append(message)
+
+        # 发出自己的消息，转发评估到期且通过评估的消息
+        waiting: List[str or NormalMessage] = []
+        for message in node.send_queue:
+            # 字符串和合成流量注入的消息都是自己发出的消息，没有等待评估的观察
+            if isinstance(message, str) or message.uuid not in states:
+                if isinstance(message, str):
+                    message = NormalMessage(data=message, source=node.node_id, ttl=self.hop_limit)
+                elif message.ttl is None:
+                    message.ttl = self.hop_limit
+                if node.duplicates is not None:
+                    node.duplicates.add(message.uuid)
+                else:
+                    node.replied_nodes.add(message.uuid)
+            else:
+                state = states[message.uuid]
+                if state.due > node.tick:
+                    waiting.append(message)
+                    continue
+                states.pop(message.uuid)
+                if not self.is_sparse(node) and not self.should_forward(node, message, state):
+                    continue
+            for i in range(self.repeats):
+                node.send(message, EnumEnergyCause.RETRANSMIT if i else None)
+        node.send_queue = waiting
+
+
+@register_protocol()
+class ProbabilisticGossipProtocol(WsnGossipProtocol):
+    """固定概率的 gossip ，即 GOSSIP1(p, k)
+    离消息源不超过 flood_hops 跳的节点总是转发，以免消息在源头附近就消失，更远的节点以概率 p 转发
+    """
+    name = 'gossip'
+
+    p: float
+    flood_hops: int
+
+    def __init__(self, p: float = 0.65, flood_hops: int = 1, **kwargs):
+        """
+        :param p: 转发概率
+        :param flood_hops: 离消息源不超过这么多跳的节点总是转发
+        :param kwargs: 见 WsnGossipProtocol
+        """
+        super(ProbabilisticGossipProtocol, self).__init__(**kwargs)
+        if not 0 < p <= 1:
+            raise ValueError('转发概率必须在 (0, 1] 之间')
+        if flood_hops < 0:
+            raise ValueError('总是转发的跳数不能小于 0')
+        self.p = p
+        self.flood_hops = flood_hops
+
+    def should_forward(self, node, message: NormalMessage, state: GossipState) -> bool:
+        # 注册上自己之后，handlers 的长度减一就是自己离消息源的跳数
+        return len(message.handlers) - 1 <= self.flood_hops or numpy.random.random() < self.p
+
+
+@register_protocol()
+class CounterGossipProtocol(WsnGossipProtocol):
+    """基于计数的 gossip
+    评估期间又听到了 threshold 份以上的副本，说明周围的节点大多已经转发过，放弃转发
+    """
+    name = 'gossip_counter'
+
+    threshold: int
+
+    def __init__(self, threshold: int = 3, max_delay: int = 3, **kwargs):
+        """
+        :param threshold: 评估期间听到这么多份副本就放弃转发
+        :param max_delay: 见 WsnGossipProtocol
+        :param kwargs: 见 WsnGossipProtocol
+        """
+        super(CounterGossipProtocol, self).__init__(max_delay=max_delay, **kwargs)
+        if threshold < 1:
+            raise ValueError('副本数阈值不能小于 1')
+        self.threshold = threshold
+
+    def should_forward(self, node, message: NormalMessage, state: GossipState) -> bool:
+        return state.duplicates < self.threshold
+
+
+@register_protocol()
+class DistanceGossipProtocol(WsnGossipProtocol):
+    """基于距离的 gossip
+    节点知道邻居的位置，评估期间听到过的发送者中只要有一个离自己不到 min_distance * r ，
+    自己转发能覆盖的新区域就很小，放弃转发
+    """
+    name = 'gossip_distance'
+
+    min_distance: float
+
+    def __init__(self, min_distance: float = 0.5, max_delay: int = 3, **kwargs):
+        """
+        :param min_distance: 转发所需的到最近发送者的距离，是自己通信半径的倍数
+        :param max_delay: 见 WsnGossipProtocol
+        :param kwargs: 见 WsnGossipProtocol
+        """
+        super(DistanceGossipProtocol, self).__init__(max_delay=max_delay, **kwargs)
+        if min_distance < 0:
+            raise ValueError('距离阈值不能小于 0')
+        self.min_distance = min_distance
+
+    def should_forward(self, node, message: NormalMessage, state: GossipState) -> bool:
+        return state.min_distance >= self.min_distance * node.r
@@ -0,0 +1,112 @@
+from typing import Dict, List
+
+import numpy
+
+
+class RetransmissionPolicy(object):
+    """重传策略
+    第一次发送后，等待 initial_interval 次活动再重传，之后每次重传的间隔乘以 factor ，最长不超过 max_interval ，
+    每个间隔都会加上 ±jitter 比例的随机抖动，避免相邻节点总在同一时刻重传；重传 max_retries 次后放弃
+    """
+
+    initial_interval: float
+    factor: float
+    max_interval: float
+    jitter: float
+    max_retries: int
+
+    def __init__(
+            self, initial_interval: float = 1, factor: float = 2, max_interval: float = 32,
+            jitter: float = 0.5, max_retries: int = 8
+    ):
+        """
+        :param initial_interval: 第一次重传前等待的活动次数
+        :param factor: 重传间隔的增长倍数
+        :param max_interval: 重传间隔的上限
+        :param jitter: 随机抖动的比例，取值 [0, 1)
+        :param max_retries: 最大重传次数（不含第一次发送）
+        """
+        if initial_interval <= 0 or max_interval < initial_interval:
+            raise ValueError('重传间隔必须大于 0 ，且上限不能小于初始值')
+        if factor < 1:
+            raise ValueError('重传间隔的增长倍数不能小于 1')
+        if not 0 <= jitter < 1:
+            raise ValueError('随机抖动的比例只能在 [0, 1) 范围内取值')
+        if max_retries < 0:
+            raise ValueError('最大重传次数不能小于 0')
+        self.initial_interval = initial_interval
+        self.factor = factor
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.max_retries = max_retries
+
+
+class WsnRetransmitter(object):
+    """一个节点的重传管理器
+    为节点需要反复发送的每一条消息维护一个计时器，按 RetransmissionPolicy 指数退避；
+    收到确认后应立即 cancel() ，不再重传
+    计时以节点自己的活动次数为单位，在单线程和多线程模式下都适用
+    """
+
+    policy: RetransmissionPolicy
+    # 消息键 -> [下次发送的时刻, 已发送次数, 当前重传间隔]
+    timers: Dict[str, List[float]]
+
+    def __init__(self, policy: RetransmissionPolicy):
+        self.policy = policy
+        self.timers = {}
+
+    def due(self, key: str, now: float) -> bool:
+        """判断一条消息此刻是否应当发送，如果应当发送则同时安排下一次重传
+        第一次询问某条消息时总是应当发送
+        :param key: 消息键
+        :param now: 节点当前的活动次数
+        :return: 是否应当发送
+        """
+        timer = self.timers.get(key)
+        if timer is None:
+            self.timers[key] = [now + self.next_interval(self.policy.initial_interval), 1, self.policy.initial_interval]
+            return True
+
+        next_time, attempts, interval = timer
+        if now < next_time or self.exhausted(key):
+            return False
+
+        interval = min(interval * self.policy.factor, self.policy.max_interval)
+        timer[0] = now + self.next_interval(interval)
+        timer[1] = attempts + 1
+        timer[2] = interval
+        return True
+
+    def next_interval(self, interval: float) -> float:
+        if self.policy.jitter:
+            interval *= 1 + numpy.random.uniform(-self.policy.jitter, self.policy.jitter)
+        return interval
+
+    def exhausted(self, key: str) -> bool:
+        """一条消息是否已经达到最大重传次数
+        """
+        timer = self.timers.get(key)
+        return timer is not None and timer[1] > self.policy.max_retries
+
+    def abandoned(self, key: str, now: float) -> bool:
+        """一条消息是否已经达到最大重传次数，且最后一次重传后也等满了重传间隔，可以放弃等待确认
+        :param key: 消息键
+        :param now: 节点当前的活动次数
+        """
+        return self.exhausted(key) and now >= self.timers[key][0]
+
+    def attempts(self, key: str) -> int:
+        timer = self.timers.get(key)
+        return 0 if timer is None else int(timer[1])
+
+    def cancel(self, key: str) -> None:
+        """消息已被确认，或不再需要发送，取消其计时器
+        """
+        self.timers.pop(key, None)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.timers
+
+    def __len__(self) -> int:
+        return len(self.timers)
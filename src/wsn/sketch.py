@@ -0,0 +1,423 @@
+import hashlib
+import math
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+
+class SpaceSavingCounter(object):
+    """固定大小的重击者（heavy hitter）计数器，即 Space-Saving 算法
+    最多保存 capacity 个键；计数器已满时，新的键替换计数最小的键，并继承其计数，
+    所以每个键的计数是真实计数的上界，误差不超过被替换时继承的计数（见 error()）；
+    真实计数超过总数 1 / capacity 的键一定会被保留
+    """
+
+    capacity: int
+    # 键 -> 计数（上界）
+    counts: Dict[Hashable, int]
+    # 键 -> 继承的计数，即计数可能多算的部分
+    errors: Dict[Hashable, int]
+
+    def __init__(self, capacity: int):
+        """
+        :param capacity: 最多保存的键数
+        """
+        if capacity < 1:
+            raise ValueError('计数器容量不能小于 1')
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, key: Hashable, count: int = 1) -> int:
+        """给 key 的计数加上 count
+        :return: 加上之后的计数（上界）
+        """
+        counts = self.counts
+        if key in counts:
+            counts[key] += count
+            return counts[key]
+
+        inherited = 0
+        if len(counts) >= self.capacity:
+            # 容量很小，直接扫描找出计数最小的键
+            victim = min(counts, key=counts.__getitem__)
+            inherited = counts.pop(victim)
+            self.errors.pop(victim, None)
+        counts[key] = inherited + count
+        if inherited:
+            self.errors[key] = inherited
+        return counts[key]
+
+    def error(self, key: Hashable) -> int:
+        return self.errors.get(key, 0)
+
+    def guaranteed(self, key: Hashable) -> int:
+        """key 的真实计数的下界
+        """
+        return self.counts.get(key, 0) - self.errors.get(key, 0)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.counts.get(key, default)
+
+    def keys(self):
+        return self.counts.keys()
+
+    def values(self):
+        return self.counts.values()
+
+    def items(self):
+        return self.counts.items()
+
+    def __getitem__(self, key: Hashable) -> int:
+        return self.counts[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.counts
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.counts)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def __repr__(self) -> str:
+        return f'SpaceSavingCounter({self.capacity}, {self.counts})'
+
+
+class ExpiringSet(object):
+    """元素在加入 horizon 个时间单位之后过期的集合
+    时间由使用者通过 expire(now) 推进，加入的元素按时间先后排列，过期时只需从头部弹出
+    """
+
+    horizon: int
+    # 当前时间
+    now: int
+    # 元素 -> 加入的时间，按加入的先后排列
+    times: Dict[Hashable, int]
+
+    def __init__(self, horizon: int):
+        """
+        :param horizon: 元素的存活时间
+        """
+        if horizon < 1:
+            raise ValueError('存活时间不能小于 1')
+        self.horizon = horizon
+        self.now = 0
+        self.times = {}
+
+    def add(self, key: Hashable) -> None:
+        if key not in self.times:
+            self.times[key] = self.now
+
+    def discard(self, key: Hashable) -> None:
+        self.times.pop(key, None)
+
+    def expire(self, now: int) -> List[Hashable]:
+        """推进时间，移除过期的元素
+        :param now: 当前时间，不能比上次的小
+        :return: 过期的元素
+        """
+        self.now = now
+        expired = []
+        times = self.times
+        deadline = now - self.horizon
+        while times:
+            key = next(iter(times))
+            if times[key] > deadline:
+                break
+            del times[key]
+            expired.append(key)
+        return expired
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.times
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.times)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+class ExpiringDict(object):
+    """键在加入 horizon 个时间单位之后过期的字典，时间的推进方式与 ExpiringSet 相同
+    """
+
+    # 键的加入时间
+    keys_set: ExpiringSet
+    data: Dict[Hashable, Any]
+
+    def __init__(self, horizon: int):
+        """
+        :param horizon: 键的存活时间
+        """
+        self.keys_set = ExpiringSet(horizon)
+        self.data = {}
+
+    @property
+    def horizon(self) -> int:
+        return self.keys_set.horizon
+
+    def expire(self, now: int) -> List[Tuple[Hashable, Any]]:
+        """推进时间，移除过期的键
+        :param now: 当前时间，不能比上次的小
+        :return: 过期的 (键, 值)
+        """
+        return [(key, self.data.pop(key)) for key in self.keys_set.expire(now)]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def pop(self, key: Hashable, *default: Any) -> Any:
+        self.keys_set.discard(key)
+        return self.data.pop(key, *default)
+
+    def keys(self):
+        return self.data.keys()
+
+    def values(self):
+        return self.data.values()
+
+    def items(self):
+        return self.data.items()
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.keys_set.add(key)
+        self.data[key] = value
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self.data[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.data
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class BloomFilter(object):
+    """布隆过滤器
+    用 num_of_bits 位的位图和 num_of_hashes 个哈希函数记录加入过的键，判断键是否存在时不会漏报，
+    误报的概率在加入的键数不超过 capacity 时约为 error_rate ；位图大小 m = -n ln(p) / (ln 2)^2 ，
+    哈希函数个数 k = m / n * ln 2 ，k 个位置由 blake2b 的 128 位摘要拆成两半双重哈希得到（h1 + i * h2）
+    """
+
+    capacity: int
+    error_rate: float
+    num_of_bits: int
+    num_of_hashes: int
+    bits: bytearray
+    # 加入过的键数（判断为已存在的不计）
+    count: int
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        :param capacity: 预计加入的键数
+        :param error_rate: 加入 capacity 个键时的误报率
+        """
+        if capacity < 1:
+            raise ValueError('布隆过滤器的容量不能小于 1')
+        if not 0 < error_rate < 1:
+            raise ValueError('误报率必须在 0 和 1 之间')
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_of_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_of_hashes = max(1, round(self.num_of_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_of_bits + 7) // 8)
+        self.count = 0
+
+    def positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_of_bits for i in range(self.num_of_hashes)]
+
+    def add(self, key: str) -> bool:
+        """加入一个键
+        :return: 加入之前是否（可能）已经存在
+        """
+        bits = self.bits
+        present = True
+        for position in self.positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                present = False
+        if not present:
+            self.count += 1
+        return present
+
+    def clear(self) -> None:
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class RotatingBloomFilter(object):
+    """占用固定内存的重复消息过滤器
+    由新旧两代 BloomFilter 组成，键加入新一代，判断时两代都查；新一代加满 capacity 个键后丢弃旧一代，
+    新一代变成旧一代，再换上一个空的新一代，所以至少记得最近加入的 capacity 个键，更早的键逐渐被遗忘；
+    只在旧一代中的键再次出现时会重新加入新一代，经常出现的键不会因为轮换被遗忘
+    设置了 horizon 时，时间每推进 horizon 个单位也轮换一次（时间的推进方式与 ExpiringSet 相同），
+    键在最后一次加入之后的 horizon 到 2 * horizon 个时间单位之间被遗忘
+    两代各按 error_rate / 2 分配大小，合起来的误报率不超过 error_rate
+    """
+
+    current: BloomFilter
+    previous: BloomFilter
+    horizon: Optional[int]
+    # 新一代开始的时间
+    started: int
+    # 已经轮换的次数
+    rotations: int
+
+    def __init__(self, capacity: int, error_rate: float = 0.01, horizon: Optional[int] = None):
+        """
+        :param capacity: 每一代最多加入的键数
+        :param error_rate: 判断键是否存在时的误报率上限
+        :param horizon: 每一代的存活时间，为 None 时只在加满时轮换
+        """
+        if horizon is not None and horizon < 1:
+            raise ValueError('存活时间不能小于 1')
+        self.current = BloomFilter(capacity, error_rate / 2)
+        self.previous = BloomFilter(capacity, error_rate / 2)
+        self.horizon = horizon
+        self.started = 0
+        self.rotations = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.current.capacity
+
+    @property
+    def error_rate(self) -> float:
+        return self.current.error_rate * 2
+
+    @property
+    def nbytes(self) -> int:
+        return self.current.nbytes + self.previous.nbytes
+
+    def rotate(self) -> None:
+        """丢弃旧一代，新一代变成旧一代
+        """
+        self.previous, self.current = self.current, self.previous
+        self.current.clear()
+        self.rotations += 1
+
+    def expire(self, now: int) -> None:
+        """推进时间，新一代存活满 horizon 个时间单位时轮换，超过 2 * horizon 时两代都丢弃
+        :param now: 当前时间，不能比上次的小
+        """
+        if self.horizon is None:
+            return
+        if now - self.started >= 2 * self.horizon:
+            self.rotate()
+            self.rotate()
+            self.started = now
+        elif now - self.started >= self.horizon:
+            self.rotate()
+            self.started = now
+
+    def add(self, key: str) -> bool:
+        """加入一个键
+        :return: 加入之前是否（可能）已经存在
+        """
+        if self.current.count >= self.current.capacity:
+            self.rotate()
+        in_previous = key in self.previous
+        return self.current.add(key) or in_previous
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.current or key in self.previous
+
+    def __len__(self) -> int:
+        return self.current.count + self.previous.count
+
+
+class ExactRouteTable(dict):
+    """精确的上一跳统计，消息源 -> 上一跳 -> 收到的次数
+    """
+
+    def add(self, source: str, last_hop: str) -> None:
+        """记录一条由 last_hop 转发来的、源自 source 的消息
+        """
+        hops = self.get(source)
+        if hops is None:
+            hops = self[source] = {}
+        hops[last_hop] = hops.get(last_hop, 0) + 1
+
+    def is_most_common(self, source: str, last_hop: str) -> bool:
+        """last_hop 是否是 source 的消息最常见的上一跳（之一）
+        """
+        hops = self.get(source, {})
+        return hops.get(last_hop, 0) >= max(hops.values(), default=0)
+
+
+class SketchRouteTable(object):
+    """固定大小的上一跳统计
+    所有消息源共用一个容量为 capacity 的 SpaceSavingCounter ，键为 (消息源, 上一跳) ，
+    占用的内存与经过的消息源个数无关，只保留最常见的 capacity 对
+    按真实计数的下界比较最常见的上一跳：刚替换进来的键继承了被替换的键的计数，按上界比较会常常与最常见的键打平，
+    下界则与精确统计一样从 1 开始；没有发生过替换时与 ExactRouteTable 的判断完全相同
+    读取的接口（get 、items 等）与 ExactRouteTable 相同，值是临时生成的 上一跳 -> 计数 的字典
+    """
+
+    counter: SpaceSavingCounter
+
+    def __init__(self, capacity: int):
+        """
+        :param capacity: 最多保存的 (消息源, 上一跳) 对数
+        """
+        self.counter = SpaceSavingCounter(capacity)
+
+    @property
+    def capacity(self) -> int:
+        return self.counter.capacity
+
+    def add(self, source: str, last_hop: str) -> None:
+        """记录一条由 last_hop 转发来的、源自 source 的消息
+        """
+        self.counter.add((source, last_hop))
+
+    def is_most_common(self, source: str, last_hop: str) -> bool:
+        """last_hop 是否是 source 的消息最常见的上一跳（之一）
+        """
+        counter = self.counter
+        most_common = max((counter.guaranteed(key) for key in counter.counts if key[0] == source), default=0)
+        return counter.guaranteed((source, last_hop)) >= most_common
+
+    def get(self, source: str, default: Any = None) -> Any:
+        hops = {hop: count for (each, hop), count in self.counter.items() if each == source}
+        return hops if hops else default
+
+    def keys(self):
+        return list(dict.fromkeys(source for source, _ in self.counter.keys()))
+
+    def items(self):
+        return [(source, self.get(source)) for source in self.keys()]
+
+    def __getitem__(self, source: str) -> Dict[str, int]:
+        hops = self.get(source)
+        if hops is None:
+            raise KeyError(source)
+        return hops
+
+    def __contains__(self, source: str) -> bool:
+        return any(each == source for each, _ in self.counter.keys())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
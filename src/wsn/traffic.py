@@ -0,0 +1,326 @@
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Type
+
+import numpy
+
+from .message import NormalMessage
+
+
+class ArrivalProcess(object):
+    """消息的到达过程
+    给出每个循环每个消息源新到达的消息数，rate 是长期平均下每个消息源每个循环到达的消息数
+    """
+
+    # 到达过程的注册名
+    name: str = ''
+
+    @property
+    def rate(self) -> float:
+        raise NotImplementedError
+
+    def arrives_after(self, cycle: int) -> bool:
+        """第 cycle 个循环之后是否还可能有消息到达
+        """
+        return self.rate > 0
+
+    def sample(self, cycle: int, num_of_sources: int) -> numpy.ndarray:
+        """
+        :param cycle: 当前循环次数（从 0 开始）
+        :param num_of_sources: 消息源的个数
+        :return: 每个消息源在这个循环新到达的消息数，形状为 (num_of_sources, )
+        """
+        raise NotImplementedError
+
+
+class PoissonArrival(ArrivalProcess):
+    """泊松到达，各消息源、各循环之间相互独立
+    """
+    name = 'poisson'
+
+    def __init__(self, rate: float):
+        """
+        :param rate: 每个消息源每个循环平均到达的消息数
+        """
+        if rate < 0:
+            raise ValueError('到达率不能小于 0')
+        self._rate = rate
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def sample(self, cycle: int, num_of_sources: int) -> numpy.ndarray:
+        return numpy.random.poisson(self._rate, num_of_sources)
+
+
+class PeriodicArrival(ArrivalProcess):
+    """周期到达，从第 offset 个循环开始，每隔 period 个循环每个消息源到达 batch 条消息
+    """
+    name = 'periodic'
+
+    def __init__(self, period: int, offset: int = 0, batch: int = 1):
+        """
+        :param period: 到达的周期（循环数）
+        :param offset: 第一次到达的循环
+        :param batch: 每次到达的消息数
+        """
+        if period < 1:
+            raise ValueError('到达周期不能小于 1')
+        if offset < 0 or batch < 1:
+            raise ValueError('第一次到达的循环不能小于 0 ，每次到达的消息数不能小于 1')
+        self.period = period
+        self.offset = offset
+        self.batch = batch
+
+    @property
+    def rate(self) -> float:
+        return self.batch / self.period
+
+    def sample(self, cycle: int, num_of_sources: int) -> numpy.ndarray:
+        arrived = cycle >= self.offset and (cycle - self.offset) % self.period == 0
+        return numpy.full(num_of_sources, self.batch if arrived else 0, dtype=numpy.int64)
+
+
+class BurstyArrival(ArrivalProcess):
+    """突发到达（开关模型）
+    全网同步地交替处于持续 on_cycles 个循环的突发期和持续 off_cycles 个循环的静默期，
+    突发期内按泊松到达，到达率取 rate × (on_cycles + off_cycles) / on_cycles ，使长期平均到达率仍为 rate
+    """
+    name = 'bursty'
+
+    def __init__(self, rate: float, on_cycles: int, off_cycles: int):
+        """
+        :param rate: 每个消息源每个循环平均到达的消息数
+        :param on_cycles: 突发期的循环数
+        :param off_cycles: 静默期的循环数
+        """
+        if rate < 0:
+            raise ValueError('到达率不能小于 0')
+        if on_cycles < 1 or off_cycles < 0:
+            raise ValueError('突发期的循环数不能小于 1 ，静默期的循环数不能小于 0')
+        self._rate = rate
+        self.on_cycles = on_cycles
+        self.off_cycles = off_cycles
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def sample(self, cycle: int, num_of_sources: int) -> numpy.ndarray:
+        period = self.on_cycles + self.off_cycles
+        if cycle % period >= self.on_cycles:
+            return numpy.zeros(num_of_sources, dtype=numpy.int64)
+        return numpy.random.poisson(self._rate * period / self.on_cycles, num_of_sources)
+
+
+# 注册名 -> 到达过程类
+ARRIVAL_PROCESSES: Dict[str, Type[ArrivalProcess]] = {
+    arrival_type.name: arrival_type for arrival_type in (PoissonArrival, PeriodicArrival, BurstyArrival)
+}
+
+
+def get_arrival(name: str, **kwargs) -> ArrivalProcess:
+    """按注册名创建一个到达过程
+    :param name: 到达过程的注册名
+    :param kwargs: 到达过程的参数
+    """
+    if name not in ARRIVAL_PROCESSES:
+        raise ValueError(f'未知的到达过程 `{name}` ，可选的到达过程有 {sorted(ARRIVAL_PROCESSES)}')
+    return ARRIVAL_PROCESSES[name](**kwargs)
+
+
+class WsnTrafficGenerator(object):
+    """合成流量发生器
+    按调度器的循环，依到达过程向若干消息源的 send_queue 注入消息，并跟踪每条消息的结局，统计吞吐量、时延和队列深度
+
+    消息源逐条发送自己队列中的消息，一条消息已经不是节点正在发送的消息、也不在发送队列的队首时就有了结局：
+    节点通过 on_finish 回调报告它被全部确认（送达）还是重传次数用尽后被放弃，没有报告的（例如节点电量耗尽）记为丢弃；
+    只有送达的消息计入吞吐量、送达率和时延。节点的 send_queue 和 sending 需要由协议逐条处理并报告结局，
+    即适用于 action1 、action2 这类要求回应、按节点调度的协议
+
+    在单线程模式下把发生器传给 Scheduler.schedule 即可，也可以在自己的循环中依次调用 inject() 和 update()
+    要求节点回应的协议每发送完一条消息就会要求终止网络，此时不要同时使用 NodeDriven 终止条件
+    """
+    # 日志配置
+    logger: logging.Logger = logging.getLogger('wsn.traffic')
+
+    # 消息源的节点下标
+    sources: numpy.ndarray
+    arrival: ArrivalProcess
+    # 每条消息需要收到回应的节点数，为 None 时不修改消息源的 teammate_num
+    teammate_num: Optional[int]
+    # 每个消息源已注入、尚未有结局的 (消息, 注入的循环) ，按注入的先后排列
+    pending: List[Deque[Tuple[NormalMessage, int]]]
+    # 节点报告了结局、还没有从 pending 中取出的消息，消息 uuid -> 是否被全部确认
+    outcomes: Dict[str, bool]
+    # 每个循环的统计，下标为循环次数 - 1
+    offered: List[int]
+    # 送达（被全部确认）的消息数
+    completed: List[int]
+    # 全部消息源的积压
+    backlog: List[int]
+    # 积压最多的消息源的积压
+    queue_depth: List[int]
+    # 送达的消息的时延（循环数）
+    latencies: List[int]
+    # 累计的消息数
+    num_of_injected: int
+    num_of_delivered: int
+    num_of_abandoned: int
+    num_of_dropped: int
+
+    def __init__(
+            self, sources: List[int], arrival: ArrivalProcess, teammate_num: Optional[int] = None,
+            data: str = 'traffic'
+    ):
+        """
+        :param sources: 消息源的节点下标（在 node_manager.nodes 中的下标）
+        :param arrival: 到达过程
+        :param teammate_num: 每条消息需要收到回应的节点数
+        :param data: 消息内容的前缀，消息内容为 `<前缀>-<消息源下标>-<序号>`
+        """
+        if not len(sources):
+            raise ValueError('至少需要一个消息源')
+        self.sources = numpy.asarray(sources, dtype=numpy.int64)
+        self.arrival = arrival
+        self.teammate_num = teammate_num
+        self.data = data
+        self.pending = [deque() for _ in range(len(self.sources))]
+        self.outcomes = {}
+        self.num_of_injected = 0
+        self.num_of_delivered = 0
+        self.num_of_abandoned = 0
+        self.num_of_dropped = 0
+        self.offered = []
+        self.completed = []
+        self.backlog = []
+        self.queue_depth = []
+        self.latencies = []
+        self._offered = 0
+
+    def inject(self, wsn, cycle: int) -> int:
+        """在循环开始前注入这个循环到达的消息
+        :param wsn: 无线传感网络
+        :param cycle: 已经完成的循环次数
+        :return: 注入的消息数
+        """
+        nodes = wsn.node_manager.nodes
+        counts = self.arrival.sample(cycle, len(self.sources))
+        woken = []
+        for k, (i, count) in enumerate(zip(self.sources.tolist(), counts.tolist())):
+            if not count:
+                continue
+            node = nodes[i]
+            if self.teammate_num is not None:
+                node.teammate_num = self.teammate_num
+            node.on_finish = self.finish
+            for _ in range(count):
+                # 以注入的循环作为起始循环，送达时延包含在消息源排队的时间
+                message = NormalMessage(
+                    data=f'{self.data}-{i}-{self.num_of_injected}', source=node.node_id, origin_tick=cycle
+                )
+                node.send_queue.append(message)
+                self.pending[k].append((message, cycle))
+                self.num_of_injected += 1
+            woken.append(i)
+        if woken:
+            wsn.medium.wake(numpy.array(woken, dtype=numpy.int64))
+        self._offered = int(counts.sum())
+        return self._offered
+
+    def has_future_arrivals(self, cycle: int) -> bool:
+        """第 cycle 个循环之后是否还可能注入新的消息
+        """
+        return self.arrival.arrives_after(cycle)
+
+    def finish(self, node, message: NormalMessage, acknowledged: bool) -> None:
+        """消息源的 on_finish 回调，记下消息的结局，由 update() 统计
+        """
+        self.outcomes[message.uuid] = acknowledged
+
+    def update(self, wsn, cycle: int) -> int:
+        """在循环结束后统计有了结局的消息和积压，只检查消息源，不遍历全网节点
+        :param wsn: 无线传感网络
+        :param cycle: 已经完成的循环次数（含这个循环）
+        :return: 这个循环送达的消息数
+        """
+        nodes = wsn.node_manager.nodes
+        completed = 0
+        backlog = 0
+        queue_depth = 0
+        for i, pending in zip(self.sources.tolist(), self.pending):
+            node = nodes[i]
+            while pending:
+                message, injected_at = pending[0]
+                if node.sending is message or (node.send_queue and node.send_queue[0] is message):
+                    break
+                pending.popleft()
+                acknowledged = self.outcomes.pop(message.uuid, None)
+                if acknowledged:
+                    self.latencies.append(cycle - injected_at)
+                    completed += 1
+                elif acknowledged is None:
+                    self.num_of_dropped += 1
+                else:
+                    self.num_of_abandoned += 1
+            backlog += len(pending)
+            queue_depth = max(queue_depth, len(pending))
+
+        self.num_of_delivered += completed
+        self.offered.append(self._offered)
+        self.completed.append(completed)
+        self.backlog.append(backlog)
+        self.queue_depth.append(queue_depth)
+        self._offered = 0
+        return completed
+
+    def report(self, warmup: float = 0.5, saturation_ratio: float = 0.9) -> Dict[str, Any]:
+        """汇总统计
+        稳态指标只统计 warmup 比例之后的循环；稳态吞吐量低于稳态提供负载的 saturation_ratio 倍，
+        且消息源的积压仍在增长时，认为已经饱和
+        :param warmup: 预热阶段占全部循环的比例
+        :param saturation_ratio: 判定饱和的吞吐量比例
+        :return: 每个循环的提供负载 offered_load 和吞吐量 throughput （全部消息源合计送达的消息数），
+                 送达（被全部确认）的比例 delivery_ratio ，被放弃的消息数 abandoned 和丢弃的消息数 dropped ，
+                 时延的平均值 latency_mean 和 95 分位数 latency_p95 ，
+                 消息源积压的最大值 backlog_max 和稳态下每个循环的增长量 backlog_growth ，
+                 单个消息源积压的最大值 queue_depth_max ，是否饱和 saturated
+        """
+        num_of_cycles = len(self.offered)
+        start = min(int(num_of_cycles * warmup), max(num_of_cycles - 1, 0))
+        offered = numpy.asarray(self.offered[start:], dtype=numpy.float64)
+        completed = numpy.asarray(self.completed[start:], dtype=numpy.float64)
+        backlog = numpy.asarray(self.backlog, dtype=numpy.float64)
+        latencies = numpy.asarray(self.latencies, dtype=numpy.float64)
+
+        offered_load = float(offered.mean()) if len(offered) else 0.
+        throughput = float(completed.mean()) if len(completed) else 0.
+        steady_backlog = backlog[start:]
+        backlog_growth = float(numpy.polyfit(
+            numpy.arange(len(steady_backlog)), steady_backlog, 1
+        )[0]) if len(steady_backlog) > 1 else 0.
+        return {
+            'num_of_cycles': num_of_cycles,
+            'offered_load': offered_load,
+            'throughput': throughput,
+            'delivery_ratio': self.num_of_delivered / self.num_of_injected if self.num_of_injected else 1.,
+            'abandoned': self.num_of_abandoned,
+            'dropped': self.num_of_dropped,
+            'latency_mean': float(latencies.mean()) if len(latencies) else 0.,
+            'latency_p95': float(numpy.percentile(latencies, 95)) if len(latencies) else 0.,
+            'backlog_max': int(backlog.max(initial=0)),
+            'backlog_growth': backlog_growth,
+            'queue_depth_max': int(max(self.queue_depth, default=0)),
+            'saturated': bool(offered_load > 0 and throughput < offered_load * saturation_ratio and backlog_growth > 0),
+        }
+
+    def summary(self) -> str:
+        report = self.report()
+        return (
+            f'{len(self.sources)} 个消息源共注入 {self.num_of_injected} 条消息，'
+            f'稳态提供负载 {report["offered_load"]:.3f} 条/循环，吞吐量 {report["throughput"]:.3f} 条/循环，'
+            f'送达 {report["delivery_ratio"]:.1%} （放弃 {report["abandoned"]} 条，丢弃 {report["dropped"]} 条），平均时延 {report["latency_mean"]:.1f} 个循环，'
+            f'积压最多 {report["backlog_max"]} 条（稳态每循环增长 {report["backlog_growth"]:.3f}）'
+            f'{"，已饱和" if report["saturated"] else ""}'
+        )
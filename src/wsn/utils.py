@@ -1,4 +1,6 @@
 import logging
+import time
+from typing import Optional
 
 import numpy
 
@@ -12,7 +14,8 @@ logger: logging.Logger = logging.getLogger('wsn.utils')
 def generate_rand_nodes(
         wsn: Wsn,
         wsn_width_x: float, wsn_width_y: float, node_num: int,
-        node_r_mu: float, node_r_sigma: float, node_power: float, node_pc_per_send
+        node_r_mu: float, node_r_sigma: float, node_power: float, node_pc_per_send,
+        rand_seed: Optional[int] = None
 ) -> Wsn:
     """生成随机节点
     根据实验参数，生成所需的随机节点
@@ -25,6 +28,7 @@ def generate_rand_nodes(
     :param node_r_sigma: 节点通信半径 r 的标准差 σ
     :param node_power: 节点初始总电量
     :param node_pc_per_send: 节点单次发射耗电量
+    :param rand_seed: 随机数种子，默认使用当前时间
     :return: 输入参数 `wsn`
     """
     node_num = node_num if node_num >= 0. else 0.
@@ -33,7 +37,7 @@ def generate_rand_nodes(
     node_r_sigma = node_r_sigma if node_r_sigma >= 0. else 0.
 
     # 设置随机数种子
-    numpy.random.seed(int(time.time()))
+    numpy.random.seed(int(time.time()) if rand_seed is None else rand_seed)
     # 实验报告中例子使用的随机数种子
     # numpy.random.seed(64540)
 
@@ -0,0 +1,80 @@
+import logging
+from typing import Optional
+
+import numpy
+
+
+class WsnWorklist(object):
+    """单线程调度用的活跃节点集合
+    只有有消息要处理、有消息要发送或者有重传在计时的节点才需要活动，其余节点调用 action 什么都不会做；
+    调度器每个循环只按随机顺序调度集合中的节点，开销与网络的活跃程度成正比，而不是与节点数成正比
+    节点活动后变得空闲就离开集合，通信介质向其投递消息时（WsnMedium.wake）重新加入，下一个循环开始活动，
+    时隙模式下这与逐个调度全部节点完全等价；非时隙模式下，循环中途被唤醒的节点原本有一定概率在本循环就活动
+    在运行中向节点的 send_queue 注入消息时，需要调用 WsnMedium.wake 唤醒该节点
+    """
+    # 日志配置
+    logger: logging.Logger = logging.getLogger('wsn.worklist')
+
+    # wsn: Wsn
+    # 每个节点是否在集合中，下标与 wsn.node_manager.nodes 一致
+    active: numpy.ndarray
+    # 只有前 num_of_schedulable 个节点会被调度，为 None 时全部节点都会被调度
+    num_of_schedulable: Optional[int]
+
+    def __init__(self, wsn, num_of_schedulable: Optional[int] = None):
+        """
+        :param wsn: 需要调度的无线传感网络
+        :param num_of_schedulable: 只调度前若干个节点，例如分片模式下只调度本分片拥有的节点
+        """
+        self.wsn = wsn
+        self.num_of_schedulable = num_of_schedulable
+        self.active = numpy.zeros(0, dtype=bool)
+        wsn.medium.woken = []
+        self.rebuild()
+
+    def is_idle(self, node) -> bool:
+        return self.wsn.protocol.is_idle(node)
+
+    def rebuild(self) -> None:
+        """逐个检查全部节点，重新建立集合，网络增删节点后需要调用
+        """
+        nodes = self.wsn.node_manager.nodes
+        self.active = numpy.fromiter((not self.is_idle(node) for node in nodes), dtype=bool, count=len(nodes))
+        if self.num_of_schedulable is not None:
+            self.active[self.num_of_schedulable:] = False
+        self.wsn.medium.woken = []
+        self.logger.info(f'活跃节点集合中有 {self.num_of_active} 个节点')
+
+    @property
+    def num_of_active(self) -> int:
+        return int(numpy.count_nonzero(self.active))
+
+    def step(self) -> bool:
+        """按随机顺序调度集合中的每个节点活动一次
+        :return: 是否有节点要求终止
+        """
+        nodes = self.wsn.node_manager.nodes
+        if len(nodes) != len(self.active):
+            self.rebuild()
+
+        # 上个循环中被投递了消息的节点加入集合
+        woken, self.wsn.medium.woken = self.wsn.medium.woken, []
+        for indices in woken:
+            if self.num_of_schedulable is not None:
+                indices = indices[indices < self.num_of_schedulable]
+            self.active[indices] = True
+
+        node_driven = False
+        order = numpy.random.permutation(numpy.flatnonzero(self.active)).tolist()
+        for i in order:
+            if nodes[i].action():
+                node_driven = True
+
+        # 活动后变得空闲的节点离开集合
+        for i in order:
+            if self.is_idle(nodes[i]):
+                self.active[i] = False
+        return node_driven
+
+    def close(self) -> None:
+        self.wsn.medium.woken = None
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+# 源码在 src/ 下，各个包按顶层包导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """日志、链路矩阵缓存和实验结果都写在工作路径下，每个测试在自己的临时目录中运行
+    """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def make_network(node_num=80, width=50, r_mu=10, r_sigma=3, power=10 ** 6, seed=3, slotted=True, lossless=False):
+    """生成一个单线程模式的随机网络
+    :param lossless: 把所有非零的链路概率改为 1 ，使结果不依赖随机数
+    """
+    from wsn import Wsn
+    from wsn.utils import generate_rand_nodes
+
+    network = generate_rand_nodes(
+        wsn=Wsn(), wsn_width_x=width, wsn_width_y=width, node_num=node_num,
+        node_r_mu=r_mu, node_r_sigma=r_sigma, node_power=power, node_pc_per_send=1, rand_seed=seed
+    )
+    network.medium.slotted = slotted
+    if lossless:
+        network.medium.get_link_matrix().probs[:] = 1.
+    for node in network.node_manager.nodes:
+        node.multithreading = False
+    return network
+
+
+def run_cycles(network, cycles, batch=None):
+    """按单线程模式调度器的方式运行若干个循环
+    :param batch: 是否使用协议的批量实现，为 None 时与调度器相同
+    """
+    from wsn import WsnWorklist
+
+    protocol = network.protocol
+    batch = protocol.supports_batch if batch is None else batch
+    worklist = None if batch else WsnWorklist(network)
+    for _ in range(cycles):
+        if batch:
+            protocol.step_all(network)
+        else:
+            worklist.step()
+        network.medium.end_slot()
+        network.energy_ledger.tick()
+    if worklist is not None:
+        worklist.close()
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+
+SRC_DIR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+GUI_MODULES = ('matplotlib', 'PyQt5', 'tkinter', '_tkinter')
+
+
+def loaded_gui_modules(code):
+    """在新的解释器中运行一段代码，返回其间加载了的图形界面相关模块
+    """
+    code += f'\nimport sys\nprint(sorted({{name.split(".")[0] for name in sys.modules}} & {set(GUI_MODULES)!r}))'
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=SRC_DIR_PATH, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip().splitlines()[-1]
+
+
+def test_importing_packages_loads_no_gui_modules():
+    """导入各个包（包括图形后端的入口）时不加载 matplotlib 和图形界面库
+    """
+    assert loaded_gui_modules('import bystander.backend, bystander, experiment, utils, wsn') == '[]'
+
+
+def test_headless_experiment_loads_no_gui_modules(tmp_path):
+    """无界面地运行一次实验也不加载 matplotlib
+    """
+    code = (
+        'import os\n'
+        'from experiment import run_experiment\n'
+        # 日志和结果写在临时目录下
+        f'os.chdir({str(tmp_path)!r})\n'
+        "run_experiment({'topology': {'wsn_width_x': 50, 'wsn_width_y': 50, 'node_num': 40}, "
+        "'termination': {'node_driven': False, 'num_of_cycles': 5}})"
+    )
+    assert loaded_gui_modules(code) == '[]'
+
+
+def test_load_matplotlib_imports_once(monkeypatch):
+    """第一次调用时才导入 matplotlib ，之后返回同样的模块
+    """
+    monkeypatch.setenv('MPLBACKEND', 'Agg')
+    from bystander.backend import load_matplotlib
+
+    pyplot, animation = load_matplotlib()
+    assert load_matplotlib() == (pyplot, animation)
+    assert pyplot.get_backend().lower() == 'agg'
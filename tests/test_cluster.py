@@ -0,0 +1,63 @@
+import numpy
+import pytest
+
+from conftest import make_network, run_cycles
+
+
+def test_leach_rotates_cluster_heads_every_epoch():
+    """每 1/p 轮为一个周期：每轮平均约有 p 比例的节点当簇头，每个节点在一个周期内至少当一次簇头，
+    分簇后每个存活的节点要么是簇头，要么加入了一个簇头
+    """
+    from wsn import get_protocol
+
+    numpy.random.seed(0)
+    network = make_network(node_num=200, width=30, r_sigma=0, lossless=True)
+    protocol = get_protocol('leach', p=0.1, control_cost=False)
+    network.set_protocol(protocol)
+    node_num = network.node_manager.node_num
+
+    for epoch in range(3):
+        counts = numpy.zeros(node_num, dtype=numpy.int64)
+        for round_index in range(epoch * 10, epoch * 10 + 10):
+            protocol.form_clusters(network, round_index)
+            assert ((protocol.head_of >= 0) | protocol.heads).all()
+            assert (protocol.head_of[protocol.heads] == -1).all()
+            counts += protocol.heads
+        # 汇聚节点每轮都是簇头
+        assert counts[0] == 10
+        assert (counts[1:] >= 1).all()
+        # 阈值选出的簇头每个节点每周期恰好一次，只有少数没有簇头可加入的节点被额外选为簇头
+        assert abs(counts[1:].sum() / 10 - 0.1 * (node_num - 1)) <= 0.05 * (node_num - 1)
+
+
+def test_leach_collects_every_reachable_node():
+    """汇聚节点每个收集任务都收齐所有可达节点的数据，任务结束时通过 on_finish 报告
+    """
+    from wsn import WsnConnectivity, get_protocol
+
+    numpy.random.seed(0)
+    network = make_network(node_num=60, width=30, lossless=True)
+    network.set_protocol(get_protocol('leach', p=0.1))
+    nodes = network.node_manager.nodes
+    reachable = WsnConnectivity.from_wsn(network, numpy.array([0])).reachable_num - 1
+    nodes[0].teammate_num = reachable
+    nodes[0].send_queue.extend(['first', 'second'])
+    outcomes = []
+    nodes[0].on_finish = lambda node, message, acknowledged: outcomes.append(
+        (message.data, acknowledged, set(node.replied_nodes))
+    )
+
+    run_cycles(network, 100)
+    senders = {node.node_id for node in nodes[1:]}
+    assert reachable == len(senders)
+    assert outcomes == [('first', True, senders), ('second', True, senders)]
+    assert network.protocol.delivered == 2 * reachable
+
+
+def test_leach_rejects_invalid_settings():
+    from wsn import get_protocol
+
+    with pytest.raises(ValueError):
+        get_protocol('leach', p=0)
+    with pytest.raises(ValueError):
+        get_protocol('leach', round_length=5, aggregate_delay=5)
@@ -0,0 +1,46 @@
+import numpy
+import pytest
+
+from conftest import make_network, run_cycles
+
+
+def test_ledger_keeps_only_network_totals_by_default():
+    """默认只按原因记录全网每个循环的耗电量，逐节点的内存只有累计耗电量和两份快照
+    """
+    from wsn import get_protocol
+
+    network = make_network()
+    network.set_protocol(get_protocol('action0'))
+    network.node_manager.nodes[0].send_queue.append('hello')
+    run_cycles(network, 30)
+
+    ledger = network.energy_ledger
+    node_num = network.node_manager.node_num
+    assert ledger.history.shape == (ledger.capacity, 4)
+    assert ledger.node_window is None
+    assert ledger.total.shape == (node_num, 4)
+    # 全网历史记录的合计与累计耗电量一致
+    assert ledger.window().sum() == pytest.approx(ledger.consumption().sum())
+    with pytest.raises(ValueError):
+        ledger.series()
+
+
+def test_rate_from_snapshots_matches_node_history():
+    """由快照推算的耗电速率与逐节点历史记录在同一时间窗口内的平均值一致
+    """
+    from wsn import WsnEnergyLedger, get_protocol
+
+    network = make_network()
+    network.energy_ledger = WsnEnergyLedger(network, capacity=8, node_history=64)
+    network.set_protocol(get_protocol('action0'))
+    network.node_manager.nodes[0].send_queue.append('hello')
+    run_cycles(network, 44)
+
+    ledger = network.energy_ledger
+    assert ledger.node_window.dtype == numpy.float32
+    # 每 8 个循环一次快照，保留第 32 和第 40 个循环的两份，速率是最近 44 - 32 = 12 个循环的平均值
+    assert [cycle for cycle, _ in ledger.snapshots] == [32, 40]
+    series = ledger.series()
+    assert series.shape == (44, network.node_manager.node_num)
+    numpy.testing.assert_allclose(ledger.rate(), series[-12:].mean(axis=0), rtol=1e-6)
+    numpy.testing.assert_allclose(series.sum(axis=0), ledger.consumption(), rtol=1e-6)
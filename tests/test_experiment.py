@@ -0,0 +1,110 @@
+def test_sweep_does_not_cache_skipped_points(tmp_path):
+    """目标无法达成的点标记为 skipped 且不保存到结果仓库，能运行的点照常保存
+    """
+    from experiment import ResultStore, run_sweep
+
+    topology = {'wsn_width_x': 50, 'wsn_width_y': 50, 'node_num': 40}
+    configs = [
+        # 40 个节点全部回应不可能达成
+        {'topology': topology, 'source': {'teammate_rate': 1.0}, 'seed': 1},
+        {'topology': topology, 'termination': {'node_driven': False, 'num_of_cycles': 5}, 'seed': 1},
+    ]
+    store = ResultStore(str(tmp_path / 'results'))
+    skipped, ran = run_sweep(configs, store)
+
+    assert skipped['summary']['skipped'] and skipped['summary']['num_of_cycles'] == 0
+    assert not ran['summary']['skipped'] and ran['summary']['num_of_cycles'] == 5
+    assert len(list((tmp_path / 'results').iterdir())) == 1
+
+
+SMALL_TOPOLOGY = {'wsn_width_x': 50, 'wsn_width_y': 50, 'node_num': 40}
+
+
+def count_runs(monkeypatch):
+    """记下 run_sweep 实际运行的实验点的种子
+    """
+    import experiment.core
+
+    calls = []
+    run_experiment = experiment.core.run_experiment
+
+    def counting_run_experiment(config):
+        calls.append(config['seed'])
+        return run_experiment(config)
+
+    monkeypatch.setattr(experiment.core, 'run_experiment', counting_run_experiment)
+    return calls
+
+
+def test_run_experiment_is_reproducible():
+    """同样的配置和种子给出同样的结果摘要，循环次数受终止条件限制
+    """
+    from experiment import run_experiment
+
+    config = {'topology': SMALL_TOPOLOGY, 'termination': {'node_driven': False, 'num_of_cycles': 20}, 'seed': 3}
+    first, second = run_experiment(config), run_experiment(config)
+    first.pop('running_time')
+    second.pop('running_time')
+    assert first == second
+    assert first['num_of_cycles'] == 20 and not first['skipped']
+    assert 0 < first['received_rate'] <= 1 and first['spread_count'] > 0
+
+
+def test_expand_grid_sets_dotted_paths():
+    from experiment import expand_grid
+
+    configs = expand_grid({'seed': 0}, {'topology.node_num': [10, 20], 'seed': [1, 2]})
+    assert [(config['topology']['node_num'], config['seed']) for config in configs] == [(10, 1), (10, 2), (20, 1), (20, 2)]
+
+
+def test_sweep_reads_cached_points_and_computes_only_missing(tmp_path, monkeypatch):
+    """已有结果的点直接从仓库读取，新增的点、结果损坏的点和代码版本变化后的点重新计算
+    """
+    import experiment.core
+    from experiment import ResultStore, get_config_key, run_sweep
+    from experiment.core import DEFAULT_CONFIG, merge_config
+
+    calls = count_runs(monkeypatch)
+    store = ResultStore(str(tmp_path / 'results'))
+    base = {'topology': SMALL_TOPOLOGY, 'termination': {'node_driven': False, 'num_of_cycles': 5}}
+    configs = [dict(base, seed=seed) for seed in (1, 2)]
+
+    first = run_sweep(configs, store)
+    assert calls == [1, 2]
+    assert len(list((tmp_path / 'results').iterdir())) == 2
+
+    # 全部命中缓存
+    assert run_sweep(configs, store) == first
+    assert calls == [1, 2]
+
+    # 只计算新增的点
+    run_sweep(configs + [dict(base, seed=3)], store)
+    assert calls == [1, 2, 3]
+
+    # 损坏的结果重新计算
+    key = get_config_key(merge_config(DEFAULT_CONFIG, configs[0]))
+    with open(store.path(key), 'w', encoding='utf-8') as f:
+        f.write('{')
+    run_sweep(configs, store)
+    assert calls == [1, 2, 3, 1]
+
+    # 代码版本变化后全部重新计算
+    monkeypatch.setattr(experiment.core, 'get_code_version', lambda: 'other-version')
+    records = run_sweep(configs, store)
+    assert calls == [1, 2, 3, 1, 1, 2]
+    assert all(record['code_version'] == 'other-version' for record in records)
+    assert [record['summary']['num_of_cycles'] for record in records] == [5, 5]
+
+
+def test_sweep_reevaluates_skipped_points(tmp_path, monkeypatch):
+    """没有运行的点不保存，再次扫描时重新判断
+    """
+    from experiment import ResultStore, run_sweep
+
+    calls = count_runs(monkeypatch)
+    store = ResultStore(str(tmp_path / 'results'))
+    configs = [{'topology': SMALL_TOPOLOGY, 'source': {'teammate_rate': 1.0}, 'seed': 1}]
+    assert run_sweep(configs, store)[0]['summary']['skipped']
+    assert run_sweep(configs, store)[0]['summary']['skipped']
+    assert calls == [1, 1]
+    assert not list((tmp_path / 'results').iterdir())
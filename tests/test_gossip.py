@@ -0,0 +1,42 @@
+import numpy
+import pytest
+
+from conftest import make_network, run_cycles
+
+
+def test_gossip_sends_injected_messages():
+    """合成流量注入 send_queue 的 NormalMessage 与字符串一样作为自己的消息发出，并带上节点的跳数限制
+    """
+    from wsn import get_protocol
+    from wsn.message import NormalMessage
+
+    network = make_network(lossless=True)
+    network.set_protocol(get_protocol('gossip', p=1., hop_limit=3))
+    nodes = network.node_manager.nodes
+    message = NormalMessage(data='injected', source=nodes[0].node_id)
+    nodes[0].send_queue.append(message)
+
+    run_cycles(network, 30)
+    assert message.ttl == 3
+    assert not nodes[0].send_queue and message.uuid in nodes[0].replied_nodes
+    assert any(node.recv_count for node in nodes[1:])
+
+
+@pytest.mark.parametrize('name', ['gossip', 'gossip_counter', 'gossip_distance'])
+def test_gossip_sends_less_than_flooding_by_default(name):
+    """默认参数下只有邻居数最少的一部分节点总是转发，三种 gossip 的发送次数都少于每个节点转发一次的泛洪
+    """
+    from wsn import get_protocol
+
+    sends = {}
+    for key, protocol in (('flood', get_protocol('gossip', p=1.)), ('gossip', get_protocol(name))):
+        numpy.random.seed(0)
+        network = make_network(node_num=200, width=60)
+        network.set_protocol(protocol)
+        network.node_manager.nodes[0].send_queue.append('hello')
+        run_cycles(network, 60)
+        sends[key] = network.medium.spread_count
+        if key == 'gossip':
+            degrees = numpy.diff(network.medium.get_link_matrix().indptr) - 1
+            assert protocol.sparse_threshold(network.medium.get_link_matrix()) == numpy.percentile(degrees, 20)
+    assert sends['gossip'] < sends['flood'] * 0.9
@@ -0,0 +1,39 @@
+import numpy
+import pytest
+
+from conftest import make_network, run_cycles
+
+
+def flood(protocol, batch, power, lossless=True, seed=3, node_num=80, cycles=30):
+    from wsn import get_protocol
+
+    network = make_network(node_num=node_num, power=power, seed=seed, lossless=lossless)
+    network.set_protocol(get_protocol(protocol))
+    network.node_manager.nodes[0].send_queue.append('Hello World!')
+    run_cycles(network, cycles, batch)
+    nodes = network.node_manager.nodes
+    return (
+        numpy.array([node.power for node in nodes]),
+        numpy.array([node.recv_count for node in nodes]),
+        network.energy_ledger.consumption().sum(),
+    )
+
+
+@pytest.mark.parametrize('protocol', ['action0', 'action3'])
+@pytest.mark.parametrize('power', [10 ** 6, 60, 3])
+def test_kernel_matches_object_path_without_loss(protocol, power):
+    """链路不丢包时，批量内核与逐节点调度的每个节点的电量和接收次数完全相同，包括电量耗尽的节点
+    """
+    power_by_object, recv_by_object, _ = flood(protocol, False, power)
+    power_by_kernel, recv_by_kernel, _ = flood(protocol, True, power)
+    numpy.testing.assert_array_equal(power_by_kernel, power_by_object)
+    numpy.testing.assert_array_equal(recv_by_kernel, recv_by_object)
+
+
+@pytest.mark.parametrize('protocol', ['action0', 'action3'])
+def test_kernel_matches_object_path_in_expectation(protocol):
+    """有丢包时两者的总耗电和收到消息的节点数在若干个随机拓扑上的平均值相近
+    """
+    by_object = numpy.mean([flood(protocol, False, 10 ** 6, False, seed, 150)[2] for seed in range(12)])
+    by_kernel = numpy.mean([flood(protocol, True, 10 ** 6, False, seed, 150)[2] for seed in range(12)])
+    assert by_kernel == pytest.approx(by_object, rel=0.08)
@@ -0,0 +1,69 @@
+import numpy
+import pytest
+
+from conftest import make_network
+
+
+def traced_flood(batch, cycles=30):
+    """无损网络上由一号节点发起一次 action3 泛洪，返回送达时延追踪
+    """
+    from utils import DeliveryTracer
+    from wsn import WsnWorklist, get_protocol
+
+    network = make_network(lossless=True)
+    network.set_protocol(get_protocol('action3'))
+    network.node_manager.nodes[0].send_queue.append('Hello World!')
+    tracer = DeliveryTracer(save=False)
+    tracer.bind(network)
+    network.delivery_tracer = tracer
+    worklist = None if batch else WsnWorklist(network)
+    for cycle in range(cycles):
+        tracer.cycle = cycle
+        if batch:
+            network.protocol.step_all(network)
+        else:
+            worklist.step()
+        network.medium.end_slot()
+        network.energy_ledger.tick()
+    if worklist is not None:
+        worklist.close()
+    return tracer
+
+
+def test_batch_path_traces_first_arrivals_like_object_path():
+    """批量实现从内核的首次送达记录时延和跳数，与逐节点调度的结果完全相同
+    """
+    batch, per_node = traced_flood(True), traced_flood(False)
+    assert batch.num_of_messages == per_node.num_of_messages == 1
+    assert batch.latency.count == per_node.latency.count > 0
+    assert numpy.array_equal(batch.latency.counts, per_node.latency.counts)
+    assert numpy.array_equal(batch.hops.counts, per_node.hops.counts)
+    # 无损链路上首次送达的跳数就是最短路径的跳数，时隙模式下每一跳需要两个循环
+    assert batch.latency.max == 2 * batch.hops.max - 1
+
+
+def test_tracer_evicts_records_with_arrivals():
+    """送达情况和逐条记录都只保留最近 max_messages 条，被挤出去的消息之后的副本被忽略
+    """
+    from utils import DeliveryTracer
+
+    tracer = DeliveryTracer(save=False, max_messages=2)
+    tracer.node_num = 4
+    tracer.node_index = {i + 1: i for i in range(5)}
+    for i in range(5):
+        tracer.arrive_batch(f'm{i}', 1, i, numpy.array([1, 2]), 1, i + 1)
+    assert list(tracer.records) == list(tracer.arrived) == ['m3', 'm4']
+    assert tracer.num_of_messages == 5 and tracer.summary()['messages'] == 5
+
+    tracer.arrive_batch('m0', 1, 0, numpy.array([3]), 2, 9)
+    assert 'm0' not in tracer.records and tracer.latency.count == 10
+    # 不同的接收者可以有不同的跳数
+    tracer.arrive_batch('m4', 1, 4, numpy.array([2, 3, 4]), numpy.array([5, 2, 3]), 6)
+    assert tracer.latency.count == 12 and tracer.hops.max == 3
+
+
+def test_tracer_rejects_invalid_settings():
+    from utils import DeliveryTracer
+
+    with pytest.raises(ValueError):
+        DeliveryTracer(save=False, max_messages=0)
@@ -0,0 +1,24 @@
+import numpy
+
+
+def test_snapshot_buffer_cycle_belongs_to_its_slot():
+    """循环次数和快照存放在同一个缓冲区里，读到的循环次数总是对应读到的快照
+    """
+    from bystander.live import HEADER_FRONT, HEADER_SEQ, SNAPSHOT_DTYPE, SnapshotBuffer
+
+    buffer = SnapshotBuffer(4)
+    try:
+        for cycle in range(1, 4):
+            snapshot = numpy.zeros(4, dtype=SNAPSHOT_DTYPE)
+            snapshot['recv_count'] = cycle
+            buffer.publish(snapshot, cycle)
+            frame = buffer.read()
+            assert frame is not None
+            assert frame[1] == cycle and (frame[0]['recv_count'] == cycle).all()
+
+        # 写入方正在改写前台缓冲区时（序号为奇数）放弃这一帧
+        front = int(buffer.header[HEADER_FRONT])
+        buffer.header[HEADER_SEQ + front] += 1
+        assert buffer.read() is None
+    finally:
+        buffer.close(unlink=True)
@@ -0,0 +1,26 @@
+import logging
+import time
+import zlib
+
+
+def test_gzip_handler_flushes_after_interval_without_new_records(tmp_path):
+    """间隔内写入的日志在间隔到期后由定时器刷新，不必等到下一条日志
+    """
+    from utils.log import GzipRotatingFileHandler
+
+    path = tmp_path / 'test.log.gz'
+    handler = GzipRotatingFileHandler(str(path), flush_interval=0.2)
+    logger = logging.getLogger('test-log')
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        logger.info('one')
+        logger.info('two')
+        time.sleep(0.5)
+        # 模拟崩溃：不关闭文件，直接解压已写入的部分
+        content = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(path.read_bytes())
+        assert content == b'one\ntwo\n'
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    assert handler.flush_timer is None
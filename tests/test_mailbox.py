@@ -0,0 +1,109 @@
+import threading
+import time
+
+
+def test_wait_wakes_on_message_from_another_thread():
+    """阻塞等待的节点线程在消息投递后立即醒来，不必等到超时
+    """
+    from wsn.mailbox import WsnMailbox
+
+    mailbox = WsnMailbox()
+    threading.Timer(0.05, mailbox.append, args=('hello', )).start()
+    start = time.time()
+    mailbox.wait(timeout=10)
+    assert time.time() - start < 5
+    assert mailbox.popleft() == 'hello'
+    assert not mailbox
+
+
+def test_wait_without_wake_on_message_sleeps_until_timeout():
+    """只等待计时器时，收到消息也不醒来
+    """
+    from wsn.mailbox import WsnMailbox
+
+    mailbox = WsnMailbox()
+    threading.Timer(0.01, mailbox.append, args=('hello', )).start()
+    start = time.time()
+    mailbox.wait(timeout=0.2, wake_on_message=False)
+    assert time.time() - start >= 0.2
+    assert len(mailbox) == 1
+
+
+def test_concurrent_producers_are_drained_in_order():
+    """多个线程并发投递时消费者最终取出所有消息，每个投递者的消息保持投递的先后顺序
+    """
+    from wsn.mailbox import WsnMailbox
+
+    mailbox = WsnMailbox()
+    num_of_producers, num_of_messages = 4, 2000
+
+    def produce(k):
+        for i in range(num_of_messages):
+            if i % 2:
+                mailbox.append((k, i))
+            else:
+                mailbox.extend([(k, i)])
+
+    producers = [threading.Thread(target=produce, args=(k, )) for k in range(num_of_producers)]
+    for producer in producers:
+        producer.start()
+
+    received = []
+    deadline = time.time() + 30
+    while len(received) < num_of_producers * num_of_messages and time.time() < deadline:
+        mailbox.wait(timeout=1)
+        while mailbox:
+            received.append(mailbox.popleft())
+    for producer in producers:
+        producer.join()
+
+    assert len(received) == num_of_producers * num_of_messages
+    for k in range(num_of_producers):
+        assert [i for owner, i in received if owner == k] == list(range(num_of_messages))
+
+
+def test_interrupt_stops_waiting_until_reset():
+    """interrupt() 唤醒无限期等待的线程，之后的等待立即返回，reset() 清空收件箱并恢复等待
+    """
+    from wsn.mailbox import WsnMailbox
+
+    mailbox = WsnMailbox()
+    waiter = threading.Thread(target=mailbox.wait)
+    waiter.start()
+    time.sleep(0.05)
+    assert waiter.is_alive()
+    mailbox.interrupt()
+    waiter.join(5)
+    assert not waiter.is_alive()
+
+    start = time.time()
+    mailbox.wait()
+    assert time.time() - start < 1
+
+    mailbox.append('stale')
+    mailbox.reset()
+    assert not mailbox and not mailbox.interrupted
+    start = time.time()
+    mailbox.wait(timeout=0.1)
+    assert time.time() - start >= 0.1
+
+
+def test_append_rings_doorbell_and_counts_in_flight():
+    """投递时按响所属工作线程的门铃，投递和取出都更新介质的 in_flight 计数
+    """
+    from wsn.mailbox import WsnMailbox
+
+    class Medium(object):
+        in_flight = 0
+
+    medium = Medium()
+    mailbox = WsnMailbox(medium)
+    mailbox.doorbell = threading.Event()
+    mailbox.append('a')
+    assert mailbox.doorbell.is_set()
+    mailbox.extend(['b', 'c'])
+    assert medium.in_flight == 3
+    assert mailbox.popleft() == 'a'
+    assert medium.in_flight == 2
+    mailbox.reset()
+    assert medium.in_flight == 0
@@ -0,0 +1,90 @@
+import pytest
+
+from conftest import make_network
+
+
+def drain(node):
+    """取出节点接收队列中的所有消息
+    """
+    messages = []
+    while node.recv_queue:
+        messages.append(node.recv_queue.popleft())
+    return messages
+
+
+def spread_from_source(slotted):
+    from wsn.message import NormalMessage
+
+    network = make_network(slotted=slotted, lossless=True)
+    nodes = network.node_manager.nodes
+    receivers, _ = network.medium.get_link_matrix().row(0)
+    message = NormalMessage(data='a', source=nodes[0].node_id)
+    nodes[0].send(message)
+    return network, message, receivers.tolist()
+
+
+def test_slotted_medium_delivers_at_end_of_slot():
+    """时隙模式下发送时不投递，结束时隙时一次性投递给链路上的所有节点，投递的是发送时的副本
+    """
+    network, message, receivers = spread_from_source(slotted=True)
+    nodes = network.node_manager.nodes
+    assert not any(node.recv_queue for node in nodes)
+
+    # 发送之后对消息的修改不影响已经发出的副本
+    message.data = 'b'
+    network.medium.end_slot()
+    assert sorted(i for i, node in enumerate(nodes) if node.recv_queue) == sorted(receivers)
+    assert network.medium.delivery_count == len(receivers)
+
+    # 投递之后时隙清空，再结束一次不会重复投递
+    network.medium.end_slot()
+    assert all(len(nodes[i].recv_queue) == 1 for i in receivers)
+
+    delivered = [drain(nodes[i])[0] for i in receivers]
+    assert all(each.data == 'a' and each.uuid == message.uuid for each in delivered)
+    # 每个接收者拿到的是各自的副本
+    assert len({id(each) for each in delivered}) == len(receivers)
+
+
+def test_unslotted_medium_delivers_immediately():
+    network, message, receivers = spread_from_source(slotted=False)
+    nodes = network.node_manager.nodes
+    assert sorted(i for i, node in enumerate(nodes) if node.recv_queue) == sorted(receivers)
+    assert network.medium.delivery_count == len(receivers)
+
+
+def test_slotted_medium_keeps_send_order_per_receiver():
+    """同一接收者在一个时隙内收到的多条消息保持发送的先后顺序
+    """
+    from wsn.message import NormalMessage
+
+    network = make_network(slotted=True, lossless=True)
+    nodes = network.node_manager.nodes
+    receivers, _ = network.medium.get_link_matrix().row(0)
+    neighbour = next(i for i in receivers.tolist() if i != 0)
+    data = ['first', 'second', 'third']
+    for i, text in enumerate(data):
+        sender = nodes[0] if i % 2 == 0 else nodes[neighbour]
+        sender.send(NormalMessage(data=text, source=sender.node_id))
+    network.medium.end_slot()
+
+    common = set(receivers.tolist()) & set(network.medium.get_link_matrix().row(neighbour)[0].tolist())
+    assert common
+    for i in common:
+        assert [message.data for message in drain(nodes[i])] == data
+
+
+@pytest.mark.parametrize('slotted', [True, False])
+def test_medium_wakes_receivers(slotted):
+    """投递时通知调度器唤醒接收者
+    """
+    import numpy
+    from wsn.message import NormalMessage
+
+    network = make_network(slotted=slotted, lossless=True)
+    network.medium.woken = []
+    nodes = network.node_manager.nodes
+    nodes[0].send(NormalMessage(data='a', source=nodes[0].node_id))
+    network.medium.end_slot()
+    receivers, _ = network.medium.get_link_matrix().row(0)
+    assert sorted(numpy.concatenate(network.medium.woken).tolist()) == sorted(receivers.tolist())
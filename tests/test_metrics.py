@@ -0,0 +1,55 @@
+from conftest import make_network, run_cycles
+
+
+def test_metrics_sampled_every_interval(tmp_path):
+    """按采样间隔记录，累计耗电量与能耗账本一致
+    """
+    from utils import MetricsRecorder
+    from utils.metrics import load_metrics
+    from wsn import get_protocol
+
+    network = make_network()
+    network.set_protocol(get_protocol('action0'))
+    network.node_manager.nodes[0].send_queue.append('Hello World!')
+    recorder = MetricsRecorder(str(tmp_path / 'metrics'), chunk_size=4, interval=5)
+    for cycle in range(1, 31):
+        run_cycles(network, 1)
+        recorder.sample(network, cycle)
+    recorder.close()
+
+    metrics = load_metrics(str(tmp_path / 'metrics'))
+    assert list(metrics['cycle']) == [5, 10, 15, 20, 25, 30]
+    assert metrics['energy'][-1] == network.energy_ledger.consumption().sum()
+    nodes = network.node_manager.nodes
+    assert metrics['energy'][-1] == sum(node.total_power - node.power for node in nodes)
+
+
+def test_node_stats_sum_replies_over_sources():
+    """回应数是所有消息源收到的回应之和，其它列与逐个节点统计的结果一致
+    """
+    from utils.metrics import collect_node_stats
+    from wsn import get_protocol
+
+    network = make_network(lossless=True)
+    network.set_protocol(get_protocol('action2'))
+    nodes = network.node_manager.nodes
+    sources = [nodes[0], nodes[40]]
+    for source in sources:
+        source.teammate_num = len(nodes)
+        source.send_queue.append(f'Hello from {source.node_id}')
+    run_cycles(network, 8)
+
+    stats = collect_node_stats(network)
+    assert all(source.replied_nodes for source in sources)
+    assert stats['replied'] == sum(len(source.replied_nodes) for source in sources)
+    assert stats['received'] == sum(1 for node in nodes if node.recv_count)
+    assert stats['alive'] == len(nodes)
+    assert stats['queue_depth'] == sum(
+        len(node.send_queue) + len(node.reply_queue) + (node.sending is not None) for node in nodes
+    )
+    assert stats['in_flight'] == sum(len(node.recv_queue) for node in nodes)
+    assert stats['energy'] == sum(node.total_power - node.power for node in nodes)
+
+    owned = collect_node_stats(network, 40)
+    assert owned['replied'] == len(nodes[0].replied_nodes)
+    assert owned['received'] == sum(1 for node in nodes[:40] if node.recv_count)
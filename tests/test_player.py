@@ -0,0 +1,104 @@
+import base64
+import re
+
+import numpy
+
+from conftest import make_network, run_cycles
+
+
+def decode_player(blob):
+    """按 encode_frames 的布局解码，与页面中的播放器逐帧应用增量的方式相同
+    :return: (node_id, x, y, r) 静态节点表，以及每一帧全部节点的 (类别, 电量, 上一跳下标)
+    """
+    from bystander.player import LABELS, PLAYER_MAGIC, PLAYER_VERSION
+
+    assert blob[:4] == PLAYER_MAGIC
+    version, node_num, frame_num = numpy.frombuffer(blob, dtype='<u4', count=3, offset=4)
+    assert version == PLAYER_VERSION
+    pos = 16
+    static = []
+    for dtype in ('<u4', '<f4', '<f4', '<f4'):
+        static.append(numpy.frombuffer(blob, dtype=dtype, count=node_num, offset=pos))
+        pos += 4 * node_num
+
+    category = numpy.full(node_num, LABELS.index('alive'), dtype='<u1')
+    power = numpy.zeros(node_num, dtype='<u1')
+    parent = numpy.full(node_num, -1, dtype='<i4')
+    states = []
+    for _ in range(frame_num):
+        k = int(numpy.frombuffer(blob, dtype='<u4', count=1, offset=pos)[0])
+        pos += 4
+        changed = numpy.frombuffer(blob, dtype='<u4', count=k, offset=pos)
+        pos += 4 * k
+        category[changed] = numpy.frombuffer(blob, dtype='<u1', count=k, offset=pos)
+        pos += k
+        power[changed] = numpy.frombuffer(blob, dtype='<u1', count=k, offset=pos)
+        pos += k
+        parent[changed] = numpy.frombuffer(blob, dtype='<i4', count=k, offset=pos)
+        pos += 4 * k
+        states.append((category.copy(), power.copy(), parent.copy()))
+    assert pos == len(blob)
+    return static, states
+
+
+def record_frames(cycles=12):
+    """用 action2 运行若干个循环，逐个循环记录旁观者画图用的节点信息
+    """
+    from bystander import Bystander
+    from wsn import get_protocol
+
+    network = make_network(node_num=40, width=30, power=60)
+    network.set_protocol(get_protocol('action2'))
+    nodes = network.node_manager.nodes
+    nodes[0].teammate_num = len(nodes)
+    nodes[0].send_queue.append('hello')
+    bystander = Bystander(network, headless=True)
+    frames = []
+    for _ in range(cycles):
+        run_cycles(network, 1)
+        frames.append([bystander.extract_node_info(node) for node in nodes])
+    return frames
+
+
+def test_player_round_trip():
+    """编码后内嵌在页面中的数据能还原出每一帧每个节点的类别、电量比例和上一跳
+    """
+    from bystander.player import LABELS, encode_frames, render_player
+
+    frames = record_frames()
+    blob = encode_frames(frames)
+    html = render_player(blob, title='round trip', fps=5)
+    assert '<title>round trip</title>' in html
+    assert 'fpsInput.value = 5.0' in html
+    assert not re.search(r'__[A-Z]+__', html)
+    embedded = base64.b64decode(re.search(r"atob\('([A-Za-z0-9+/=]*)'\)", html).group(1))
+    assert embedded == blob
+
+    (node_id, x, y, r), states = decode_player(embedded)
+    first = frames[0]
+    assert node_id.tolist() == [node_info['node_id'] for node_info in first]
+    assert numpy.allclose(x, [node_info['xy'][0] for node_info in first])
+    assert numpy.allclose(y, [node_info['xy'][1] for node_info in first])
+    assert numpy.allclose(r, [node_info['r'] for node_info in first], rtol=1e-6)
+
+    index_of = {tuple(node_info['xy']): i for i, node_info in enumerate(first)}
+    assert len(states) == len(frames)
+    for frame, (category, power, parent) in zip(frames, states):
+        assert [LABELS[c] for c in category] == [node_info['label'] for node_info in frame]
+        assert power.tolist() == [round(255 * node_info['power'] / node_info['total_power']) for node_info in frame]
+        assert parent.tolist() == [
+            index_of[tuple(node_info['last_node'])] if node_info['last_node'] is not None else -1 for node_info in frame
+        ]
+    # 节点的状态确实在变化，增量编码比逐帧保存全部节点小
+    assert len({tuple(category) for category, _, _ in states}) > 1
+    assert any((parent >= 0).any() for _, _, parent in states)
+    assert len(blob) < 16 + 16 * len(first) + len(frames) * (4 + 10 * len(first))
+
+
+def test_player_encodes_empty_recording():
+    from bystander.player import encode_frames, render_player
+
+    blob = encode_frames([])
+    _, states = decode_player(blob)
+    assert states == []
+    assert 'atob(' in render_player(blob)
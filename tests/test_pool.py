@@ -0,0 +1,58 @@
+import numpy
+import pytest
+
+from conftest import make_network, run_cycles
+
+
+def run_reply_protocol(pooled):
+    """不丢包时用 action2 从一号节点发出一条消息，直到收齐所有可达节点的回应
+    :param pooled: 是否由线程池调度，否则按单线程模式逐个循环调度
+    :return: (消息的结局 (是否被全部确认, 回应的节点), 收到过消息的节点)
+    """
+    from utils.event import node_want_to_terminate
+    from wsn import WsnConnectivity, get_protocol
+    from wsn.pool import WsnThreadPool
+
+    network = make_network(node_num=40, width=30, lossless=True, slotted=not pooled)
+    network.set_protocol(get_protocol('action2'))
+    nodes = network.node_manager.nodes
+    nodes[0].teammate_num = WsnConnectivity.from_wsn(network, numpy.array([0])).reachable_num - 1
+    nodes[0].send_queue.append('hello')
+    outcomes = []
+    nodes[0].on_finish = lambda node, message, acknowledged: outcomes.append((acknowledged, set(node.replied_nodes)))
+
+    if pooled:
+        for node in nodes:
+            node.multithreading = True
+            node.tick_interval = 0.01
+        node_want_to_terminate.clear()
+        pool = WsnThreadPool(network, num_of_workers=4)
+        assert pool.start()
+        try:
+            assert node_want_to_terminate.wait(30)
+        finally:
+            assert pool.stop(10)
+        assert not any(node.is_running for node in nodes)
+    else:
+        for _ in range(200):
+            if outcomes:
+                break
+            run_cycles(network, 1)
+
+    return outcomes, {node.node_id for node in nodes if node.recv_count}
+
+
+def test_thread_pool_matches_single_thread():
+    """线程池调度的结果与单线程模式一致：消息被同样的节点全部确认，同样的节点收到过消息
+    """
+    single = run_reply_protocol(pooled=False)
+    pooled = run_reply_protocol(pooled=True)
+    assert single[0] and single[0][0][0]
+    assert pooled == single
+
+
+def test_thread_pool_rejects_invalid_worker_count():
+    from wsn.pool import WsnThreadPool
+
+    with pytest.raises(ValueError):
+        WsnThreadPool(make_network(node_num=3), num_of_workers=0)
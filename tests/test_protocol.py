@@ -0,0 +1,122 @@
+import numpy
+import pytest
+
+from conftest import make_network, run_cycles
+
+
+@pytest.fixture
+def protocols(monkeypatch):
+    """在注册表的副本上注册协议，不影响其它测试
+    """
+    from wsn.protocol import base
+
+    monkeypatch.setattr(base, 'PROTOCOLS', dict(base.PROTOCOLS))
+    return base
+
+
+def test_register_and_get_protocol(protocols):
+    from wsn import WsnProtocol, get_protocol, register_protocol
+
+    @register_protocol('echo_alias')
+    class EchoProtocol(WsnProtocol):
+        name = 'echo'
+
+        def __init__(self, times: int = 1):
+            self.times = times
+
+        def step(self, node):
+            return None
+
+    assert protocols.PROTOCOLS['echo'] is protocols.PROTOCOLS['echo_alias'] is EchoProtocol
+    protocol = get_protocol('echo_alias', times=3)
+    assert isinstance(protocol, EchoProtocol) and protocol.times == 3
+    with pytest.raises(ValueError):
+        register_protocol()(type('Duplicate', (WsnProtocol, ), {'name': 'echo'}))
+    with pytest.raises(ValueError):
+        get_protocol('no_such_protocol')
+
+
+def test_builtin_protocols_are_registered_under_action_names():
+    from wsn import get_protocol
+    from wsn.protocol import (
+        OnceFloodingProtocol, RepeatBroadcastProtocol, ReplyRequiredProtocol, ReverseRouteReplyProtocol
+    )
+
+    for name, protocol_type in (
+            ('action0', RepeatBroadcastProtocol), ('action1', ReplyRequiredProtocol),
+            ('action2', ReverseRouteReplyProtocol), ('action3', OnceFloodingProtocol),
+    ):
+        assert type(get_protocol(name)) is protocol_type
+        assert type(get_protocol(protocol_type.name)) is protocol_type
+
+
+def test_init_node_owns_protocol_state():
+    """协议的状态由 init_node 建立在节点上，包括之后新增的节点；换用协议时保留已有的上一跳统计
+    """
+    from wsn import get_protocol
+    from wsn.sketch import ExactRouteTable, RotatingBloomFilter, SketchRouteTable
+
+    network = make_network(node_num=10)
+    nodes = network.node_manager.nodes
+    # 默认选用 action2
+    assert network.protocol.name == 'reverse_route_reply'
+    assert all(isinstance(node.route_len, ExactRouteTable) for node in nodes)
+    nodes[1].route_len.add('1', '2')
+
+    network.set_protocol(get_protocol('action2', route_capacity=8, dedup_capacity=16))
+    new_node = network.node_manager.add_node(1., 1., 5., 100., 1.)
+    for node in nodes:
+        assert isinstance(node.route_len, SketchRouteTable)
+        assert isinstance(node.duplicates, RotatingBloomFilter)
+        assert node.reply_attempts == {}
+    assert nodes[1].route_len.get('1') == {'2': 1}
+    assert new_node.action.func == network.protocol.step
+
+    network.set_protocol(get_protocol('gossip'))
+    assert all(node.gossip_states == {} and node.duplicates is None for node in nodes)
+
+
+def test_reply_protocol_end_to_end():
+    """不丢包时 action2 的消息源收齐所有可达节点的回应后要求终止，之后全网空闲
+    """
+    from wsn import WsnConnectivity, WsnWorklist, get_protocol
+
+    network = make_network(node_num=40, width=30, lossless=True)
+    network.set_protocol(get_protocol('action2'))
+    nodes = network.node_manager.nodes
+    reachable = WsnConnectivity.from_wsn(network, numpy.array([0])).reachable_num - 1
+    assert reachable > 10
+    nodes[0].teammate_num = reachable
+    nodes[0].send_queue.append('hello')
+    outcomes = []
+    nodes[0].on_finish = lambda node, message, acknowledged: outcomes.append((acknowledged, len(node.replied_nodes)))
+
+    worklist = WsnWorklist(network)
+    finished = None
+    for cycle in range(200):
+        if worklist.step():
+            finished = cycle
+            break
+        network.medium.end_slot()
+    worklist.close()
+    assert finished is not None
+    assert outcomes == [(True, reachable)]
+    assert sum(1 for node in nodes[1:] if node.recv_count) == reachable
+
+
+def test_once_flooding_end_to_end():
+    """不丢包时逐节点调度的 action3 送达所有可达节点，每个节点只转发一轮（100 次发送），
+    消息源发出自己的消息时没有记下 uuid ，听到邻居的转发后还会再泛洪一轮
+    """
+    from wsn import WsnConnectivity, get_protocol
+
+    network = make_network(node_num=40, width=30, lossless=True)
+    network.set_protocol(get_protocol('action3', hop_limit=1000))
+    nodes = network.node_manager.nodes
+    reachable = WsnConnectivity.from_wsn(network, numpy.array([0])).reachable_num
+    nodes[0].send_queue.append('hello')
+
+    run_cycles(network, 60)
+    assert sum(1 for node in nodes if node.recv_count or node is nodes[0]) == reachable
+    assert network.medium.spread_count == 100 * (reachable + 1)
+    assert all(network.protocol.is_idle(node) for node in nodes)
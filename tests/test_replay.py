@@ -0,0 +1,61 @@
+import numpy
+import pytest
+
+from conftest import make_network
+
+
+def run_traced(tmp_path, protocol, power, cycles):
+    """记录事件轨迹运行网络，返回网络和轨迹的回放
+    :param protocol: 协议的配置
+    """
+    from bystander import Bystander
+    from bystander.replay import TraceReplay
+    from utils import EnumScheduleMode, EventTrace, Scheduler, TerminationCondition
+    from wsn import get_protocol
+
+    network = make_network(power=power)
+    network.set_protocol(get_protocol(**protocol))
+    source = network.node_manager.nodes[0]
+    source.teammate_num = 10 ** 6
+    source.send_queue.append('Hello World!')
+    path = str(tmp_path / 'trace.bin')
+    Scheduler.schedule(
+        Bystander(network, headless=True), EnumScheduleMode.SINGLE_THREAD, [TerminationCondition.NumOfCycles(cycles)],
+        rand_seed=1, event_trace=EventTrace(path), check_reachability=False
+    )
+    # 关键帧间隔很小，跳转时要经过多个关键帧
+    return network, TraceReplay(path, keyframe_events=64)
+
+
+@pytest.mark.parametrize('protocol', [{'name': 'action2'}, {'name': 'action3', 'hop_limit': 1000}, {'name': 'action3'}])
+def test_replay_matches_live_state(tmp_path, protocol):
+    """回放最后一个循环结束时的电量、死亡和收到消息的节点与运行结束时的节点状态一致，
+    批量实现只记录节点层面的事件，回放结果也相同
+    """
+    network, replay = run_traced(tmp_path, protocol, power=150, cycles=40)
+    nodes = network.node_manager.nodes
+    assert len(replay.keyframe_cycles) > 2
+
+    state = replay.seek(replay.num_of_cycles)
+    assert numpy.array_equal(state.power, [node.power for node in nodes])
+    # 单线程模式下节点对象没有关机状态，电量不够再发送一次、并且尝试过发送的节点才会记录死亡
+    exhausted = numpy.array([node.power < node.pc_per_send for node in nodes])
+    assert state.dead.any() and not (state.dead & ~exhausted).any()
+    # 回放按送达计数，节点按处理计数；消息源只会收到自己消息的回声
+    received = numpy.array([node.recv_count > 0 for node in nodes])
+    assert numpy.array_equal(state.recv_count[1:] > 0, received[1:])
+
+
+def test_replay_seek_is_consistent_with_sequential_apply(tmp_path):
+    """从关键帧跳转到任意循环与从头顺序应用事件的结果相同
+    """
+    from bystander.replay import ReplayState
+
+    _, replay = run_traced(tmp_path, {'name': 'action2'}, power=150, cycles=40)
+    state = ReplayState(replay.topology['power'])
+    for cycle in range(replay.num_of_cycles + 1):
+        start, end = replay.cycle_range(cycle)
+        replay.apply(state, replay.trace[start:end])
+        sought = replay.seek(cycle)
+        for name in ReplayState.FIELDS:
+            assert numpy.array_equal(getattr(sought, name), getattr(state, name)), (cycle, name)
@@ -0,0 +1,25 @@
+from conftest import make_network, run_cycles
+
+
+def test_action2_gives_up_source_message_after_max_retries():
+    """源节点的消息重传次数用尽仍未被全部确认时放弃，接着发送队列里的下一条，都放弃后节点空闲
+    """
+    from wsn import get_protocol
+    from wsn.retransmit import RetransmissionPolicy, WsnRetransmitter
+
+    network = make_network(node_num=3)
+    network.set_protocol(get_protocol('action2'))
+    for node in network.node_manager.nodes:
+        node.retransmitter = WsnRetransmitter(RetransmissionPolicy(max_retries=2, jitter=0))
+    source = network.node_manager.nodes[0]
+    # 只有 3 个节点，不可能收齐 10 个回应
+    source.teammate_num = 10
+    source.send_queue.extend(['a', 'b'])
+
+    run_cycles(network, 200)
+    assert source.sending is None
+    assert not source.send_queue
+    assert not source.retransmitter
+    assert source.is_idle
+    # 两条消息各发送了 1 + max_retries 次
+    assert source.sending_attempts == 3
@@ -0,0 +1,41 @@
+import pytest
+
+from conftest import make_network
+
+
+def run(mode, protocol, tiles=(1, 1), cycles=30):
+    """由一号节点发出一条消息，按指定的调度模式运行 cycles 个循环
+    工作进程按节点坐标重新生成链路矩阵，所以这里不能把链路改成无损的
+    """
+    from bystander import Bystander
+    from utils import EnumScheduleMode, Scheduler, TerminationCondition
+    from wsn import get_protocol
+
+    network = make_network()
+    network.set_protocol(get_protocol(**protocol))
+    source = network.node_manager.nodes[0]
+    source.teammate_num = 10
+    source.send_queue.append('Hello World!')
+    Scheduler.schedule(
+        Bystander(network, headless=True), mode, [TerminationCondition.NumOfCycles(cycles)], rand_seed=1,
+        tiles=tiles, check_reachability=False
+    )
+    return network
+
+
+@pytest.mark.parametrize('protocol', [
+    {'name': 'action2'},
+    # 工作进程总是逐个节点调度，设置跳数限制让单线程模式也不使用批量实现
+    {'name': 'action3', 'hop_limit': 1000},
+])
+def test_single_tile_matches_single_thread(protocol):
+    """只有一个分片时，多进程模式与单线程模式使用相同的随机数，逐个节点的电量和接收次数完全相同
+    """
+    from utils import EnumScheduleMode
+
+    single = run(EnumScheduleMode.SINGLE_THREAD, protocol)
+    sharded = run(EnumScheduleMode.MULTI_PROCESS, protocol)
+    assert single.energy_ledger.cycle == sharded.energy_ledger.cycle == 30
+    for a, b in zip(single.node_manager.nodes, sharded.node_manager.nodes):
+        assert (a.node_id, a.power, a.recv_count) == (b.node_id, b.power, b.recv_count)
+    assert len(single.node_manager.nodes[0].replied_nodes) == len(sharded.node_manager.nodes[0].replied_nodes)
@@ -0,0 +1,89 @@
+import random
+from collections import Counter
+
+import pytest
+
+
+@pytest.mark.parametrize('capacity', [4, 16, 64])
+def test_space_saving_counts_bound_true_counts(capacity):
+    """每个键的计数是真实计数的上界，减去误差是下界，真实计数超过总数 1 / capacity 的键一定被保留
+    """
+    from wsn.sketch import SpaceSavingCounter
+
+    rng = random.Random(capacity)
+    stream = [int(rng.paretovariate(1.2)) for _ in range(5000)]
+    truth = Counter(stream)
+    counter = SpaceSavingCounter(capacity)
+    for key in stream:
+        counter.add(key)
+
+    assert len(counter) <= capacity
+    for key in counter:
+        assert counter.guaranteed(key) <= truth[key] <= counter[key]
+        assert counter.error(key) <= len(stream) // capacity
+    for key, count in truth.items():
+        if count > len(stream) / capacity:
+            assert key in counter
+
+
+def test_space_saving_rejects_invalid_capacity():
+    from wsn.sketch import SpaceSavingCounter
+
+    with pytest.raises(ValueError):
+        SpaceSavingCounter(0)
+
+
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives():
+    """加入 capacity 个键后，加入过的键都能查到，没加入过的键的误报率不超过 error_rate 太多
+    """
+    from wsn.sketch import BloomFilter
+
+    bloom = BloomFilter(2000, 0.01)
+    keys = [f'key-{i}' for i in range(2000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f'other-{i}' in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+    assert bloom.nbytes * 8 >= bloom.num_of_bits
+
+
+def test_rotating_bloom_filter_remembers_recent_keys_in_fixed_memory():
+    """轮换的过滤器至少记得最近加入的 capacity 个键，内存不随加入的键数增长
+    """
+    from wsn.sketch import RotatingBloomFilter
+
+    bloom = RotatingBloomFilter(500, 0.01)
+    nbytes = bloom.nbytes
+    for i in range(10000):
+        bloom.add(f'key-{i}')
+        assert all(f'key-{j}' in bloom for j in range(max(0, i - 499), i + 1, 50))
+    assert bloom.nbytes == nbytes
+    assert bloom.rotations >= 10000 // 500 - 1
+    # 两代合起来的误报率不超过 error_rate 太多
+    assert sum(f'other-{i}' in bloom for i in range(20000)) / 20000 < 0.02
+    # 很早以前的键大多已经被遗忘
+    assert sum(f'key-{i}' in bloom for i in range(1000)) < 100
+
+
+def test_rotating_bloom_filter_forgets_after_horizon():
+    from wsn.sketch import RotatingBloomFilter
+
+    bloom = RotatingBloomFilter(100, 0.01, horizon=10)
+    bloom.add('a')
+    bloom.expire(15)
+    assert 'a' in bloom
+    bloom.expire(25)
+    assert 'a' not in bloom
+
+
+def test_bloom_filters_reject_invalid_settings():
+    from wsn.sketch import BloomFilter, RotatingBloomFilter
+
+    with pytest.raises(ValueError):
+        BloomFilter(0)
+    with pytest.raises(ValueError):
+        BloomFilter(10, 1.)
+    with pytest.raises(ValueError):
+        RotatingBloomFilter(10, horizon=0)
@@ -0,0 +1,101 @@
+from conftest import make_network
+
+
+def schedule(network, conditions):
+    from bystander import Bystander
+    from utils import EnumScheduleMode, Scheduler
+
+    Scheduler.schedule(
+        Bystander(network, headless=True), EnumScheduleMode.SINGLE_THREAD, conditions, rand_seed=1,
+        check_reachability=False
+    )
+    return network.energy_ledger.cycle
+
+
+def test_projected_lifetime_stops_when_no_death_within_budget():
+    """电量充足时推算的第一个节点没电的循环远在预算之外，记录满预热的循环数就结束
+    """
+    from utils import TerminationCondition
+    from wsn import get_protocol
+
+    network = make_network(power=10 ** 6)
+    network.set_protocol(get_protocol('action0'))
+    network.node_manager.nodes[0].send_queue.append('Hello World!')
+    conditions = [TerminationCondition.NumOfCycles(500), TerminationCondition.ProjectedLifetime(10)]
+    assert schedule(network, conditions) == 10
+
+
+def test_projected_lifetime_keeps_running_when_death_is_within_budget():
+    """推算节点会在预算之内没电时继续运行，寿命的结论还取决于后面的循环
+    """
+    from utils import TerminationCondition
+    from wsn import get_protocol
+
+    network = make_network(power=40)
+    network.set_protocol(get_protocol('action0'))
+    network.node_manager.nodes[0].send_queue.append('Hello World!')
+    conditions = [TerminationCondition.NumOfCycles(100), TerminationCondition.ProjectedLifetime(10)]
+    assert schedule(network, conditions) == 100
+
+
+def test_projected_lifetime_uses_survival_rate_threshold():
+    """设置了存活率时推算的是存活率低至阈值的循环，horizon 覆盖 NumOfCycles 的预算
+    """
+    from utils import TerminationCondition
+    from wsn import get_protocol
+
+    network = make_network(power=300)
+    network.set_protocol(get_protocol('action0'))
+    network.node_manager.nodes[0].send_queue.append('Hello World!')
+    conditions = [
+        TerminationCondition.NumOfCycles(1000), TerminationCondition.SurvivalRate(0.),
+        TerminationCondition.ProjectedLifetime(20, horizon=50)
+    ]
+    assert schedule(network, conditions) == 20
+
+
+def test_quiescent_waits_for_pending_backoff():
+    """两次退避重传之间没有收发，但源节点还有重传计时器，等到重传次数用尽放弃之后才算静止
+    """
+    from utils import TerminationCondition
+    from wsn import get_protocol
+    from wsn.retransmit import RetransmissionPolicy, WsnRetransmitter
+
+    network = make_network(node_num=3)
+    network.set_protocol(get_protocol('action2'))
+    for node in network.node_manager.nodes:
+        node.retransmitter = WsnRetransmitter(
+            RetransmissionPolicy(initial_interval=8, max_interval=16, jitter=0, max_retries=2)
+        )
+    source = network.node_manager.nodes[0]
+    # 只有 3 个节点，不可能收齐 10 个回应
+    source.teammate_num = 10
+    source.send_queue.append('Hello World!')
+
+    cycles = schedule(network, [TerminationCondition.NumOfCycles(1000), TerminationCondition.Quiescent(4)])
+    # 第一次发送后等待 8 + 16 + 16 次活动才放弃
+    assert 40 <= cycles < 1000
+    assert source.sending is None and source.sending_attempts == 3
+    assert not any(node.retransmitter for node in network.node_manager.nodes)
+
+
+def test_quiescent_waits_for_future_traffic():
+    """合成流量之后还会有消息到达时，两批消息之间的安静不算静止
+    """
+    from bystander import Bystander
+    from utils import EnumScheduleMode, Scheduler, TerminationCondition
+    from wsn import get_protocol
+    from wsn.retransmit import RetransmissionPolicy, WsnRetransmitter
+    from wsn.traffic import PeriodicArrival, WsnTrafficGenerator
+
+    network = make_network(node_num=3, width=5, lossless=True)
+    network.set_protocol(get_protocol('action2'))
+    for node in network.node_manager.nodes:
+        node.retransmitter = WsnRetransmitter(RetransmissionPolicy(max_interval=2, jitter=0, max_retries=1))
+    traffic = WsnTrafficGenerator([0], PeriodicArrival(period=30), teammate_num=1)
+    Scheduler.schedule(
+        Bystander(network, headless=True), EnumScheduleMode.SINGLE_THREAD,
+        [TerminationCondition.NumOfCycles(100), TerminationCondition.Quiescent(5)], rand_seed=1, traffic=traffic
+    )
+    assert network.energy_ledger.cycle == 100
+    assert traffic.num_of_injected == 4
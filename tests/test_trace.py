@@ -0,0 +1,30 @@
+import os
+
+import numpy
+
+
+def test_trace_rotates_into_compressed_segments(tmp_path):
+    """写满 max_records 条后滚动为压缩分段，超出 backup_count 的被删除，读取时按时间先后拼接剩下的分段
+    """
+    from utils import EnumTraceEvent, EventTrace, iter_trace, open_trace
+
+    path = str(tmp_path / 'trace.bin')
+    trace = EventTrace(path, chunk_size=7, max_records=10, backup_count=2)
+    for cycle in range(45):
+        trace.cycle = cycle
+        trace.record(EnumTraceEvent.SEND, node=cycle)
+    trace.close()
+
+    # 当前文件 5 条，保留最近的两个分段 (20, 30] 、(30, 40]
+    assert os.path.exists(f'{path}.1.gz') and os.path.exists(f'{path}.2.gz')
+    assert not os.path.exists(f'{path}.3.gz')
+    assert os.path.getsize(path) == 16 + 5 * 32
+    assert trace.flushed == 45
+    events = numpy.concatenate(list(iter_trace(path, chunk_size=4)))
+    assert events['node'].tolist() == list(range(20, 45))
+    assert open_trace(path)['cycle'].tolist() == list(range(20, 45))
+
+    # 同一路径重新开始记录时清理之前的分段
+    EventTrace(path).close()
+    assert not os.path.exists(f'{path}.1.gz')
+    assert len(open_trace(path)) == 0
@@ -0,0 +1,57 @@
+from conftest import make_network
+
+
+def run_traffic(network, traffic, cycles):
+    """按单线程模式调度器的方式运行若干个循环，每个循环前注入消息，循环后统计
+    """
+    from wsn import WsnWorklist
+
+    worklist = WsnWorklist(network)
+    for cycle in range(cycles):
+        traffic.inject(network, cycle)
+        worklist.step()
+        network.medium.end_slot()
+        network.energy_ledger.tick()
+        traffic.update(network, cycle + 1)
+    worklist.close()
+
+
+def test_abandoned_messages_do_not_count_as_delivered():
+    """重传次数用尽后被放弃的消息单独计数，不计入送达率、吞吐量和时延
+    """
+    from wsn import get_protocol
+    from wsn.retransmit import RetransmissionPolicy, WsnRetransmitter
+    from wsn.traffic import WsnTrafficGenerator, get_arrival
+
+    network = make_network(node_num=3)
+    network.set_protocol(get_protocol('action2'))
+    for node in network.node_manager.nodes:
+        node.retransmitter = WsnRetransmitter(RetransmissionPolicy(max_retries=2, jitter=0))
+    # 只有 3 个节点，不可能收齐 10 个回应
+    traffic = WsnTrafficGenerator([0], get_arrival('periodic', period=20), teammate_num=10)
+
+    run_traffic(network, traffic, 200)
+    report = traffic.report()
+    assert traffic.num_of_injected == 10
+    assert report['abandoned'] >= 8
+    assert report['abandoned'] + report['dropped'] + traffic.backlog[-1] == traffic.num_of_injected
+    assert report['delivery_ratio'] == 0.
+    assert report['throughput'] == 0.
+    assert not traffic.latencies
+
+
+def test_acknowledged_messages_count_as_delivered():
+    """被全部确认的消息计入送达率，没有被放弃或丢弃的消息
+    """
+    from wsn import get_protocol
+    from wsn.traffic import WsnTrafficGenerator, get_arrival
+
+    network = make_network(node_num=3, width=5, lossless=True)
+    network.set_protocol(get_protocol('action2'))
+    traffic = WsnTrafficGenerator([0], get_arrival('periodic', period=20), teammate_num=2)
+
+    run_traffic(network, traffic, 200)
+    report = traffic.report()
+    assert traffic.num_of_delivered == traffic.num_of_injected - traffic.backlog[-1] > 0
+    assert report['abandoned'] == report['dropped'] == 0
+    assert report['delivery_ratio'] > 0.9
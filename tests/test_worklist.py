@@ -0,0 +1,53 @@
+import numpy
+import pytest
+
+from conftest import make_network
+
+
+def run(protocol, use_worklist, cycles=60):
+    """不丢包的时隙模式下运行若干个循环，逐个调度全部节点或者只调度活跃节点集合
+    :return: 每个循环结束时的 (发送次数, 投递次数) ，以及结束时每个节点的接收次数和累计耗电量
+    """
+    from wsn import WsnWorklist, get_protocol
+    from wsn.retransmit import RetransmissionPolicy, WsnRetransmitter
+
+    network = make_network(node_num=40, width=30, lossless=True)
+    network.set_protocol(get_protocol(protocol))
+    nodes = network.node_manager.nodes
+    for node in nodes:
+        node.retransmitter = WsnRetransmitter(RetransmissionPolicy(max_retries=2, jitter=0))
+    # 不可能收齐的回应数，消息源重传次数用尽后放弃
+    nodes[0].teammate_num = len(nodes) + 1
+    nodes[0].send_queue.extend(['a', 'b'])
+
+    worklist = WsnWorklist(network) if use_worklist else None
+    counts = []
+    for _ in range(cycles):
+        if worklist is None:
+            for node in nodes:
+                node.action()
+        else:
+            worklist.step()
+        network.medium.end_slot()
+        network.energy_ledger.tick()
+        counts.append((network.medium.spread_count, network.medium.delivery_count))
+    if worklist is not None:
+        assert worklist.num_of_active == 0
+        worklist.close()
+
+    recv_count = numpy.array([node.recv_count for node in nodes])
+    return counts, recv_count, network.energy_ledger.consumption()
+
+
+@pytest.mark.parametrize('protocol', ['action2', 'action3'])
+def test_worklist_matches_full_scan(protocol, monkeypatch):
+    """时隙模式下只调度活跃节点与每个循环调度全部节点的结果完全一致
+    节点处理消息的结果与消息到达的先后有关，这里把活跃节点的随机顺序固定为下标顺序，与逐个调度全部节点的顺序相同
+    """
+    monkeypatch.setattr(numpy.random, 'permutation', numpy.array)
+    full_counts, full_recv, full_energy = run(protocol, use_worklist=False)
+    counts, recv, energy = run(protocol, use_worklist=True)
+    assert counts == full_counts
+    assert full_counts[-1][0] > 0
+    assert (recv == full_recv).all()
+    assert (energy == full_energy).all()